@@ -0,0 +1,91 @@
+"""
+Copyright 2025 Amazon.com, Inc. or its affiliates.  All Rights Reserved.
+SPDX-License-Identifier: MIT-0
+
+Benchmark of the concurrent tag retrieval of the AWS Backup *_for_tags operations of the AWS Backup agent
+handler Lambda function. Lists the backup vaults for a tag against a stubbed AWS Backup client, whose
+list_tags calls each take a random 20-60ms, with 1 worker (sequential) and with the specified number of
+workers (BOTO3_API_MAX_CONCURRENCY). No AWS API is called.
+
+Usage: python benchmarks/backup_resource_tags_concurrency_benchmark.py [backup vault count] [max concurrency]
+"""
+import os
+import random
+import sys
+import time
+from timeit import default_timer as timer
+
+# The directory of the Lambda function under benchmark
+LAMBDA_FUNCTION_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda',
+                                   'backup-assistant-aws-backup-agent-handler')
+
+# Set the environment variables read by the Lambda function on import
+for env_var_name, env_var_value in {
+    'LOG_LEVEL': 'WARNING',
+    'LOG_LLM_PROCESSING_INFO': 'False',
+    'BOTO3_API_MAX_RESULTS': '100',
+    'DEFAULT_AWS_REGION': 'us-west-2',
+    'LLM_MODEL_OR_INFERENCE_PROFILE_ID': 'benchmark',
+    'SYSTEM_PROMPT_FILE_NAME': 'system_prompt_template.txt',
+    'USER_PROMPT_FILE_NAME': 'user_prompt_template.txt',
+    'SYSTEM_PROMPT_FOR_BOTO3_RETRY_FILE_NAME': 'system_prompt_template_for_boto3_retry.txt',
+    'USER_PROMPT_FOR_BOTO3_RETRY_FILE_NAME': 'user_prompt_template_for_boto3_retry.txt'
+}.items():
+    os.environ.setdefault(env_var_name, env_var_value)
+os.chdir(LAMBDA_FUNCTION_DIR)
+sys.path.insert(0, LAMBDA_FUNCTION_DIR)
+import lambda_function
+
+
+# Stubbed AWS Backup client with the specified number of backup vaults; every other backup vault
+# has the tag "env" with the value "prod", and the list_tags latency is fixed per backup vault
+class StubbedBackupClient:
+    def __init__(self, backup_vault_count):
+        random_generator = random.Random(0)
+        self.backup_vaults = [
+            {
+                'BackupVaultName': 'vault-{:04d}'.format(idx),
+                'BackupVaultArn': 'arn:aws:backup:us-west-2:111111111111:backup-vault:vault-{:04d}'.format(idx)
+            }
+            for idx in range(backup_vault_count)
+        ]
+        self.backup_vault_tags = {
+            backup_vault['BackupVaultArn']: {'env': 'prod' if idx % 2 == 0 else 'dev'}
+            for idx, backup_vault in enumerate(self.backup_vaults)
+        }
+        self.list_tags_latencies = {
+            backup_vault['BackupVaultArn']: random_generator.uniform(0.02, 0.06) for backup_vault in self.backup_vaults
+        }
+
+    def list_backup_vaults(self, **kwargs):
+        start_idx = int(kwargs.get('NextToken', '0'))
+        end_idx = start_idx + kwargs['MaxResults']
+        list_backup_vaults_response = {'BackupVaultList': self.backup_vaults[start_idx:end_idx]}
+        if end_idx < len(self.backup_vaults):
+            list_backup_vaults_response['NextToken'] = str(end_idx)
+        return list_backup_vaults_response
+
+    def list_tags(self, ResourceArn, MaxResults):
+        time.sleep(self.list_tags_latencies[ResourceArn])
+        return {'Tags': self.backup_vault_tags[ResourceArn]}
+
+
+# List the backup vaults for the tag with the specified max concurrency; returns the matching backup vault
+# names and the elapsed time
+def time_list_backup_vaults_for_tags(bkp_client, max_concurrency):
+    os.environ['BOTO3_API_MAX_CONCURRENCY'] = str(max_concurrency)
+    start_time = timer()
+    backup_vaults = lambda_function.list_backup_vaults_for_tags(bkp_client, 'env', ['prod'])
+    return [backup_vault['BackupVaultName'] for backup_vault in backup_vaults], timer() - start_time
+
+
+if __name__ == '__main__':
+    backup_vault_count = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    max_concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    bkp_client = StubbedBackupClient(backup_vault_count)
+    sequential_backup_vault_names, sequential_time = time_list_backup_vaults_for_tags(bkp_client, 1)
+    concurrent_backup_vault_names, concurrent_time = time_list_backup_vaults_for_tags(bkp_client, max_concurrency)
+    print('{} backup vaults, list_tags latency 20-60ms :: sequential (1 worker): {:.2f}s, {} workers: {:.2f}s, '
+          'identical results: {}'
+          .format(backup_vault_count, sequential_time, max_concurrency, concurrent_time,
+                  sequential_backup_vault_names == concurrent_backup_vault_names))
@@ -0,0 +1,87 @@
+"""
+Copyright 2025 Amazon.com, Inc. or its affiliates.  All Rights Reserved.
+SPDX-License-Identifier: MIT-0
+
+Micro-benchmark of the prompt template rendering of the AWS Backup agent handler Lambda function.
+Compares reading the prompt template files and substituting the placeholders with chained replace() calls
+on every render, against rendering the prompt templates preloaded and precompiled by the Lambda function.
+No AWS API is called.
+
+Usage: python benchmarks/prompt_template_rendering_benchmark.py [render count]
+"""
+import os
+import sys
+from timeit import default_timer as timer
+
+# The directory of the Lambda function under benchmark
+LAMBDA_FUNCTION_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda',
+                                   'backup-assistant-aws-backup-agent-handler')
+
+# Set the environment variables read by the Lambda function on import
+for env_var_name, env_var_value in {
+    'LOG_LEVEL': 'WARNING',
+    'LOG_LLM_PROCESSING_INFO': 'False',
+    'DEFAULT_AWS_REGION': 'us-west-2',
+    'LLM_MODEL_OR_INFERENCE_PROFILE_ID': 'benchmark',
+    'SYSTEM_PROMPT_FILE_NAME': 'system_prompt_template.txt',
+    'USER_PROMPT_FILE_NAME': 'user_prompt_template.txt',
+    'SYSTEM_PROMPT_FOR_BOTO3_RETRY_FILE_NAME': 'system_prompt_template_for_boto3_retry.txt',
+    'USER_PROMPT_FOR_BOTO3_RETRY_FILE_NAME': 'user_prompt_template_for_boto3_retry.txt'
+}.items():
+    os.environ.setdefault(env_var_name, env_var_value)
+os.chdir(LAMBDA_FUNCTION_DIR)
+sys.path.insert(0, LAMBDA_FUNCTION_DIR)
+import lambda_function
+
+# The sample values of the user prompt placeholders
+SAMPLE_PLACEHOLDER_VALUES = {
+    'aws_account_id': '111111111111',
+    'aws_region': 'us-west-2',
+    'boto3_api_name': 'create_backup_plan',
+    'user_input': 'Create a backup plan named daily-backups with a daily rule retained for 35 days',
+    'generated_boto3_json': '{"BackupPlan": {"BackupPlanName": "daily-backups", "Rules": [{"RuleName": "daily"}]}}'
+}
+
+# The placeholder values of the user prompt, for the placeholders in the user prompt template
+PLACEHOLDER_VALUES = {
+    placeholder_name: SAMPLE_PLACEHOLDER_VALUES.get(placeholder_name, '')
+    for placeholder_name in lambda_function.PROMPT_TEMPLATES['USER_PROMPT_FILE_NAME'][1]
+}
+
+
+# Render the system and user prompts by reading the prompt template files and substituting the placeholders
+# with chained replace() calls; the rendering before the prompt templates were preloaded and precompiled
+def render_prompts_with_file_reads():
+    system_prompt = lambda_function.read_file(os.environ['SYSTEM_PROMPT_FILE_NAME'], 'r')
+    user_prompt = lambda_function.read_file(os.environ['USER_PROMPT_FILE_NAME'], 'r')
+    for placeholder_name, placeholder_value in PLACEHOLDER_VALUES.items():
+        user_prompt = user_prompt.replace('{' + placeholder_name + '}', placeholder_value)
+    return system_prompt, user_prompt
+
+
+# Render the system and user prompts from the preloaded and precompiled prompt templates
+def render_prompts_with_precompiled_templates():
+    system_prompt = lambda_function.render_prompt_template(
+        lambda_function.PROMPT_TEMPLATES['SYSTEM_PROMPT_FILE_NAME'], {})
+    user_prompt = lambda_function.render_prompt_template(
+        lambda_function.PROMPT_TEMPLATES['USER_PROMPT_FILE_NAME'], PLACEHOLDER_VALUES)
+    return system_prompt, user_prompt
+
+
+# Time the specified number of renders with the specified render function
+def time_renders(render_function, render_count):
+    start_time = timer()
+    for _ in range(render_count):
+        render_function()
+    return timer() - start_time
+
+
+if __name__ == '__main__':
+    render_count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    # Both the render functions are expected to render the same prompts
+    if render_prompts_with_file_reads() != render_prompts_with_precompiled_templates():
+        sys.exit('The rendered prompts do not match.')
+    print('{} renders of the system and user prompts :: file reads + chained replace(): {:.3f}s, '
+          'precompiled templates: {:.3f}s'
+          .format(render_count, time_renders(render_prompts_with_file_reads, render_count),
+                  time_renders(render_prompts_with_precompiled_templates, render_count)))
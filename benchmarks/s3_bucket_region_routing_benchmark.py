@@ -0,0 +1,133 @@
+"""
+Copyright 2025 Amazon.com, Inc. or its affiliates.  All Rights Reserved.
+SPDX-License-Identifier: MIT-0
+
+Benchmark of the routing of the per bucket Amazon S3 API calls to the bucket's regional client, in the
+Amazon S3 agent handler Lambda function. Runs the requests against stubbed Amazon S3 clients, with buckets
+spread over 5 regions, and counts the round trips; a call from a client in another region than the bucket's
+costs 2 round trips (the 301 redirect and the retried request). The requests are run with the routing
+disabled (every call made with the client of the requested region) and enabled. No AWS API is called.
+
+Usage: python benchmarks/s3_bucket_region_routing_benchmark.py [bucket count]
+"""
+import json
+import os
+import sys
+
+# The directory of the Lambda function under benchmark
+LAMBDA_FUNCTION_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda',
+                                   'backup-assistant-amazon-s3-agent-handler')
+
+# Set the environment variables read by the Lambda function on import
+for env_var_name, env_var_value in {
+    'LOG_LEVEL': 'WARNING',
+    'LOG_LLM_PROCESSING_INFO': 'False',
+    'BOTO3_API_MAX_RESULTS': '1000',
+    'DEFAULT_AWS_REGION': 'us-west-2',
+    'LLM_MODEL_OR_INFERENCE_PROFILE_ID': 'benchmark',
+    'SYSTEM_PROMPT_FILE_NAME': 'system_prompt_template.txt',
+    'USER_PROMPT_FILE_NAME': 'user_prompt_template.txt',
+    'SYSTEM_PROMPT_FOR_BOTO3_RETRY_FILE_NAME': 'system_prompt_template_for_boto3_retry.txt',
+    'USER_PROMPT_FOR_BOTO3_RETRY_FILE_NAME': 'user_prompt_template_for_boto3_retry.txt'
+}.items():
+    os.environ.setdefault(env_var_name, env_var_value)
+os.chdir(LAMBDA_FUNCTION_DIR)
+sys.path.insert(0, LAMBDA_FUNCTION_DIR)
+import boto3
+import lambda_function
+
+# The region of the requests, and the regions of the buckets
+AWS_REGION = 'us-west-2'
+BUCKET_AWS_REGIONS = ['us-west-2', 'us-east-1', 'eu-west-1', 'ap-south-1', 'sa-east-1']
+
+# The service model of the Amazon S3 client, used by the local validation of the boto3 API JSON
+S3_SERVICE_MODEL = boto3.client('s3', region_name=AWS_REGION).meta.service_model
+
+
+# Stubbed Amazon S3 client of the specified region, that counts the round trips of its calls
+class StubbedS3Client:
+    def __init__(self, aws_region, bucket_regions, round_trip_counts):
+        self.meta = type('ClientMeta', (), {'region_name': aws_region, 'service_model': S3_SERVICE_MODEL})()
+        self.bucket_regions = bucket_regions
+        self.round_trip_counts = round_trip_counts
+
+    def count_bucket_call(self, bucket_name):
+        self.round_trip_counts['Total'] += 1 if self.bucket_regions[bucket_name] == self.meta.region_name else 2
+
+    def list_buckets(self, **kwargs):
+        self.round_trip_counts['Total'] += 1
+        buckets = [{'Name': bucket_name, 'BucketRegion': bucket_region}
+                   for bucket_name, bucket_region in self.bucket_regions.items()
+                   if kwargs.get('BucketRegion') in (None, bucket_region)]
+        return {'Buckets': buckets}
+
+    def head_bucket(self, Bucket):
+        self.count_bucket_call(Bucket)
+        return {'BucketRegion': self.bucket_regions[Bucket], 'ResponseMetadata': {'HTTPHeaders': {}}}
+
+    def get_bucket_tagging(self, Bucket):
+        self.count_bucket_call(Bucket)
+        return {'TagSet': [{'Key': 'env', 'Value': 'prod'}]}
+
+    def get_bucket_versioning(self, Bucket):
+        self.count_bucket_call(Bucket)
+        return {'Status': 'Enabled'}
+
+
+# Get the Lambda function event of the specified boto3 API request
+def get_event(boto3_api_name, boto3_api_json):
+    return {
+        'actionGroup': 'benchmark',
+        'function': 'benchmark',
+        'inputText': 'benchmark',
+        'sessionAttributes': {'AWSAccountId': '111111111111'},
+        'promptSessionAttributes': {},
+        'parameters': [
+            {'name': 'AWSRegion', 'value': AWS_REGION},
+            {'name': 'Boto3APIName', 'value': boto3_api_name},
+            {'name': 'Boto3APIJSON', 'value': json.dumps(boto3_api_json)}
+        ]
+    }
+
+
+# The routing to the bucket's regional client of the Lambda function
+ROUTED_GET_S3_CLIENT_FOR_BUCKET = lambda_function.get_s3_client_for_bucket
+
+
+# Run the benchmark requests with the routing to the bucket's regional client enabled or disabled;
+# returns the round trips per request
+def run_requests(bucket_regions, routing_enabled):
+    round_trip_counts = {'Total': 0}
+    stubbed_s3_clients = {}
+    lambda_function.get_boto3_client = lambda service_name, aws_region, *args, **kwargs: stubbed_s3_clients.setdefault(
+        aws_region, StubbedS3Client(aws_region, bucket_regions, round_trip_counts))
+    lambda_function.get_s3_client_for_bucket = (ROUTED_GET_S3_CLIENT_FOR_BUCKET if routing_enabled
+                                                else lambda s3_client, bucket_name: s3_client)
+    lambda_function.S3_BUCKET_REGION_CACHE.clear()
+    request_round_trip_counts = {}
+    for request_label in ['get_bucket_versioning x{}, cold cache'.format(len(bucket_regions)),
+                          'get_bucket_versioning x{}, warm cache'.format(len(bucket_regions))]:
+        round_trip_counts['Total'] = 0
+        for bucket_name in bucket_regions:
+            lambda_function.parse_request_and_prepare_response(
+                get_event('get_bucket_versioning', {'Bucket': bucket_name}), None)
+        request_round_trip_counts[request_label] = round_trip_counts['Total']
+    lambda_function.S3_BUCKET_REGION_CACHE.clear()
+    round_trip_counts['Total'] = 0
+    lambda_function.parse_request_and_prepare_response(
+        get_event('list_buckets_by_regions_and_tags', {'RegionNames': '', 'BucketTagName': 'env',
+                                                       'BucketTagValues': 'prod'}), None)
+    request_round_trip_counts['list_buckets_by_regions_and_tags, {} buckets'.format(len(bucket_regions))] = \
+        round_trip_counts['Total']
+    return request_round_trip_counts
+
+
+if __name__ == '__main__':
+    bucket_count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    bucket_regions = {'bucket-{:04d}'.format(idx): BUCKET_AWS_REGIONS[idx % len(BUCKET_AWS_REGIONS)]
+                      for idx in range(bucket_count)}
+    unrouted_round_trip_counts = run_requests(bucket_regions, False)
+    routed_round_trip_counts = run_requests(bucket_regions, True)
+    for request_label in routed_round_trip_counts:
+        print('{:<50} {:>5} -> {:>5} round trips'.format(request_label, unrouted_round_trip_counts[request_label],
+                                                         routed_round_trip_counts[request_label]))
@@ -3,10 +3,23 @@ Copyright 2025 Amazon.com, Inc. or its affiliates.  All Rights Reserved.
 SPDX-License-Identifier: MIT-0
 """
 import boto3
+import hashlib
 import json
 import logging
 import os
+import random
+import re
+import threading
+import time
+import weakref
 from botocore.config import Config
+from botocore.exceptions import ClientError, ConnectTimeoutError, EndpointConnectionError, HTTPClientError, ParamValidationError
+from botocore.validate import ParamValidator
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from itertools import islice
 
 
 # Set the logger
@@ -69,90 +82,988 @@ def read_file(file_full_path, file_read_type):
     return file_content
 
 
+# Pattern of the placeholders (for example, {aws_region}) in the prompt templates
+PROMPT_TEMPLATE_PLACEHOLDER_PATTERN = re.compile(r'\{(\w+)\}')
+
+
+# Compile the prompt template text into its literal parts and placeholder names;
+# the odd indexed items of the parts list are the placeholder names
+def compile_prompt_template(template_text):
+    template_parts = PROMPT_TEMPLATE_PLACEHOLDER_PATTERN.split(template_text)
+    placeholder_names = frozenset(template_parts[1::2])
+    return template_parts, placeholder_names
+
+
+# Render the compiled prompt template by substituting all the placeholders in a single pass
+def render_prompt_template(compiled_prompt_template, placeholder_values):
+    template_parts, placeholder_names = compiled_prompt_template
+    # Validate that the placeholder values match the placeholders in the template
+    if placeholder_names != placeholder_values.keys():
+        raise ValueError('Prompt template placeholders {} do not match the specified values {}.'
+                         .format(sorted(placeholder_names), sorted(placeholder_values.keys())))
+    rendered_parts = template_parts.copy()
+    for idx in range(1, len(rendered_parts), 2):
+        rendered_parts[idx] = placeholder_values[rendered_parts[idx]]
+    return ''.join(rendered_parts)
+
+
+# Read and compile all the prompt templates; done once per Lambda container
+def load_prompt_templates():
+    prompt_templates_dir = os.path.dirname(os.path.abspath(__file__))
+    prompt_templates = {}
+    for prompt_file_name_env_var in ('SYSTEM_PROMPT_FILE_NAME',
+                                     'USER_PROMPT_FILE_NAME',
+                                     'SYSTEM_PROMPT_FOR_BOTO3_RETRY_FILE_NAME',
+                                     'USER_PROMPT_FOR_BOTO3_RETRY_FILE_NAME'):
+        prompt_file_full_path = os.path.join(prompt_templates_dir, os.environ[prompt_file_name_env_var])
+        prompt_templates[prompt_file_name_env_var] = compile_prompt_template(read_file(prompt_file_full_path, 'r'))
+    return prompt_templates
+
+
+# Load the prompt templates
+PROMPT_TEMPLATES = load_prompt_templates()
+
+
+# The hashes of the prompt templates; used to key the cached LLM responses
+PROMPT_TEMPLATE_HASHES = {
+    prompt_template_name: hashlib.sha256(json.dumps(prompt_template[0]).encode('utf-8')).hexdigest()
+    for prompt_template_name, prompt_template in PROMPT_TEMPLATES.items()
+}
+
+
+# In-memory LRU cache of the LLM responses, that is reused across invocations of a warm Lambda container;
+# the optional on-disk tier (e.g. under /tmp) is enabled by specifying its directory
+LLM_RESPONSE_CACHE = OrderedDict()
+LLM_RESPONSE_CACHE_LOCK = threading.Lock()
+LLM_RESPONSE_CACHE_STATS = {
+    'memory_hits': 0,
+    'disk_hits': 0,
+    'misses': 0,
+    'saved_input_tokens': 0,
+    'saved_output_tokens': 0
+}
+
+
+# Canonicalize the boto3 API JSON text so that formatting and key order do not change the cache key
+def canonicalize_boto3_json(boto3_json_str):
+    try:
+        return json.dumps(json.loads(boto3_json_str), sort_keys=True, separators=(',', ':'))
+    except json.JSONDecodeError:
+        return boto3_json_str.strip()
+
+
+# Get the cache key of the LLM response for the specified prompt templates and placeholder values
+def get_llm_response_cache_key(prompt_template_names, placeholder_values):
+    cache_key_json = json.dumps({
+        'model_id': os.environ['LLM_MODEL_OR_INFERENCE_PROFILE_ID'],
+        'prompt_template_hashes': [PROMPT_TEMPLATE_HASHES[name] for name in prompt_template_names],
+        'placeholder_values': placeholder_values
+    }, sort_keys=True)
+    return hashlib.sha256(cache_key_json.encode('utf-8')).hexdigest()
+
+
+# Get the TTL (in seconds) of the cached LLM responses, in both the in-memory and the on-disk tiers
+def get_llm_response_cache_ttl():
+    return int(os.environ.get('LLM_RESPONSE_CACHE_TTL_SECONDS', '86400'))
+
+
+# Check if the specified LLM response cache entry has expired; entries without a cached time have expired
+def is_llm_response_cache_entry_expired(cache_entry):
+    return (time.time() - cache_entry.get('cached_time', 0)) > get_llm_response_cache_ttl()
+
+
+# Get the path of the on-disk LLM response cache file for the specified key;
+# returns an empty string if the on-disk tier is not enabled
+def get_llm_response_cache_file_path(cache_key):
+    cache_dir = os.environ.get('LLM_RESPONSE_CACHE_DIR', '')
+    if len(cache_dir) == 0:
+        return ''
+    return os.path.join(cache_dir, '{}.json'.format(cache_key))
+
+
+# Add the cache entry to the in-memory tier and evict the least recently used entries beyond the max size.
+# Must be called with the cache lock held.
+def add_llm_response_cache_entry(cache_key, cache_entry):
+    LLM_RESPONSE_CACHE[cache_key] = cache_entry
+    LLM_RESPONSE_CACHE.move_to_end(cache_key)
+    while len(LLM_RESPONSE_CACHE) > int(os.environ.get('LLM_RESPONSE_CACHE_MAX_ENTRIES', '256')):
+        LLM_RESPONSE_CACHE.popitem(last=False)
+
+
+# Remove the cached LLM response for the specified key from the in-memory tier and the on-disk tier.
+# Must be called with the cache lock held.
+def remove_llm_response_cache_entry(cache_key):
+    LLM_RESPONSE_CACHE.pop(cache_key, None)
+    cache_file_path = get_llm_response_cache_file_path(cache_key)
+    if len(cache_file_path) > 0:
+        try:
+            os.remove(cache_file_path)
+        except FileNotFoundError:
+            pass
+        except OSError as exception:
+            logging.warning('Could not remove the LLM response cache file "{}" :: {}'.format(cache_file_path, exception))
+
+
+# Evict the cached LLM response for the specified key, so that it is not replayed
+def evict_cached_llm_response(cache_key):
+    with LLM_RESPONSE_CACHE_LOCK:
+        remove_llm_response_cache_entry(cache_key)
+
+
+# Get the cached LLM response for the specified key from the in-memory tier, then the on-disk tier;
+# returns None if the response is not cached or has expired
+def get_cached_llm_response(cache_key):
+    with LLM_RESPONSE_CACHE_LOCK:
+        cache_entry = LLM_RESPONSE_CACHE.get(cache_key)
+        if (cache_entry is not None) and is_llm_response_cache_entry_expired(cache_entry):
+            remove_llm_response_cache_entry(cache_key)
+            cache_entry = None
+        if cache_entry is not None:
+            LLM_RESPONSE_CACHE.move_to_end(cache_key)
+            LLM_RESPONSE_CACHE_STATS['memory_hits'] += 1
+        else:
+            cache_file_path = get_llm_response_cache_file_path(cache_key)
+            if (len(cache_file_path) > 0) and os.path.isfile(cache_file_path):
+                try:
+                    cache_entry = json.loads(read_file(cache_file_path, 'r'))
+                    if is_llm_response_cache_entry_expired(cache_entry):
+                        remove_llm_response_cache_entry(cache_key)
+                        cache_entry = None
+                    else:
+                        add_llm_response_cache_entry(cache_key, cache_entry)
+                        LLM_RESPONSE_CACHE_STATS['disk_hits'] += 1
+                except (OSError, ValueError) as exception:
+                    logging.warning('Could not read the LLM response cache file "{}" :: {}'.format(cache_file_path, exception))
+                    cache_entry = None
+        if cache_entry is None:
+            LLM_RESPONSE_CACHE_STATS['misses'] += 1
+            return None
+        LLM_RESPONSE_CACHE_STATS['saved_input_tokens'] += cache_entry['input_tokens']
+        LLM_RESPONSE_CACHE_STATS['saved_output_tokens'] += cache_entry['output_tokens']
+        return cache_entry['llm_response']
+
+
+# Cache the LLM response for the specified key in the in-memory tier and, if enabled, the on-disk tier
+def put_cached_llm_response(cache_key, llm_response, token_usage):
+    cache_entry = {
+        'llm_response': llm_response,
+        'input_tokens': token_usage['inputTokens'],
+        'output_tokens': token_usage['outputTokens'],
+        'cached_time': time.time()
+    }
+    with LLM_RESPONSE_CACHE_LOCK:
+        add_llm_response_cache_entry(cache_key, cache_entry)
+    cache_file_path = get_llm_response_cache_file_path(cache_key)
+    if len(cache_file_path) > 0:
+        try:
+            os.makedirs(os.path.dirname(cache_file_path), exist_ok=True)
+            # Write to a temporary file and rename it so that a partially written file is never read
+            temp_cache_file_path = '{}.{}.tmp'.format(cache_file_path, threading.get_ident())
+            with open(temp_cache_file_path, 'w') as temp_cache_file:
+                json.dump(cache_entry, temp_cache_file)
+            os.replace(temp_cache_file_path, cache_file_path)
+        except OSError as exception:
+            logging.warning('Could not write the LLM response cache file "{}" :: {}'.format(cache_file_path, exception))
+
+
+# Log the LLM response cache hit rate and the saved tokens
+def log_llm_response_cache_stats():
+    with LLM_RESPONSE_CACHE_LOCK:
+        cache_stats = dict(LLM_RESPONSE_CACHE_STATS)
+    lookup_count = cache_stats['memory_hits'] + cache_stats['disk_hits'] + cache_stats['misses']
+    hit_rate = ((cache_stats['memory_hits'] + cache_stats['disk_hits']) / lookup_count) if lookup_count > 0 else 0
+    logging.info('LLM response cache :: memory hits: {}, disk hits: {}, misses: {}, hit rate: {:.1%}, '
+                 'saved input tokens: {}, saved output tokens: {}.'
+                 .format(cache_stats['memory_hits'], cache_stats['disk_hits'], cache_stats['misses'], hit_rate,
+                         cache_stats['saved_input_tokens'], cache_stats['saved_output_tokens']))
+
+
+# Invoke the specified LLM unless its response for the specified cache key is cached; the response is
+# cached only if it contains the specified tag, so that malformed responses are not replayed
+def invoke_llm_with_cache(bedrock_rt_client, system_prompts, messages, cache_key, response_tag):
+    llm_response = get_cached_llm_response(cache_key)
+    if llm_response is None:
+        llm_response, token_usage = invoke_llm(bedrock_rt_client, system_prompts, messages)
+        if '<{}>'.format(response_tag) in llm_response:
+            put_cached_llm_response(cache_key, llm_response, token_usage)
+    else:
+        logging.info('Using the cached LLM response.')
+    log_llm_response_cache_stats()
+    return llm_response
+
+
+# Cache the specified LLM fix of a boto3 API JSON request, unless there is no fix or it was answered from the cache
+def put_cached_llm_fix(llm_fix):
+    if (llm_fix is not None) and (llm_fix['token_usage'] is not None):
+        put_cached_llm_response(llm_fix['cache_key'], llm_fix['llm_response'], llm_fix['token_usage'])
+
+
 # Get the config for all boto3 clients to be used by this Lambda function
-def get_boto_config():
+def get_boto_config(max_pool_connections=10, retry_mode='standard'):
     return Config(
         connect_timeout = (60 * 3),
         read_timeout = (60 * 3),
         retries = {
             'max_attempts': 10,
-            'mode': 'standard'
-        }
+            'mode': retry_mode
+        },
+        max_pool_connections = max_pool_connections
     )
 
 
+# Cache of the boto3 clients, keyed by service name, region, client config and the assumed IAM role, if any,
+# that is reused across invocations of a warm Lambda container
+BOTO3_CLIENT_CACHE = {}
+BOTO3_CLIENT_CACHE_LOCK = threading.Lock()
+
+
+# The assumed IAM role ARNs of the cached cross account boto3 clients; used to scope the per region caches
+# by AWS account, and to create the other boto3 clients of the same AWS account
+BOTO3_CLIENT_ASSUME_ROLE_ARNS = weakref.WeakKeyDictionary()
+
+
+# Get the boto3 client for the specified service, region, connection pool size and retry mode, optionally
+# with the temporary credentials of the specified IAM role in another AWS account;
+# the client is created on first use and cached for the subsequent invocations
+def get_boto3_client(service_name, aws_region, max_pool_connections=10, retry_mode='standard', assume_role_arn=''):
+    client_cache_key = (service_name, aws_region, max_pool_connections, retry_mode, assume_role_arn)
+    # Resolve the temporary credentials first, as refreshing them evicts the cached clients of the IAM role
+    assumed_role_credentials = get_assumed_role_credentials(assume_role_arn) if len(assume_role_arn) > 0 else None
+    boto3_client = BOTO3_CLIENT_CACHE.get(client_cache_key)
+    if boto3_client is None:
+        # boto3 client creation is not thread safe; so, serialize it
+        with BOTO3_CLIENT_CACHE_LOCK:
+            boto3_client = BOTO3_CLIENT_CACHE.get(client_cache_key)
+            if boto3_client is None:
+                if assumed_role_credentials is None:
+                    logging.info('Creating boto3 client for service "{}" in region "{}"...'.format(service_name, aws_region))
+                    boto3_client = boto3.client(service_name, region_name=aws_region,
+                                                config=get_boto_config(max_pool_connections, retry_mode))
+                else:
+                    logging.info('Creating boto3 client for service "{}" in region "{}" with IAM role "{}"...'
+                                 .format(service_name, aws_region, assume_role_arn))
+                    boto3_client = boto3.client(service_name, region_name=aws_region,
+                                                config=get_boto_config(max_pool_connections, retry_mode),
+                                                aws_access_key_id=assumed_role_credentials['AccessKeyId'],
+                                                aws_secret_access_key=assumed_role_credentials['SecretAccessKey'],
+                                                aws_session_token=assumed_role_credentials['SessionToken'])
+                    BOTO3_CLIENT_ASSUME_ROLE_ARNS[boto3_client] = assume_role_arn
+                BOTO3_CLIENT_CACHE[client_cache_key] = boto3_client
+    return boto3_client
+
+
+# Get the assumed IAM role ARN of the specified boto3 client; empty for the AWS account of this Lambda function
+def get_boto3_client_assume_role_arn(boto3_client):
+    return BOTO3_CLIENT_ASSUME_ROLE_ARNS.get(boto3_client, '')
+
+
+# Get the scope of the per region caches for the specified boto3 client, which is its assumed IAM role ARN
+# and region, so that the caches of different AWS accounts are kept apart
+def get_boto3_client_cache_scope(boto3_client):
+    return get_boto3_client_assume_role_arn(boto3_client), boto3_client.meta.region_name
+
+
+# Clear the boto3 client cache; used by tests to start from a cold container state
+def reset_boto3_client_cache():
+    with BOTO3_CLIENT_CACHE_LOCK:
+        BOTO3_CLIENT_CACHE.clear()
+
+
+# Get the max number of boto3 API calls that can be made concurrently
+def get_boto3_api_max_concurrency():
+    return int(os.environ.get('BOTO3_API_MAX_CONCURRENCY', '10'))
+
+
+# Get the IAM role name to assume in the other AWS accounts; empty if cross account requests are not enabled
+def get_cross_account_role_name():
+    return os.environ.get('CROSS_ACCOUNT_ROLE_NAME', '')
+
+
+# Get the duration of the sessions of the assumed IAM roles
+def get_assumed_role_session_duration():
+    return int(os.environ.get('ASSUMED_ROLE_SESSION_DURATION_SECONDS', '3600'))
+
+
+# Get the number of seconds before their expiry that the temporary credentials of an assumed IAM role are refreshed
+def get_assumed_role_credentials_refresh_margin():
+    return int(os.environ.get('ASSUMED_ROLE_CREDENTIALS_REFRESH_MARGIN_SECONDS', '300'))
+
+
+# Cache of the temporary credentials of the assumed IAM roles, keyed by IAM role ARN, that is reused across
+# invocations of a warm Lambda container until shortly before the credentials expire; the IAM roles
+# are assumed under a lock per IAM role ARN, so that different AWS accounts are assumed concurrently
+ASSUMED_ROLE_CREDENTIALS_CACHE = {}
+ASSUMED_ROLE_CREDENTIALS_LOCKS = {}
+ASSUMED_ROLE_CREDENTIALS_LOCKS_LOCK = threading.Lock()
+
+
+# Get the temporary credentials of the specified IAM role, assuming it if not cached or about to expire
+def get_assumed_role_credentials(assume_role_arn):
+    with ASSUMED_ROLE_CREDENTIALS_LOCKS_LOCK:
+        assumed_role_credentials_lock = ASSUMED_ROLE_CREDENTIALS_LOCKS.setdefault(assume_role_arn, threading.Lock())
+    with assumed_role_credentials_lock:
+        assumed_role_credentials = ASSUMED_ROLE_CREDENTIALS_CACHE.get(assume_role_arn)
+        if ((assumed_role_credentials is None) or
+                (assumed_role_credentials['Expiration'].timestamp() - time.time() < get_assumed_role_credentials_refresh_margin())):
+            if assumed_role_credentials is not None:
+                # Evict the cached clients that use the expiring credentials
+                with BOTO3_CLIENT_CACHE_LOCK:
+                    for client_cache_key in [key for key in BOTO3_CLIENT_CACHE if key[4] == assume_role_arn]:
+                        del BOTO3_CLIENT_CACHE[client_cache_key]
+            logging.info('Assuming IAM role "{}"...'.format(assume_role_arn))
+            sts_client = get_boto3_client('sts', os.environ.get('AWS_REGION'))
+            assume_role_response = sts_client.assume_role(RoleArn=assume_role_arn,
+                                                          RoleSessionName='backup-assistant',
+                                                          DurationSeconds=get_assumed_role_session_duration())
+            assumed_role_credentials = assume_role_response['Credentials']
+            ASSUMED_ROLE_CREDENTIALS_CACHE[assume_role_arn] = assumed_role_credentials
+            logging.info('Assumed IAM role "{}" with credentials expiring at {}.'
+                         .format(assume_role_arn, assumed_role_credentials['Expiration']))
+        return assumed_role_credentials
+
+
+# The AWS account id of this Lambda function; resolved once per Lambda container
+AWS_ACCOUNT_ID = ''
+
+
+# Get the AWS account id; it is read from the ARN of the invoked Lambda function, since the
+# execution role always belongs to the account of the function. If the ARN is not available
+# (for example, when invoked outside of AWS Lambda with assumed role credentials),
+# it is resolved through the STS caller identity. The result is cached in both cases.
+def get_aws_account_id(context):
+    global AWS_ACCOUNT_ID
+    if len(AWS_ACCOUNT_ID) == 0:
+        invoked_function_arn_parts = str(getattr(context, 'invoked_function_arn', '')).split(':')
+        if (len(invoked_function_arn_parts) > 4) and (len(invoked_function_arn_parts[4]) > 0):
+            AWS_ACCOUNT_ID = invoked_function_arn_parts[4]
+        else:
+            AWS_ACCOUNT_ID = get_boto3_client('sts', os.environ.get('AWS_REGION')).get_caller_identity().get('Account')
+        logging.info('Resolved AWS account id "{}".'.format(AWS_ACCOUNT_ID))
+    return AWS_ACCOUNT_ID
+
+
+# Pattern of an AWS account id
+AWS_ACCOUNT_ID_PATTERN = re.compile(r'^\d{12}$')
+
+
+# Get the AWS account ids for the specified comma separated AWS account ids text; defaults to the specified
+# AWS account id
+def get_aws_account_ids(aws_account_ids_text, default_aws_account_id):
+    aws_account_ids = []
+    for aws_account_id in aws_account_ids_text.split(','):
+        aws_account_id = aws_account_id.strip()
+        if (len(aws_account_id) > 0) and (aws_account_id not in aws_account_ids):
+            aws_account_ids.append(aws_account_id)
+    if len(aws_account_ids) == 0:
+        aws_account_ids.append(default_aws_account_id)
+    return aws_account_ids
+
+
+# Get the ARN of the IAM role to assume in the specified AWS account; empty for the AWS account of this
+# Lambda function, which uses the execution role of this Lambda function
+def get_assume_role_arn(aws_account_id, lambda_aws_account_id, role_name):
+    if aws_account_id == lambda_aws_account_id:
+        return ''
+    lambda_aws_region = os.environ.get('AWS_REGION', os.environ['DEFAULT_AWS_REGION'])
+    if lambda_aws_region.startswith('cn-'):
+        aws_partition = 'aws-cn'
+    elif lambda_aws_region.startswith('us-gov-'):
+        aws_partition = 'aws-us-gov'
+    else:
+        aws_partition = 'aws'
+    return 'arn:{}:iam::{}:role/{}'.format(aws_partition, aws_account_id, role_name)
+
+
+# The name prefixes of the read only boto3 APIs, which can be run across multiple AWS regions
+READ_ONLY_BOTO3_API_NAME_PREFIXES = ('describe_', 'find_', 'get_', 'list_')
+
+
+# The AWS regions enabled for the AWS account; resolved once per Lambda container
+ENABLED_AWS_REGIONS = []
+ENABLED_AWS_REGIONS_LOCK = threading.Lock()
+
+
+# Get the AWS regions enabled for the AWS account
+def get_enabled_aws_regions():
+    global ENABLED_AWS_REGIONS
+    with ENABLED_AWS_REGIONS_LOCK:
+        if len(ENABLED_AWS_REGIONS) == 0:
+            ec2_client = get_boto3_client('ec2', os.environ['DEFAULT_AWS_REGION'])
+            describe_regions_response = ec2_client.describe_regions(
+                Filters=[{'Name': 'opt-in-status', 'Values': ['opt-in-not-required', 'opted-in']}]
+            )
+            ENABLED_AWS_REGIONS = sorted(region['RegionName'] for region in describe_regions_response['Regions'])
+            logging.info('Resolved the enabled AWS regions {}.'.format(ENABLED_AWS_REGIONS))
+        return list(ENABLED_AWS_REGIONS)
+
+
+# Get the AWS regions for the specified AWS region text, which is a single AWS region, a comma separated
+# list of AWS regions, or "all" for all the enabled AWS regions
+def get_aws_regions(aws_region_text):
+    aws_regions = []
+    for aws_region in aws_region_text.split(','):
+        aws_region = aws_region.strip().lower()
+        if aws_region in ('all', '*'):
+            return get_enabled_aws_regions()
+        if (len(aws_region) > 0) and (aws_region not in aws_regions):
+            aws_regions.append(aws_region)
+    if len(aws_regions) == 0:
+        aws_regions.append(os.environ['DEFAULT_AWS_REGION'])
+    return aws_regions
+
+
+# Get the max number of AWS account and AWS region targets that a boto3 API request can be run in concurrently
+def get_fan_out_max_concurrency():
+    return int(os.environ.get('FAN_OUT_MAX_CONCURRENCY', '8'))
+
+
+# Get the number of seconds to wait for a boto3 API request across targets, before returning partial results
+def get_fan_out_timeout():
+    return float(os.environ.get('FAN_OUT_TIMEOUT_SECONDS', '120'))
+
+
+# Thread pool to run a boto3 API request across AWS account and AWS region targets;
+# shared by the invocations of a warm Lambda container. A target that timed out keeps its worker until its
+# boto3 API calls complete, which are bounded by the botocore connect and read timeouts and retries, so that
+# the workers still held by the timed out targets are not available to the next invocation until then.
+FAN_OUT_EXECUTOR = None
+FAN_OUT_EXECUTOR_LOCK = threading.Lock()
+
+
+# Get the shared thread pool to run a boto3 API request across targets
+def get_fan_out_executor():
+    global FAN_OUT_EXECUTOR
+    with FAN_OUT_EXECUTOR_LOCK:
+        if FAN_OUT_EXECUTOR is None:
+            FAN_OUT_EXECUTOR = ThreadPoolExecutor(max_workers=get_fan_out_max_concurrency(),
+                                                  thread_name_prefix='fan-out')
+        return FAN_OUT_EXECUTOR
+
+
+# Process the boto3 API request for the specified AWS account and AWS region target, and measure its latency
+def process_boto3_api_request_for_target_with_latency(target, boto3_api_name, boto3_api_json_text):
+    start_time = time.monotonic()
+    response_body_text_list, function_response_state = process_boto3_api_request_for_region(target['AWSAccountId'],
+                                                                                             target['AWSRegion'],
+                                                                                             boto3_api_name,
+                                                                                             boto3_api_json_text,
+                                                                                             target['AssumeRoleArn'])
+    return response_body_text_list, function_response_state, time.monotonic() - start_time
+
+
+# Get the text of the per target latency stats
+def get_fan_out_latency_text(target_latencies, target_count):
+    if len(target_latencies) == 0:
+        return 'Latency :: none of the {} targets completed.'.format(target_count)
+    latencies = sorted(target_latencies.values())
+    slowest_target_label = max(target_latencies, key=target_latencies.get)
+    return ('Latency :: {} of {} targets completed; min {:.2f}s, median {:.2f}s, max {:.2f}s ("{}").'
+            .format(len(latencies), target_count, latencies[0], latencies[len(latencies) // 2],
+                    latencies[-1], slowest_target_label))
+
+
+# Process the boto3 API request concurrently across the specified AWS account and AWS region targets on the
+# shared thread pool, and aggregate the results by AWS account; the targets that do not complete within
+# the timeout are reported as timed out, and the results of the other targets are still returned.
+# The timed out targets that are still queued are cancelled, but the running ones cannot be interrupted,
+# and complete in the background on the shared thread pool.
+def process_boto3_api_request_for_targets(targets, boto3_api_name, boto3_api_json_text):
+    response_body_text_list, target_states, target_latencies = [], [], {}
+    executor = get_fan_out_executor()
+    futures = [executor.submit(process_boto3_api_request_for_target_with_latency, target, boto3_api_name,
+                               boto3_api_json_text)
+               for target in targets]
+    fan_out_timeout = get_fan_out_timeout()
+    done_futures, not_done_futures = wait(futures, timeout=fan_out_timeout)
+    multiple_aws_accounts = len(set(target['AWSAccountId'] for target in targets)) > 1
+    # Share the response size limit among the targets, after the AWS account headers, so that every target
+    # and the latency stats fit within the truncated response message
+    aws_account_header_length = sum(len('AWS Account Id "{}" :: '.format(aws_account_id))
+                                    for aws_account_id in set(target['AWSAccountId'] for target in targets)
+                                    ) if multiple_aws_accounts else 0
+    max_target_text_length = max(0, (20000 - aws_account_header_length) // len(targets) - 1)
+    previous_aws_account_id = ''
+    # The targets are ordered by AWS account, and then by AWS region
+    for target, future in zip(targets, futures):
+        if multiple_aws_accounts:
+            target_label = '{}/{}'.format(target['AWSAccountId'], target['AWSRegion'])
+            if target['AWSAccountId'] != previous_aws_account_id:
+                response_body_text_list.append('AWS Account Id "{}" ::'.format(target['AWSAccountId']))
+                previous_aws_account_id = target['AWSAccountId']
+        else:
+            target_label = target['AWSRegion']
+        if future in not_done_futures:
+            # Do not start the targets still queued; the running ones complete in the background
+            future.cancel()
+            target_state = 'FAILURE'
+            target_text = 'Timed out after {:.0f} seconds.'.format(fan_out_timeout)
+        elif future.exception() is not None:
+            target_state = 'FAILURE'
+            target_text = 'Failed with the error :: {}'.format(future.exception())
+        else:
+            target_text_list, target_state, target_latencies[target_label] = future.result()
+            target_text = ' '.join(target_text_list)
+        if target_label in target_latencies:
+            target_text = '[AWSRegion "{}", {:.2f}s] {}'.format(target['AWSRegion'], target_latencies[target_label],
+                                                                target_text)
+        else:
+            target_text = '[AWSRegion "{}"] {}'.format(target['AWSRegion'], target_text)
+        if target_state == 'FAILURE':
+            logging.warning('Target "{}" :: {}'.format(target_label, target_text))
+        response_body_text_list.append(target_text[:max_target_text_length])
+        target_states.append(target_state)
+    # Append the per target latency stats
+    response_body_text = get_fan_out_latency_text(target_latencies, len(targets))
+    response_body_text_list.append(response_body_text)
+    logging.info(response_body_text)
+    # The request fails only if it failed for every target
+    if all(target_state == 'REPROMPT' for target_state in target_states):
+        function_response_state = 'REPROMPT'
+    elif all(len(target_state) > 0 for target_state in target_states):
+        function_response_state = 'FAILURE'
+    else:
+        function_response_state = ''
+    return response_body_text_list, function_response_state
+
+
+# The min and the max page sizes supported by the EC2 describe APIs
+EC2_DESCRIBE_API_MIN_PAGE_SIZE = 5
+EC2_DESCRIBE_API_MAX_PAGE_SIZES = {
+    'describe_instances': 1000,
+    'describe_volumes': 500,
+    'describe_snapshots': 1000
+}
+
+
+# The max number of values in an EC2 describe API filter
+EC2_FILTER_MAX_VALUES = 200
+
+
+# The keys of the item ids returned by the EC2 describe APIs
+EC2_DESCRIBE_API_ITEM_ID_KEYS = {
+    'describe_instances': 'InstanceId',
+    'describe_volumes': 'VolumeId',
+    'describe_snapshots': 'SnapshotId'
+}
+
+
+# The request parameters and the filter names of the item ids of the EC2 describe APIs
+EC2_DESCRIBE_API_ITEM_ID_PARAMETERS = {
+    'describe_instances': 'InstanceIds',
+    'describe_volumes': 'VolumeIds',
+    'describe_snapshots': 'SnapshotIds'
+}
+EC2_DESCRIBE_API_ITEM_ID_FILTER_NAMES = {
+    'describe_instances': 'instance-id',
+    'describe_volumes': 'volume-id',
+    'describe_snapshots': 'snapshot-id'
+}
+
+
+# Error codes of the EC2 describe API errors for the ids that do not exist or are malformed
+EC2_ITEM_ID_NOT_FOUND_ERROR_CODES = frozenset((
+    'InvalidInstanceID.Malformed',
+    'InvalidInstanceID.NotFound',
+    'InvalidParameterValue',
+    'InvalidSnapshot.NotFound',
+    'InvalidSnapshotID.Malformed',
+    'InvalidVolume.NotFound',
+    'InvalidVolumeID.Malformed'
+))
+
+
+# The states of the instances that can have volumes attached
+INSTANCE_STATES_WITH_VOLUMES = ['pending', 'running', 'shutting-down', 'stopping', 'stopped']
+
+
+# Get the max number of items to be returned in the response
+def get_boto3_api_max_results():
+    return int(os.environ['BOTO3_API_MAX_RESULTS'])
+
+
+# Get the items in the specified EC2 describe API response
+def get_ec2_describe_response_items(describe_api_name, describe_api_response):
+    if describe_api_name == 'describe_instances':
+        return [instance for reservation in describe_api_response.get('Reservations', [])
+                for instance in reservation['Instances']]
+    elif describe_api_name == 'describe_volumes':
+        return describe_api_response.get('Volumes', [])
+    return describe_api_response.get('Snapshots', [])
+
+
+# Iterate the items of the specified EC2 describe API page by page; the next page is fetched only when
+# the items of the current page are consumed, so the iteration can stop without fetching the remaining pages.
+# If specified, the number of EC2 API calls made is added to the call counter.
+def iterate_ec2_describe_items(ec2_client, describe_api_name, describe_api_request_json, page_size=0, call_counter=None):
+    max_page_size = EC2_DESCRIBE_API_MAX_PAGE_SIZES[describe_api_name]
+    page_request_json = dict(describe_api_request_json)
+    page_request_json['MaxResults'] = max(EC2_DESCRIBE_API_MIN_PAGE_SIZE, min(max_page_size, page_size or max_page_size))
+    describe_api_function = getattr(ec2_client, describe_api_name)
+    while True:
+        describe_api_response = describe_api_function(**page_request_json)
+        if call_counter is not None:
+            call_counter['Calls'] += 1
+        yield from get_ec2_describe_response_items(describe_api_name, describe_api_response)
+        next_token = describe_api_response.get('NextToken', '')
+        if len(next_token) == 0:
+            break
+        page_request_json['NextToken'] = next_token
+
+
+# Get the items of the specified EC2 describe API, up to the max number of items to be returned in the response;
+# no page is fetched after the max number of items are retrieved
+def get_ec2_describe_items(ec2_client, describe_api_name, describe_api_request_json):
+    max_results = get_boto3_api_max_results()
+    return list(islice(iterate_ec2_describe_items(ec2_client, describe_api_name, describe_api_request_json, max_results),
+                       max_results))
+
+
+# Describe the items of the specified EC2 describe API for one chunk of the filter values;
+# returns the items and the number of EC2 API calls made
+def describe_ec2_items_for_filter_chunk(ec2_client, describe_api_name, describe_api_request_json, filter_name,
+                                        max_results, filter_values_chunk):
+    chunk_request_json = dict(describe_api_request_json)
+    chunk_request_json['Filters'] = chunk_request_json.get('Filters', []) + [
+        {
+            'Name': filter_name,
+            'Values': filter_values_chunk
+        }
+    ]
+    call_counter = {'Calls': 0}
+    items = list(islice(iterate_ec2_describe_items(ec2_client, describe_api_name, chunk_request_json, max_results, call_counter),
+                        max_results or None))
+    return items, call_counter['Calls']
+
+
+# Get the items of the specified EC2 describe API for the filter with the specified values; the values are split
+# into chunks within the EC2 filter values limit and the chunks are described concurrently on a bounded thread pool.
+# The items are de-duplicated by id and returned in the order of the chunks, up to the specified max number of
+# items (0 for all the items). If specified, the number of EC2 API calls made is recorded per describe API.
+def get_ec2_describe_items_for_filter_values(ec2_client, describe_api_name, describe_api_request_json, filter_name,
+                                             filter_values, max_results=0, ec2_api_call_counts=None):
+    # Remove the duplicate values and keep the order; no value means no item as an empty filter would match all
+    filter_values = list(dict.fromkeys(filter_values))
+    if len(filter_values) == 0:
+        return []
+    filter_values_chunks = [filter_values[idx:(idx + EC2_FILTER_MAX_VALUES)]
+                            for idx in range(0, len(filter_values), EC2_FILTER_MAX_VALUES)]
+    describe_chunk = partial(describe_ec2_items_for_filter_chunk, ec2_client, describe_api_name,
+                             describe_api_request_json, filter_name, max_results)
+    if len(filter_values_chunks) == 1:
+        chunk_results = [describe_chunk(filter_values_chunks[0])]
+    else:
+        with ThreadPoolExecutor(max_workers=min(get_boto3_api_max_concurrency(), len(filter_values_chunks))) as executor:
+            chunk_results = list(executor.map(describe_chunk, filter_values_chunks))
+    # Merge the items of the chunks and de-duplicate them by id
+    item_id_key = EC2_DESCRIBE_API_ITEM_ID_KEYS[describe_api_name]
+    items, item_ids = [], set()
+    for chunk_items, chunk_call_count in chunk_results:
+        if ec2_api_call_counts is not None:
+            ec2_api_call_counts[describe_api_name] = ec2_api_call_counts.get(describe_api_name, 0) + chunk_call_count
+        for item in chunk_items:
+            if item[item_id_key] not in item_ids:
+                item_ids.add(item[item_id_key])
+                items.append(item)
+    return items[:max_results] if max_results > 0 else items
+
+
+# Get the text of the number of EC2 API calls made per describe API
+def get_ec2_api_call_count_text(ec2_api_call_counts):
+    if len(ec2_api_call_counts) == 0:
+        return 'EC2 API calls made :: none, answered from the cached resource graph. '
+    return 'EC2 API calls made :: {}. '.format(', '.join('{}: {}'.format(describe_api_name, call_count)
+                                                       for describe_api_name, call_count in ec2_api_call_counts.items()))
+
+
+# Strip each item in the specified values list
+def strip_values(values):
+    return [value.strip() for value in values]
+
+
+# Cache of the instances, volumes and snapshots, keyed by AWS account and region, along with the instance to volume
+# and the volume to snapshot relationships between them, that is reused across invocations of a warm Lambda container.
+# The resource graph is built incrementally from the described items; the filter values whose items were
+# completely described are recorded as covered, so that the same lookups can be answered from memory.
+EC2_RESOURCE_GRAPH_CACHE = {}
+EC2_RESOURCE_GRAPH_CACHE_LOCK = threading.Lock()
+
+
+# Counts of the filter values answered from the resource graph (hit) or described (miss),
+# across invocations of a warm Lambda container
+EC2_RESOURCE_GRAPH_COUNTS = {'hit': 0, 'miss': 0}
+
+
+# The names of the resource graph nodes of the items returned by the EC2 describe APIs
+EC2_RESOURCE_GRAPH_NODE_NAMES = {
+    'describe_instances': 'Instances',
+    'describe_volumes': 'Volumes',
+    'describe_snapshots': 'Snapshots'
+}
+
+
+# Get the TTL (in seconds) of the cached resource graph
+def get_ec2_resource_graph_ttl():
+    return int(os.environ.get('EC2_RESOURCE_GRAPH_TTL_SECONDS', '60'))
+
+
+# Get the resource graph for the AWS account and region of the specified client; an empty resource graph is created
+# when it is missing or its TTL has expired. Must be called with the resource graph lock held.
+def get_ec2_resource_graph(ec2_client):
+    cache_scope = get_boto3_client_cache_scope(ec2_client)
+    ec2_resource_graph = EC2_RESOURCE_GRAPH_CACHE.get(cache_scope)
+    if (ec2_resource_graph is None) or ((time.monotonic() - ec2_resource_graph['CreatedTime']) > get_ec2_resource_graph_ttl()):
+        ec2_resource_graph = {
+            'CreatedTime': time.monotonic(),
+            'Instances': {'ById': {}, 'ByTag': {}},
+            'Volumes': {'ById': {}, 'ByTag': {}},
+            'Snapshots': {'ById': {}, 'ByTag': {}},
+            'VolumeIdsByInstanceId': {},
+            'SnapshotIdsByVolumeId': {},
+            'Covered': set()
+        }
+        EC2_RESOURCE_GRAPH_CACHE[cache_scope] = ec2_resource_graph
+    return ec2_resource_graph
+
+
+# Remove the item for the specified id from the resource graph, along with its tag index entries
+# and its relationships. Must be called with the resource graph lock held.
+def remove_item_from_ec2_resource_graph(ec2_resource_graph, describe_api_name, item_id):
+    graph_node = ec2_resource_graph[EC2_RESOURCE_GRAPH_NODE_NAMES[describe_api_name]]
+    item = graph_node['ById'].pop(item_id, None)
+    if item is None:
+        return
+    for tag in item.get('Tags', []):
+        tagged_item_ids = graph_node['ByTag'].get((tag['Key'], tag['Value']))
+        if tagged_item_ids is not None:
+            tagged_item_ids.discard(item_id)
+    if describe_api_name == 'describe_volumes':
+        for attachment in item.get('Attachments', []):
+            ec2_resource_graph['VolumeIdsByInstanceId'].get(attachment['InstanceId'], set()).discard(item_id)
+    elif describe_api_name == 'describe_snapshots':
+        ec2_resource_graph['SnapshotIdsByVolumeId'].get(item.get('VolumeId', ''), set()).discard(item_id)
+
+
+# Add or replace the specified item in the resource graph; it is indexed by id and by each of its tags,
+# including the Name tag, and linked to its related items. Must be called with the resource graph lock held.
+def add_item_to_ec2_resource_graph(ec2_resource_graph, describe_api_name, item):
+    item_id = item[EC2_DESCRIBE_API_ITEM_ID_KEYS[describe_api_name]]
+    remove_item_from_ec2_resource_graph(ec2_resource_graph, describe_api_name, item_id)
+    graph_node = ec2_resource_graph[EC2_RESOURCE_GRAPH_NODE_NAMES[describe_api_name]]
+    graph_node['ById'][item_id] = item
+    for tag in item.get('Tags', []):
+        graph_node['ByTag'].setdefault((tag['Key'], tag['Value']), set()).add(item_id)
+    if describe_api_name == 'describe_instances':
+        # The block device mappings of an instance are the volumes attached to it
+        ec2_resource_graph['VolumeIdsByInstanceId'][item_id] = {
+            block_device_mapping['Ebs']['VolumeId'] for block_device_mapping in item.get('BlockDeviceMappings', [])
+            if 'Ebs' in block_device_mapping
+        }
+    elif describe_api_name == 'describe_volumes':
+        for attachment in item.get('Attachments', []):
+            ec2_resource_graph['VolumeIdsByInstanceId'].setdefault(attachment['InstanceId'], set()).add(item_id)
+    elif len(item.get('VolumeId', '')) > 0:
+        ec2_resource_graph['SnapshotIdsByVolumeId'].setdefault(item['VolumeId'], set()).add(item_id)
+
+
+# Add the specified items to the resource graph for the region of the specified client
+def add_items_to_ec2_resource_graph(ec2_client, describe_api_name, items):
+    with EC2_RESOURCE_GRAPH_CACHE_LOCK:
+        ec2_resource_graph = get_ec2_resource_graph(ec2_client)
+        for item in items:
+            add_item_to_ec2_resource_graph(ec2_resource_graph, describe_api_name, item)
+
+
+# Add the specified created snapshot to the resource graph for the region of the specified client;
+# it is linked to its volume, so that the covered snapshot lookups of the volume stay complete
+def add_snapshot_to_ec2_resource_graph(ec2_client, create_snapshot_response):
+    snapshot = {key: value for key, value in create_snapshot_response.items() if key != 'ResponseMetadata'}
+    add_items_to_ec2_resource_graph(ec2_client, 'describe_snapshots', [snapshot])
+
+
+# Remove the specified deleted snapshot from the resource graph for the region of the specified client
+def remove_snapshot_from_ec2_resource_graph(ec2_client, snapshot_id):
+    with EC2_RESOURCE_GRAPH_CACHE_LOCK:
+        remove_item_from_ec2_resource_graph(get_ec2_resource_graph(ec2_client), 'describe_snapshots', snapshot_id)
+
+
+# Replace the specified items in the resource graph for the region of the specified client,
+# only for the items that are already in the resource graph
+def refresh_items_in_ec2_resource_graph(ec2_client, describe_api_name, items):
+    item_id_key = EC2_DESCRIBE_API_ITEM_ID_KEYS[describe_api_name]
+    with EC2_RESOURCE_GRAPH_CACHE_LOCK:
+        ec2_resource_graph = get_ec2_resource_graph(ec2_client)
+        graph_items_by_id = ec2_resource_graph[EC2_RESOURCE_GRAPH_NODE_NAMES[describe_api_name]]['ById']
+        for item in items:
+            if item[item_id_key] in graph_items_by_id:
+                add_item_to_ec2_resource_graph(ec2_resource_graph, describe_api_name, item)
+
+
+# Get the items for the specified filter value from the resource graph; returns None if the filter value
+# with the specified request JSON is not covered, or if any of its related items is not in the resource graph.
+# Of the request JSON filters, only the instance state filter is applied on the items.
+# Must be called with the resource graph lock held.
+def get_ec2_resource_graph_items_for_filter_value(ec2_resource_graph, describe_api_name, describe_api_request_json,
+                                                  filter_name, filter_value):
+    describe_api_request_key = json.dumps(describe_api_request_json, sort_keys=True)
+    if (describe_api_name, describe_api_request_key, filter_name, filter_value) not in ec2_resource_graph['Covered']:
+        return None
+    graph_node = ec2_resource_graph[EC2_RESOURCE_GRAPH_NODE_NAMES[describe_api_name]]
+    if filter_name == EC2_DESCRIBE_API_ITEM_ID_FILTER_NAMES[describe_api_name]:
+        # A covered id that is not in the resource graph was described and does not exist
+        item_ids = {filter_value} if filter_value in graph_node['ById'] else set()
+    elif filter_name.startswith('tag:'):
+        item_ids = graph_node['ByTag'].get((filter_name[len('tag:'):], filter_value), set())
+    elif filter_name == 'attachment.instance-id':
+        item_ids = ec2_resource_graph['VolumeIdsByInstanceId'].get(filter_value, set())
+    elif filter_name == 'volume-id':
+        item_ids = ec2_resource_graph['SnapshotIdsByVolumeId'].get(filter_value, set())
+    else:
+        return None
+    if not all(item_id in graph_node['ById'] for item_id in item_ids):
+        return None
+    items = [graph_node['ById'][item_id] for item_id in sorted(item_ids)]
+    for describe_api_filter in describe_api_request_json.get('Filters', []):
+        if describe_api_filter['Name'] == 'instance-state-name':
+            items = [item for item in items if item['State']['Name'] in describe_api_filter['Values']]
+    return items
+
+
+# Get the items of the specified EC2 describe API for the filter with the specified values; the values covered
+# by the resource graph are answered from memory, and only the remaining values are described and added to the
+# resource graph. The remaining values are recorded as covered, unless their items were capped to the specified
+# max number of items (0 for all the items). If specified, the number of EC2 API calls made is recorded per describe API.
+def get_ec2_graph_items_for_filter_values(ec2_client, describe_api_name, describe_api_request_json, filter_name,
+                                          filter_values, max_results=0, ec2_api_call_counts=None):
+    filter_values = list(dict.fromkeys(filter_values))
+    if len(filter_values) == 0:
+        return []
+    graph_items, uncovered_filter_values = [], []
+    with EC2_RESOURCE_GRAPH_CACHE_LOCK:
+        ec2_resource_graph = get_ec2_resource_graph(ec2_client)
+        for filter_value in filter_values:
+            filter_value_items = get_ec2_resource_graph_items_for_filter_value(ec2_resource_graph, describe_api_name,
+                                                                               describe_api_request_json, filter_name,
+                                                                               filter_value)
+            if filter_value_items is None:
+                uncovered_filter_values.append(filter_value)
+            else:
+                graph_items.extend(filter_value_items)
+        EC2_RESOURCE_GRAPH_COUNTS['hit'] += len(filter_values) - len(uncovered_filter_values)
+        EC2_RESOURCE_GRAPH_COUNTS['miss'] += len(uncovered_filter_values)
+    logging.info('Answered {} of {} "{}" filter value(s) from the resource graph. Resource graph hits: {}, misses: {}.'
+                 .format(len(filter_values) - len(uncovered_filter_values), len(filter_values), filter_name,
+                         EC2_RESOURCE_GRAPH_COUNTS['hit'], EC2_RESOURCE_GRAPH_COUNTS['miss']))
+    described_items = get_ec2_describe_items_for_filter_values(ec2_client, describe_api_name, describe_api_request_json,
+                                                         filter_name, uncovered_filter_values, max_results,
+                                                         ec2_api_call_counts)
+    if len(uncovered_filter_values) > 0:
+        describe_api_request_key = json.dumps(describe_api_request_json, sort_keys=True)
+        with EC2_RESOURCE_GRAPH_CACHE_LOCK:
+            ec2_resource_graph = get_ec2_resource_graph(ec2_client)
+            for item in described_items:
+                add_item_to_ec2_resource_graph(ec2_resource_graph, describe_api_name, item)
+            if (max_results == 0) or (len(described_items) < max_results):
+                ec2_resource_graph['Covered'].update((describe_api_name, describe_api_request_key, filter_name, filter_value)
+                                                     for filter_value in uncovered_filter_values)
+    # Merge the items and de-duplicate them by id
+    item_id_key = EC2_DESCRIBE_API_ITEM_ID_KEYS[describe_api_name]
+    items = list({item[item_id_key]: item for item in graph_items + described_items}.values())
+    return items[:max_results] if max_results > 0 else items
+
+
+# Get the ids that the specified EC2 describe API error reports as missing or malformed, out of the specified ids;
+# returns an empty list if the error is not about the ids
+def get_missing_ec2_item_ids_from_error(exception, item_ids):
+    if not isinstance(exception, ClientError):
+        return []
+    if exception.response.get('Error', {}).get('Code', '') not in EC2_ITEM_ID_NOT_FOUND_ERROR_CODES:
+        return []
+    error_message_tokens = set(re.findall(r'[\w.:-]+', exception.response.get('Error', {}).get('Message', '')))
+    return [item_id for item_id in item_ids if item_id in error_message_tokens]
+
+
+# Describe the items of the specified ids with the id request parameter of the EC2 describe API. If the request
+# fails for missing or malformed ids, the ids reported in the error are removed and the remaining ids are described
+# in one more request, instead of describing each id on its own. Returns the items and the missing ids.
+def describe_ec2_items_for_ids(ec2_client, describe_api_name, item_ids):
+    remaining_item_ids, missing_item_ids = list(dict.fromkeys(item_ids)), []
+    describe_api_function = getattr(ec2_client, describe_api_name)
+    while len(remaining_item_ids) > 0:
+        try:
+            describe_api_response = describe_api_function(**{
+                EC2_DESCRIBE_API_ITEM_ID_PARAMETERS[describe_api_name]: remaining_item_ids
+            })
+            return get_ec2_describe_response_items(describe_api_name, describe_api_response), missing_item_ids
+        except Exception as exception:
+            error_item_ids = get_missing_ec2_item_ids_from_error(exception, remaining_item_ids)
+            if len(error_item_ids) == 0:
+                raise exception
+            logging.info('Ids reported missing by "{}" :: {}'.format(describe_api_name, error_item_ids))
+            missing_item_ids.extend(error_item_ids)
+            remaining_item_ids = [item_id for item_id in remaining_item_ids if item_id not in error_item_ids]
+    return [], missing_item_ids
+
+
+# Find which of the specified ids of the EC2 describe API items exist; the ids in the resource graph are found
+# without any API call, and the remaining ids are described with the id filter, in chunks within the filter values
+# limit. The id filter returns the existing items without failing on the missing ids, and the described ids,
+# including the missing ones, are covered by the resource graph. Returns the found and the missing ids.
+def find_ec2_item_ids(ec2_client, describe_api_name, item_ids, ec2_api_call_counts=None):
+    item_ids = list(dict.fromkeys(strip_values(item_ids)))
+    with EC2_RESOURCE_GRAPH_CACHE_LOCK:
+        graph_items_by_id = get_ec2_resource_graph(ec2_client)[EC2_RESOURCE_GRAPH_NODE_NAMES[describe_api_name]]['ById']
+        found_item_ids = {item_id for item_id in item_ids if item_id in graph_items_by_id}
+    items = get_ec2_graph_items_for_filter_values(ec2_client, describe_api_name, {},
+                                                  EC2_DESCRIBE_API_ITEM_ID_FILTER_NAMES[describe_api_name],
+                                                  [item_id for item_id in item_ids if item_id not in found_item_ids],
+                                                  0, ec2_api_call_counts)
+    found_item_ids.update(item[EC2_DESCRIBE_API_ITEM_ID_KEYS[describe_api_name]] for item in items)
+    return ([item_id for item_id in item_ids if item_id in found_item_ids],
+            [item_id for item_id in item_ids if item_id not in found_item_ids])
+
+
+# Find which of the specified instance ids exist; returns the found and the missing instance ids
+def find_instance_ids(ec2_client, instance_ids, ec2_api_call_counts=None):
+    return find_ec2_item_ids(ec2_client, 'describe_instances', instance_ids, ec2_api_call_counts)
+
+
+# Find which of the specified volume ids exist; returns the found and the missing volume ids
+def find_volume_ids(ec2_client, volume_ids, ec2_api_call_counts=None):
+    return find_ec2_item_ids(ec2_client, 'describe_volumes', volume_ids, ec2_api_call_counts)
+
+
 # Check if the instance for the specified id exists
 def does_instance_exist_for_id(ec2_client, instance_id):
-    # Search for the specified instance
-    try:
-        ec2_client.describe_instances(
-            InstanceIds=[
-                instance_id,
-            ],
-        )
-    except Exception as exception:
-        return False
-    return True
+    return len(find_instance_ids(ec2_client, [instance_id])[0]) > 0
 
 
 # Check if the volume for the specified id exists
 def does_volume_exist_for_id(ec2_client, volume_id):
-    # Search for the specified volume
-    try:
-        ec2_client.describe_volumes(
-            VolumeIds=[
-                volume_id,
-            ],
-        )
-    except Exception as exception:
-        return False
-    return True
+    return len(find_volume_ids(ec2_client, [volume_id])[0]) > 0
 
 
 # Get all the instances
 def get_all_instances(ec2_client):
-    instances = []
-    describe_instances_response = ec2_client.describe_instances(
-        MaxResults=int(os.environ['BOTO3_API_MAX_RESULTS'])
-    )
-    reservations = describe_instances_response['Reservations']
-    for reservation in reservations:
-        instances.extend(reservation['Instances'])
+    instances = get_ec2_describe_items(ec2_client, 'describe_instances', {})
+    add_items_to_ec2_resource_graph(ec2_client, 'describe_instances', instances)
     return instances
 
 
-# Get the instances for the specified ids
+# Get the instances for the specified ids, along with the ids of the missing instances; the instances
+# are always described, as their state may have changed, and refreshed in the resource graph
 def get_instances_for_instance_ids(ec2_client, instance_ids):
-    instances = []
     # Strip each item in the instance id list
     instance_ids = [instance_id.strip() for instance_id in instance_ids]
     # Get the instance details for the specified instance ids
-    describe_instances_response = ec2_client.describe_instances(InstanceIds=instance_ids)
-    reservations = describe_instances_response['Reservations']
-    for reservation in reservations:
-        instances.extend(reservation['Instances'])
-    return instances
+    instances, missing_instance_ids = describe_ec2_items_for_ids(ec2_client, 'describe_instances', instance_ids)
+    add_items_to_ec2_resource_graph(ec2_client, 'describe_instances', instances)
+    return instances, missing_instance_ids
 
 
 # Get the instances for the specified tags
 def get_instances_for_tags(ec2_client, tag_key, tag_values):
-    instances = []
-    # Strip each item in the tag values list
-    tag_values = [tag_value.strip() for tag_value in tag_values]
-    # Get the instance details for the tag key and values
-    describe_instances_response = ec2_client.describe_instances(
-        Filters=[
-            {
-                'Name': 'tag:{}'.format(tag_key),
-                'Values': tag_values
-            }
-        ],
-        MaxResults=int(os.environ['BOTO3_API_MAX_RESULTS'])
-    )
-    reservations = describe_instances_response['Reservations']
-    for reservation in reservations:
-        instances.extend(reservation['Instances'])
-    return instances
+    return get_ec2_graph_items_for_filter_values(ec2_client, 'describe_instances', {}, 'tag:{}'.format(tag_key),
+                                                 strip_values(tag_values), get_boto3_api_max_results())
 
 
 # Get the instances for the specified names
@@ -160,54 +1071,53 @@ def get_instances_for_names(ec2_client, instance_names):
     return get_instances_for_tags(ec2_client, 'Name', instance_names)
 
 
-# Get the instance ids for the specified tags
-def get_instance_ids_for_tags(ec2_client, tag_key, tag_values):
-    instance_ids = []
-    # Get all the instances with matching tag and values
-    instances = get_instances_for_tags(ec2_client, tag_key, tag_values)
-    # Loop through and get the instance id
-    for instance in instances:
-        instance_ids.append(instance['InstanceId'])
-    return instance_ids
+# Get the ids of all the instances that can have volumes attached for the specified tags
+def get_instance_ids_for_tags(ec2_client, tag_key, tag_values, ec2_api_call_counts=None):
+    instances = get_ec2_graph_items_for_filter_values(ec2_client, 'describe_instances', {
+        'Filters': [
+            {
+                'Name': 'instance-state-name',
+                'Values': INSTANCE_STATES_WITH_VOLUMES
+            }
+        ]
+    }, 'tag:{}'.format(tag_key), strip_values(tag_values), 0, ec2_api_call_counts)
+    return [instance['InstanceId'] for instance in instances]
 
 
 # Get the instance ids for the specified names
-def get_instance_ids_for_names(ec2_client, instance_names):
-    return get_instance_ids_for_tags(ec2_client, 'Name', instance_names)
+def get_instance_ids_for_names(ec2_client, instance_names, ec2_api_call_counts=None):
+    return get_instance_ids_for_tags(ec2_client, 'Name', instance_names, ec2_api_call_counts)
 
 
 # Get all the volumes
 def get_all_volumes(ec2_client):
-    describe_volumes_response = ec2_client.describe_volumes(
-        MaxResults=int(os.environ['BOTO3_API_MAX_RESULTS'])
-    )
-    return describe_volumes_response['Volumes']
+    volumes = get_ec2_describe_items(ec2_client, 'describe_volumes', {})
+    add_items_to_ec2_resource_graph(ec2_client, 'describe_volumes', volumes)
+    return volumes
 
 
-# Get the volumes associated with the specified volume ids
+# Get the volumes associated with the specified volume ids, along with the ids of the missing volumes;
+# the volumes are always described, as their state may have changed, and refreshed in the resource graph
 def get_volumes_for_volume_ids(ec2_client, volume_ids):
     # Strip each item in the volume id list
     volume_ids = [volume_id.strip() for volume_id in volume_ids]
     # Get the volumes for the volume ids
-    describe_volumes_response = ec2_client.describe_volumes(VolumeIds=volume_ids)
-    return describe_volumes_response['Volumes']
+    volumes, missing_volume_ids = describe_ec2_items_for_ids(ec2_client, 'describe_volumes', volume_ids)
+    add_items_to_ec2_resource_graph(ec2_client, 'describe_volumes', volumes)
+    return volumes, missing_volume_ids
 
 
 # Get the volumes for the specified tags
 def get_volumes_for_volume_tags(ec2_client, tag_key, tag_values):
-    # Strip each item in the tag values list
-    tag_values = [tag_value.strip() for tag_value in tag_values]
-    # Get the volume details for the tag key and values
-    describe_volumes_response = ec2_client.describe_volumes(
-        Filters=[
-            {
-                'Name': 'tag:{}'.format(tag_key),
-                'Values': tag_values
-            }
-        ],
-        MaxResults=int(os.environ['BOTO3_API_MAX_RESULTS'])
-    )
-    return describe_volumes_response['Volumes']
+    return get_ec2_graph_items_for_filter_values(ec2_client, 'describe_volumes', {}, 'tag:{}'.format(tag_key),
+                                                 strip_values(tag_values), get_boto3_api_max_results())
+
+
+# Get the ids of all the volumes for the specified tags
+def get_volume_ids_for_volume_tags(ec2_client, tag_key, tag_values, ec2_api_call_counts=None):
+    volumes = get_ec2_graph_items_for_filter_values(ec2_client, 'describe_volumes', {}, 'tag:{}'.format(tag_key),
+                                                    strip_values(tag_values), 0, ec2_api_call_counts)
+    return [volume['VolumeId'] for volume in volumes]
 
 
 # Get the volumes for the specified names
@@ -216,53 +1126,54 @@ def get_volumes_for_volume_names(ec2_client, volume_names):
 
 
 # Get the volumes associated with the specified instance ids
-def get_volumes_for_instance_ids(ec2_client, instance_ids):
-    # Strip each item in the instance id list
-    instance_ids = [instance_id.strip() for instance_id in instance_ids]
-    # Get the volumes for the instance ids
-    describe_volumes_response = ec2_client.describe_volumes(
-        Filters=[
-            {
-                'Name': 'attachment.instance-id',
-                'Values': instance_ids
-            }
-        ]
-    )
-    return describe_volumes_response['Volumes']
+def get_volumes_for_instance_ids(ec2_client, instance_ids, ec2_api_call_counts=None):
+    return get_ec2_graph_items_for_filter_values(ec2_client, 'describe_volumes', {}, 'attachment.instance-id',
+                                                 strip_values(instance_ids), get_boto3_api_max_results(),
+                                                 ec2_api_call_counts)
+
+
+# Get the ids of all the volumes associated with the specified instance ids; the volume ids of the instances
+# in the resource graph are answered from their block device mappings, without describing the volumes
+def get_volume_ids_for_instance_ids(ec2_client, instance_ids, ec2_api_call_counts=None):
+    volume_ids, uncovered_instance_ids = [], []
+    with EC2_RESOURCE_GRAPH_CACHE_LOCK:
+        ec2_resource_graph = get_ec2_resource_graph(ec2_client)
+        for instance_id in dict.fromkeys(strip_values(instance_ids)):
+            if (instance_id in ec2_resource_graph['Instances']['ById']) or (
+                    get_ec2_resource_graph_items_for_filter_value(ec2_resource_graph, 'describe_volumes', {},
+                                                                  'attachment.instance-id', instance_id) is not None):
+                volume_ids.extend(sorted(ec2_resource_graph['VolumeIdsByInstanceId'].get(instance_id, set())))
+            else:
+                uncovered_instance_ids.append(instance_id)
+    volumes = get_ec2_graph_items_for_filter_values(ec2_client, 'describe_volumes', {}, 'attachment.instance-id',
+                                                    uncovered_instance_ids, 0, ec2_api_call_counts)
+    return list(dict.fromkeys(volume_ids + [volume['VolumeId'] for volume in volumes]))
 
 
-# Get all the snapshots
+# Get all the snapshots owned by this account
 def get_all_snapshots(ec2_client):
-    describe_snapshots_response = ec2_client.describe_snapshots(
-        MaxResults=int(os.environ['BOTO3_API_MAX_RESULTS'])
-    )
-    return describe_snapshots_response['Snapshots']
+    snapshots = get_ec2_describe_items(ec2_client, 'describe_snapshots', {'OwnerIds': ['self']})
+    add_items_to_ec2_resource_graph(ec2_client, 'describe_snapshots', snapshots)
+    return snapshots
 
 
-# Get the snapshots associated with the specified snapshot ids
+# Get the snapshots associated with the specified snapshot ids, along with the ids of the missing snapshots;
+# the snapshots are always described, as their state and progress may have changed. The described snapshots
+# are only refreshed in the resource graph if they are already in it, as they may be owned by other accounts.
 def get_snapshots_for_snapshot_ids(ec2_client, snapshot_ids):
     # Strip each item in the snapshot id list
     snapshot_ids = [snapshot_id.strip() for snapshot_id in snapshot_ids]
     # Get the snapshots for the snapshot ids
-    describe_snapshots_response = ec2_client.describe_snapshots(SnapshotIds=snapshot_ids)
-    return describe_snapshots_response['Snapshots']
+    snapshots, missing_snapshot_ids = describe_ec2_items_for_ids(ec2_client, 'describe_snapshots', snapshot_ids)
+    refresh_items_in_ec2_resource_graph(ec2_client, 'describe_snapshots', snapshots)
+    return snapshots, missing_snapshot_ids
 
 
-# Get the snapshots for the specified tags
+# Get the snapshots owned by this account for the specified tags
 def get_snapshots_for_snapshot_tags(ec2_client, tag_key, tag_values):
-    # Strip each item in the tag values list
-    tag_values = [tag_value.strip() for tag_value in tag_values]
-    # Get the snapshot details for the tag key and values
-    describe_snapshots_response = ec2_client.describe_snapshots(
-        Filters=[
-            {
-                'Name': 'tag:{}'.format(tag_key),
-                'Values': tag_values
-            }
-        ],
-        MaxResults=int(os.environ['BOTO3_API_MAX_RESULTS'])
-    )
-    return describe_snapshots_response['Snapshots']
+    return get_ec2_graph_items_for_filter_values(ec2_client, 'describe_snapshots', {'OwnerIds': ['self']},
+                                                 'tag:{}'.format(tag_key), strip_values(tag_values),
+                                                 get_boto3_api_max_results())
 
 
 # Get the snapshots for the specified names
@@ -270,77 +1181,517 @@ def get_snapshots_for_snapshot_names(ec2_client, snapshot_names):
     return get_snapshots_for_snapshot_tags(ec2_client, 'Name', snapshot_names)
 
 
-# Get the snapshots associated with the specified volume ids
-def get_snapshots_for_volume_ids(ec2_client, volume_ids):
-    # Strip each item in the volume id list
-    volume_ids = [volume_id.strip() for volume_id in volume_ids]
-    # Get the snapshots for the volume ids
-    describe_snapshots_response = ec2_client.describe_snapshots(
-        Filters=[
-            {
-                'Name': 'volume-id',
-                'Values': volume_ids
-            }
-        ],
-        OwnerIds=['self']  # Filter for snapshots owned by your account
-    )
-    return describe_snapshots_response['Snapshots']
+# Get the snapshots owned by this account associated with the specified volume ids
+def get_snapshots_for_volume_ids(ec2_client, volume_ids, ec2_api_call_counts=None):
+    return get_ec2_graph_items_for_filter_values(ec2_client, 'describe_snapshots', {'OwnerIds': ['self']},
+                                                 'volume-id', strip_values(volume_ids),
+                                                 get_boto3_api_max_results(), ec2_api_call_counts)
 
 
 # Get the snapshots associated with volumes with the specified tags
-def get_snapshots_for_volume_tags(ec2_client, tag_key, tag_values):
-    volume_ids = []
-    # Get the volumes for the volume tags
-    volumes = get_volumes_for_volume_tags(ec2_client, tag_key, tag_values)
-    # Loop through the volumes
-    for volume in volumes:
-        volume_ids.append(volume['VolumeId'])
-    # Get the snapshots for the volume ids
-    return get_snapshots_for_volume_ids(ec2_client, volume_ids)
+def get_snapshots_for_volume_tags(ec2_client, tag_key, tag_values, ec2_api_call_counts=None):
+    volume_ids = get_volume_ids_for_volume_tags(ec2_client, tag_key, tag_values, ec2_api_call_counts)
+    return get_snapshots_for_volume_ids(ec2_client, volume_ids, ec2_api_call_counts)
 
 
 # Get the snapshots associated with volumes with the specified names
-def get_snapshots_for_volume_names(ec2_client, volume_names):
-    return get_snapshots_for_volume_tags(ec2_client, 'Name', volume_names)
+def get_snapshots_for_volume_names(ec2_client, volume_names, ec2_api_call_counts=None):
+    return get_snapshots_for_volume_tags(ec2_client, 'Name', volume_names, ec2_api_call_counts)
 
 
 # Get the snapshots associated with the specified instance ids
-def get_snapshots_for_instance_ids(ec2_client, instance_ids):
-    # Get the volumes for the instance ids
-    volumes = get_volumes_for_instance_ids(ec2_client, instance_ids)
-    # Get the volume ids
-    volume_ids = [volume['VolumeId'] for volume in volumes]
-    # Get the snapshots for the volume ids
-    return get_snapshots_for_volume_ids(ec2_client, volume_ids)
+def get_snapshots_for_instance_ids(ec2_client, instance_ids, ec2_api_call_counts=None):
+    volume_ids = get_volume_ids_for_instance_ids(ec2_client, instance_ids, ec2_api_call_counts)
+    return get_snapshots_for_volume_ids(ec2_client, volume_ids, ec2_api_call_counts)
 
 
 # Get the snapshots associated with instances with the specified tags
-def get_snapshots_for_instance_tags(ec2_client, tag_key, tag_values):
-    return get_snapshots_for_instance_ids(ec2_client, get_instance_ids_for_tags(ec2_client, tag_key, tag_values))
+def get_snapshots_for_instance_tags(ec2_client, tag_key, tag_values, ec2_api_call_counts=None):
+    instance_ids = get_instance_ids_for_tags(ec2_client, tag_key, tag_values, ec2_api_call_counts)
+    return get_snapshots_for_instance_ids(ec2_client, instance_ids, ec2_api_call_counts)
 
 
 # Get the snapshots associated with instances with the specified names
-def get_snapshots_for_instance_names(ec2_client, volume_names):
-    return get_snapshots_for_instance_tags(ec2_client, 'Name', volume_names)
+def get_snapshots_for_instance_names(ec2_client, volume_names, ec2_api_call_counts=None):
+    return get_snapshots_for_instance_tags(ec2_client, 'Name', volume_names, ec2_api_call_counts)
+
+
+# Create crash-consistent snapshots of all the volumes attached to the specified instance, in a single
+# create_snapshots call; returns the summary of the instance, which has the error in case of failure
+def create_snapshots_for_instance_id(ec2_client, create_snapshots_request_json, instance_id):
+    instance_request_json = dict(create_snapshots_request_json)
+    instance_request_json['InstanceSpecification'] = {'InstanceId': instance_id}
+    try:
+        create_snapshots_response = ec2_client.create_snapshots(**instance_request_json)
+    except Exception as exception:
+        return {'InstanceId': instance_id, 'Snapshots': [], 'Error': str(exception)}
+    # Add the created snapshots to the resource graph, as the snapshots of their volumes
+    add_items_to_ec2_resource_graph(ec2_client, 'describe_snapshots', create_snapshots_response['Snapshots'])
+    return {'InstanceId': instance_id, 'Snapshots': create_snapshots_response['Snapshots'], 'Error': ''}
+
+
+# Create crash-consistent snapshots of the volumes of each of the specified instances; the instances are
+# processed concurrently on a bounded thread pool. The snapshots copy the tags of their volumes and,
+# if specified, are tagged with the specified tag. Returns the summaries of the instances in their order.
+def create_snapshots_for_instance_ids(ec2_client, instance_ids, description, snapshot_tag_name, snapshot_tag_value):
+    instance_ids = list(dict.fromkeys(strip_values(instance_ids)))
+    if len(instance_ids) == 0:
+        return []
+    create_snapshots_request_json = {'CopyTagsFromSource': 'volume'}
+    if len(description) > 0:
+        create_snapshots_request_json['Description'] = description
+    if len(snapshot_tag_name) > 0:
+        create_snapshots_request_json['TagSpecifications'] = [
+            {
+                'ResourceType': 'snapshot',
+                'Tags': [
+                    {
+                        'Key': snapshot_tag_name,
+                        'Value': snapshot_tag_value
+                    }
+                ]
+            }
+        ]
+    create_instance_snapshots = partial(create_snapshots_for_instance_id, ec2_client, create_snapshots_request_json)
+    with ThreadPoolExecutor(max_workers=min(get_boto3_api_max_concurrency(), len(instance_ids))) as executor:
+        return list(executor.map(create_instance_snapshots, instance_ids))
+
+
+# The max length of the text of the per-instance summaries of the created snapshots
+CREATE_SNAPSHOTS_SUMMARY_MAX_LENGTH = 12000
+
+
+# Get the max number of instances whose snapshots can be created in one request
+def get_create_snapshots_max_instances():
+    return int(os.environ.get('EC2_CREATE_SNAPSHOTS_MAX_INSTANCES', '50'))
+
+
+# Get the compact text of the specified instance summaries of the created snapshots,
+# restricted to the max summary length
+def get_create_snapshots_summary_text(create_snapshots_summaries):
+    instance_summary_texts, summary_text_length = [], 0
+    for create_snapshots_summary in create_snapshots_summaries:
+        if len(create_snapshots_summary['Error']) > 0:
+            instance_summary_texts.append('"{}": failed :: "{}"'.format(create_snapshots_summary['InstanceId'],
+                                                                        create_snapshots_summary['Error']))
+        else:
+            instance_summary_texts.append('"{}": {} snapshot(s) [{}]'.format(
+                create_snapshots_summary['InstanceId'],
+                len(create_snapshots_summary['Snapshots']),
+                ', '.join('{} of {} ({} GiB, {})'.format(snapshot['SnapshotId'], snapshot['VolumeId'],
+                                                         snapshot['VolumeSize'], snapshot['State'])
+                          for snapshot in create_snapshots_summary['Snapshots'])))
+        summary_text_length += len(instance_summary_texts[-1]) + 2
+        if summary_text_length > CREATE_SNAPSHOTS_SUMMARY_MAX_LENGTH:
+            instance_summary_texts.pop()
+            break
+    summary_text = '; '.join(instance_summary_texts)
+    if len(instance_summary_texts) < len(create_snapshots_summaries):
+        summary_text += '; {} more instance(s) not listed'.format(len(create_snapshots_summaries) - len(instance_summary_texts))
+    return summary_text
+
+
+# The max length of the text of the per-snapshot outcomes of a bulk snapshot deletion
+SNAPSHOT_BULK_DELETE_SUMMARY_MAX_LENGTH = 12000
+
+
+# Get the max number of snapshots to be deleted in a bulk snapshot deletion
+def get_snapshot_bulk_delete_max_snapshots():
+    return int(os.environ.get('EC2_SNAPSHOT_BULK_DELETE_MAX_SNAPSHOTS', '1000'))
+
+
+# Get the number of seconds of the remaining Lambda execution time that is reserved for preparing the response;
+# no new snapshot is taken up by a bulk snapshot deletion within this time
+def get_snapshot_bulk_delete_time_reserve():
+    return float(os.environ.get('EC2_SNAPSHOT_BULK_DELETE_TIME_RESERVE_SECONDS', '30'))
+
+
+# Create a token bucket that allows the specified number of requests per second, with bursts of up to one second
+def create_token_bucket(requests_per_second):
+    return {
+        'Rate': requests_per_second,
+        'Capacity': max(1.0, requests_per_second),
+        'Tokens': max(1.0, requests_per_second),
+        'UpdatedTime': time.monotonic(),
+        'Lock': threading.Lock()
+    }
+
+
+# Take a token from the specified token bucket; waits until a token is available
+def acquire_token(token_bucket):
+    while True:
+        with token_bucket['Lock']:
+            current_time = time.monotonic()
+            token_bucket['Tokens'] = min(token_bucket['Capacity'], token_bucket['Tokens'] + (
+                (current_time - token_bucket['UpdatedTime']) * token_bucket['Rate']))
+            token_bucket['UpdatedTime'] = current_time
+            if token_bucket['Tokens'] >= 1:
+                token_bucket['Tokens'] -= 1
+                return
+            wait_seconds = (1 - token_bucket['Tokens']) / token_bucket['Rate']
+        time.sleep(wait_seconds)
+
+
+# Get the snapshots owned by this account for the specified selector; the snapshot ids, the snapshot tag,
+# the volume ids and the volume tag select the snapshots (all the snapshots if none of them is specified),
+# which are then filtered to the ones older than the specified number of days (0 for any age).
+# As the snapshots are selected for deletion, they are always described, bypassing the resource graph,
+# so that the tags and volumes changed within its TTL are not missed. Returns the snapshots oldest first,
+# and the specified snapshot ids that were not found.
+def get_snapshots_for_selector(ec2_client, snapshot_selector, ec2_api_call_counts=None):
+    missing_snapshot_ids = []
+    if len(snapshot_selector['SnapshotIds']) > 0:
+        snapshots, missing_snapshot_ids = get_snapshots_for_snapshot_ids(ec2_client, snapshot_selector['SnapshotIds'])
+    elif len(snapshot_selector['SnapshotTagName']) > 0:
+        snapshots = get_ec2_describe_items_for_filter_values(ec2_client, 'describe_snapshots', {'OwnerIds': ['self']},
+                                                             'tag:{}'.format(snapshot_selector['SnapshotTagName']),
+                                                             strip_values(snapshot_selector['SnapshotTagValues']), 0,
+                                                             ec2_api_call_counts)
+    elif (len(snapshot_selector['VolumeIds']) > 0) or (len(snapshot_selector['VolumeTagName']) > 0):
+        volume_ids = snapshot_selector['VolumeIds']
+        if len(volume_ids) == 0:
+            volumes = get_ec2_describe_items_for_filter_values(ec2_client, 'describe_volumes', {},
+                                                               'tag:{}'.format(snapshot_selector['VolumeTagName']),
+                                                               strip_values(snapshot_selector['VolumeTagValues']), 0,
+                                                               ec2_api_call_counts)
+            volume_ids = [volume['VolumeId'] for volume in volumes]
+        snapshots = get_ec2_describe_items_for_filter_values(ec2_client, 'describe_snapshots', {'OwnerIds': ['self']},
+                                                             'volume-id', strip_values(volume_ids), 0, ec2_api_call_counts)
+    else:
+        call_counter = {'Calls': 0}
+        snapshots = list(iterate_ec2_describe_items(ec2_client, 'describe_snapshots', {'OwnerIds': ['self']},
+                                                    call_counter=call_counter))
+        if ec2_api_call_counts is not None:
+            ec2_api_call_counts['describe_snapshots'] = ec2_api_call_counts.get('describe_snapshots', 0) + call_counter['Calls']
+    # Refresh the resource graph with the described snapshots, which are owned by this account
+    if len(snapshot_selector['SnapshotIds']) == 0:
+        add_items_to_ec2_resource_graph(ec2_client, 'describe_snapshots', snapshots)
+    if snapshot_selector['OlderThanDays'] > 0:
+        cutoff_time = datetime.now(timezone.utc) - timedelta(days=snapshot_selector['OlderThanDays'])
+        snapshots = [snapshot for snapshot in snapshots if snapshot['StartTime'] < cutoff_time]
+    return sorted(snapshots, key=lambda snapshot: snapshot['StartTime']), missing_snapshot_ids
+
+
+# Delete the specified snapshot, or only check the permission to delete it in case of a dry run,
+# after taking a token from the specified token bucket; returns the outcome of the snapshot.
+# The snapshot is not attempted once the specified deadline (a time.monotonic() value, if any) has passed.
+def delete_snapshot_for_bulk_delete(ec2_client, token_bucket, dry_run, deadline, snapshot):
+    snapshot_outcome = {'SnapshotId': snapshot['SnapshotId'], 'Outcome': '', 'Error': ''}
+    acquire_token(token_bucket)
+    if (deadline is not None) and (time.monotonic() >= deadline):
+        snapshot_outcome['Outcome'] = 'NOT_ATTEMPTED'
+        return snapshot_outcome
+    try:
+        ec2_client.delete_snapshot(SnapshotId=snapshot['SnapshotId'], DryRun=dry_run)
+        snapshot_outcome['Outcome'] = 'DELETED'
+    except ClientError as exception:
+        if exception.response.get('Error', {}).get('Code', '') == 'DryRunOperation':
+            snapshot_outcome['Outcome'] = 'DRY_RUN_PASSED'
+        else:
+            snapshot_outcome['Outcome'] = 'FAILED'
+            snapshot_outcome['Error'] = exception.response.get('Error', {}).get('Code', str(exception))
+    except Exception as exception:
+        snapshot_outcome['Outcome'] = 'FAILED'
+        snapshot_outcome['Error'] = str(exception)
+    return snapshot_outcome
+
+
+# Delete the specified snapshots concurrently on a bounded thread pool, with the delete requests rate limited
+# by a token bucket (EC2_SNAPSHOT_DELETE_REQUESTS_PER_SECOND). If only the dry run is requested, every snapshot
+# is evaluated with a dry run; otherwise, as the dry run was already shown to the user before the confirmation,
+# the snapshots are deleted directly, and removed from the resource graph. The snapshots not yet taken up when
+# the specified deadline (a time.monotonic() value, if any) passes are not attempted.
+# Returns the outcomes of the snapshots in their order.
+def delete_snapshots_in_bulk(ec2_client, snapshots, dry_run_only, deadline=None):
+    if len(snapshots) == 0:
+        return []
+    token_bucket = create_token_bucket(float(os.environ.get('EC2_SNAPSHOT_DELETE_REQUESTS_PER_SECOND', '5')))
+    with ThreadPoolExecutor(max_workers=min(get_boto3_api_max_concurrency(), len(snapshots))) as executor:
+        snapshot_outcomes = list(executor.map(partial(delete_snapshot_for_bulk_delete, ec2_client, token_bucket,
+                                                      dry_run_only, deadline),
+                                              snapshots))
+    for snapshot_outcome in snapshot_outcomes:
+        if snapshot_outcome['Outcome'] == 'DELETED':
+            remove_snapshot_from_ec2_resource_graph(ec2_client, snapshot_outcome['SnapshotId'])
+    return snapshot_outcomes
+
+
+# Get the value of the specified tag from the tags of an EC2 describe API item
+def get_tag_value(tags, tag_key):
+    return next((tag['Value'] for tag in tags or [] if tag['Key'] == tag_key), '')
+
+
+# Get the snapshot coverage of the volumes, optionally of the volumes with the specified tag and values. The volumes
+# and the snapshots owned by this account are streamed page by page, and hash-joined on the volume id: only a summary
+# of each volume and the latest snapshot time per volume id are kept, so that the time and the memory stay linear in
+# the number of volumes and snapshots, and no snapshot is kept in memory. Only the completed snapshots are counted,
+# as a pending snapshot may still fail. Returns the aggregate counts and the volumes with no completed snapshot
+# started within the specified number of days, the volumes never snapshotted first, up to the max number of items
+# to be returned in the response.
+def get_snapshot_coverage_for_volumes(ec2_client, max_age_days, volume_tag_name, volume_tag_values, ec2_api_call_counts=None):
+    volume_call_counter, snapshot_call_counter = {'Calls': 0}, {'Calls': 0}
+    volume_request_json = {}
+    if len(volume_tag_name) > 0:
+        volume_request_json['Filters'] = [
+            {
+                'Name': 'tag:{}'.format(volume_tag_name),
+                'Values': strip_values(volume_tag_values)
+            }
+        ]
+    # Build side of the hash join: the summary of each volume, keyed by volume id
+    volume_summaries = {}
+    for volume in iterate_ec2_describe_items(ec2_client, 'describe_volumes', volume_request_json,
+                                             call_counter=volume_call_counter):
+        volume_summaries[volume['VolumeId']] = {
+            'VolumeId': volume['VolumeId'],
+            'Name': get_tag_value(volume.get('Tags'), 'Name'),
+            'Size': volume['Size'],
+            'State': volume['State'],
+            'InstanceIds': [attachment['InstanceId'] for attachment in volume.get('Attachments', [])],
+            'LatestSnapshotTime': None
+        }
+    # Probe side of the hash join: the snapshots are streamed and only the latest snapshot time of each volume is kept
+    snapshot_count = 0
+    for snapshot in iterate_ec2_describe_items(ec2_client, 'describe_snapshots', {
+        'OwnerIds': ['self'],
+        'Filters': [
+            {
+                'Name': 'status',
+                'Values': ['completed']
+            }
+        ]
+    }, call_counter=snapshot_call_counter):
+        snapshot_count += 1
+        volume_summary = volume_summaries.get(snapshot.get('VolumeId', ''))
+        if (volume_summary is not None) and ((volume_summary['LatestSnapshotTime'] is None) or (
+                snapshot['StartTime'] > volume_summary['LatestSnapshotTime'])):
+            volume_summary['LatestSnapshotTime'] = snapshot['StartTime']
+    if ec2_api_call_counts is not None:
+        ec2_api_call_counts['describe_volumes'] = ec2_api_call_counts.get('describe_volumes', 0) + volume_call_counter['Calls']
+        ec2_api_call_counts['describe_snapshots'] = ec2_api_call_counts.get('describe_snapshots', 0) + snapshot_call_counter['Calls']
+    # Aggregate the coverage and collect the offending volumes
+    cutoff_time = datetime.now(timezone.utc) - timedelta(days=max_age_days)
+    never_snapshotted_volumes, stale_volumes = [], []
+    for volume_summary in volume_summaries.values():
+        if volume_summary['LatestSnapshotTime'] is None:
+            never_snapshotted_volumes.append(volume_summary)
+        elif volume_summary['LatestSnapshotTime'] < cutoff_time:
+            stale_volumes.append(volume_summary)
+    stale_volumes.sort(key=lambda volume_summary: volume_summary['LatestSnapshotTime'])
+    offending_volumes = never_snapshotted_volumes + stale_volumes
+    for volume_summary in offending_volumes:
+        if volume_summary['LatestSnapshotTime'] is not None:
+            volume_summary['LatestSnapshotTime'] = volume_summary['LatestSnapshotTime'].isoformat()
+    return {
+        'VolumeCount': len(volume_summaries),
+        'SnapshotCount': snapshot_count,
+        'CoveredVolumeCount': len(volume_summaries) - len(offending_volumes),
+        'StaleVolumeCount': len(stale_volumes),
+        'NeverSnapshottedVolumeCount': len(never_snapshotted_volumes),
+        'OffendingVolumes': offending_volumes[:get_boto3_api_max_results()]
+    }
+
+
+# The age buckets of the snapshots, as the max age in days (None for no max) and the name of each bucket
+SNAPSHOT_AGE_BUCKETS = [
+    (7, '0-7 days'),
+    (30, '8-30 days'),
+    (90, '31-90 days'),
+    (365, '91-365 days'),
+    (None, 'over 365 days')
+]
+
+
+# The max number of groups per grouping in the snapshot storage footprint; the remaining groups are combined
+SNAPSHOT_FOOTPRINT_MAX_GROUPS = 10
+
+
+# Create an empty snapshot storage footprint
+def create_snapshot_footprint():
+    return {'SnapshotCount': 0, 'VolumeSizeGiB': 0, 'ByStorageTier': {}, 'ByAge': {}}
+
+
+# Add the specified snapshot, of the specified age bucket, to the specified snapshot storage footprint
+def add_snapshot_to_footprint(snapshot_footprint, snapshot, age_bucket_name):
+    snapshot_footprint['SnapshotCount'] += 1
+    snapshot_footprint['VolumeSizeGiB'] += snapshot.get('VolumeSize', 0)
+    storage_tier_footprint = snapshot_footprint['ByStorageTier'].setdefault(snapshot.get('StorageTier', 'standard'),
+                                                                            {'SnapshotCount': 0, 'VolumeSizeGiB': 0})
+    storage_tier_footprint['SnapshotCount'] += 1
+    storage_tier_footprint['VolumeSizeGiB'] += snapshot.get('VolumeSize', 0)
+    snapshot_footprint['ByAge'][age_bucket_name] = snapshot_footprint['ByAge'].get(age_bucket_name, 0) + 1
+
+
+# Merge the specified snapshot storage footprint into the other specified snapshot storage footprint
+def merge_snapshot_footprint(target_snapshot_footprint, snapshot_footprint):
+    target_snapshot_footprint['SnapshotCount'] += snapshot_footprint['SnapshotCount']
+    target_snapshot_footprint['VolumeSizeGiB'] += snapshot_footprint['VolumeSizeGiB']
+    for storage_tier, storage_tier_footprint in snapshot_footprint['ByStorageTier'].items():
+        target_storage_tier_footprint = target_snapshot_footprint['ByStorageTier'].setdefault(
+            storage_tier, {'SnapshotCount': 0, 'VolumeSizeGiB': 0})
+        target_storage_tier_footprint['SnapshotCount'] += storage_tier_footprint['SnapshotCount']
+        target_storage_tier_footprint['VolumeSizeGiB'] += storage_tier_footprint['VolumeSizeGiB']
+    for age_bucket_name, snapshot_count in snapshot_footprint['ByAge'].items():
+        target_snapshot_footprint['ByAge'][age_bucket_name] = target_snapshot_footprint['ByAge'].get(age_bucket_name, 0) + snapshot_count
+
+
+# Get the largest groups of the specified grouped snapshot storage footprints, by the volume size; the remaining
+# groups are combined into one, so that the number of groups is bounded regardless of the number of snapshots
+def get_largest_snapshot_footprint_groups(grouped_snapshot_footprints):
+    sorted_groups = sorted(grouped_snapshot_footprints.items(),
+                           key=lambda group: (group[1]['VolumeSizeGiB'], group[1]['SnapshotCount']), reverse=True)
+    largest_groups = dict(sorted_groups[:SNAPSHOT_FOOTPRINT_MAX_GROUPS])
+    if len(sorted_groups) > SNAPSHOT_FOOTPRINT_MAX_GROUPS:
+        other_snapshot_footprint = create_snapshot_footprint()
+        for _, snapshot_footprint in sorted_groups[SNAPSHOT_FOOTPRINT_MAX_GROUPS:]:
+            merge_snapshot_footprint(other_snapshot_footprint, snapshot_footprint)
+        largest_groups['(other {} group(s))'.format(len(sorted_groups) - SNAPSHOT_FOOTPRINT_MAX_GROUPS)] = other_snapshot_footprint
+    return largest_groups
+
+
+# Get the storage footprint of the snapshots owned by this account, in total and grouped by volume, by instance and,
+# if specified, by the value of the specified snapshot tag. The snapshots are streamed page by page and aggregated in
+# a single pass, with the instances of the volumes resolved from the streamed volume attachments; only the groups
+# are kept in memory. The counts, the total volume size, the storage tiers and the age buckets are computed for each
+# group, and only the largest groups are returned, so that the result size is bounded.
+def get_snapshot_footprint(ec2_client, group_by_tag_name, ec2_api_call_counts=None):
+    volume_call_counter, snapshot_call_counter = {'Calls': 0}, {'Calls': 0}
+    instance_ids_by_volume_id = {}
+    for volume in iterate_ec2_describe_items(ec2_client, 'describe_volumes', {}, call_counter=volume_call_counter):
+        if len(volume.get('Attachments', [])) > 0:
+            instance_ids_by_volume_id[volume['VolumeId']] = volume['Attachments'][0]['InstanceId']
+    current_time = datetime.now(timezone.utc)
+    total_snapshot_footprint = create_snapshot_footprint()
+    grouped_snapshot_footprints = {'ByVolume': {}, 'ByInstance': {}}
+    if len(group_by_tag_name) > 0:
+        grouped_snapshot_footprints['ByTag'] = {}
+    for snapshot in iterate_ec2_describe_items(ec2_client, 'describe_snapshots', {'OwnerIds': ['self']},
+                                               call_counter=snapshot_call_counter):
+        snapshot_age_days = (current_time - snapshot['StartTime']).days
+        age_bucket_name = next(bucket_name for max_age_days, bucket_name in SNAPSHOT_AGE_BUCKETS
+                               if (max_age_days is None) or (snapshot_age_days <= max_age_days))
+        group_names = {
+            'ByVolume': snapshot.get('VolumeId', ''),
+            'ByInstance': instance_ids_by_volume_id.get(snapshot.get('VolumeId', ''), '(volume not attached)')
+        }
+        if len(group_by_tag_name) > 0:
+            group_names['ByTag'] = get_tag_value(snapshot.get('Tags'), group_by_tag_name) or '(untagged)'
+        add_snapshot_to_footprint(total_snapshot_footprint, snapshot, age_bucket_name)
+        for grouping, group_name in group_names.items():
+            add_snapshot_to_footprint(grouped_snapshot_footprints[grouping].setdefault(group_name, create_snapshot_footprint()),
+                                      snapshot, age_bucket_name)
+    if ec2_api_call_counts is not None:
+        ec2_api_call_counts['describe_volumes'] = ec2_api_call_counts.get('describe_volumes', 0) + volume_call_counter['Calls']
+        ec2_api_call_counts['describe_snapshots'] = ec2_api_call_counts.get('describe_snapshots', 0) + snapshot_call_counter['Calls']
+    snapshot_footprint = {'Total': total_snapshot_footprint}
+    for grouping, grouped_footprints in grouped_snapshot_footprints.items():
+        snapshot_footprint[grouping] = get_largest_snapshot_footprint_groups(grouped_footprints)
+    return snapshot_footprint
+
+
+# Get the text of the specified outcomes of a bulk snapshot deletion; the counts per outcome are followed by
+# the snapshot ids per outcome and error, which are truncated to the max summary length
+def get_snapshot_bulk_delete_summary_text(snapshot_outcomes):
+    if len(snapshot_outcomes) == 0:
+        return 'No snapshot matched the selector. '
+    snapshot_ids_by_outcome = {}
+    for snapshot_outcome in snapshot_outcomes:
+        outcome_text = snapshot_outcome['Outcome']
+        if len(snapshot_outcome['Error']) > 0:
+            outcome_text = '{} ({})'.format(outcome_text, snapshot_outcome['Error'])
+        snapshot_ids_by_outcome.setdefault(outcome_text, []).append(snapshot_outcome['SnapshotId'])
+    summary_text = 'Snapshot count per outcome :: {}. '.format(
+        ', '.join('{}: {}'.format(outcome_text, len(snapshot_ids))
+                  for outcome_text, snapshot_ids in snapshot_ids_by_outcome.items()))
+    listed_snapshot_count = 0
+    for outcome_text, snapshot_ids in snapshot_ids_by_outcome.items():
+        outcome_summary_text = 'Snapshot ids with outcome {} :: '.format(outcome_text)
+        for snapshot_id in snapshot_ids:
+            if (len(summary_text) + len(outcome_summary_text) + len(snapshot_id) + 2) > SNAPSHOT_BULK_DELETE_SUMMARY_MAX_LENGTH:
+                break
+            outcome_summary_text += snapshot_id + ', '
+            listed_snapshot_count += 1
+        summary_text += outcome_summary_text.rstrip(', ') + '. '
+    if listed_snapshot_count < len(snapshot_outcomes):
+        summary_text += '{} more snapshot id(s) not listed. '.format(len(snapshot_outcomes) - listed_snapshot_count)
+    return summary_text
+
+
+# Counts of the boto3 API JSONs that passed (hit) or failed (miss) the local validation,
+# across invocations of a warm Lambda container
+BOTO3_API_JSON_LOCAL_VALIDATION_COUNTS = {'hit': 0, 'miss': 0}
+
+
+# Find the values in the specified boto3 API parameter that are not in the enum of its shape
+def find_boto3_api_param_enum_errors(shape, param, param_name):
+    enum_errors = []
+    if (shape.type_name == 'structure') and isinstance(param, dict):
+        for member_name, member_param in param.items():
+            if member_name in shape.members:
+                member_param_name = '{}.{}'.format(param_name, member_name) if (len(param_name) > 0) else member_name
+                enum_errors.extend(find_boto3_api_param_enum_errors(shape.members[member_name], member_param,
+                                                                    member_param_name))
+    elif (shape.type_name == 'list') and isinstance(param, list):
+        for index, member_param in enumerate(param):
+            enum_errors.extend(find_boto3_api_param_enum_errors(shape.member, member_param,
+                                                                '{}[{}]'.format(param_name, index)))
+    elif (shape.type_name == 'map') and isinstance(param, dict):
+        for map_key, map_value in param.items():
+            enum_errors.extend(find_boto3_api_param_enum_errors(shape.value, map_value,
+                                                                '{}.{}'.format(param_name, map_key)))
+    elif (shape.type_name == 'string') and (len(shape.enum) > 0) and isinstance(param, str) and (param not in shape.enum):
+        enum_errors.append('Invalid value for parameter {}, value: {}, valid values: {}'
+                           .format(param_name, param, ', '.join(shape.enum)))
+    return enum_errors
+
+
+# Validate the boto3 API JSON locally against the service model of the specified boto3 client;
+# checks the required members, the unknown members, the types and the enums, and returns the list of errors
+def validate_boto3_api_json(boto3_client, boto3_api_name, boto3_api_json_text):
+    try:
+        boto3_api_request_json = json.loads(boto3_api_json_text)
+    except json.JSONDecodeError as exception:
+        return ['The boto3 API JSON is not valid JSON :: {}'.format(exception)]
+    if boto3_api_request_json is None:
+        boto3_api_request_json = {}
+    if not isinstance(boto3_api_request_json, dict):
+        return ['The boto3 API JSON is not a JSON object.']
+    operation_name = boto3_client.meta.method_to_api_mapping.get(boto3_api_name)
+    if operation_name is None:
+        return ['Unknown boto3 API "{}".'.format(boto3_api_name)]
+    input_shape = boto3_client.meta.service_model.operation_model(operation_name).input_shape
+    validation_errors = []
+    if input_shape is None:
+        if len(boto3_api_request_json) > 0:
+            validation_errors.append('The boto3 API "{}" does not take any parameters.'.format(boto3_api_name))
+        return validation_errors
+    validation_report = ParamValidator().validate(boto3_api_request_json, input_shape)
+    if validation_report.has_errors():
+        validation_errors.extend(validation_report.generate_report().splitlines())
+    validation_errors.extend(find_boto3_api_param_enum_errors(input_shape, boto3_api_request_json, ''))
+    return validation_errors
 
 
 # Process the prompt and the response by invoking the specified LLM
-def process_prompt(aws_account_id, aws_region, boto3_api_name, user_input, generated_boto3_json_str):
-    # Instantiate the Amazon Bedrock runtime boto3 client for the specific region
-    bedrock_rt_client = boto3.client('bedrock-runtime', region_name=aws_region, config=get_boto_config())
-    # Read the prompt templates and perform variable substitution
-    prompt_templates_dir = '.'
+def process_prompt(aws_account_id, aws_region, boto3_api_name, user_input, generated_boto3_json_str,
+                   validation_errors):
+    # Get the cached Amazon Bedrock runtime boto3 client for the specific region
+    bedrock_rt_client = get_boto3_client('bedrock-runtime', aws_region)
+    # Render the preloaded prompt templates with the variable values
     system_prompts = [
         {
-            "text": read_file(os.path.join(prompt_templates_dir, os.environ['SYSTEM_PROMPT_FILE_NAME']), 'r')
+            "text": render_prompt_template(PROMPT_TEMPLATES['SYSTEM_PROMPT_FILE_NAME'], {})
         }
     ]
-    user_prompt_content = read_file(os.path.join(prompt_templates_dir, os.environ['USER_PROMPT_FILE_NAME']), 'r')
-    user_prompt_content = user_prompt_content.replace('{aws_account_id}', aws_account_id)
-    user_prompt_content = user_prompt_content.replace('{aws_region}', aws_region)
-    user_prompt_content = user_prompt_content.replace('{boto3_api_name}', boto3_api_name)
-    user_prompt_content = user_prompt_content.replace('{user_input}', user_input)
-    user_prompt_content = user_prompt_content.replace('{generated_boto3_json}', generated_boto3_json_str)
+    placeholder_values = {
+        'aws_account_id': aws_account_id,
+        'aws_region': aws_region,
+        'boto3_api_name': boto3_api_name,
+        'user_input': user_input,
+        'generated_boto3_json': generated_boto3_json_str,
+        'validation_errors': '\n'.join(validation_errors)
+    }
+    user_prompt_content = render_prompt_template(PROMPT_TEMPLATES['USER_PROMPT_FILE_NAME'], placeholder_values)
     messages = [
         {
             "role": "user",
@@ -351,8 +1702,11 @@ def process_prompt(aws_account_id, aws_region, boto3_api_name, user_input, gener
             ]
         }
     ]
-    # Invoke the LLM, prepare and return the response
-    llm_response = invoke_llm(bedrock_rt_client, system_prompts, messages)
+    # Invoke the LLM or use its cached response, prepare and return the response
+    cache_key = get_llm_response_cache_key(('SYSTEM_PROMPT_FILE_NAME', 'USER_PROMPT_FILE_NAME'),
+                                           dict(placeholder_values,
+                                                generated_boto3_json=canonicalize_boto3_json(generated_boto3_json_str)))
+    llm_response = invoke_llm_with_cache(bedrock_rt_client, system_prompts, messages, cache_key, 'VALIDATED_BOTO3_JSON')
     change_log = substring_between(llm_response, '<CHANGELOG>', '</CHANGELOG>')
     logging.info('LLM validation and update complete. Change log :: {}'.format(change_log))
     updated_generated_json = substring_between(llm_response, '<VALIDATED_BOTO3_JSON>', '</VALIDATED_BOTO3_JSON>')
@@ -361,21 +1715,23 @@ def process_prompt(aws_account_id, aws_region, boto3_api_name, user_input, gener
 
 # Process the prompt for the boto3 API retry and the response by invoking the specified LLM
 def process_prompt_for_boto3_api_retry(aws_account_id, aws_region, boto3_api_name, boto3_json_str, boto3_error):
-    # Instantiate the Amazon Bedrock runtime boto3 client for the specific region
-    bedrock_rt_client = boto3.client('bedrock-runtime', region_name=aws_region, config=get_boto_config())
-    # Read the prompt templates and perform variable substitution
-    prompt_templates_dir = '.'
+    # Get the cached Amazon Bedrock runtime boto3 client for the specific region
+    bedrock_rt_client = get_boto3_client('bedrock-runtime', aws_region)
+    # Render the preloaded prompt templates with the variable values
     system_prompts = [
         {
-            "text": read_file(os.path.join(prompt_templates_dir, os.environ['SYSTEM_PROMPT_FOR_BOTO3_RETRY_FILE_NAME']), 'r')
+            "text": render_prompt_template(PROMPT_TEMPLATES['SYSTEM_PROMPT_FOR_BOTO3_RETRY_FILE_NAME'], {})
         }
     ]
-    user_prompt_content = read_file(os.path.join(prompt_templates_dir, os.environ['USER_PROMPT_FOR_BOTO3_RETRY_FILE_NAME']), 'r')
-    user_prompt_content = user_prompt_content.replace('{aws_account_id}', aws_account_id)
-    user_prompt_content = user_prompt_content.replace('{aws_region}', aws_region)
-    user_prompt_content = user_prompt_content.replace('{boto3_api_name}', boto3_api_name)
-    user_prompt_content = user_prompt_content.replace('{boto3_json}', boto3_json_str)
-    user_prompt_content = user_prompt_content.replace('{boto3_error}', boto3_error)
+    placeholder_values = {
+        'aws_account_id': aws_account_id,
+        'aws_region': aws_region,
+        'boto3_api_name': boto3_api_name,
+        'boto3_json': boto3_json_str,
+        'boto3_error': boto3_error
+    }
+    user_prompt_content = render_prompt_template(PROMPT_TEMPLATES['USER_PROMPT_FOR_BOTO3_RETRY_FILE_NAME'],
+                                                 placeholder_values)
     messages = [
         {
             "role": "user",
@@ -386,11 +1742,25 @@ def process_prompt_for_boto3_api_retry(aws_account_id, aws_region, boto3_api_nam
             ]
         }
     ]
-    # Invoke the LLM, prepare and return the response
-    llm_response = invoke_llm(bedrock_rt_client, system_prompts, messages)
+    # Invoke the LLM or use its cached response, prepare and return the response; unlike the validation,
+    # the fix is not cached here, but only once the boto3 API call retried with it succeeds
+    cache_key = get_llm_response_cache_key(('SYSTEM_PROMPT_FOR_BOTO3_RETRY_FILE_NAME', 'USER_PROMPT_FOR_BOTO3_RETRY_FILE_NAME'),
+                                           dict(placeholder_values, boto3_json=canonicalize_boto3_json(boto3_json_str)))
+    llm_response = get_cached_llm_response(cache_key)
+    token_usage = None
+    if llm_response is None:
+        llm_response, token_usage = invoke_llm(bedrock_rt_client, system_prompts, messages)
+    else:
+        logging.info('Using the cached LLM response.')
+    log_llm_response_cache_stats()
     fixed_boto3_json = substring_between(llm_response, '<FIXED_BOTO3_JSON>', '</FIXED_BOTO3_JSON>')
     logging.info('LLM fix to boto3 JSON completed based on the specified boto3 error.')
-    return fixed_boto3_json
+    llm_fix = {
+        'cache_key': cache_key,
+        'llm_response': llm_response,
+        'token_usage': token_usage
+    }
+    return fixed_boto3_json, llm_fix
 
 
 # Invoke the specified LLM through Amazon Bedrock's Converse API
@@ -423,8 +1793,8 @@ def invoke_llm(bedrock_rt_client, system_prompts, messages):
         logging.info('Prompt latency = {} second(s)'.format(int(metrics['latencyMs']) / 1000))
         logging.info('PROMPT: {}'.format(messages[0]['content'][0]))
         logging.info('RESPONSE: {}'.format(prompt_response))
-    # Return the LLM response text
-    return prompt_response
+    # Return the LLM response text and the token usage
+    return prompt_response, response['usage']
 
 
 # Invoke the specified boto3 API
@@ -447,98 +1817,133 @@ def invoke_boto3_api(ec2_client, boto3_api_name, boto3_api_request_json):
         raise exception
 
 
-# Invoke boto3 APIs with LLM intervened retry
+# Error codes of the boto3 API errors that a change to the request JSON can fix
+BOTO3_API_VALIDATION_ERROR_CODES = frozenset((
+    'InvalidArgument',
+    'InvalidInput',
+    'InvalidParameter',
+    'InvalidParameterCombination',
+    'InvalidParameterException',
+    'InvalidParameterValue',
+    'InvalidParameterValueException',
+    'InvalidRequest',
+    'InvalidRequestException',
+    'MalformedXML',
+    'MissingParameter',
+    'MissingParameterValueException',
+    'ValidationError',
+    'ValidationException'
+))
+
+
+# Error codes of the boto3 API errors that may succeed when retried as is
+BOTO3_API_TRANSIENT_ERROR_CODES = frozenset((
+    'InternalError',
+    'InternalFailure',
+    'InternalServerError',
+    'InternalServiceError',
+    'PriorRequestNotComplete',
+    'ProvisionedThroughputExceededException',
+    'RequestLimitExceeded',
+    'RequestThrottled',
+    'RequestThrottledException',
+    'RequestTimeout',
+    'RequestTimeoutException',
+    'ServiceUnavailable',
+    'ServiceUnavailableException',
+    'SlowDown',
+    'Throttling',
+    'ThrottlingException',
+    'TooManyRequestsException'
+))
+
+
+# Classify the boto3 API error as 'VALIDATION' (can be fixed by the LLM), 'TRANSIENT' (can be retried as is)
+# or 'TERMINAL' (cannot be fixed by retrying)
+def classify_boto3_api_error(exception):
+    if isinstance(exception, (ParamValidationError, TypeError)):
+        return 'VALIDATION'
+    if isinstance(exception, (EndpointConnectionError, ConnectTimeoutError, HTTPClientError)):
+        return 'TRANSIENT'
+    if isinstance(exception, ClientError):
+        error_code = exception.response.get('Error', {}).get('Code', '')
+        if (error_code in BOTO3_API_VALIDATION_ERROR_CODES) or error_code.endswith('.Malformed'):
+            return 'VALIDATION'
+        if ((error_code in BOTO3_API_TRANSIENT_ERROR_CODES)
+                or (exception.response.get('ResponseMetadata', {}).get('HTTPStatusCode', 0) >= 500)):
+            return 'TRANSIENT'
+    return 'TERMINAL'
+
+
+# The base and the max backoff (in seconds) of the retries after transient boto3 API errors
+BOTO3_API_RETRY_BASE_BACKOFF_SECONDS = 1
+BOTO3_API_RETRY_MAX_BACKOFF_SECONDS = 20
+
+
+# Get the jittered exponential backoff (in seconds) before the specified retry attempt
+def get_boto3_api_retry_backoff_seconds(retry_attempt):
+    return random.uniform(0, min(BOTO3_API_RETRY_MAX_BACKOFF_SECONDS,
+                                 BOTO3_API_RETRY_BASE_BACKOFF_SECONDS * (2 ** (retry_attempt - 1))))
+
+
+# Invoke boto3 APIs with a retry pipeline based on the error class; validation errors are fixed by the LLM
+# and retried, transient errors are retried after a jittered backoff and terminal errors are raised right away.
+# Each path is bounded by its own configurable attempt budget.
 def invoke_boto3_api_with_llm_intervened_retry(aws_account_id, aws_region, ec2_client,
                                                boto3_api_name, boto3_api_request_json):
-    try:
+    llm_fix_attempts = 0
+    transient_retry_attempts = 0
+    # The LLM fix of the boto3 API JSON request that is being retried, if any
+    llm_fix = None
+    while True:
         try:
-            response = invoke_boto3_api(ec2_client, boto3_api_name, boto3_api_request_json)
+            boto3_api_response = invoke_boto3_api(ec2_client, boto3_api_name, boto3_api_request_json)
+            # Cache the LLM fix only now that the call retried with it has succeeded
+            put_cached_llm_fix(llm_fix)
+            return boto3_api_response
         except Exception as exception:
-            logging.info('Error occurred when invoking boto3 API "{}" :: {}'.format(boto3_api_name, exception))
-            logging.info('Fixing the boto3 API JSON request using LLM...')
-            fixed_boto3_api_request_json = json.loads(process_prompt_for_boto3_api_retry(aws_account_id,
-                                                                                         aws_region,
-                                                                                         boto3_api_name,
-                                                                                         json.dumps(boto3_api_request_json),
-                                                                                         str(exception)))
-            logging.info('Completed fixing the boto3 API JSON request using LLM.')
-            logging.info('Retrying boto3 API "{}" after fixing the JSON request using LLM...'.format(boto3_api_name))
-            response = invoke_boto3_api(ec2_client, boto3_api_name, fixed_boto3_api_request_json)
-            logging.info('Completed retrying boto3 API "{}" after fixing the JSON request using LLM.'.format(boto3_api_name))
-    except Exception as final_exception:
-        raise final_exception
-    return response
+            boto3_api_error_class = classify_boto3_api_error(exception)
+            logging.info('{} error occurred when invoking boto3 API "{}" :: {}'
+                         .format(boto3_api_error_class, boto3_api_name, exception))
+            # The call retried with the LLM fix failed; evict the fix, if it was cached, so that it is not replayed
+            if (llm_fix is not None) and (boto3_api_error_class != 'TRANSIENT'):
+                evict_cached_llm_response(llm_fix['cache_key'])
+                llm_fix = None
+            if (boto3_api_error_class == 'VALIDATION') \
+                    and (llm_fix_attempts < int(os.environ.get('BOTO3_API_MAX_LLM_FIX_ATTEMPTS', '1'))):
+                llm_fix_attempts += 1
+                logging.info('Fixing the boto3 API JSON request using LLM...')
+                fixed_boto3_json, llm_fix = process_prompt_for_boto3_api_retry(aws_account_id,
+                                                                               aws_region,
+                                                                               boto3_api_name,
+                                                                               json.dumps(boto3_api_request_json),
+                                                                               str(exception))
+                boto3_api_request_json = json.loads(fixed_boto3_json)
+                logging.info('Completed fixing the boto3 API JSON request using LLM.')
+                logging.info('Retrying boto3 API "{}" after fixing the JSON request using LLM...'.format(boto3_api_name))
+            elif (boto3_api_error_class == 'TRANSIENT') \
+                    and (transient_retry_attempts < int(os.environ.get('BOTO3_API_MAX_TRANSIENT_RETRY_ATTEMPTS', '2'))):
+                transient_retry_attempts += 1
+                retry_backoff_seconds = get_boto3_api_retry_backoff_seconds(transient_retry_attempts)
+                logging.info('Retrying boto3 API "{}" in {:.2f} second(s)...'.format(boto3_api_name, retry_backoff_seconds))
+                time.sleep(retry_backoff_seconds)
+            else:
+                raise
 
 
-# Parse the input Lambda event received from Agents for Amazon Bedrock
-def parse_request_and_prepare_response(event):
+# Process the boto3 API request in the specified AWS account and AWS region, and return the response body
+# text list and the function response state; the IAM role is assumed for the other AWS accounts.
+# The Lambda context, if specified, bounds the long running requests by the remaining execution time
+def process_boto3_api_request_for_region(aws_account_id, aws_region, boto3_api_name, boto3_api_json_text,
+                                         assume_role_arn='', context=None):
     response_body_text_list = []
     function_response_state = ''
-    logging.info('Parsing request data...')
-    # Get the various objects from the input event
-    prompt_session_attributes = event["promptSessionAttributes"]
-    session_attributes = event["sessionAttributes"]
-    # Get the AWS account id from the session attributes, if it exists; if not, add to it
-    if 'AWSAccountId' in session_attributes:
-        aws_account_id = session_attributes['AWSAccountId']
-    else:
-        aws_account_id = (boto3.client('sts')).get_caller_identity().get('Account')
-        session_attributes['AWSAccountId'] = aws_account_id
-    # Append to the response body text
-    response_body_text = 'AWS Account Id "{}" will be used.'.format(aws_account_id)
-    response_body_text_list.append(response_body_text)
-    logging.info(response_body_text)
-    # Get the input parameters
-    aws_region, backup_plan_id, boto3_api_name, boto3_api_json_text = '', '', '', ''
-    input_text = event["inputText"]
-    # Loop through the input parameters
-    input_parameters = event["parameters"]
-    for input_parameter in input_parameters:
-        # Retrieve the value of the parameters
-        if input_parameter["name"] == "AWSRegion":
-            aws_region = input_parameter["value"]
-        elif input_parameter["name"] == "Boto3APIName":
-            boto3_api_name = input_parameter["value"].lower()
-            boto3_api_name = substring_after(boto3_api_name, 'ec2.client.')
-        elif input_parameter["name"] == "Boto3APIJSON":
-            boto3_api_json_text = input_parameter["value"]
-    logging.info('Completed parsing request data.')
-    # Set the default AWS region if not found in the input
-    if len(aws_region) == 0:
-        aws_region = os.environ['DEFAULT_AWS_REGION']
-    # Append to the response body text
-    response_body_text = 'AWS Region "{}" will be used.'.format(aws_region)
-    response_body_text_list.append(response_body_text)
-    logging.info(response_body_text)
-    # Instantiate the Amazon EC2 boto3 client for the specific region
-    ec2_client = boto3.client('ec2', region_name=aws_region, config=get_boto_config())
-    # Except for custom APIs, validate the boto3 JSON for the specified user input by invoking a LLM
-    if boto3_api_name not in ('describe_instances_for_all_instances',
-                              'describe_instances_for_instance_ids',
-                              'describe_instances_for_instance_names',
-                              'describe_instances_for_instance_tags',
-                              'describe_volumes_for_all_volumes',
-                              'describe_volumes_for_instance_ids',
-                              'describe_volumes_for_instance_names',
-                              'describe_volumes_for_instance_tags',
-                              'describe_volumes_for_volume_ids',
-                              'describe_volumes_for_volume_names',
-                              'describe_volumes_for_volume_tags',
-                              'describe_snapshots_for_all_snapshots',
-                              'describe_snapshots_for_instance_ids',
-                              'describe_snapshots_for_instance_names',
-                              'describe_snapshots_for_instance_tags',
-                              'describe_snapshots_for_snapshot_ids',
-                              'describe_snapshots_for_snapshot_names',
-                              'describe_snapshots_for_snapshot_tags',
-                              'describe_snapshots_for_volume_ids',
-                              'describe_snapshots_for_volume_names',
-                              'describe_snapshots_for_volume_tags',
-                              'create_snapshot',
-                              'delete_snapshot'):
-        logging.info('Validating the boto3 API JSON...')
-        boto3_api_json_text = process_prompt(aws_account_id, aws_region, boto3_api_name, input_text, boto3_api_json_text)
-        logging.info('Completed validating the boto3 API JSON.')
+    # Get the cached Amazon EC2 boto3 client for the specific region
+    # The connection pool is sized to match the concurrent boto3 API calls, and the adaptive retry mode
+    # rate limits the client side on throttling errors
+    ec2_client = get_boto3_client('ec2', aws_region, get_boto3_api_max_concurrency(), 'adaptive', assume_role_arn)
+    # The number of EC2 API calls made per describe API, to be reported in the response
+    ec2_api_call_counts = {}
     # Determine the action type based on the existence of the relevant parameters
     if len(boto3_api_json_text) == 0:
         function_response_state = 'FAILURE'
@@ -574,9 +1979,11 @@ def parse_request_and_prepare_response(event):
                     retrieved_instance_ids = retrieved_instance_ids.split(',')
                     # Get the instances for the retrieved instance ids
                     logging.info('Getting instance details...')
-                    describe_instances_response = get_instances_for_instance_ids(ec2_client, retrieved_instance_ids)
+                    describe_instances_response, missing_instance_ids = get_instances_for_instance_ids(ec2_client, retrieved_instance_ids)
                     logging.info('Completed getting instance details.')
                     # Append to the response body text
+                    if len(missing_instance_ids) > 0:
+                        response_body_text_list.append('Instance ids not found :: {}.'.format(missing_instance_ids))
                     response_body_text_list.append('Details of instances associated with instance ids {} :: {}'
                                                    .format(retrieved_instance_ids,
                                                            describe_instances_response))
@@ -655,8 +2062,9 @@ def parse_request_and_prepare_response(event):
                     retrieved_instance_ids = retrieved_instance_ids.split(',')
                     # Get the volumes for the retrieved instance ids
                     logging.info('Getting volume details...')
-                    describe_volumes_response = get_volumes_for_instance_ids(ec2_client, retrieved_instance_ids)
+                    describe_volumes_response = get_volumes_for_instance_ids(ec2_client, retrieved_instance_ids, ec2_api_call_counts)
                     logging.info('Completed getting volume details.')
+                    response_body_text_list.append(get_ec2_api_call_count_text(ec2_api_call_counts))
                     # Append to the response body text
                     response_body_text_list.append('Details of volumes associated with instance ids {} :: {}'
                                                    .format(retrieved_instance_ids,
@@ -675,12 +2083,13 @@ def parse_request_and_prepare_response(event):
                     retrieved_instance_names = retrieved_instance_names.split(',')
                     # Get the instance ids associated with all the instances that have the matching names
                     logging.info('Getting instance ids for names "{}"...'.format(retrieved_instance_names))
-                    retrieved_instance_ids = get_instance_ids_for_names(ec2_client, retrieved_instance_names)
+                    retrieved_instance_ids = get_instance_ids_for_names(ec2_client, retrieved_instance_names, ec2_api_call_counts)
                     logging.info('Completed getting instance ids for names.')
                     # Get the volumes for all the retrieved instance ids
                     logging.info('Getting volume details...')
-                    describe_volumes_response = get_volumes_for_instance_ids(ec2_client, retrieved_instance_ids)
+                    describe_volumes_response = get_volumes_for_instance_ids(ec2_client, retrieved_instance_ids, ec2_api_call_counts)
                     logging.info('Completed getting volume details.')
+                    response_body_text_list.append(get_ec2_api_call_count_text(ec2_api_call_counts))
                     # Append to the response body text
                     response_body_text_list.append('Details of volumes associated with instance names "{}" :: {}'
                                                    .format(retrieved_instance_names,
@@ -703,12 +2112,14 @@ def parse_request_and_prepare_response(event):
                                                                                               retrieved_tag_values))
                     retrieved_instance_ids = get_instance_ids_for_tags(ec2_client,
                                                                        retrieved_tag_name,
-                                                                       retrieved_tag_values)
+                                                                       retrieved_tag_values,
+                                                                       ec2_api_call_counts)
                     logging.info('Completed getting instance ids for tag and values.')
                     # Get the volumes for all the retrieved instance ids
                     logging.info('Getting volume details...')
-                    describe_volumes_response = get_volumes_for_instance_ids(ec2_client, retrieved_instance_ids)
+                    describe_volumes_response = get_volumes_for_instance_ids(ec2_client, retrieved_instance_ids, ec2_api_call_counts)
                     logging.info('Completed getting volume details.')
+                    response_body_text_list.append(get_ec2_api_call_count_text(ec2_api_call_counts))
                     # Append to the response body text
                     response_body_text_list.append('Details of volumes associated with instances with tag "{}" and with values {} :: {}'
                                                    .format(retrieved_tag_name,
@@ -734,9 +2145,11 @@ def parse_request_and_prepare_response(event):
                     retrieved_volume_ids = retrieved_volume_ids.split(',')
                     # Get the volumes for the retrieved volume ids
                     logging.info('Getting volume details for volume ids "{}"...'.format(retrieved_volume_ids))
-                    describe_volumes_response = get_volumes_for_volume_ids(ec2_client, retrieved_volume_ids)
+                    describe_volumes_response, missing_volume_ids = get_volumes_for_volume_ids(ec2_client, retrieved_volume_ids)
                     logging.info('Completed getting volume details for volume ids.')
                     # Append to the response body text
+                    if len(missing_volume_ids) > 0:
+                        response_body_text_list.append('Volume ids not found :: {}.'.format(missing_volume_ids))
                     response_body_text_list.append('Details of volumes associated with volume ids {} :: {}'
                                                    .format(retrieved_volume_ids,
                                                            describe_volumes_response))
@@ -813,8 +2226,9 @@ def parse_request_and_prepare_response(event):
                     retrieved_instance_ids = retrieved_instance_ids.split(',')
                     # Get the snapshots for the retrieved instance ids
                     logging.info('Getting snapshot details...')
-                    describe_snapshots_response = get_snapshots_for_instance_ids(ec2_client, retrieved_instance_ids)
+                    describe_snapshots_response = get_snapshots_for_instance_ids(ec2_client, retrieved_instance_ids, ec2_api_call_counts)
                     logging.info('Completed getting snapshot details.')
+                    response_body_text_list.append(get_ec2_api_call_count_text(ec2_api_call_counts))
                     # Append to the response body text
                     response_body_text_list.append('Details of snapshots associated with instance ids {} :: {}'
                                                    .format(retrieved_instance_ids,
@@ -833,8 +2247,9 @@ def parse_request_and_prepare_response(event):
                     retrieved_instance_names = retrieved_instance_names.split(',')
                     # Get the snapshots for all the retrieved instance names
                     logging.info('Getting snapshot details for instances with names "{}"...'.format(retrieved_instance_names))
-                    describe_snapshots_response = get_snapshots_for_instance_names(ec2_client, retrieved_instance_names)
+                    describe_snapshots_response = get_snapshots_for_instance_names(ec2_client, retrieved_instance_names, ec2_api_call_counts)
                     logging.info('Completed getting snapshot details for instances with names.')
+                    response_body_text_list.append(get_ec2_api_call_count_text(ec2_api_call_counts))
                     # Append to the response body text
                     response_body_text_list.append('Details of snapshots associated with instance names "{}" :: {}'
                                                    .format(retrieved_instance_names,
@@ -855,8 +2270,9 @@ def parse_request_and_prepare_response(event):
                     # Get the snapshots for all the instances that have the matching tags
                     logging.info('Getting snapshot details for instances with tag "{}" and values {}...'.format(retrieved_tag_name,
                                                                                                                 retrieved_tag_values))
-                    describe_snapshots_response = get_snapshots_for_instance_tags(ec2_client, retrieved_tag_name, retrieved_tag_values)
+                    describe_snapshots_response = get_snapshots_for_instance_tags(ec2_client, retrieved_tag_name, retrieved_tag_values, ec2_api_call_counts)
                     logging.info('Completed getting snapshot details for instances with tag and values.')
+                    response_body_text_list.append(get_ec2_api_call_count_text(ec2_api_call_counts))
                     # Append to the response body text
                     response_body_text_list.append('Details of snapshots associated with instances with tag "{}" and with values {} :: {}'
                                                    .format(retrieved_tag_name,
@@ -882,9 +2298,11 @@ def parse_request_and_prepare_response(event):
                     retrieved_snapshot_ids = retrieved_snapshot_ids.split(',')
                     # Get the snapshots for the retrieved snapshot ids
                     logging.info('Getting snapshot details for snapshot ids "{}"...'.format(retrieved_snapshot_ids))
-                    describe_snapshots_response = get_snapshots_for_snapshot_ids(ec2_client, retrieved_snapshot_ids)
+                    describe_snapshots_response, missing_snapshot_ids = get_snapshots_for_snapshot_ids(ec2_client, retrieved_snapshot_ids)
                     logging.info('Completed getting snapshot details for snapshot ids.')
                     # Append to the response body text
+                    if len(missing_snapshot_ids) > 0:
+                        response_body_text_list.append('Snapshot ids not found :: {}.'.format(missing_snapshot_ids))
                     response_body_text_list.append('Details of snapshots associated with snapshot ids {} :: {}'
                                                    .format(retrieved_snapshot_ids,
                                                            describe_snapshots_response))
@@ -952,8 +2370,9 @@ def parse_request_and_prepare_response(event):
                     retrieved_volume_ids = retrieved_volume_ids.split(',')
                     # Get the snapshots for the retrieved volume ids
                     logging.info('Getting snapshot details for volume ids "{}"...'.format(retrieved_volume_ids))
-                    describe_snapshots_response = get_snapshots_for_volume_ids(ec2_client, retrieved_volume_ids)
+                    describe_snapshots_response = get_snapshots_for_volume_ids(ec2_client, retrieved_volume_ids, ec2_api_call_counts)
                     logging.info('Completed getting snapshot details for volume ids.')
+                    response_body_text_list.append(get_ec2_api_call_count_text(ec2_api_call_counts))
                     # Append to the response body text
                     response_body_text_list.append('Details of snapshots associated with volume ids {} :: {}'
                                                    .format(retrieved_volume_ids,
@@ -972,8 +2391,9 @@ def parse_request_and_prepare_response(event):
                     retrieved_volume_names = retrieved_volume_names.split(',')
                     # Get the snapshots for the retrieved volume names
                     logging.info('Getting snapshot details for volume names "{}"...'.format(retrieved_volume_names))
-                    describe_snapshots_response = get_snapshots_for_volume_names(ec2_client, retrieved_volume_names)
+                    describe_snapshots_response = get_snapshots_for_volume_names(ec2_client, retrieved_volume_names, ec2_api_call_counts)
                     logging.info('Completed getting snapshot details for volume names.')
+                    response_body_text_list.append(get_ec2_api_call_count_text(ec2_api_call_counts))
                     # Append to the response body text
                     response_body_text_list.append('Details of snapshots associated with volume names {} :: {}'
                                                    .format(retrieved_volume_names,
@@ -993,8 +2413,9 @@ def parse_request_and_prepare_response(event):
                     retrieved_tag_values = retrieved_tag_values.split(',')
                     # Get the snapshots associated with all the specified matching volume tag and values
                     logging.info('Getting snapshot details for volume tag "{}" with values {}...'.format(retrieved_tag_name, retrieved_tag_values))
-                    describe_snapshots_response = get_snapshots_for_volume_tags(ec2_client, retrieved_tag_name, retrieved_tag_values)
+                    describe_snapshots_response = get_snapshots_for_volume_tags(ec2_client, retrieved_tag_name, retrieved_tag_values, ec2_api_call_counts)
                     logging.info('Completed getting snapshot details for volume tag with values.')
+                    response_body_text_list.append(get_ec2_api_call_count_text(ec2_api_call_counts))
                     # Append to the response body text
                     response_body_text_list.append(
                         'Results restricted to a max of {} snapshot(s). '.format(os.environ['BOTO3_API_MAX_RESULTS']))
@@ -1009,6 +2430,110 @@ def parse_request_and_prepare_response(event):
                                           'It is required to get the snapshot details.')
                     logging.warning(response_body_text)
                     response_body_text_list.append(response_body_text)
+        elif boto3_api_name in ['describe_snapshot_coverage_for_all_volumes',
+                                'describe_snapshot_coverage_for_volume_tags']:
+            # Parse the JSON
+            describe_coverage_json = json.loads(boto3_api_json_text)
+            retrieved_max_age_days_text = str(describe_coverage_json.get('MaxAgeDays', 0) or 0).strip()
+            retrieved_max_age_days = int(retrieved_max_age_days_text) if retrieved_max_age_days_text.isdigit() else 0
+            retrieved_tag_name = describe_coverage_json.get('VolumeTagName', '')
+            retrieved_tag_values = describe_coverage_json.get('VolumeTagValues', '')
+            # Check the values that the user provided and process accordingly
+            if not retrieved_max_age_days_text.isdigit():
+                function_response_state = 'REPROMPT'
+                # Append to the response body text
+                response_body_text = ('The max age in days "{}" is not a whole number of days. '
+                                      'It is required to get the snapshot coverage of the volumes.'.format(retrieved_max_age_days_text))
+                logging.warning(response_body_text)
+                response_body_text_list.append(response_body_text)
+            elif retrieved_max_age_days <= 0:
+                function_response_state = 'REPROMPT'
+                # Append to the response body text
+                response_body_text = ('Max age in days is missing. '
+                                      'It is required to get the snapshot coverage of the volumes.')
+                logging.warning(response_body_text)
+                response_body_text_list.append(response_body_text)
+            elif (boto3_api_name == 'describe_snapshot_coverage_for_volume_tags') and (
+                    (len(retrieved_tag_name) == 0) or (len(retrieved_tag_values) == 0)):
+                function_response_state = 'REPROMPT'
+                # Append to the response body text
+                response_body_text = ('One or more volume tag name and/or value is missing. '
+                                      'It is required to get the snapshot coverage of the volumes.')
+                logging.warning(response_body_text)
+                response_body_text_list.append(response_body_text)
+            else:
+                retrieved_tag_values = retrieved_tag_values.split(',') if len(retrieved_tag_values) > 0 else []
+                # Get the snapshot coverage of the volumes
+                logging.info('Getting snapshot coverage of volumes for max age of {} day(s)...'.format(retrieved_max_age_days))
+                snapshot_coverage = get_snapshot_coverage_for_volumes(ec2_client,
+                                                                      retrieved_max_age_days,
+                                                                      retrieved_tag_name,
+                                                                      retrieved_tag_values,
+                                                                      ec2_api_call_counts)
+                logging.info('Completed getting snapshot coverage of volumes.')
+                response_body_text_list.append(get_ec2_api_call_count_text(ec2_api_call_counts))
+                # Append to the response body text
+                response_body_text_list.append(
+                    'Snapshot coverage for max age of {} day(s) of {} volume(s){} :: {} covered, {} stale, '
+                    '{} never snapshotted, out of {} completed snapshot(s) scanned. '
+                    .format(retrieved_max_age_days,
+                            snapshot_coverage['VolumeCount'],
+                            ' with tag "{}" and with values {}'.format(retrieved_tag_name, retrieved_tag_values)
+                            if len(retrieved_tag_name) > 0 else '',
+                            snapshot_coverage['CoveredVolumeCount'],
+                            snapshot_coverage['StaleVolumeCount'],
+                            snapshot_coverage['NeverSnapshottedVolumeCount'],
+                            snapshot_coverage['SnapshotCount']))
+                response_body_text_list.append(
+                    'Results restricted to a max of {} volume(s). '.format(os.environ['BOTO3_API_MAX_RESULTS']))
+                response_body_text_list.append('Volumes with no completed snapshot in the last {} day(s) :: {}'
+                                               .format(retrieved_max_age_days, snapshot_coverage['OffendingVolumes']))
+        elif boto3_api_name == 'describe_snapshot_footprint_for_all_snapshots':
+            # Parse the JSON
+            describe_footprint_json = json.loads(boto3_api_json_text)
+            retrieved_tag_name = describe_footprint_json.get('GroupByTagName', '')
+            # Get the storage footprint of all the snapshots
+            logging.info('Getting storage footprint of all snapshots...')
+            snapshot_footprint = get_snapshot_footprint(ec2_client, retrieved_tag_name, ec2_api_call_counts)
+            logging.info('Completed getting storage footprint of all snapshots.')
+            response_body_text_list.append(get_ec2_api_call_count_text(ec2_api_call_counts))
+            # Append to the response body text
+            response_body_text_list.append(
+                'The volume size is the provisioned size of the snapshotted volumes; as the snapshots are incremental, '
+                'the billed snapshot storage is usually lower. Groups restricted to the {} largest by volume size. '
+                .format(SNAPSHOT_FOOTPRINT_MAX_GROUPS))
+            response_body_text_list.append('Storage footprint of all snapshots :: {}'.format(snapshot_footprint))
+        elif boto3_api_name in ['find_instances_for_instance_ids',
+                                'find_volumes_for_volume_ids']:
+            # Parse the JSON
+            find_items_json = json.loads(boto3_api_json_text)
+            item_type = 'instance' if boto3_api_name == 'find_instances_for_instance_ids' else 'volume'
+            # Get the ids
+            retrieved_item_ids = find_items_json.get('InstanceIds' if item_type == 'instance' else 'VolumeIds', '')
+            if len(retrieved_item_ids) > 0:
+                retrieved_item_ids = retrieved_item_ids.split(',')
+                # Find which of the retrieved ids exist
+                logging.info('Finding {} ids {}...'.format(item_type, retrieved_item_ids))
+                found_item_ids, missing_item_ids = find_ec2_item_ids(ec2_client,
+                                                                     'describe_{}s'.format(item_type),
+                                                                     retrieved_item_ids,
+                                                                     ec2_api_call_counts)
+                logging.info('Completed finding {} ids.'.format(item_type))
+                response_body_text_list.append(get_ec2_api_call_count_text(ec2_api_call_counts))
+                # Append to the response body text
+                response_body_text_list.append('Found {} of {} {} id(s) :: found {}, missing {}.'
+                                               .format(len(found_item_ids),
+                                                       len(found_item_ids) + len(missing_item_ids),
+                                                       item_type,
+                                                       found_item_ids,
+                                                       missing_item_ids))
+            else:
+                function_response_state = 'REPROMPT'
+                # Append to the response body text
+                response_body_text = ('One or more {} id is missing. '
+                                      'It is required to find the {}s.'.format(item_type, item_type))
+                logging.warning(response_body_text)
+                response_body_text_list.append(response_body_text)
         elif boto3_api_name == 'create_snapshot':
             # Parse the JSON
             create_snapshot_json = json.loads(boto3_api_json_text)
@@ -1024,6 +2549,7 @@ def parse_request_and_prepare_response(event):
                                                                                           'create_snapshot',
                                                                                           create_snapshot_json)
                     logging.info('Completed creating snapshot.')
+                    add_snapshot_to_ec2_resource_graph(ec2_client, create_snapshot_response)
                     # Append to the response body text
                     response_body_text_list.append(
                         'Created snapshot for volume id "{}" :: snapshot id = "{}" with state "{}".'
@@ -1043,6 +2569,88 @@ def parse_request_and_prepare_response(event):
                 response_body_text = 'Volume id is missing. It is required to create the snapshot.'
                 logging.warning(response_body_text)
                 response_body_text_list.append(response_body_text)
+        elif boto3_api_name in ['create_snapshots_for_instance_ids',
+                                'create_snapshots_for_instance_names',
+                                'create_snapshots_for_instance_tags']:
+            # Parse the JSON
+            create_snapshots_json = json.loads(boto3_api_json_text)
+            retrieved_description = create_snapshots_json.get('Description', '')
+            retrieved_snapshot_tag_name = create_snapshots_json.get('SnapshotTagName', '')
+            retrieved_snapshot_tag_value = create_snapshots_json.get('SnapshotTagValue', '')
+            retrieved_instance_ids = []
+            # Resolve the instances that the user provided and process accordingly
+            if boto3_api_name == 'create_snapshots_for_instance_ids':
+                retrieved_instance_filter_text = 'instance ids {}'.format(create_snapshots_json.get('InstanceIds', ''))
+                if len(create_snapshots_json.get('InstanceIds', '')) > 0:
+                    retrieved_instance_ids = create_snapshots_json['InstanceIds'].split(',')
+            elif boto3_api_name == 'create_snapshots_for_instance_names':
+                retrieved_instance_filter_text = 'instance names "{}"'.format(create_snapshots_json.get('InstanceNames', ''))
+                if len(create_snapshots_json.get('InstanceNames', '')) > 0:
+                    # Get the instance ids associated with all the instances that have the matching names
+                    logging.info('Getting instance ids for {}...'.format(retrieved_instance_filter_text))
+                    retrieved_instance_ids = get_instance_ids_for_names(ec2_client,
+                                                                        create_snapshots_json['InstanceNames'].split(','),
+                                                                        ec2_api_call_counts)
+                    logging.info('Completed getting instance ids for names.')
+            else:
+                retrieved_instance_filter_text = 'instances with tag "{}" and with values {}'.format(
+                    create_snapshots_json.get('InstanceTagName', ''), create_snapshots_json.get('InstanceTagValues', ''))
+                if (len(create_snapshots_json.get('InstanceTagName', '')) > 0) and (
+                        len(create_snapshots_json.get('InstanceTagValues', '')) > 0):
+                    # Get the instance ids associated with all the instances that have the matching tags
+                    logging.info('Getting instance ids for {}...'.format(retrieved_instance_filter_text))
+                    retrieved_instance_ids = get_instance_ids_for_tags(ec2_client,
+                                                                       create_snapshots_json['InstanceTagName'],
+                                                                       create_snapshots_json['InstanceTagValues'].split(','),
+                                                                       ec2_api_call_counts)
+                    logging.info('Completed getting instance ids for tag and values.')
+            retrieved_instance_ids = list(dict.fromkeys(strip_values(retrieved_instance_ids)))
+            max_instances = get_create_snapshots_max_instances()
+            if len(retrieved_instance_ids) > max_instances:
+                function_response_state = 'REPROMPT'
+                # Append to the response body text
+                response_body_text = ('{} instance(s) are associated with {}, which is more than the max of {} instance(s) '
+                                      'whose snapshots can be created in one request. No snapshot was created. '
+                                      'Narrow down the instances to create the snapshots.'
+                                      .format(len(retrieved_instance_ids), retrieved_instance_filter_text, max_instances))
+                logging.warning(response_body_text)
+                response_body_text_list.append(response_body_text)
+            elif len(retrieved_instance_ids) > 0:
+                # Create the snapshots of all the volumes of each instance
+                logging.info('Creating snapshots for {} instance(s)...'.format(len(retrieved_instance_ids)))
+                create_snapshots_summaries = create_snapshots_for_instance_ids(ec2_client,
+                                                                               retrieved_instance_ids,
+                                                                               retrieved_description,
+                                                                               retrieved_snapshot_tag_name,
+                                                                               retrieved_snapshot_tag_value)
+                logging.info('Completed creating snapshots.')
+                failed_instance_count = len([create_snapshots_summary for create_snapshots_summary in create_snapshots_summaries
+                                             if len(create_snapshots_summary['Error']) > 0])
+                if failed_instance_count == len(create_snapshots_summaries):
+                    function_response_state = 'FAILURE'
+                # Append to the response body text
+                response_body_text = ('Created snapshots for {} of {} instance(s) associated with {} :: {}'
+                                      .format(len(create_snapshots_summaries) - failed_instance_count,
+                                              len(create_snapshots_summaries),
+                                              retrieved_instance_filter_text,
+                                              get_create_snapshots_summary_text(create_snapshots_summaries)))
+                response_body_text_list.append(response_body_text)
+                logging.info(response_body_text)
+            elif boto3_api_name == 'create_snapshots_for_instance_ids':
+                function_response_state = 'REPROMPT'
+                # Append to the response body text
+                response_body_text = ('One or more instance id is missing. '
+                                      'It is required to create the snapshots.')
+                logging.warning(response_body_text)
+                response_body_text_list.append(response_body_text)
+            else:
+                function_response_state = 'REPROMPT'
+                # Append to the response body text
+                response_body_text = ('No instance that can have volumes attached was found for {}. '
+                                      'One or more instance name, or tag name and value, is required to create the snapshots.'
+                                      .format(retrieved_instance_filter_text))
+                logging.warning(response_body_text)
+                response_body_text_list.append(response_body_text)
         elif boto3_api_name == 'delete_snapshot':
             # Parse the JSON
             delete_snapshot_json = json.loads(boto3_api_json_text)
@@ -1058,6 +2666,7 @@ def parse_request_and_prepare_response(event):
                                                                'delete_snapshot',
                                                                delete_snapshot_json)
                     logging.info('Completed deleting snapshot.')
+                    remove_snapshot_from_ec2_resource_graph(ec2_client, retrieved_snapshot_id)
                     # Append to the response body text
                     response_body_text_list.append('Deleted snapshot with id "{}".'.format(retrieved_snapshot_id))
                 except Exception as exception:
@@ -1073,12 +2682,268 @@ def parse_request_and_prepare_response(event):
                 response_body_text = 'Snapshot id is missing. It is required to delete the snapshot.'
                 logging.warning(response_body_text)
                 response_body_text_list.append(response_body_text)
+        elif boto3_api_name == 'delete_snapshots_for_selector':
+            # Parse the JSON
+            delete_snapshots_json = json.loads(boto3_api_json_text)
+            # Get the snapshot selector; the comma separated values are split into lists
+            snapshot_selector = {}
+            for selector_key in ['SnapshotIds', 'SnapshotTagValues', 'VolumeIds', 'VolumeTagValues']:
+                selector_value = str(delete_snapshots_json.get(selector_key, ''))
+                snapshot_selector[selector_key] = selector_value.split(',') if len(selector_value) > 0 else []
+            for selector_key in ['SnapshotTagName', 'VolumeTagName']:
+                snapshot_selector[selector_key] = str(delete_snapshots_json.get(selector_key, ''))
+            retrieved_older_than_days = str(delete_snapshots_json.get('OlderThanDays', 0) or 0).strip()
+            snapshot_selector['OlderThanDays'] = int(retrieved_older_than_days) if retrieved_older_than_days.isdigit() else 0
+            # Only a dry run is performed, unless it is explicitly disabled
+            retrieved_dry_run = str(delete_snapshots_json.get('DryRun', True)).lower() != 'false'
+            if not retrieved_older_than_days.isdigit():
+                function_response_state = 'REPROMPT'
+                # Append to the response body text
+                response_body_text = ('The age in days "{}" is not a whole number of days. '
+                                      'It is required to select the snapshots by age.'.format(retrieved_older_than_days))
+                logging.warning(response_body_text)
+                response_body_text_list.append(response_body_text)
+            elif ((len(snapshot_selector['SnapshotTagName']) > 0) and (len(snapshot_selector['SnapshotTagValues']) == 0)) or (
+                    (len(snapshot_selector['VolumeTagName']) > 0) and (len(snapshot_selector['VolumeTagValues']) == 0)):
+                function_response_state = 'REPROMPT'
+                # Append to the response body text
+                response_body_text = ('One or more tag value is missing. '
+                                      'It is required to select the snapshots by tag.')
+                logging.warning(response_body_text)
+                response_body_text_list.append(response_body_text)
+            elif all(len(snapshot_selector[selector_key]) == 0 for selector_key in ['SnapshotIds', 'SnapshotTagName', 'VolumeIds', 'VolumeTagName']) and (
+                    snapshot_selector['OlderThanDays'] == 0):
+                function_response_state = 'REPROMPT'
+                # Append to the response body text
+                response_body_text = ('Snapshot selector is missing. One or more of snapshot ids, snapshot tag, volume ids, '
+                                      'volume tag, or age in days is required to delete the snapshots.')
+                logging.warning(response_body_text)
+                response_body_text_list.append(response_body_text)
+            else:
+                # Get the snapshots for the selector, and delete them
+                try:
+                    logging.info('Getting snapshots for selector {}...'.format(snapshot_selector))
+                    selected_snapshots, missing_snapshot_ids = get_snapshots_for_selector(ec2_client, snapshot_selector,
+                                                                                          ec2_api_call_counts)
+                    logging.info('Completed getting snapshots for selector.')
+                    response_body_text_list.append(get_ec2_api_call_count_text(ec2_api_call_counts))
+                    max_snapshots = get_snapshot_bulk_delete_max_snapshots()
+                    if len(selected_snapshots) > max_snapshots:
+                        # Append to the response body text
+                        response_body_text_list.append('{} snapshot(s) matched the selector; only the oldest {} will be processed. '
+                                                       .format(len(selected_snapshots), max_snapshots))
+                        selected_snapshots = selected_snapshots[:max_snapshots]
+                    # Evaluate the deletion of the snapshots with a dry run, and delete them unless only the dry run is requested
+                    logging.info('{} {} snapshot(s)...'.format('Dry running the deletion of' if retrieved_dry_run else 'Deleting',
+                                                               len(selected_snapshots)))
+                    # Stop taking up new snapshots before the Lambda function runs out of time
+                    deadline = None
+                    if context is not None:
+                        deadline = (time.monotonic() + (context.get_remaining_time_in_millis() / 1000)
+                                    - get_snapshot_bulk_delete_time_reserve())
+                    snapshot_outcomes = delete_snapshots_in_bulk(ec2_client, selected_snapshots, retrieved_dry_run,
+                                                                 deadline)
+                    logging.info('Completed {} snapshots.'.format('dry running the deletion of' if retrieved_dry_run else 'deleting'))
+                    # Report the specified snapshot ids that were not found, so that they are not silently dropped
+                    snapshot_outcomes += [{'SnapshotId': snapshot_id, 'Outcome': 'NOT_FOUND', 'Error': ''}
+                                          for snapshot_id in missing_snapshot_ids]
+                    if (len(snapshot_outcomes) > 0) and all(snapshot_outcome['Outcome'] in ['FAILED', 'NOT_FOUND', 'NOT_ATTEMPTED']
+                                                            for snapshot_outcome in snapshot_outcomes):
+                        function_response_state = 'FAILURE'
+                    # Append to the response body text
+                    response_body_text = ('{} {} snapshot(s) selected for {} :: {}'
+                                          .format('Dry run of the deletion of' if retrieved_dry_run else 'Deletion of',
+                                                  len(selected_snapshots),
+                                                  {selector_key: selector_value for selector_key, selector_value in snapshot_selector.items()
+                                                   if selector_value},
+                                                  get_snapshot_bulk_delete_summary_text(snapshot_outcomes)))
+                    response_body_text_list.append(response_body_text)
+                    logging.info(response_body_text)
+                    not_attempted_snapshot_count = sum(1 for snapshot_outcome in snapshot_outcomes
+                                                       if snapshot_outcome['Outcome'] == 'NOT_ATTEMPTED')
+                    if not_attempted_snapshot_count > 0:
+                        # Append to the response body text
+                        response_body_text = ('{} snapshot(s) were not attempted, as the Lambda function was running out of '
+                                              'time. Repeat the request to process them.'.format(not_attempted_snapshot_count))
+                        logging.warning(response_body_text)
+                        response_body_text_list.append(response_body_text)
+                except Exception as exception:
+                    function_response_state = 'FAILURE'
+                    # Append to the response body text
+                    response_body_text = ('Error occurred while deleting snapshots for selector {} :: "{}"'
+                                          .format(snapshot_selector, exception))
+                    response_body_text_list.append(response_body_text)
+                    logging.error(response_body_text)
         else:
             function_response_state = 'FAILURE'
             # Append to the response body text
             response_body_text = 'API "{}" is not supported. No API invocation was performed.'.format(boto3_api_name)
             logging.warning(response_body_text)
             response_body_text_list.append(response_body_text)
+    return response_body_text_list, function_response_state
+
+
+# Parse the input Lambda event received from Agents for Amazon Bedrock
+def parse_request_and_prepare_response(event, context):
+    response_body_text_list = []
+    function_response_state = ''
+    logging.info('Parsing request data...')
+    # Get the various objects from the input event
+    prompt_session_attributes = event["promptSessionAttributes"]
+    session_attributes = event["sessionAttributes"]
+    # Get the AWS account id from the session attributes, if it exists; if not, add to it
+    if 'AWSAccountId' in session_attributes:
+        aws_account_id = session_attributes['AWSAccountId']
+    else:
+        aws_account_id = get_aws_account_id(context)
+        session_attributes['AWSAccountId'] = aws_account_id
+    # Append to the response body text
+    response_body_text = 'AWS Account Id "{}" will be used.'.format(aws_account_id)
+    response_body_text_list.append(response_body_text)
+    logging.info(response_body_text)
+    # Get the input parameters
+    aws_region, backup_plan_id, boto3_api_name, boto3_api_json_text = '', '', '', ''
+    aws_account_ids_text = ''
+    input_text = event["inputText"]
+    # Loop through the input parameters
+    input_parameters = event["parameters"]
+    for input_parameter in input_parameters:
+        # Retrieve the value of the parameters
+        if input_parameter["name"] == "AWSRegion":
+            aws_region = input_parameter["value"]
+        elif input_parameter["name"] == "AWSAccountIds":
+            aws_account_ids_text = input_parameter["value"]
+        elif input_parameter["name"] == "Boto3APIName":
+            boto3_api_name = input_parameter["value"].lower()
+            boto3_api_name = substring_after(boto3_api_name, 'ec2.client.')
+        elif input_parameter["name"] == "Boto3APIJSON":
+            boto3_api_json_text = input_parameter["value"]
+    logging.info('Completed parsing request data.')
+    # Set the default AWS region if not found in the input
+    if len(aws_region) == 0:
+        aws_region = os.environ['DEFAULT_AWS_REGION']
+    # Get the AWS regions, as the AWS region may be a comma separated list of AWS regions or "all"
+    aws_regions = get_aws_regions(aws_region)
+    # Append to the response body text
+    if len(aws_regions) == 1:
+        aws_region = aws_regions[0]
+        response_body_text = 'AWS Region "{}" will be used.'.format(aws_region)
+    else:
+        # The boto3 API JSON is validated in the default AWS region
+        aws_region = os.environ['DEFAULT_AWS_REGION']
+        response_body_text = 'AWS Regions {} will be used.'.format(', '.join('"{}"'.format(aws_region_name)
+                                                                       for aws_region_name in aws_regions))
+    response_body_text_list.append(response_body_text)
+    logging.info(response_body_text)
+    # Get the target AWS accounts, which are the AWS account of this Lambda function unless other AWS accounts
+    # are specified
+    aws_account_ids = get_aws_account_ids(aws_account_ids_text, aws_account_id)
+    if aws_account_ids != [aws_account_id]:
+        # Append to the response body text
+        response_body_text = 'AWS Account Ids {} will be used.'.format(', '.join('"{}"'.format(target_aws_account_id)
+                                                                           for target_aws_account_id in aws_account_ids))
+        response_body_text_list.append(response_body_text)
+        logging.info(response_body_text)
+    # Get the cached Amazon EC2 boto3 client for the specific region
+    # The connection pool is sized to match the concurrent boto3 API calls, and the adaptive retry mode
+    # rate limits the client side on throttling errors
+    ec2_client = get_boto3_client('ec2', aws_region, get_boto3_api_max_concurrency(), 'adaptive')
+    # Except for custom APIs, validate the boto3 JSON for the specified user input locally
+    # and, only if it is not valid, fix it by invoking a LLM
+    if boto3_api_name not in ('describe_instances_for_all_instances',
+                              'describe_instances_for_instance_ids',
+                              'describe_instances_for_instance_names',
+                              'describe_instances_for_instance_tags',
+                              'describe_volumes_for_all_volumes',
+                              'describe_volumes_for_instance_ids',
+                              'describe_volumes_for_instance_names',
+                              'describe_volumes_for_instance_tags',
+                              'describe_volumes_for_volume_ids',
+                              'describe_volumes_for_volume_names',
+                              'describe_volumes_for_volume_tags',
+                              'describe_snapshots_for_all_snapshots',
+                              'describe_snapshots_for_instance_ids',
+                              'describe_snapshots_for_instance_names',
+                              'describe_snapshots_for_instance_tags',
+                              'describe_snapshots_for_snapshot_ids',
+                              'describe_snapshots_for_snapshot_names',
+                              'describe_snapshots_for_snapshot_tags',
+                              'describe_snapshots_for_volume_ids',
+                              'describe_snapshots_for_volume_names',
+                              'describe_snapshots_for_volume_tags',
+                              'describe_snapshot_coverage_for_all_volumes',
+                              'describe_snapshot_coverage_for_volume_tags',
+                              'describe_snapshot_footprint_for_all_snapshots',
+                              'find_instances_for_instance_ids',
+                              'find_volumes_for_volume_ids',
+                              'create_snapshot',
+                              'create_snapshots_for_instance_ids',
+                              'create_snapshots_for_instance_names',
+                              'create_snapshots_for_instance_tags',
+                              'delete_snapshot',
+                              'delete_snapshots_for_selector'):
+        logging.info('Validating the boto3 API JSON...')
+        validation_errors = validate_boto3_api_json(ec2_client, boto3_api_name, boto3_api_json_text)
+        if len(validation_errors) == 0:
+            BOTO3_API_JSON_LOCAL_VALIDATION_COUNTS['hit'] += 1
+            logging.info('The boto3 API JSON is valid as per the local validation.')
+        else:
+            BOTO3_API_JSON_LOCAL_VALIDATION_COUNTS['miss'] += 1
+            logging.info('The boto3 API JSON failed the local validation :: {}'.format(validation_errors))
+            boto3_api_json_text = process_prompt(aws_account_id, aws_region, boto3_api_name, input_text,
+                                                 boto3_api_json_text, validation_errors)
+        logging.info('Completed validating the boto3 API JSON. Local validation hits: {}, misses: {}.'
+                     .format(BOTO3_API_JSON_LOCAL_VALIDATION_COUNTS['hit'], BOTO3_API_JSON_LOCAL_VALIDATION_COUNTS['miss']))
+    # Get the AWS account and AWS region targets, ordered by AWS account
+    cross_account_role_name = get_cross_account_role_name()
+    targets = [
+        {
+            'AWSAccountId': target_aws_account_id,
+            'AWSRegion': target_aws_region,
+            'AssumeRoleArn': get_assume_role_arn(target_aws_account_id, aws_account_id, cross_account_role_name)
+        }
+        for target_aws_account_id in aws_account_ids
+        for target_aws_region in aws_regions
+    ]
+    invalid_aws_account_ids = [target_aws_account_id for target_aws_account_id in aws_account_ids
+                               if AWS_ACCOUNT_ID_PATTERN.match(target_aws_account_id) is None]
+    # Process the boto3 API request for the target; the read only APIs can also be processed concurrently
+    # across multiple targets
+    if len(invalid_aws_account_ids) > 0:
+        function_response_state = 'REPROMPT'
+        # Append to the response body text
+        response_body_text = ('AWS Account Ids {} are not valid 12 digit AWS account ids. No API invocation was performed.'
+                              .format(invalid_aws_account_ids))
+        logging.warning(response_body_text)
+        response_body_text_list.append(response_body_text)
+    elif (aws_account_ids != [aws_account_id]) and (len(cross_account_role_name) == 0):
+        function_response_state = 'FAILURE'
+        # Append to the response body text
+        response_body_text = ('Cross account requests are not enabled, as the IAM role name to assume in the other '
+                              'AWS accounts is not configured. No API invocation was performed.')
+        logging.warning(response_body_text)
+        response_body_text_list.append(response_body_text)
+    elif len(targets) == 1:
+        target_text_list, function_response_state = process_boto3_api_request_for_region(targets[0]['AWSAccountId'],
+                                                                                           targets[0]['AWSRegion'],
+                                                                                           boto3_api_name,
+                                                                                           boto3_api_json_text,
+                                                                                           targets[0]['AssumeRoleArn'],
+                                                                                           context)
+        response_body_text_list.extend(target_text_list)
+    elif boto3_api_name.startswith(READ_ONLY_BOTO3_API_NAME_PREFIXES):
+        target_text_list, function_response_state = process_boto3_api_request_for_targets(targets,
+                                                                                            boto3_api_name,
+                                                                                            boto3_api_json_text)
+        response_body_text_list.extend(target_text_list)
+    else:
+        function_response_state = 'REPROMPT'
+        # Append to the response body text
+        response_body_text = ('API "{}" is not read only and can be run in only one AWS account and AWS Region. '
+                              'Please specify a single AWS account and AWS Region. No API invocation was performed.'
+                              .format(boto3_api_name))
+        logging.warning(response_body_text)
+        response_body_text_list.append(response_body_text)
     # Create the response message
     logging.info('Creating the response message...')
     # Concatenate the messages
@@ -1117,7 +2982,7 @@ def lambda_handler(event,context):
     logging.info('Request event :: {}'.format(event))
     logging.info('Request context :: {}'.format(context))
     # Parse the request data and prepare response
-    return_data = parse_request_and_prepare_response(event)
+    return_data = parse_request_and_prepare_response(event, context)
     logging.info('Response :: {}'.format(return_data))
     logging.info('Completed executing the handler() function.')
     return return_data
\ No newline at end of file
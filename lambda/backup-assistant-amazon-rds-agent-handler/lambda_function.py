@@ -3,11 +3,20 @@ Copyright 2025 Amazon.com, Inc. or its affiliates.  All Rights Reserved.
 SPDX-License-Identifier: MIT-0
 """
 import boto3
+import hashlib
 import json
 import logging
 import os
+import random
+import re
+import threading
+import time
+import weakref
 from botocore.config import Config
-from botocore.exceptions import ClientError
+from botocore.exceptions import ClientError, ConnectTimeoutError, EndpointConnectionError, HTTPClientError, ParamValidationError
+from botocore.validate import ParamValidator
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
 
 
 # Set the logger
@@ -70,18 +79,544 @@ def read_file(file_full_path, file_read_type):
     return file_content
 
 
+# Pattern of the placeholders (for example, {aws_region}) in the prompt templates
+PROMPT_TEMPLATE_PLACEHOLDER_PATTERN = re.compile(r'\{(\w+)\}')
+
+
+# Compile the prompt template text into its literal parts and placeholder names;
+# the odd indexed items of the parts list are the placeholder names
+def compile_prompt_template(template_text):
+    template_parts = PROMPT_TEMPLATE_PLACEHOLDER_PATTERN.split(template_text)
+    placeholder_names = frozenset(template_parts[1::2])
+    return template_parts, placeholder_names
+
+
+# Render the compiled prompt template by substituting all the placeholders in a single pass
+def render_prompt_template(compiled_prompt_template, placeholder_values):
+    template_parts, placeholder_names = compiled_prompt_template
+    # Validate that the placeholder values match the placeholders in the template
+    if placeholder_names != placeholder_values.keys():
+        raise ValueError('Prompt template placeholders {} do not match the specified values {}.'
+                         .format(sorted(placeholder_names), sorted(placeholder_values.keys())))
+    rendered_parts = template_parts.copy()
+    for idx in range(1, len(rendered_parts), 2):
+        rendered_parts[idx] = placeholder_values[rendered_parts[idx]]
+    return ''.join(rendered_parts)
+
+
+# Read and compile all the prompt templates; done once per Lambda container
+def load_prompt_templates():
+    prompt_templates_dir = os.path.dirname(os.path.abspath(__file__))
+    prompt_templates = {}
+    for prompt_file_name_env_var in ('SYSTEM_PROMPT_FILE_NAME',
+                                     'USER_PROMPT_FILE_NAME',
+                                     'SYSTEM_PROMPT_FOR_BOTO3_RETRY_FILE_NAME',
+                                     'USER_PROMPT_FOR_BOTO3_RETRY_FILE_NAME'):
+        prompt_file_full_path = os.path.join(prompt_templates_dir, os.environ[prompt_file_name_env_var])
+        prompt_templates[prompt_file_name_env_var] = compile_prompt_template(read_file(prompt_file_full_path, 'r'))
+    return prompt_templates
+
+
+# Load the prompt templates
+PROMPT_TEMPLATES = load_prompt_templates()
+
+
+# The hashes of the prompt templates; used to key the cached LLM responses
+PROMPT_TEMPLATE_HASHES = {
+    prompt_template_name: hashlib.sha256(json.dumps(prompt_template[0]).encode('utf-8')).hexdigest()
+    for prompt_template_name, prompt_template in PROMPT_TEMPLATES.items()
+}
+
+
+# In-memory LRU cache of the LLM responses, that is reused across invocations of a warm Lambda container;
+# the optional on-disk tier (e.g. under /tmp) is enabled by specifying its directory
+LLM_RESPONSE_CACHE = OrderedDict()
+LLM_RESPONSE_CACHE_LOCK = threading.Lock()
+LLM_RESPONSE_CACHE_STATS = {
+    'memory_hits': 0,
+    'disk_hits': 0,
+    'misses': 0,
+    'saved_input_tokens': 0,
+    'saved_output_tokens': 0
+}
+
+
+# Canonicalize the boto3 API JSON text so that formatting and key order do not change the cache key
+def canonicalize_boto3_json(boto3_json_str):
+    try:
+        return json.dumps(json.loads(boto3_json_str), sort_keys=True, separators=(',', ':'))
+    except json.JSONDecodeError:
+        return boto3_json_str.strip()
+
+
+# Get the cache key of the LLM response for the specified prompt templates and placeholder values
+def get_llm_response_cache_key(prompt_template_names, placeholder_values):
+    cache_key_json = json.dumps({
+        'model_id': os.environ['LLM_MODEL_OR_INFERENCE_PROFILE_ID'],
+        'prompt_template_hashes': [PROMPT_TEMPLATE_HASHES[name] for name in prompt_template_names],
+        'placeholder_values': placeholder_values
+    }, sort_keys=True)
+    return hashlib.sha256(cache_key_json.encode('utf-8')).hexdigest()
+
+
+# Get the TTL (in seconds) of the cached LLM responses, in both the in-memory and the on-disk tiers
+def get_llm_response_cache_ttl():
+    return int(os.environ.get('LLM_RESPONSE_CACHE_TTL_SECONDS', '86400'))
+
+
+# Check if the specified LLM response cache entry has expired; entries without a cached time have expired
+def is_llm_response_cache_entry_expired(cache_entry):
+    return (time.time() - cache_entry.get('cached_time', 0)) > get_llm_response_cache_ttl()
+
+
+# Get the path of the on-disk LLM response cache file for the specified key;
+# returns an empty string if the on-disk tier is not enabled
+def get_llm_response_cache_file_path(cache_key):
+    cache_dir = os.environ.get('LLM_RESPONSE_CACHE_DIR', '')
+    if len(cache_dir) == 0:
+        return ''
+    return os.path.join(cache_dir, '{}.json'.format(cache_key))
+
+
+# Add the cache entry to the in-memory tier and evict the least recently used entries beyond the max size.
+# Must be called with the cache lock held.
+def add_llm_response_cache_entry(cache_key, cache_entry):
+    LLM_RESPONSE_CACHE[cache_key] = cache_entry
+    LLM_RESPONSE_CACHE.move_to_end(cache_key)
+    while len(LLM_RESPONSE_CACHE) > int(os.environ.get('LLM_RESPONSE_CACHE_MAX_ENTRIES', '256')):
+        LLM_RESPONSE_CACHE.popitem(last=False)
+
+
+# Remove the cached LLM response for the specified key from the in-memory tier and the on-disk tier.
+# Must be called with the cache lock held.
+def remove_llm_response_cache_entry(cache_key):
+    LLM_RESPONSE_CACHE.pop(cache_key, None)
+    cache_file_path = get_llm_response_cache_file_path(cache_key)
+    if len(cache_file_path) > 0:
+        try:
+            os.remove(cache_file_path)
+        except FileNotFoundError:
+            pass
+        except OSError as exception:
+            logging.warning('Could not remove the LLM response cache file "{}" :: {}'.format(cache_file_path, exception))
+
+
+# Evict the cached LLM response for the specified key, so that it is not replayed
+def evict_cached_llm_response(cache_key):
+    with LLM_RESPONSE_CACHE_LOCK:
+        remove_llm_response_cache_entry(cache_key)
+
+
+# Get the cached LLM response for the specified key from the in-memory tier, then the on-disk tier;
+# returns None if the response is not cached or has expired
+def get_cached_llm_response(cache_key):
+    with LLM_RESPONSE_CACHE_LOCK:
+        cache_entry = LLM_RESPONSE_CACHE.get(cache_key)
+        if (cache_entry is not None) and is_llm_response_cache_entry_expired(cache_entry):
+            remove_llm_response_cache_entry(cache_key)
+            cache_entry = None
+        if cache_entry is not None:
+            LLM_RESPONSE_CACHE.move_to_end(cache_key)
+            LLM_RESPONSE_CACHE_STATS['memory_hits'] += 1
+        else:
+            cache_file_path = get_llm_response_cache_file_path(cache_key)
+            if (len(cache_file_path) > 0) and os.path.isfile(cache_file_path):
+                try:
+                    cache_entry = json.loads(read_file(cache_file_path, 'r'))
+                    if is_llm_response_cache_entry_expired(cache_entry):
+                        remove_llm_response_cache_entry(cache_key)
+                        cache_entry = None
+                    else:
+                        add_llm_response_cache_entry(cache_key, cache_entry)
+                        LLM_RESPONSE_CACHE_STATS['disk_hits'] += 1
+                except (OSError, ValueError) as exception:
+                    logging.warning('Could not read the LLM response cache file "{}" :: {}'.format(cache_file_path, exception))
+                    cache_entry = None
+        if cache_entry is None:
+            LLM_RESPONSE_CACHE_STATS['misses'] += 1
+            return None
+        LLM_RESPONSE_CACHE_STATS['saved_input_tokens'] += cache_entry['input_tokens']
+        LLM_RESPONSE_CACHE_STATS['saved_output_tokens'] += cache_entry['output_tokens']
+        return cache_entry['llm_response']
+
+
+# Cache the LLM response for the specified key in the in-memory tier and, if enabled, the on-disk tier
+def put_cached_llm_response(cache_key, llm_response, token_usage):
+    cache_entry = {
+        'llm_response': llm_response,
+        'input_tokens': token_usage['inputTokens'],
+        'output_tokens': token_usage['outputTokens'],
+        'cached_time': time.time()
+    }
+    with LLM_RESPONSE_CACHE_LOCK:
+        add_llm_response_cache_entry(cache_key, cache_entry)
+    cache_file_path = get_llm_response_cache_file_path(cache_key)
+    if len(cache_file_path) > 0:
+        try:
+            os.makedirs(os.path.dirname(cache_file_path), exist_ok=True)
+            # Write to a temporary file and rename it so that a partially written file is never read
+            temp_cache_file_path = '{}.{}.tmp'.format(cache_file_path, threading.get_ident())
+            with open(temp_cache_file_path, 'w') as temp_cache_file:
+                json.dump(cache_entry, temp_cache_file)
+            os.replace(temp_cache_file_path, cache_file_path)
+        except OSError as exception:
+            logging.warning('Could not write the LLM response cache file "{}" :: {}'.format(cache_file_path, exception))
+
+
+# Log the LLM response cache hit rate and the saved tokens
+def log_llm_response_cache_stats():
+    with LLM_RESPONSE_CACHE_LOCK:
+        cache_stats = dict(LLM_RESPONSE_CACHE_STATS)
+    lookup_count = cache_stats['memory_hits'] + cache_stats['disk_hits'] + cache_stats['misses']
+    hit_rate = ((cache_stats['memory_hits'] + cache_stats['disk_hits']) / lookup_count) if lookup_count > 0 else 0
+    logging.info('LLM response cache :: memory hits: {}, disk hits: {}, misses: {}, hit rate: {:.1%}, '
+                 'saved input tokens: {}, saved output tokens: {}.'
+                 .format(cache_stats['memory_hits'], cache_stats['disk_hits'], cache_stats['misses'], hit_rate,
+                         cache_stats['saved_input_tokens'], cache_stats['saved_output_tokens']))
+
+
+# Invoke the specified LLM unless its response for the specified cache key is cached; the response is
+# cached only if it contains the specified tag, so that malformed responses are not replayed
+def invoke_llm_with_cache(bedrock_rt_client, system_prompts, messages, cache_key, response_tag):
+    llm_response = get_cached_llm_response(cache_key)
+    if llm_response is None:
+        llm_response, token_usage = invoke_llm(bedrock_rt_client, system_prompts, messages)
+        if '<{}>'.format(response_tag) in llm_response:
+            put_cached_llm_response(cache_key, llm_response, token_usage)
+    else:
+        logging.info('Using the cached LLM response.')
+    log_llm_response_cache_stats()
+    return llm_response
+
+
+# Cache the specified LLM fix of a boto3 API JSON request, unless there is no fix or it was answered from the cache
+def put_cached_llm_fix(llm_fix):
+    if (llm_fix is not None) and (llm_fix['token_usage'] is not None):
+        put_cached_llm_response(llm_fix['cache_key'], llm_fix['llm_response'], llm_fix['token_usage'])
+
+
 # Get the config for all boto3 clients to be used by this Lambda function
-def get_boto_config():
+def get_boto_config(max_pool_connections=10, retry_mode='standard'):
     return Config(
         connect_timeout = (60 * 3),
         read_timeout = (60 * 3),
         retries = {
             'max_attempts': 10,
-            'mode': 'standard'
-        }
+            'mode': retry_mode
+        },
+        max_pool_connections = max_pool_connections
     )
 
 
+# Cache of the boto3 clients, keyed by service name, region, client config and the assumed IAM role, if any,
+# that is reused across invocations of a warm Lambda container
+BOTO3_CLIENT_CACHE = {}
+BOTO3_CLIENT_CACHE_LOCK = threading.Lock()
+
+
+# The assumed IAM role ARNs of the cached cross account boto3 clients; used to scope the per region caches
+# by AWS account, and to create the other boto3 clients of the same AWS account
+BOTO3_CLIENT_ASSUME_ROLE_ARNS = weakref.WeakKeyDictionary()
+
+
+# Get the boto3 client for the specified service, region, connection pool size and retry mode, optionally
+# with the temporary credentials of the specified IAM role in another AWS account;
+# the client is created on first use and cached for the subsequent invocations
+def get_boto3_client(service_name, aws_region, max_pool_connections=10, retry_mode='standard', assume_role_arn=''):
+    client_cache_key = (service_name, aws_region, max_pool_connections, retry_mode, assume_role_arn)
+    # Resolve the temporary credentials first, as refreshing them evicts the cached clients of the IAM role
+    assumed_role_credentials = get_assumed_role_credentials(assume_role_arn) if len(assume_role_arn) > 0 else None
+    boto3_client = BOTO3_CLIENT_CACHE.get(client_cache_key)
+    if boto3_client is None:
+        # boto3 client creation is not thread safe; so, serialize it
+        with BOTO3_CLIENT_CACHE_LOCK:
+            boto3_client = BOTO3_CLIENT_CACHE.get(client_cache_key)
+            if boto3_client is None:
+                if assumed_role_credentials is None:
+                    logging.info('Creating boto3 client for service "{}" in region "{}"...'.format(service_name, aws_region))
+                    boto3_client = boto3.client(service_name, region_name=aws_region,
+                                                config=get_boto_config(max_pool_connections, retry_mode))
+                else:
+                    logging.info('Creating boto3 client for service "{}" in region "{}" with IAM role "{}"...'
+                                 .format(service_name, aws_region, assume_role_arn))
+                    boto3_client = boto3.client(service_name, region_name=aws_region,
+                                                config=get_boto_config(max_pool_connections, retry_mode),
+                                                aws_access_key_id=assumed_role_credentials['AccessKeyId'],
+                                                aws_secret_access_key=assumed_role_credentials['SecretAccessKey'],
+                                                aws_session_token=assumed_role_credentials['SessionToken'])
+                    BOTO3_CLIENT_ASSUME_ROLE_ARNS[boto3_client] = assume_role_arn
+                BOTO3_CLIENT_CACHE[client_cache_key] = boto3_client
+    return boto3_client
+
+
+# Get the assumed IAM role ARN of the specified boto3 client; empty for the AWS account of this Lambda function
+def get_boto3_client_assume_role_arn(boto3_client):
+    return BOTO3_CLIENT_ASSUME_ROLE_ARNS.get(boto3_client, '')
+
+
+# Clear the boto3 client cache; used by tests to start from a cold container state
+def reset_boto3_client_cache():
+    with BOTO3_CLIENT_CACHE_LOCK:
+        BOTO3_CLIENT_CACHE.clear()
+
+
+# Get the max number of boto3 API calls that can be made concurrently
+def get_boto3_api_max_concurrency():
+    return int(os.environ.get('BOTO3_API_MAX_CONCURRENCY', '10'))
+
+
+# Get the IAM role name to assume in the other AWS accounts; empty if cross account requests are not enabled
+def get_cross_account_role_name():
+    return os.environ.get('CROSS_ACCOUNT_ROLE_NAME', '')
+
+
+# Get the duration of the sessions of the assumed IAM roles
+def get_assumed_role_session_duration():
+    return int(os.environ.get('ASSUMED_ROLE_SESSION_DURATION_SECONDS', '3600'))
+
+
+# Get the number of seconds before their expiry that the temporary credentials of an assumed IAM role are refreshed
+def get_assumed_role_credentials_refresh_margin():
+    return int(os.environ.get('ASSUMED_ROLE_CREDENTIALS_REFRESH_MARGIN_SECONDS', '300'))
+
+
+# Cache of the temporary credentials of the assumed IAM roles, keyed by IAM role ARN, that is reused across
+# invocations of a warm Lambda container until shortly before the credentials expire; the IAM roles
+# are assumed under a lock per IAM role ARN, so that different AWS accounts are assumed concurrently
+ASSUMED_ROLE_CREDENTIALS_CACHE = {}
+ASSUMED_ROLE_CREDENTIALS_LOCKS = {}
+ASSUMED_ROLE_CREDENTIALS_LOCKS_LOCK = threading.Lock()
+
+
+# Get the temporary credentials of the specified IAM role, assuming it if not cached or about to expire
+def get_assumed_role_credentials(assume_role_arn):
+    with ASSUMED_ROLE_CREDENTIALS_LOCKS_LOCK:
+        assumed_role_credentials_lock = ASSUMED_ROLE_CREDENTIALS_LOCKS.setdefault(assume_role_arn, threading.Lock())
+    with assumed_role_credentials_lock:
+        assumed_role_credentials = ASSUMED_ROLE_CREDENTIALS_CACHE.get(assume_role_arn)
+        if ((assumed_role_credentials is None) or
+                (assumed_role_credentials['Expiration'].timestamp() - time.time() < get_assumed_role_credentials_refresh_margin())):
+            if assumed_role_credentials is not None:
+                # Evict the cached clients that use the expiring credentials
+                with BOTO3_CLIENT_CACHE_LOCK:
+                    for client_cache_key in [key for key in BOTO3_CLIENT_CACHE if key[4] == assume_role_arn]:
+                        del BOTO3_CLIENT_CACHE[client_cache_key]
+            logging.info('Assuming IAM role "{}"...'.format(assume_role_arn))
+            sts_client = get_boto3_client('sts', os.environ.get('AWS_REGION'))
+            assume_role_response = sts_client.assume_role(RoleArn=assume_role_arn,
+                                                          RoleSessionName='backup-assistant',
+                                                          DurationSeconds=get_assumed_role_session_duration())
+            assumed_role_credentials = assume_role_response['Credentials']
+            ASSUMED_ROLE_CREDENTIALS_CACHE[assume_role_arn] = assumed_role_credentials
+            logging.info('Assumed IAM role "{}" with credentials expiring at {}.'
+                         .format(assume_role_arn, assumed_role_credentials['Expiration']))
+        return assumed_role_credentials
+
+
+# The AWS account id of this Lambda function; resolved once per Lambda container
+AWS_ACCOUNT_ID = ''
+
+
+# Get the AWS account id; it is read from the ARN of the invoked Lambda function, since the
+# execution role always belongs to the account of the function. If the ARN is not available
+# (for example, when invoked outside of AWS Lambda with assumed role credentials),
+# it is resolved through the STS caller identity. The result is cached in both cases.
+def get_aws_account_id(context):
+    global AWS_ACCOUNT_ID
+    if len(AWS_ACCOUNT_ID) == 0:
+        invoked_function_arn_parts = str(getattr(context, 'invoked_function_arn', '')).split(':')
+        if (len(invoked_function_arn_parts) > 4) and (len(invoked_function_arn_parts[4]) > 0):
+            AWS_ACCOUNT_ID = invoked_function_arn_parts[4]
+        else:
+            AWS_ACCOUNT_ID = get_boto3_client('sts', os.environ.get('AWS_REGION')).get_caller_identity().get('Account')
+        logging.info('Resolved AWS account id "{}".'.format(AWS_ACCOUNT_ID))
+    return AWS_ACCOUNT_ID
+
+
+# Pattern of an AWS account id
+AWS_ACCOUNT_ID_PATTERN = re.compile(r'^\d{12}$')
+
+
+# Get the AWS account ids for the specified comma separated AWS account ids text; defaults to the specified
+# AWS account id
+def get_aws_account_ids(aws_account_ids_text, default_aws_account_id):
+    aws_account_ids = []
+    for aws_account_id in aws_account_ids_text.split(','):
+        aws_account_id = aws_account_id.strip()
+        if (len(aws_account_id) > 0) and (aws_account_id not in aws_account_ids):
+            aws_account_ids.append(aws_account_id)
+    if len(aws_account_ids) == 0:
+        aws_account_ids.append(default_aws_account_id)
+    return aws_account_ids
+
+
+# Get the ARN of the IAM role to assume in the specified AWS account; empty for the AWS account of this
+# Lambda function, which uses the execution role of this Lambda function
+def get_assume_role_arn(aws_account_id, lambda_aws_account_id, role_name):
+    if aws_account_id == lambda_aws_account_id:
+        return ''
+    lambda_aws_region = os.environ.get('AWS_REGION', os.environ['DEFAULT_AWS_REGION'])
+    if lambda_aws_region.startswith('cn-'):
+        aws_partition = 'aws-cn'
+    elif lambda_aws_region.startswith('us-gov-'):
+        aws_partition = 'aws-us-gov'
+    else:
+        aws_partition = 'aws'
+    return 'arn:{}:iam::{}:role/{}'.format(aws_partition, aws_account_id, role_name)
+
+
+# The name prefixes of the read only boto3 APIs, which can be run across multiple AWS regions
+READ_ONLY_BOTO3_API_NAME_PREFIXES = ('describe_', 'find_', 'get_', 'list_')
+
+
+# The AWS regions enabled for the AWS account; resolved once per Lambda container
+ENABLED_AWS_REGIONS = []
+ENABLED_AWS_REGIONS_LOCK = threading.Lock()
+
+
+# Get the AWS regions enabled for the AWS account
+def get_enabled_aws_regions():
+    global ENABLED_AWS_REGIONS
+    with ENABLED_AWS_REGIONS_LOCK:
+        if len(ENABLED_AWS_REGIONS) == 0:
+            ec2_client = get_boto3_client('ec2', os.environ['DEFAULT_AWS_REGION'])
+            describe_regions_response = ec2_client.describe_regions(
+                Filters=[{'Name': 'opt-in-status', 'Values': ['opt-in-not-required', 'opted-in']}]
+            )
+            ENABLED_AWS_REGIONS = sorted(region['RegionName'] for region in describe_regions_response['Regions'])
+            logging.info('Resolved the enabled AWS regions {}.'.format(ENABLED_AWS_REGIONS))
+        return list(ENABLED_AWS_REGIONS)
+
+
+# Get the AWS regions for the specified AWS region text, which is a single AWS region, a comma separated
+# list of AWS regions, or "all" for all the enabled AWS regions
+def get_aws_regions(aws_region_text):
+    aws_regions = []
+    for aws_region in aws_region_text.split(','):
+        aws_region = aws_region.strip().lower()
+        if aws_region in ('all', '*'):
+            return get_enabled_aws_regions()
+        if (len(aws_region) > 0) and (aws_region not in aws_regions):
+            aws_regions.append(aws_region)
+    if len(aws_regions) == 0:
+        aws_regions.append(os.environ['DEFAULT_AWS_REGION'])
+    return aws_regions
+
+
+# Get the max number of AWS account and AWS region targets that a boto3 API request can be run in concurrently
+def get_fan_out_max_concurrency():
+    return int(os.environ.get('FAN_OUT_MAX_CONCURRENCY', '8'))
+
+
+# Get the number of seconds to wait for a boto3 API request across targets, before returning partial results
+def get_fan_out_timeout():
+    return float(os.environ.get('FAN_OUT_TIMEOUT_SECONDS', '120'))
+
+
+# Thread pool to run a boto3 API request across AWS account and AWS region targets;
+# shared by the invocations of a warm Lambda container. A target that timed out keeps its worker until its
+# boto3 API calls complete, which are bounded by the botocore connect and read timeouts and retries, so that
+# the workers still held by the timed out targets are not available to the next invocation until then.
+FAN_OUT_EXECUTOR = None
+FAN_OUT_EXECUTOR_LOCK = threading.Lock()
+
+
+# Get the shared thread pool to run a boto3 API request across targets
+def get_fan_out_executor():
+    global FAN_OUT_EXECUTOR
+    with FAN_OUT_EXECUTOR_LOCK:
+        if FAN_OUT_EXECUTOR is None:
+            FAN_OUT_EXECUTOR = ThreadPoolExecutor(max_workers=get_fan_out_max_concurrency(),
+                                                  thread_name_prefix='fan-out')
+        return FAN_OUT_EXECUTOR
+
+
+# Process the boto3 API request for the specified AWS account and AWS region target, and measure its latency
+def process_boto3_api_request_for_target_with_latency(target, boto3_api_name, boto3_api_json_text):
+    start_time = time.monotonic()
+    response_body_text_list, function_response_state = process_boto3_api_request_for_region(target['AWSAccountId'],
+                                                                                             target['AWSRegion'],
+                                                                                             boto3_api_name,
+                                                                                             boto3_api_json_text,
+                                                                                             target['AssumeRoleArn'])
+    return response_body_text_list, function_response_state, time.monotonic() - start_time
+
+
+# Get the text of the per target latency stats
+def get_fan_out_latency_text(target_latencies, target_count):
+    if len(target_latencies) == 0:
+        return 'Latency :: none of the {} targets completed.'.format(target_count)
+    latencies = sorted(target_latencies.values())
+    slowest_target_label = max(target_latencies, key=target_latencies.get)
+    return ('Latency :: {} of {} targets completed; min {:.2f}s, median {:.2f}s, max {:.2f}s ("{}").'
+            .format(len(latencies), target_count, latencies[0], latencies[len(latencies) // 2],
+                    latencies[-1], slowest_target_label))
+
+
+# Process the boto3 API request concurrently across the specified AWS account and AWS region targets on the
+# shared thread pool, and aggregate the results by AWS account; the targets that do not complete within
+# the timeout are reported as timed out, and the results of the other targets are still returned.
+# The timed out targets that are still queued are cancelled, but the running ones cannot be interrupted,
+# and complete in the background on the shared thread pool.
+def process_boto3_api_request_for_targets(targets, boto3_api_name, boto3_api_json_text):
+    response_body_text_list, target_states, target_latencies = [], [], {}
+    executor = get_fan_out_executor()
+    futures = [executor.submit(process_boto3_api_request_for_target_with_latency, target, boto3_api_name,
+                               boto3_api_json_text)
+               for target in targets]
+    fan_out_timeout = get_fan_out_timeout()
+    done_futures, not_done_futures = wait(futures, timeout=fan_out_timeout)
+    multiple_aws_accounts = len(set(target['AWSAccountId'] for target in targets)) > 1
+    # Share the response size limit among the targets, after the AWS account headers, so that every target
+    # and the latency stats fit within the truncated response message
+    aws_account_header_length = sum(len('AWS Account Id "{}" :: '.format(aws_account_id))
+                                    for aws_account_id in set(target['AWSAccountId'] for target in targets)
+                                    ) if multiple_aws_accounts else 0
+    max_target_text_length = max(0, (20000 - aws_account_header_length) // len(targets) - 1)
+    previous_aws_account_id = ''
+    # The targets are ordered by AWS account, and then by AWS region
+    for target, future in zip(targets, futures):
+        if multiple_aws_accounts:
+            target_label = '{}/{}'.format(target['AWSAccountId'], target['AWSRegion'])
+            if target['AWSAccountId'] != previous_aws_account_id:
+                response_body_text_list.append('AWS Account Id "{}" ::'.format(target['AWSAccountId']))
+                previous_aws_account_id = target['AWSAccountId']
+        else:
+            target_label = target['AWSRegion']
+        if future in not_done_futures:
+            # Do not start the targets still queued; the running ones complete in the background
+            future.cancel()
+            target_state = 'FAILURE'
+            target_text = 'Timed out after {:.0f} seconds.'.format(fan_out_timeout)
+        elif future.exception() is not None:
+            target_state = 'FAILURE'
+            target_text = 'Failed with the error :: {}'.format(future.exception())
+        else:
+            target_text_list, target_state, target_latencies[target_label] = future.result()
+            target_text = ' '.join(target_text_list)
+        if target_label in target_latencies:
+            target_text = '[AWSRegion "{}", {:.2f}s] {}'.format(target['AWSRegion'], target_latencies[target_label],
+                                                                target_text)
+        else:
+            target_text = '[AWSRegion "{}"] {}'.format(target['AWSRegion'], target_text)
+        if target_state == 'FAILURE':
+            logging.warning('Target "{}" :: {}'.format(target_label, target_text))
+        response_body_text_list.append(target_text[:max_target_text_length])
+        target_states.append(target_state)
+    # Append the per target latency stats
+    response_body_text = get_fan_out_latency_text(target_latencies, len(targets))
+    response_body_text_list.append(response_body_text)
+    logging.info(response_body_text)
+    # The request fails only if it failed for every target
+    if all(target_state == 'REPROMPT' for target_state in target_states):
+        function_response_state = 'REPROMPT'
+    elif all(len(target_state) > 0 for target_state in target_states):
+        function_response_state = 'FAILURE'
+    else:
+        function_response_state = ''
+    return response_body_text_list, function_response_state
+
+
 # Get all the db clusters
 def get_all_db_clusters(rds_client):
     describe_db_clusters_response = rds_client.describe_db_clusters(
@@ -146,23 +681,81 @@ def get_db_instances_for_names(rds_client, instance_names):
     return get_db_instances_for_tags(rds_client, 'Name', instance_names)
 
 
+# Counts of the boto3 API JSONs that passed (hit) or failed (miss) the local validation,
+# across invocations of a warm Lambda container
+BOTO3_API_JSON_LOCAL_VALIDATION_COUNTS = {'hit': 0, 'miss': 0}
+
+
+# Find the values in the specified boto3 API parameter that are not in the enum of its shape
+def find_boto3_api_param_enum_errors(shape, param, param_name):
+    enum_errors = []
+    if (shape.type_name == 'structure') and isinstance(param, dict):
+        for member_name, member_param in param.items():
+            if member_name in shape.members:
+                member_param_name = '{}.{}'.format(param_name, member_name) if (len(param_name) > 0) else member_name
+                enum_errors.extend(find_boto3_api_param_enum_errors(shape.members[member_name], member_param,
+                                                                    member_param_name))
+    elif (shape.type_name == 'list') and isinstance(param, list):
+        for index, member_param in enumerate(param):
+            enum_errors.extend(find_boto3_api_param_enum_errors(shape.member, member_param,
+                                                                '{}[{}]'.format(param_name, index)))
+    elif (shape.type_name == 'map') and isinstance(param, dict):
+        for map_key, map_value in param.items():
+            enum_errors.extend(find_boto3_api_param_enum_errors(shape.value, map_value,
+                                                                '{}.{}'.format(param_name, map_key)))
+    elif (shape.type_name == 'string') and (len(shape.enum) > 0) and isinstance(param, str) and (param not in shape.enum):
+        enum_errors.append('Invalid value for parameter {}, value: {}, valid values: {}'
+                           .format(param_name, param, ', '.join(shape.enum)))
+    return enum_errors
+
+
+# Validate the boto3 API JSON locally against the service model of the specified boto3 client;
+# checks the required members, the unknown members, the types and the enums, and returns the list of errors
+def validate_boto3_api_json(boto3_client, boto3_api_name, boto3_api_json_text):
+    try:
+        boto3_api_request_json = json.loads(boto3_api_json_text)
+    except json.JSONDecodeError as exception:
+        return ['The boto3 API JSON is not valid JSON :: {}'.format(exception)]
+    if boto3_api_request_json is None:
+        boto3_api_request_json = {}
+    if not isinstance(boto3_api_request_json, dict):
+        return ['The boto3 API JSON is not a JSON object.']
+    operation_name = boto3_client.meta.method_to_api_mapping.get(boto3_api_name)
+    if operation_name is None:
+        return ['Unknown boto3 API "{}".'.format(boto3_api_name)]
+    input_shape = boto3_client.meta.service_model.operation_model(operation_name).input_shape
+    validation_errors = []
+    if input_shape is None:
+        if len(boto3_api_request_json) > 0:
+            validation_errors.append('The boto3 API "{}" does not take any parameters.'.format(boto3_api_name))
+        return validation_errors
+    validation_report = ParamValidator().validate(boto3_api_request_json, input_shape)
+    if validation_report.has_errors():
+        validation_errors.extend(validation_report.generate_report().splitlines())
+    validation_errors.extend(find_boto3_api_param_enum_errors(input_shape, boto3_api_request_json, ''))
+    return validation_errors
+
+
 # Process the prompt and the response by invoking the specified LLM
-def process_prompt(aws_account_id, aws_region, boto3_api_name, user_input, generated_boto3_json_str):
-    # Instantiate the Amazon Bedrock runtime boto3 client for the specific region
-    bedrock_rt_client = boto3.client('bedrock-runtime', region_name=aws_region, config=get_boto_config())
-    # Read the prompt templates and perform variable substitution
-    prompt_templates_dir = '.'
+def process_prompt(aws_account_id, aws_region, boto3_api_name, user_input, generated_boto3_json_str,
+                   validation_errors):
+    # Get the cached Amazon Bedrock runtime boto3 client for the specific region
+    bedrock_rt_client = get_boto3_client('bedrock-runtime', aws_region)
+    # Render the preloaded prompt templates with the variable values
     system_prompts = [
         {
-            "text": read_file(os.path.join(prompt_templates_dir, os.environ['SYSTEM_PROMPT_FILE_NAME']), 'r')
+            "text": render_prompt_template(PROMPT_TEMPLATES['SYSTEM_PROMPT_FILE_NAME'], {})
         }
     ]
-    user_prompt_content = read_file(os.path.join(prompt_templates_dir, os.environ['USER_PROMPT_FILE_NAME']), 'r')
-    user_prompt_content = user_prompt_content.replace('{aws_account_id}', aws_account_id)
-    user_prompt_content = user_prompt_content.replace('{aws_region}', aws_region)
-    user_prompt_content = user_prompt_content.replace('{boto3_api_name}', boto3_api_name)
-    user_prompt_content = user_prompt_content.replace('{user_input}', user_input)
-    user_prompt_content = user_prompt_content.replace('{generated_boto3_json}', generated_boto3_json_str)
+    placeholder_values = {
+        'aws_account_id': aws_account_id,
+        'aws_region': aws_region,
+        'boto3_api_name': boto3_api_name,
+        'user_input': user_input,
+        'generated_boto3_json': generated_boto3_json_str,
+        'validation_errors': '\n'.join(validation_errors)
+    }
+    user_prompt_content = render_prompt_template(PROMPT_TEMPLATES['USER_PROMPT_FILE_NAME'], placeholder_values)
     messages = [
         {
             "role": "user",
@@ -173,8 +766,11 @@ def process_prompt(aws_account_id, aws_region, boto3_api_name, user_input, gener
             ]
         }
     ]
-    # Invoke the LLM, prepare and return the response
-    llm_response = invoke_llm(bedrock_rt_client, system_prompts, messages)
+    # Invoke the LLM or use its cached response, prepare and return the response
+    cache_key = get_llm_response_cache_key(('SYSTEM_PROMPT_FILE_NAME', 'USER_PROMPT_FILE_NAME'),
+                                           dict(placeholder_values,
+                                                generated_boto3_json=canonicalize_boto3_json(generated_boto3_json_str)))
+    llm_response = invoke_llm_with_cache(bedrock_rt_client, system_prompts, messages, cache_key, 'VALIDATED_BOTO3_JSON')
     change_log = substring_between(llm_response, '<CHANGELOG>', '</CHANGELOG>')
     logging.info('LLM validation and update complete. Change log :: {}'.format(change_log))
     updated_generated_json = substring_between(llm_response, '<VALIDATED_BOTO3_JSON>', '</VALIDATED_BOTO3_JSON>')
@@ -183,21 +779,23 @@ def process_prompt(aws_account_id, aws_region, boto3_api_name, user_input, gener
 
 # Process the prompt for the boto3 API retry and the response by invoking the specified LLM
 def process_prompt_for_boto3_api_retry(aws_account_id, aws_region, boto3_api_name, boto3_json_str, boto3_error):
-    # Instantiate the Amazon Bedrock runtime boto3 client for the specific region
-    bedrock_rt_client = boto3.client('bedrock-runtime', region_name=aws_region, config=get_boto_config())
-    # Read the prompt templates and perform variable substitution
-    prompt_templates_dir = '.'
+    # Get the cached Amazon Bedrock runtime boto3 client for the specific region
+    bedrock_rt_client = get_boto3_client('bedrock-runtime', aws_region)
+    # Render the preloaded prompt templates with the variable values
     system_prompts = [
         {
-            "text": read_file(os.path.join(prompt_templates_dir, os.environ['SYSTEM_PROMPT_FOR_BOTO3_RETRY_FILE_NAME']), 'r')
+            "text": render_prompt_template(PROMPT_TEMPLATES['SYSTEM_PROMPT_FOR_BOTO3_RETRY_FILE_NAME'], {})
         }
     ]
-    user_prompt_content = read_file(os.path.join(prompt_templates_dir, os.environ['USER_PROMPT_FOR_BOTO3_RETRY_FILE_NAME']), 'r')
-    user_prompt_content = user_prompt_content.replace('{aws_account_id}', aws_account_id)
-    user_prompt_content = user_prompt_content.replace('{aws_region}', aws_region)
-    user_prompt_content = user_prompt_content.replace('{boto3_api_name}', boto3_api_name)
-    user_prompt_content = user_prompt_content.replace('{boto3_json}', boto3_json_str)
-    user_prompt_content = user_prompt_content.replace('{boto3_error}', boto3_error)
+    placeholder_values = {
+        'aws_account_id': aws_account_id,
+        'aws_region': aws_region,
+        'boto3_api_name': boto3_api_name,
+        'boto3_json': boto3_json_str,
+        'boto3_error': boto3_error
+    }
+    user_prompt_content = render_prompt_template(PROMPT_TEMPLATES['USER_PROMPT_FOR_BOTO3_RETRY_FILE_NAME'],
+                                                 placeholder_values)
     messages = [
         {
             "role": "user",
@@ -208,11 +806,25 @@ def process_prompt_for_boto3_api_retry(aws_account_id, aws_region, boto3_api_nam
             ]
         }
     ]
-    # Invoke the LLM, prepare and return the response
-    llm_response = invoke_llm(bedrock_rt_client, system_prompts, messages)
+    # Invoke the LLM or use its cached response, prepare and return the response; unlike the validation,
+    # the fix is not cached here, but only once the boto3 API call retried with it succeeds
+    cache_key = get_llm_response_cache_key(('SYSTEM_PROMPT_FOR_BOTO3_RETRY_FILE_NAME', 'USER_PROMPT_FOR_BOTO3_RETRY_FILE_NAME'),
+                                           dict(placeholder_values, boto3_json=canonicalize_boto3_json(boto3_json_str)))
+    llm_response = get_cached_llm_response(cache_key)
+    token_usage = None
+    if llm_response is None:
+        llm_response, token_usage = invoke_llm(bedrock_rt_client, system_prompts, messages)
+    else:
+        logging.info('Using the cached LLM response.')
+    log_llm_response_cache_stats()
     fixed_boto3_json = substring_between(llm_response, '<FIXED_BOTO3_JSON>', '</FIXED_BOTO3_JSON>')
     logging.info('LLM fix to boto3 JSON completed based on the specified boto3 error.')
-    return fixed_boto3_json
+    llm_fix = {
+        'cache_key': cache_key,
+        'llm_response': llm_response,
+        'token_usage': token_usage
+    }
+    return fixed_boto3_json, llm_fix
 
 
 # Invoke the specified LLM through Amazon Bedrock's Converse API
@@ -245,8 +857,8 @@ def invoke_llm(bedrock_rt_client, system_prompts, messages):
         logging.info('Prompt latency = {} second(s)'.format(int(metrics['latencyMs']) / 1000))
         logging.info('PROMPT: {}'.format(messages[0]['content'][0]))
         logging.info('RESPONSE: {}'.format(prompt_response))
-    # Return the LLM response text
-    return prompt_response
+    # Return the LLM response text and the token usage
+    return prompt_response, response['usage']
 
 
 # Invoke the specified boto3 API
@@ -275,98 +887,153 @@ def invoke_boto3_api(rds_client, boto3_api_name, boto3_api_request_json):
         raise exception
 
 
-# Invoke boto3 APIs with LLM intervened retry
+# Get the response for the boto3 API errors that are handled as a response message;
+# returns None if the error is not handled
+def get_handled_boto3_api_error_response(boto3_api_name, boto3_api_request_json, exception):
+    if not isinstance(exception, ClientError):
+        return None
+    if (boto3_api_name in ['start_db_instance_automated_backups_replication', 'stop_db_instance_automated_backups_replication'])\
+            and (exception.response['Error']['Code'] == 'InvalidParameterValue'):
+        return {'handled_exception_message': 'The specified Source RDS db instance ARN "{}" is not a valid ARN.'.format(boto3_api_request_json['SourceDBInstanceArn'])}
+    elif (boto3_api_name in ['start_db_instance_automated_backups_replication', 'stop_db_instance_automated_backups_replication'])\
+            and (exception.response['Error']['Code'] == 'DBInstanceNotFound'):
+        return {'handled_exception_message': 'The specified Source RDS db instance with ARN "{}" not found.'.format(boto3_api_request_json['SourceDBInstanceArn'])}
+    elif (boto3_api_name == 'delete_db_cluster_automated_backup') and (exception.response['Error']['Code'] == 'InvalidParameterValue'):
+        return {'handled_exception_message': 'The specified RDS db cluster resource id "{}" is not valid.'.format(boto3_api_request_json['DbClusterResourceId'])}
+    elif (boto3_api_name == 'delete_db_instance_automated_backup') and (exception.response['Error']['Code'] == 'InvalidParameterValue'):
+        return {'handled_exception_message': 'The specified RDS db instance resource id "{}" is not valid.'.format(boto3_api_request_json['DbiResourceId'])}
+    return None
+
+
+# Error codes of the boto3 API errors that a change to the request JSON can fix
+BOTO3_API_VALIDATION_ERROR_CODES = frozenset((
+    'InvalidArgument',
+    'InvalidInput',
+    'InvalidParameter',
+    'InvalidParameterCombination',
+    'InvalidParameterException',
+    'InvalidParameterValue',
+    'InvalidParameterValueException',
+    'InvalidRequest',
+    'InvalidRequestException',
+    'MalformedXML',
+    'MissingParameter',
+    'MissingParameterValueException',
+    'ValidationError',
+    'ValidationException'
+))
+
+
+# Error codes of the boto3 API errors that may succeed when retried as is
+BOTO3_API_TRANSIENT_ERROR_CODES = frozenset((
+    'InternalError',
+    'InternalFailure',
+    'InternalServerError',
+    'InternalServiceError',
+    'PriorRequestNotComplete',
+    'ProvisionedThroughputExceededException',
+    'RequestLimitExceeded',
+    'RequestThrottled',
+    'RequestThrottledException',
+    'RequestTimeout',
+    'RequestTimeoutException',
+    'ServiceUnavailable',
+    'ServiceUnavailableException',
+    'SlowDown',
+    'Throttling',
+    'ThrottlingException',
+    'TooManyRequestsException'
+))
+
+
+# Classify the boto3 API error as 'VALIDATION' (can be fixed by the LLM), 'TRANSIENT' (can be retried as is)
+# or 'TERMINAL' (cannot be fixed by retrying)
+def classify_boto3_api_error(exception):
+    if isinstance(exception, (ParamValidationError, TypeError)):
+        return 'VALIDATION'
+    if isinstance(exception, (EndpointConnectionError, ConnectTimeoutError, HTTPClientError)):
+        return 'TRANSIENT'
+    if isinstance(exception, ClientError):
+        error_code = exception.response.get('Error', {}).get('Code', '')
+        if (error_code in BOTO3_API_VALIDATION_ERROR_CODES) or error_code.endswith('.Malformed'):
+            return 'VALIDATION'
+        if ((error_code in BOTO3_API_TRANSIENT_ERROR_CODES)
+                or (exception.response.get('ResponseMetadata', {}).get('HTTPStatusCode', 0) >= 500)):
+            return 'TRANSIENT'
+    return 'TERMINAL'
+
+
+# The base and the max backoff (in seconds) of the retries after transient boto3 API errors
+BOTO3_API_RETRY_BASE_BACKOFF_SECONDS = 1
+BOTO3_API_RETRY_MAX_BACKOFF_SECONDS = 20
+
+
+# Get the jittered exponential backoff (in seconds) before the specified retry attempt
+def get_boto3_api_retry_backoff_seconds(retry_attempt):
+    return random.uniform(0, min(BOTO3_API_RETRY_MAX_BACKOFF_SECONDS,
+                                 BOTO3_API_RETRY_BASE_BACKOFF_SECONDS * (2 ** (retry_attempt - 1))))
+
+
+# Invoke boto3 APIs with a retry pipeline based on the error class; validation errors are fixed by the LLM
+# and retried, transient errors are retried after a jittered backoff and terminal errors are raised right away.
+# Each path is bounded by its own configurable attempt budget.
 def invoke_boto3_api_with_llm_intervened_retry(aws_account_id, aws_region, rds_client,
                                                boto3_api_name, boto3_api_request_json):
-    try:
+    llm_fix_attempts = 0
+    transient_retry_attempts = 0
+    # The LLM fix of the boto3 API JSON request that is being retried, if any
+    llm_fix = None
+    while True:
         try:
-            response = invoke_boto3_api(rds_client, boto3_api_name, boto3_api_request_json)
-        except ClientError as e:
-            if (boto3_api_name in ['start_db_instance_automated_backups_replication', 'stop_db_instance_automated_backups_replication'])\
-                    and (e.response['Error']['Code'] == 'InvalidParameterValue'):
-                response = {'handled_exception_message': 'The specified Source RDS db instance ARN "{}" is not a valid ARN.'.format(boto3_api_request_json['SourceDBInstanceArn'])}
-            elif (boto3_api_name in ['start_db_instance_automated_backups_replication', 'stop_db_instance_automated_backups_replication'])\
-                    and (e.response['Error']['Code'] == 'DBInstanceNotFound'):
-                response = {'handled_exception_message': 'The specified Source RDS db instance with ARN "{}" not found.'.format(boto3_api_request_json['SourceDBInstanceArn'])}
-            elif (boto3_api_name == 'delete_db_cluster_automated_backup') and (e.response['Error']['Code'] == 'InvalidParameterValue'):
-                response = {'handled_exception_message': 'The specified RDS db cluster resource id "{}" is not valid.'.format(boto3_api_request_json['DbClusterResourceId'])}
-            elif (boto3_api_name == 'delete_db_instance_automated_backup') and (e.response['Error']['Code'] == 'InvalidParameterValue'):
-                response = {'handled_exception_message': 'The specified RDS db instance resource id "{}" is not valid.'.format(boto3_api_request_json['DbiResourceId'])}
-            else:
-                logging.info('Error occurred when invoking boto3 API "{}" :: {}'.format(boto3_api_name, e))
+            boto3_api_response = invoke_boto3_api(rds_client, boto3_api_name, boto3_api_request_json)
+            # Cache the LLM fix only now that the call retried with it has succeeded
+            put_cached_llm_fix(llm_fix)
+            return boto3_api_response
+        except Exception as exception:
+            handled_error_response = get_handled_boto3_api_error_response(boto3_api_name,
+                                                                          boto3_api_request_json,
+                                                                          exception)
+            if handled_error_response is not None:
+                # The call retried with the LLM fix, if any, was accepted by the boto3 API
+                put_cached_llm_fix(llm_fix)
+                return handled_error_response
+            boto3_api_error_class = classify_boto3_api_error(exception)
+            logging.info('{} error occurred when invoking boto3 API "{}" :: {}'
+                         .format(boto3_api_error_class, boto3_api_name, exception))
+            # The call retried with the LLM fix failed; evict the fix, if it was cached, so that it is not replayed
+            if (llm_fix is not None) and (boto3_api_error_class != 'TRANSIENT'):
+                evict_cached_llm_response(llm_fix['cache_key'])
+                llm_fix = None
+            if (boto3_api_error_class == 'VALIDATION') \
+                    and (llm_fix_attempts < int(os.environ.get('BOTO3_API_MAX_LLM_FIX_ATTEMPTS', '1'))):
+                llm_fix_attempts += 1
                 logging.info('Fixing the boto3 API JSON request using LLM...')
-                fixed_boto3_api_request_json = json.loads(process_prompt_for_boto3_api_retry(aws_account_id,
-                                                                                             aws_region,
-                                                                                             boto3_api_name,
-                                                                                             json.dumps(boto3_api_request_json),
-                                                                                             str(e)))
+                fixed_boto3_json, llm_fix = process_prompt_for_boto3_api_retry(aws_account_id,
+                                                                               aws_region,
+                                                                               boto3_api_name,
+                                                                               json.dumps(boto3_api_request_json),
+                                                                               str(exception))
+                boto3_api_request_json = json.loads(fixed_boto3_json)
                 logging.info('Completed fixing the boto3 API JSON request using LLM.')
                 logging.info('Retrying boto3 API "{}" after fixing the JSON request using LLM...'.format(boto3_api_name))
-                response = invoke_boto3_api(rds_client, boto3_api_name, fixed_boto3_api_request_json)
-                logging.info('Completed retrying boto3 API "{}" after fixing the JSON request using LLM.'.format(boto3_api_name))
-    except Exception as final_exception:
-        raise final_exception
-    return response
+            elif (boto3_api_error_class == 'TRANSIENT') \
+                    and (transient_retry_attempts < int(os.environ.get('BOTO3_API_MAX_TRANSIENT_RETRY_ATTEMPTS', '2'))):
+                transient_retry_attempts += 1
+                retry_backoff_seconds = get_boto3_api_retry_backoff_seconds(transient_retry_attempts)
+                logging.info('Retrying boto3 API "{}" in {:.2f} second(s)...'.format(boto3_api_name, retry_backoff_seconds))
+                time.sleep(retry_backoff_seconds)
+            else:
+                raise
 
 
-# Parse the input Lambda event received from Agents for Amazon Bedrock
-def parse_request_and_prepare_response(event):
+# Process the boto3 API request in the specified AWS account and AWS region, and return the response body
+# text list and the function response state; the IAM role is assumed for the other AWS accounts
+def process_boto3_api_request_for_region(aws_account_id, aws_region, boto3_api_name, boto3_api_json_text,
+                                         assume_role_arn=''):
     response_body_text_list = []
     function_response_state = ''
-    logging.info('Parsing request data...')
-    # Get the various objects from the input event
-    prompt_session_attributes = event["promptSessionAttributes"]
-    session_attributes = event["sessionAttributes"]
-    # Get the AWS account id from the session attributes, if it exists; if not, add to it
-    if 'AWSAccountId' in session_attributes:
-        aws_account_id = session_attributes['AWSAccountId']
-    else:
-        aws_account_id = (boto3.client('sts')).get_caller_identity().get('Account')
-        session_attributes['AWSAccountId'] = aws_account_id
-    # Append to the response body text
-    response_body_text = 'AWS Account Id "{}" will be used.'.format(aws_account_id)
-    response_body_text_list.append(response_body_text)
-    logging.info(response_body_text)
-    # Get the input parameters
-    aws_region, backup_plan_id, boto3_api_name, boto3_api_json_text = '', '', '', ''
-    input_text = event["inputText"]
-    # Loop through the input parameters
-    input_parameters = event["parameters"]
-    for input_parameter in input_parameters:
-        # Retrieve the value of the parameters
-        if input_parameter["name"] == "AWSRegion":
-            aws_region = input_parameter["value"]
-        elif input_parameter["name"] == "Boto3APIName":
-            boto3_api_name = input_parameter["value"].lower()
-            boto3_api_name = substring_after(boto3_api_name, 'rds.client.')
-        elif input_parameter["name"] == "Boto3APIJSON":
-            boto3_api_json_text = input_parameter["value"]
-    logging.info('Completed parsing request data.')
-    # Set the default AWS region if not found in the input
-    if len(aws_region) == 0:
-        aws_region = os.environ['DEFAULT_AWS_REGION']
-    # Append to the response body text
-    response_body_text = 'AWS Region "{}" will be used.'.format(aws_region)
-    response_body_text_list.append(response_body_text)
-    logging.info(response_body_text)
-    # Instantiate the Amazon RDS boto3 client for the specific region
-    rds_client = boto3.client('rds', region_name=aws_region, config=get_boto_config())
-    # Except for custom APIs, validate the boto3 JSON for the specified user input by invoking a LLM
-    if boto3_api_name not in ('describe_db_clusters',
-                              'describe_db_clusters_for_cluster_names',
-                              'describe_db_clusters_for_cluster_tags',
-                              'describe_db_instances',
-                              'describe_db_instances_for_instance_names',
-                              'describe_db_instances_for_instance_tags',
-                              'describe_db_cluster_automated_backups',
-                              'describe_db_instance_automated_backups',
-                              'start_db_instance_automated_backups_replication',
-                              'stop_db_instance_automated_backups_replication',
-                              'delete_db_cluster_automated_backup',
-                              'delete_db_instance_automated_backup'):
-        logging.info('Validating the boto3 API JSON...')
-        boto3_api_json_text = process_prompt(aws_account_id, aws_region, boto3_api_name, input_text, boto3_api_json_text)
-        logging.info('Completed validating the boto3 API JSON.')
+    # Get the cached Amazon RDS boto3 client for the specific region
+    rds_client = get_boto3_client('rds', aws_region, get_boto3_api_max_concurrency(), 'adaptive', assume_role_arn)
     # Determine the action type based on the existence of the relevant parameters
     if len(boto3_api_json_text) == 0:
         function_response_state = 'FAILURE'
@@ -686,6 +1353,147 @@ def parse_request_and_prepare_response(event):
             response_body_text = 'API "{}" is not supported. No API invocation was performed.'.format(boto3_api_name)
             logging.warning(response_body_text)
             response_body_text_list.append(response_body_text)
+    return response_body_text_list, function_response_state
+
+
+# Parse the input Lambda event received from Agents for Amazon Bedrock
+def parse_request_and_prepare_response(event, context):
+    response_body_text_list = []
+    function_response_state = ''
+    logging.info('Parsing request data...')
+    # Get the various objects from the input event
+    prompt_session_attributes = event["promptSessionAttributes"]
+    session_attributes = event["sessionAttributes"]
+    # Get the AWS account id from the session attributes, if it exists; if not, add to it
+    if 'AWSAccountId' in session_attributes:
+        aws_account_id = session_attributes['AWSAccountId']
+    else:
+        aws_account_id = get_aws_account_id(context)
+        session_attributes['AWSAccountId'] = aws_account_id
+    # Append to the response body text
+    response_body_text = 'AWS Account Id "{}" will be used.'.format(aws_account_id)
+    response_body_text_list.append(response_body_text)
+    logging.info(response_body_text)
+    # Get the input parameters
+    aws_region, backup_plan_id, boto3_api_name, boto3_api_json_text = '', '', '', ''
+    aws_account_ids_text = ''
+    input_text = event["inputText"]
+    # Loop through the input parameters
+    input_parameters = event["parameters"]
+    for input_parameter in input_parameters:
+        # Retrieve the value of the parameters
+        if input_parameter["name"] == "AWSRegion":
+            aws_region = input_parameter["value"]
+        elif input_parameter["name"] == "AWSAccountIds":
+            aws_account_ids_text = input_parameter["value"]
+        elif input_parameter["name"] == "Boto3APIName":
+            boto3_api_name = input_parameter["value"].lower()
+            boto3_api_name = substring_after(boto3_api_name, 'rds.client.')
+        elif input_parameter["name"] == "Boto3APIJSON":
+            boto3_api_json_text = input_parameter["value"]
+    logging.info('Completed parsing request data.')
+    # Set the default AWS region if not found in the input
+    if len(aws_region) == 0:
+        aws_region = os.environ['DEFAULT_AWS_REGION']
+    # Get the AWS regions, as the AWS region may be a comma separated list of AWS regions or "all"
+    aws_regions = get_aws_regions(aws_region)
+    # Append to the response body text
+    if len(aws_regions) == 1:
+        aws_region = aws_regions[0]
+        response_body_text = 'AWS Region "{}" will be used.'.format(aws_region)
+    else:
+        # The boto3 API JSON is validated in the default AWS region
+        aws_region = os.environ['DEFAULT_AWS_REGION']
+        response_body_text = 'AWS Regions {} will be used.'.format(', '.join('"{}"'.format(aws_region_name)
+                                                                       for aws_region_name in aws_regions))
+    response_body_text_list.append(response_body_text)
+    logging.info(response_body_text)
+    # Get the target AWS accounts, which are the AWS account of this Lambda function unless other AWS accounts
+    # are specified
+    aws_account_ids = get_aws_account_ids(aws_account_ids_text, aws_account_id)
+    if aws_account_ids != [aws_account_id]:
+        # Append to the response body text
+        response_body_text = 'AWS Account Ids {} will be used.'.format(', '.join('"{}"'.format(target_aws_account_id)
+                                                                           for target_aws_account_id in aws_account_ids))
+        response_body_text_list.append(response_body_text)
+        logging.info(response_body_text)
+    # Get the cached Amazon RDS boto3 client for the specific region
+    rds_client = get_boto3_client('rds', aws_region, get_boto3_api_max_concurrency(), 'adaptive')
+    # Except for custom APIs, validate the boto3 JSON for the specified user input locally
+    # and, only if it is not valid, fix it by invoking a LLM
+    if boto3_api_name not in ('describe_db_clusters',
+                              'describe_db_clusters_for_cluster_names',
+                              'describe_db_clusters_for_cluster_tags',
+                              'describe_db_instances',
+                              'describe_db_instances_for_instance_names',
+                              'describe_db_instances_for_instance_tags',
+                              'describe_db_cluster_automated_backups',
+                              'describe_db_instance_automated_backups',
+                              'start_db_instance_automated_backups_replication',
+                              'stop_db_instance_automated_backups_replication',
+                              'delete_db_cluster_automated_backup',
+                              'delete_db_instance_automated_backup'):
+        logging.info('Validating the boto3 API JSON...')
+        validation_errors = validate_boto3_api_json(rds_client, boto3_api_name, boto3_api_json_text)
+        if len(validation_errors) == 0:
+            BOTO3_API_JSON_LOCAL_VALIDATION_COUNTS['hit'] += 1
+            logging.info('The boto3 API JSON is valid as per the local validation.')
+        else:
+            BOTO3_API_JSON_LOCAL_VALIDATION_COUNTS['miss'] += 1
+            logging.info('The boto3 API JSON failed the local validation :: {}'.format(validation_errors))
+            boto3_api_json_text = process_prompt(aws_account_id, aws_region, boto3_api_name, input_text,
+                                                 boto3_api_json_text, validation_errors)
+        logging.info('Completed validating the boto3 API JSON. Local validation hits: {}, misses: {}.'
+                     .format(BOTO3_API_JSON_LOCAL_VALIDATION_COUNTS['hit'], BOTO3_API_JSON_LOCAL_VALIDATION_COUNTS['miss']))
+    # Get the AWS account and AWS region targets, ordered by AWS account
+    cross_account_role_name = get_cross_account_role_name()
+    targets = [
+        {
+            'AWSAccountId': target_aws_account_id,
+            'AWSRegion': target_aws_region,
+            'AssumeRoleArn': get_assume_role_arn(target_aws_account_id, aws_account_id, cross_account_role_name)
+        }
+        for target_aws_account_id in aws_account_ids
+        for target_aws_region in aws_regions
+    ]
+    invalid_aws_account_ids = [target_aws_account_id for target_aws_account_id in aws_account_ids
+                               if AWS_ACCOUNT_ID_PATTERN.match(target_aws_account_id) is None]
+    # Process the boto3 API request for the target; the read only APIs can also be processed concurrently
+    # across multiple targets
+    if len(invalid_aws_account_ids) > 0:
+        function_response_state = 'REPROMPT'
+        # Append to the response body text
+        response_body_text = ('AWS Account Ids {} are not valid 12 digit AWS account ids. No API invocation was performed.'
+                              .format(invalid_aws_account_ids))
+        logging.warning(response_body_text)
+        response_body_text_list.append(response_body_text)
+    elif (aws_account_ids != [aws_account_id]) and (len(cross_account_role_name) == 0):
+        function_response_state = 'FAILURE'
+        # Append to the response body text
+        response_body_text = ('Cross account requests are not enabled, as the IAM role name to assume in the other '
+                              'AWS accounts is not configured. No API invocation was performed.')
+        logging.warning(response_body_text)
+        response_body_text_list.append(response_body_text)
+    elif len(targets) == 1:
+        target_text_list, function_response_state = process_boto3_api_request_for_region(targets[0]['AWSAccountId'],
+                                                                                           targets[0]['AWSRegion'],
+                                                                                           boto3_api_name,
+                                                                                           boto3_api_json_text,
+                                                                                           targets[0]['AssumeRoleArn'])
+        response_body_text_list.extend(target_text_list)
+    elif boto3_api_name.startswith(READ_ONLY_BOTO3_API_NAME_PREFIXES):
+        target_text_list, function_response_state = process_boto3_api_request_for_targets(targets,
+                                                                                            boto3_api_name,
+                                                                                            boto3_api_json_text)
+        response_body_text_list.extend(target_text_list)
+    else:
+        function_response_state = 'REPROMPT'
+        # Append to the response body text
+        response_body_text = ('API "{}" is not read only and can be run in only one AWS account and AWS Region. '
+                              'Please specify a single AWS account and AWS Region. No API invocation was performed.'
+                              .format(boto3_api_name))
+        logging.warning(response_body_text)
+        response_body_text_list.append(response_body_text)
     # Create the response message
     logging.info('Creating the response message...')
     # Concatenate the messages
@@ -724,7 +1532,7 @@ def lambda_handler(event,context):
     logging.info('Request event :: {}'.format(event))
     logging.info('Request context :: {}'.format(context))
     # Parse the request data and prepare response
-    return_data = parse_request_and_prepare_response(event)
+    return_data = parse_request_and_prepare_response(event, context)
     logging.info('Response :: {}'.format(return_data))
     logging.info('Completed executing the handler() function.')
     return return_data
\ No newline at end of file
@@ -3,11 +3,21 @@ Copyright 2025 Amazon.com, Inc. or its affiliates.  All Rights Reserved.
 SPDX-License-Identifier: MIT-0
 """
 import boto3
+import hashlib
 import json
 import logging
 import os
+import random
+import re
+import threading
+import time
+import weakref
 from botocore.config import Config
-from botocore.exceptions import ClientError
+from botocore.exceptions import ClientError, ConnectTimeoutError, EndpointConnectionError, HTTPClientError, ParamValidationError
+from botocore.validate import ParamValidator
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from functools import partial
 
 
 # Set the logger
@@ -70,111 +80,1023 @@ def read_file(file_full_path, file_read_type):
     return file_content
 
 
+# Pattern of the placeholders (for example, {aws_region}) in the prompt templates
+PROMPT_TEMPLATE_PLACEHOLDER_PATTERN = re.compile(r'\{(\w+)\}')
+
+
+# Compile the prompt template text into its literal parts and placeholder names;
+# the odd indexed items of the parts list are the placeholder names
+def compile_prompt_template(template_text):
+    template_parts = PROMPT_TEMPLATE_PLACEHOLDER_PATTERN.split(template_text)
+    placeholder_names = frozenset(template_parts[1::2])
+    return template_parts, placeholder_names
+
+
+# Render the compiled prompt template by substituting all the placeholders in a single pass
+def render_prompt_template(compiled_prompt_template, placeholder_values):
+    template_parts, placeholder_names = compiled_prompt_template
+    # Validate that the placeholder values match the placeholders in the template
+    if placeholder_names != placeholder_values.keys():
+        raise ValueError('Prompt template placeholders {} do not match the specified values {}.'
+                         .format(sorted(placeholder_names), sorted(placeholder_values.keys())))
+    rendered_parts = template_parts.copy()
+    for idx in range(1, len(rendered_parts), 2):
+        rendered_parts[idx] = placeholder_values[rendered_parts[idx]]
+    return ''.join(rendered_parts)
+
+
+# Read and compile all the prompt templates; done once per Lambda container
+def load_prompt_templates():
+    prompt_templates_dir = os.path.dirname(os.path.abspath(__file__))
+    prompt_templates = {}
+    for prompt_file_name_env_var in ('SYSTEM_PROMPT_FILE_NAME',
+                                     'USER_PROMPT_FILE_NAME',
+                                     'SYSTEM_PROMPT_FOR_BOTO3_RETRY_FILE_NAME',
+                                     'USER_PROMPT_FOR_BOTO3_RETRY_FILE_NAME'):
+        prompt_file_full_path = os.path.join(prompt_templates_dir, os.environ[prompt_file_name_env_var])
+        prompt_templates[prompt_file_name_env_var] = compile_prompt_template(read_file(prompt_file_full_path, 'r'))
+    return prompt_templates
+
+
+# Load the prompt templates
+PROMPT_TEMPLATES = load_prompt_templates()
+
+
+# The hashes of the prompt templates; used to key the cached LLM responses
+PROMPT_TEMPLATE_HASHES = {
+    prompt_template_name: hashlib.sha256(json.dumps(prompt_template[0]).encode('utf-8')).hexdigest()
+    for prompt_template_name, prompt_template in PROMPT_TEMPLATES.items()
+}
+
+
+# In-memory LRU cache of the LLM responses, that is reused across invocations of a warm Lambda container;
+# the optional on-disk tier (e.g. under /tmp) is enabled by specifying its directory
+LLM_RESPONSE_CACHE = OrderedDict()
+LLM_RESPONSE_CACHE_LOCK = threading.Lock()
+LLM_RESPONSE_CACHE_STATS = {
+    'memory_hits': 0,
+    'disk_hits': 0,
+    'misses': 0,
+    'saved_input_tokens': 0,
+    'saved_output_tokens': 0
+}
+
+
+# Canonicalize the boto3 API JSON text so that formatting and key order do not change the cache key
+def canonicalize_boto3_json(boto3_json_str):
+    try:
+        return json.dumps(json.loads(boto3_json_str), sort_keys=True, separators=(',', ':'))
+    except json.JSONDecodeError:
+        return boto3_json_str.strip()
+
+
+# Get the cache key of the LLM response for the specified prompt templates and placeholder values
+def get_llm_response_cache_key(prompt_template_names, placeholder_values):
+    cache_key_json = json.dumps({
+        'model_id': os.environ['LLM_MODEL_OR_INFERENCE_PROFILE_ID'],
+        'prompt_template_hashes': [PROMPT_TEMPLATE_HASHES[name] for name in prompt_template_names],
+        'placeholder_values': placeholder_values
+    }, sort_keys=True)
+    return hashlib.sha256(cache_key_json.encode('utf-8')).hexdigest()
+
+
+# Get the TTL (in seconds) of the cached LLM responses, in both the in-memory and the on-disk tiers
+def get_llm_response_cache_ttl():
+    return int(os.environ.get('LLM_RESPONSE_CACHE_TTL_SECONDS', '86400'))
+
+
+# Check if the specified LLM response cache entry has expired; entries without a cached time have expired
+def is_llm_response_cache_entry_expired(cache_entry):
+    return (time.time() - cache_entry.get('cached_time', 0)) > get_llm_response_cache_ttl()
+
+
+# Get the path of the on-disk LLM response cache file for the specified key;
+# returns an empty string if the on-disk tier is not enabled
+def get_llm_response_cache_file_path(cache_key):
+    cache_dir = os.environ.get('LLM_RESPONSE_CACHE_DIR', '')
+    if len(cache_dir) == 0:
+        return ''
+    return os.path.join(cache_dir, '{}.json'.format(cache_key))
+
+
+# Add the cache entry to the in-memory tier and evict the least recently used entries beyond the max size.
+# Must be called with the cache lock held.
+def add_llm_response_cache_entry(cache_key, cache_entry):
+    LLM_RESPONSE_CACHE[cache_key] = cache_entry
+    LLM_RESPONSE_CACHE.move_to_end(cache_key)
+    while len(LLM_RESPONSE_CACHE) > int(os.environ.get('LLM_RESPONSE_CACHE_MAX_ENTRIES', '256')):
+        LLM_RESPONSE_CACHE.popitem(last=False)
+
+
+# Remove the cached LLM response for the specified key from the in-memory tier and the on-disk tier.
+# Must be called with the cache lock held.
+def remove_llm_response_cache_entry(cache_key):
+    LLM_RESPONSE_CACHE.pop(cache_key, None)
+    cache_file_path = get_llm_response_cache_file_path(cache_key)
+    if len(cache_file_path) > 0:
+        try:
+            os.remove(cache_file_path)
+        except FileNotFoundError:
+            pass
+        except OSError as exception:
+            logging.warning('Could not remove the LLM response cache file "{}" :: {}'.format(cache_file_path, exception))
+
+
+# Evict the cached LLM response for the specified key, so that it is not replayed
+def evict_cached_llm_response(cache_key):
+    with LLM_RESPONSE_CACHE_LOCK:
+        remove_llm_response_cache_entry(cache_key)
+
+
+# Get the cached LLM response for the specified key from the in-memory tier, then the on-disk tier;
+# returns None if the response is not cached or has expired
+def get_cached_llm_response(cache_key):
+    with LLM_RESPONSE_CACHE_LOCK:
+        cache_entry = LLM_RESPONSE_CACHE.get(cache_key)
+        if (cache_entry is not None) and is_llm_response_cache_entry_expired(cache_entry):
+            remove_llm_response_cache_entry(cache_key)
+            cache_entry = None
+        if cache_entry is not None:
+            LLM_RESPONSE_CACHE.move_to_end(cache_key)
+            LLM_RESPONSE_CACHE_STATS['memory_hits'] += 1
+        else:
+            cache_file_path = get_llm_response_cache_file_path(cache_key)
+            if (len(cache_file_path) > 0) and os.path.isfile(cache_file_path):
+                try:
+                    cache_entry = json.loads(read_file(cache_file_path, 'r'))
+                    if is_llm_response_cache_entry_expired(cache_entry):
+                        remove_llm_response_cache_entry(cache_key)
+                        cache_entry = None
+                    else:
+                        add_llm_response_cache_entry(cache_key, cache_entry)
+                        LLM_RESPONSE_CACHE_STATS['disk_hits'] += 1
+                except (OSError, ValueError) as exception:
+                    logging.warning('Could not read the LLM response cache file "{}" :: {}'.format(cache_file_path, exception))
+                    cache_entry = None
+        if cache_entry is None:
+            LLM_RESPONSE_CACHE_STATS['misses'] += 1
+            return None
+        LLM_RESPONSE_CACHE_STATS['saved_input_tokens'] += cache_entry['input_tokens']
+        LLM_RESPONSE_CACHE_STATS['saved_output_tokens'] += cache_entry['output_tokens']
+        return cache_entry['llm_response']
+
+
+# Cache the LLM response for the specified key in the in-memory tier and, if enabled, the on-disk tier
+def put_cached_llm_response(cache_key, llm_response, token_usage):
+    cache_entry = {
+        'llm_response': llm_response,
+        'input_tokens': token_usage['inputTokens'],
+        'output_tokens': token_usage['outputTokens'],
+        'cached_time': time.time()
+    }
+    with LLM_RESPONSE_CACHE_LOCK:
+        add_llm_response_cache_entry(cache_key, cache_entry)
+    cache_file_path = get_llm_response_cache_file_path(cache_key)
+    if len(cache_file_path) > 0:
+        try:
+            os.makedirs(os.path.dirname(cache_file_path), exist_ok=True)
+            # Write to a temporary file and rename it so that a partially written file is never read
+            temp_cache_file_path = '{}.{}.tmp'.format(cache_file_path, threading.get_ident())
+            with open(temp_cache_file_path, 'w') as temp_cache_file:
+                json.dump(cache_entry, temp_cache_file)
+            os.replace(temp_cache_file_path, cache_file_path)
+        except OSError as exception:
+            logging.warning('Could not write the LLM response cache file "{}" :: {}'.format(cache_file_path, exception))
+
+
+# Log the LLM response cache hit rate and the saved tokens
+def log_llm_response_cache_stats():
+    with LLM_RESPONSE_CACHE_LOCK:
+        cache_stats = dict(LLM_RESPONSE_CACHE_STATS)
+    lookup_count = cache_stats['memory_hits'] + cache_stats['disk_hits'] + cache_stats['misses']
+    hit_rate = ((cache_stats['memory_hits'] + cache_stats['disk_hits']) / lookup_count) if lookup_count > 0 else 0
+    logging.info('LLM response cache :: memory hits: {}, disk hits: {}, misses: {}, hit rate: {:.1%}, '
+                 'saved input tokens: {}, saved output tokens: {}.'
+                 .format(cache_stats['memory_hits'], cache_stats['disk_hits'], cache_stats['misses'], hit_rate,
+                         cache_stats['saved_input_tokens'], cache_stats['saved_output_tokens']))
+
+
+# Invoke the specified LLM unless its response for the specified cache key is cached; the response is
+# cached only if it contains the specified tag, so that malformed responses are not replayed
+def invoke_llm_with_cache(bedrock_rt_client, system_prompts, messages, cache_key, response_tag):
+    llm_response = get_cached_llm_response(cache_key)
+    if llm_response is None:
+        llm_response, token_usage = invoke_llm(bedrock_rt_client, system_prompts, messages)
+        if '<{}>'.format(response_tag) in llm_response:
+            put_cached_llm_response(cache_key, llm_response, token_usage)
+    else:
+        logging.info('Using the cached LLM response.')
+    log_llm_response_cache_stats()
+    return llm_response
+
+
+# Cache the specified LLM fix of a boto3 API JSON request, unless there is no fix or it was answered from the cache
+def put_cached_llm_fix(llm_fix):
+    if (llm_fix is not None) and (llm_fix['token_usage'] is not None):
+        put_cached_llm_response(llm_fix['cache_key'], llm_fix['llm_response'], llm_fix['token_usage'])
+
+
 # Get the config for all boto3 clients to be used by this Lambda function
-def get_boto_config():
+def get_boto_config(max_pool_connections=10, retry_mode='standard'):
     return Config(
         connect_timeout = (60 * 3),
         read_timeout = (60 * 3),
         retries = {
             'max_attempts': 10,
-            'mode': 'standard'
-        }
+            'mode': retry_mode
+        },
+        max_pool_connections = max_pool_connections
     )
 
 
-# Get all the S3 bucket names (and their corresponding regions)
-# from the specified regions in the current account
-def get_all_s3_bucket_names_for_regions(s3_client, aws_regions):
-    bucket_names_and_regions = []
-    if len(aws_regions) == 0:
-        list_buckets_response = s3_client.list_buckets(
-            MaxBuckets=int(os.environ['BOTO3_API_MAX_RESULTS'])
-        )
-        buckets = list_buckets_response['Buckets']
-        for bucket in buckets:
-            if 'BucketRegion' in bucket:
-                bucket_names_and_regions.append(
-                    {
-                        'name': bucket['Name'],
-                        'region': bucket['BucketRegion']
-                    }
-                )
-            else:
-                bucket_names_and_regions.append(
-                    {
-                        'name': bucket['Name'],
-                        'region': ''
-                    }
-                )
+# Cache of the boto3 clients, keyed by service name, region, client config and the assumed IAM role, if any,
+# that is reused across invocations of a warm Lambda container
+BOTO3_CLIENT_CACHE = {}
+BOTO3_CLIENT_CACHE_LOCK = threading.Lock()
+
+
+# The assumed IAM role ARNs of the cached cross account boto3 clients; used to scope the per region caches
+# by AWS account, and to create the other boto3 clients of the same AWS account
+BOTO3_CLIENT_ASSUME_ROLE_ARNS = weakref.WeakKeyDictionary()
+
+
+# Get the boto3 client for the specified service, region, connection pool size and retry mode, optionally
+# with the temporary credentials of the specified IAM role in another AWS account;
+# the client is created on first use and cached for the subsequent invocations
+def get_boto3_client(service_name, aws_region, max_pool_connections=10, retry_mode='standard', assume_role_arn=''):
+    client_cache_key = (service_name, aws_region, max_pool_connections, retry_mode, assume_role_arn)
+    # Resolve the temporary credentials first, as refreshing them evicts the cached clients of the IAM role
+    assumed_role_credentials = get_assumed_role_credentials(assume_role_arn) if len(assume_role_arn) > 0 else None
+    boto3_client = BOTO3_CLIENT_CACHE.get(client_cache_key)
+    if boto3_client is None:
+        # boto3 client creation is not thread safe; so, serialize it
+        with BOTO3_CLIENT_CACHE_LOCK:
+            boto3_client = BOTO3_CLIENT_CACHE.get(client_cache_key)
+            if boto3_client is None:
+                if assumed_role_credentials is None:
+                    logging.info('Creating boto3 client for service "{}" in region "{}"...'.format(service_name, aws_region))
+                    boto3_client = boto3.client(service_name, region_name=aws_region,
+                                                config=get_boto_config(max_pool_connections, retry_mode))
+                else:
+                    logging.info('Creating boto3 client for service "{}" in region "{}" with IAM role "{}"...'
+                                 .format(service_name, aws_region, assume_role_arn))
+                    boto3_client = boto3.client(service_name, region_name=aws_region,
+                                                config=get_boto_config(max_pool_connections, retry_mode),
+                                                aws_access_key_id=assumed_role_credentials['AccessKeyId'],
+                                                aws_secret_access_key=assumed_role_credentials['SecretAccessKey'],
+                                                aws_session_token=assumed_role_credentials['SessionToken'])
+                    BOTO3_CLIENT_ASSUME_ROLE_ARNS[boto3_client] = assume_role_arn
+                BOTO3_CLIENT_CACHE[client_cache_key] = boto3_client
+    return boto3_client
+
+
+# Get the assumed IAM role ARN of the specified boto3 client; empty for the AWS account of this Lambda function
+def get_boto3_client_assume_role_arn(boto3_client):
+    return BOTO3_CLIENT_ASSUME_ROLE_ARNS.get(boto3_client, '')
+
+
+# Clear the boto3 client cache; used by tests to start from a cold container state
+def reset_boto3_client_cache():
+    with BOTO3_CLIENT_CACHE_LOCK:
+        BOTO3_CLIENT_CACHE.clear()
+
+
+# Get the max number of boto3 API calls that can be made concurrently
+def get_boto3_api_max_concurrency():
+    return int(os.environ.get('BOTO3_API_MAX_CONCURRENCY', '10'))
+
+
+# Get the IAM role name to assume in the other AWS accounts; empty if cross account requests are not enabled
+def get_cross_account_role_name():
+    return os.environ.get('CROSS_ACCOUNT_ROLE_NAME', '')
+
+
+# Get the duration of the sessions of the assumed IAM roles
+def get_assumed_role_session_duration():
+    return int(os.environ.get('ASSUMED_ROLE_SESSION_DURATION_SECONDS', '3600'))
+
+
+# Get the number of seconds before their expiry that the temporary credentials of an assumed IAM role are refreshed
+def get_assumed_role_credentials_refresh_margin():
+    return int(os.environ.get('ASSUMED_ROLE_CREDENTIALS_REFRESH_MARGIN_SECONDS', '300'))
+
+
+# Cache of the temporary credentials of the assumed IAM roles, keyed by IAM role ARN, that is reused across
+# invocations of a warm Lambda container until shortly before the credentials expire; the IAM roles
+# are assumed under a lock per IAM role ARN, so that different AWS accounts are assumed concurrently
+ASSUMED_ROLE_CREDENTIALS_CACHE = {}
+ASSUMED_ROLE_CREDENTIALS_LOCKS = {}
+ASSUMED_ROLE_CREDENTIALS_LOCKS_LOCK = threading.Lock()
+
+
+# Get the temporary credentials of the specified IAM role, assuming it if not cached or about to expire
+def get_assumed_role_credentials(assume_role_arn):
+    with ASSUMED_ROLE_CREDENTIALS_LOCKS_LOCK:
+        assumed_role_credentials_lock = ASSUMED_ROLE_CREDENTIALS_LOCKS.setdefault(assume_role_arn, threading.Lock())
+    with assumed_role_credentials_lock:
+        assumed_role_credentials = ASSUMED_ROLE_CREDENTIALS_CACHE.get(assume_role_arn)
+        if ((assumed_role_credentials is None) or
+                (assumed_role_credentials['Expiration'].timestamp() - time.time() < get_assumed_role_credentials_refresh_margin())):
+            if assumed_role_credentials is not None:
+                # Evict the cached clients that use the expiring credentials
+                with BOTO3_CLIENT_CACHE_LOCK:
+                    for client_cache_key in [key for key in BOTO3_CLIENT_CACHE if key[4] == assume_role_arn]:
+                        del BOTO3_CLIENT_CACHE[client_cache_key]
+            logging.info('Assuming IAM role "{}"...'.format(assume_role_arn))
+            sts_client = get_boto3_client('sts', os.environ.get('AWS_REGION'))
+            assume_role_response = sts_client.assume_role(RoleArn=assume_role_arn,
+                                                          RoleSessionName='backup-assistant',
+                                                          DurationSeconds=get_assumed_role_session_duration())
+            assumed_role_credentials = assume_role_response['Credentials']
+            ASSUMED_ROLE_CREDENTIALS_CACHE[assume_role_arn] = assumed_role_credentials
+            logging.info('Assumed IAM role "{}" with credentials expiring at {}.'
+                         .format(assume_role_arn, assumed_role_credentials['Expiration']))
+        return assumed_role_credentials
+
+
+# The AWS account id of this Lambda function; resolved once per Lambda container
+AWS_ACCOUNT_ID = ''
+
+
+# Get the AWS account id; it is read from the ARN of the invoked Lambda function, since the
+# execution role always belongs to the account of the function. If the ARN is not available
+# (for example, when invoked outside of AWS Lambda with assumed role credentials),
+# it is resolved through the STS caller identity. The result is cached in both cases.
+def get_aws_account_id(context):
+    global AWS_ACCOUNT_ID
+    if len(AWS_ACCOUNT_ID) == 0:
+        invoked_function_arn_parts = str(getattr(context, 'invoked_function_arn', '')).split(':')
+        if (len(invoked_function_arn_parts) > 4) and (len(invoked_function_arn_parts[4]) > 0):
+            AWS_ACCOUNT_ID = invoked_function_arn_parts[4]
+        else:
+            AWS_ACCOUNT_ID = get_boto3_client('sts', os.environ.get('AWS_REGION')).get_caller_identity().get('Account')
+        logging.info('Resolved AWS account id "{}".'.format(AWS_ACCOUNT_ID))
+    return AWS_ACCOUNT_ID
+
+
+# Pattern of an AWS account id
+AWS_ACCOUNT_ID_PATTERN = re.compile(r'^\d{12}$')
+
+
+# Get the AWS account ids for the specified comma separated AWS account ids text; defaults to the specified
+# AWS account id
+def get_aws_account_ids(aws_account_ids_text, default_aws_account_id):
+    aws_account_ids = []
+    for aws_account_id in aws_account_ids_text.split(','):
+        aws_account_id = aws_account_id.strip()
+        if (len(aws_account_id) > 0) and (aws_account_id not in aws_account_ids):
+            aws_account_ids.append(aws_account_id)
+    if len(aws_account_ids) == 0:
+        aws_account_ids.append(default_aws_account_id)
+    return aws_account_ids
+
+
+# Get the ARN of the IAM role to assume in the specified AWS account; empty for the AWS account of this
+# Lambda function, which uses the execution role of this Lambda function
+def get_assume_role_arn(aws_account_id, lambda_aws_account_id, role_name):
+    if aws_account_id == lambda_aws_account_id:
+        return ''
+    lambda_aws_region = os.environ.get('AWS_REGION', os.environ['DEFAULT_AWS_REGION'])
+    if lambda_aws_region.startswith('cn-'):
+        aws_partition = 'aws-cn'
+    elif lambda_aws_region.startswith('us-gov-'):
+        aws_partition = 'aws-us-gov'
+    else:
+        aws_partition = 'aws'
+    return 'arn:{}:iam::{}:role/{}'.format(aws_partition, aws_account_id, role_name)
+
+
+# The name prefixes of the read only boto3 APIs, which can be run across multiple AWS regions
+READ_ONLY_BOTO3_API_NAME_PREFIXES = ('describe_', 'find_', 'get_', 'list_')
+
+
+# Get the max number of AWS account and AWS region targets that a boto3 API request can be run in concurrently
+def get_fan_out_max_concurrency():
+    return int(os.environ.get('FAN_OUT_MAX_CONCURRENCY', '8'))
+
+
+# Get the number of seconds to wait for a boto3 API request across targets, before returning partial results
+def get_fan_out_timeout():
+    return float(os.environ.get('FAN_OUT_TIMEOUT_SECONDS', '120'))
+
+
+# Thread pool to run a boto3 API request across AWS account and AWS region targets;
+# shared by the invocations of a warm Lambda container. A target that timed out keeps its worker until its
+# boto3 API calls complete, which are bounded by the botocore connect and read timeouts and retries, so that
+# the workers still held by the timed out targets are not available to the next invocation until then.
+FAN_OUT_EXECUTOR = None
+FAN_OUT_EXECUTOR_LOCK = threading.Lock()
+
+
+# Get the shared thread pool to run a boto3 API request across targets
+def get_fan_out_executor():
+    global FAN_OUT_EXECUTOR
+    with FAN_OUT_EXECUTOR_LOCK:
+        if FAN_OUT_EXECUTOR is None:
+            FAN_OUT_EXECUTOR = ThreadPoolExecutor(max_workers=get_fan_out_max_concurrency(),
+                                                  thread_name_prefix='fan-out')
+        return FAN_OUT_EXECUTOR
+
+
+# Process the boto3 API request for the specified AWS account and AWS region target, and measure its latency
+def process_boto3_api_request_for_target_with_latency(target, boto3_api_name, boto3_api_json_text):
+    start_time = time.monotonic()
+    response_body_text_list, function_response_state = process_boto3_api_request_for_region(target['AWSAccountId'],
+                                                                                             target['AWSRegion'],
+                                                                                             boto3_api_name,
+                                                                                             boto3_api_json_text,
+                                                                                             target['AssumeRoleArn'])
+    return response_body_text_list, function_response_state, time.monotonic() - start_time
+
+
+# Get the text of the per target latency stats
+def get_fan_out_latency_text(target_latencies, target_count):
+    if len(target_latencies) == 0:
+        return 'Latency :: none of the {} targets completed.'.format(target_count)
+    latencies = sorted(target_latencies.values())
+    slowest_target_label = max(target_latencies, key=target_latencies.get)
+    return ('Latency :: {} of {} targets completed; min {:.2f}s, median {:.2f}s, max {:.2f}s ("{}").'
+            .format(len(latencies), target_count, latencies[0], latencies[len(latencies) // 2],
+                    latencies[-1], slowest_target_label))
+
+
+# Process the boto3 API request concurrently across the specified AWS account and AWS region targets on the
+# shared thread pool, and aggregate the results by AWS account; the targets that do not complete within
+# the timeout are reported as timed out, and the results of the other targets are still returned.
+# The timed out targets that are still queued are cancelled, but the running ones cannot be interrupted,
+# and complete in the background on the shared thread pool.
+def process_boto3_api_request_for_targets(targets, boto3_api_name, boto3_api_json_text):
+    response_body_text_list, target_states, target_latencies = [], [], {}
+    executor = get_fan_out_executor()
+    futures = [executor.submit(process_boto3_api_request_for_target_with_latency, target, boto3_api_name,
+                               boto3_api_json_text)
+               for target in targets]
+    fan_out_timeout = get_fan_out_timeout()
+    done_futures, not_done_futures = wait(futures, timeout=fan_out_timeout)
+    multiple_aws_accounts = len(set(target['AWSAccountId'] for target in targets)) > 1
+    # Share the response size limit among the targets, after the AWS account headers, so that every target
+    # and the latency stats fit within the truncated response message
+    aws_account_header_length = sum(len('AWS Account Id "{}" :: '.format(aws_account_id))
+                                    for aws_account_id in set(target['AWSAccountId'] for target in targets)
+                                    ) if multiple_aws_accounts else 0
+    max_target_text_length = max(0, (20000 - aws_account_header_length) // len(targets) - 1)
+    previous_aws_account_id = ''
+    # The targets are ordered by AWS account, and then by AWS region
+    for target, future in zip(targets, futures):
+        if multiple_aws_accounts:
+            target_label = '{}/{}'.format(target['AWSAccountId'], target['AWSRegion'])
+            if target['AWSAccountId'] != previous_aws_account_id:
+                response_body_text_list.append('AWS Account Id "{}" ::'.format(target['AWSAccountId']))
+                previous_aws_account_id = target['AWSAccountId']
+        else:
+            target_label = target['AWSRegion']
+        if future in not_done_futures:
+            # Do not start the targets still queued; the running ones complete in the background
+            future.cancel()
+            target_state = 'FAILURE'
+            target_text = 'Timed out after {:.0f} seconds.'.format(fan_out_timeout)
+        elif future.exception() is not None:
+            target_state = 'FAILURE'
+            target_text = 'Failed with the error :: {}'.format(future.exception())
+        else:
+            target_text_list, target_state, target_latencies[target_label] = future.result()
+            target_text = ' '.join(target_text_list)
+        if target_label in target_latencies:
+            target_text = '[AWSRegion "{}", {:.2f}s] {}'.format(target['AWSRegion'], target_latencies[target_label],
+                                                                target_text)
+        else:
+            target_text = '[AWSRegion "{}"] {}'.format(target['AWSRegion'], target_text)
+        if target_state == 'FAILURE':
+            logging.warning('Target "{}" :: {}'.format(target_label, target_text))
+        response_body_text_list.append(target_text[:max_target_text_length])
+        target_states.append(target_state)
+    # Append the per target latency stats
+    response_body_text = get_fan_out_latency_text(target_latencies, len(targets))
+    response_body_text_list.append(response_body_text)
+    logging.info(response_body_text)
+    # The request fails only if it failed for every target
+    if all(target_state == 'REPROMPT' for target_state in target_states):
+        function_response_state = 'REPROMPT'
+    elif all(len(target_state) > 0 for target_state in target_states):
+        function_response_state = 'FAILURE'
     else:
-        # Loop through the specified regions
-        for aws_region in aws_regions:
-            s3_client = boto3.client('s3', region_name=aws_region, config=get_boto_config())
-            list_buckets_response = s3_client.list_buckets(
-                BucketRegion=aws_region,
-                MaxBuckets=int(os.environ['BOTO3_API_MAX_RESULTS'])
-            )
-            buckets = list_buckets_response['Buckets']
+        function_response_state = ''
+    return response_body_text_list, function_response_state
+
+
+# The max page size supported by the S3 list_buckets API
+S3_LIST_BUCKETS_PAGE_SIZE = 10000
+
+
+# Iterate lazily through the pages of the S3 buckets in the AWS account of the specified client by following
+# the ContinuationToken, optionally for a single region; the bucket name prefix is applied by S3
+def iterate_s3_bucket_pages(s3_client, bucket_region, bucket_name_prefix):
+    list_buckets_request = {'MaxBuckets': S3_LIST_BUCKETS_PAGE_SIZE}
+    if len(bucket_region) > 0:
+        list_buckets_request['BucketRegion'] = bucket_region
+    if len(bucket_name_prefix) > 0:
+        list_buckets_request['Prefix'] = bucket_name_prefix
+    while True:
+        list_buckets_response = s3_client.list_buckets(**list_buckets_request)
+        yield list_buckets_response.get('Buckets', [])
+        continuation_token = list_buckets_response.get('ContinuationToken', '')
+        if len(continuation_token) == 0:
+            break
+        list_buckets_request['ContinuationToken'] = continuation_token
+
+
+# List the S3 buckets of the specified region, or of all the regions if not specified, with the client of
+# that region, and merge each page into the specified bucket name to region map
+def add_s3_bucket_regions_for_region(s3_client, aws_region, bucket_name_prefix, bucket_regions, bucket_regions_lock):
+    if len(aws_region) > 0:
+        s3_client = get_boto3_client('s3', aws_region, get_boto3_api_max_concurrency(), 'adaptive',
+                                     get_boto3_client_assume_role_arn(s3_client))
+    for buckets in iterate_s3_bucket_pages(s3_client, aws_region, bucket_name_prefix):
+        with bucket_regions_lock:
             for bucket in buckets:
-                bucket_names_and_regions.append(
-                    {
-                        'name': bucket['Name'],
-                        'region': bucket['BucketRegion']
-                    }
-                )
+                bucket_regions[bucket['Name']] = bucket.get('BucketRegion', aws_region)
+
+
+# Get all the S3 bucket names (and their corresponding regions) from the specified regions, or from all
+# the regions if none are specified, in the AWS account of the specified client, optionally for a bucket
+# name prefix; the regions are listed concurrently, and their pages are merged as they arrive into a
+# de-duplicated bucket name to region map
+def get_all_s3_bucket_names_for_regions(s3_client, aws_regions, bucket_name_prefix=''):
+    bucket_regions, bucket_regions_lock = {}, threading.Lock()
+    aws_regions = list(OrderedDict.fromkeys(aws_region.strip() for aws_region in aws_regions
+                                            if len(aws_region.strip()) > 0))
+    if len(aws_regions) == 0:
+        add_s3_bucket_regions_for_region(s3_client, '', bucket_name_prefix, bucket_regions, bucket_regions_lock)
+    else:
+        with ThreadPoolExecutor(max_workers=min(len(aws_regions), get_boto3_api_max_concurrency())) as executor:
+            futures = [executor.submit(add_s3_bucket_regions_for_region, s3_client, aws_region, bucket_name_prefix,
+                                       bucket_regions, bucket_regions_lock)
+                       for aws_region in aws_regions]
+            # Raise the error of the first region that failed
+            for future in as_completed(futures):
+                future.result()
+    bucket_names_and_regions = [
+        {
+            'name': bucket_name,
+            'region': bucket_region
+        }
+        for bucket_name, bucket_region in sorted(bucket_regions.items())
+    ]
+    # Cache the regions of the listed buckets, to route the subsequent per bucket API calls to their regions
+    put_s3_bucket_regions(s3_client, bucket_names_and_regions)
     return bucket_names_and_regions
 
 
+# Get the tags of the specified S3 bucket with the client of the bucket's region;
+# a bucket without tags fails with NoSuchTagSet, which is returned as no tags
+def get_s3_bucket_tags(s3_client, bucket_name):
+    try:
+        return get_s3_client_for_bucket(s3_client, bucket_name).get_bucket_tagging(Bucket=bucket_name)['TagSet']
+    except ClientError as e:
+        # Filter the errors caused by no tags in buckets
+        if e.response['Error']['Code'] != 'NoSuchTagSet':
+            raise e
+        return []
+
+
 # Get all the S3 bucket names (and their corresponding regions)
-# from the specified regions in the current account
-def get_all_s3_bucket_names_for_regions_and_tags(s3_client, aws_regions, tag_key, tag_values):
-    bucket_names_and_regions_and_tags = []
-    bucket_names_and_regions = get_all_s3_bucket_names_for_regions(s3_client, aws_regions)
-    for bucket_name_and_region in bucket_names_and_regions:
-        bucket_name = bucket_name_and_region['name']
-        try:
-            get_bucket_tagging_response = s3_client.get_bucket_tagging(Bucket=bucket_name)
-            # Get the tags
-            tags = get_bucket_tagging_response['TagSet']
-            # Loop through the tags
-            for tag in tags:
+# from the specified regions in the AWS account of the specified client, that have the specified tag
+# with one of the values; the tags of the buckets are retrieved concurrently on a bounded thread pool,
+# and the scan stops once the specified max number of matching buckets (if greater than 0) is found.
+# A bucket whose tags cannot be retrieved (e.g. access denied, deleted since it was listed, or a connection
+# error) is skipped, and its error code, or the exception class name, recorded. Returns the matching buckets,
+# sorted by name, the number of buckets scanned, the total number of buckets, and the errors of the skipped
+# buckets by name
+def get_all_s3_bucket_names_for_regions_and_tags(s3_client, aws_regions, tag_key, tag_values, bucket_name_prefix='',
+                                                 max_matches=0):
+    # Strip each item in the tag values list
+    tag_values = set(tag_value.strip() for tag_value in tag_values)
+    bucket_names_and_regions = get_all_s3_bucket_names_for_regions(s3_client, aws_regions, bucket_name_prefix)
+    bucket_names_and_regions_and_tags, bucket_tag_errors = [], {}
+    scanned_bucket_count, next_bucket_index = 0, 0
+    max_concurrency = get_boto3_api_max_concurrency()
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        # Keep a window of at most max concurrency calls in flight, so that the remaining buckets
+        # are not scanned once enough matching buckets are found
+        pending_futures = {}
+        while True:
+            while ((len(pending_futures) < max_concurrency) and (next_bucket_index < len(bucket_names_and_regions))
+                   and ((max_matches <= 0) or (len(bucket_names_and_regions_and_tags) < max_matches))):
+                bucket_name_and_region = bucket_names_and_regions[next_bucket_index]
+                pending_futures[executor.submit(get_s3_bucket_tags, s3_client,
+                                                bucket_name_and_region['name'])] = bucket_name_and_region
+                next_bucket_index += 1
+            if len(pending_futures) == 0:
+                break
+            done_futures, _ = wait(pending_futures, return_when=FIRST_COMPLETED)
+            for future in done_futures:
+                bucket_name_and_region = pending_futures.pop(future)
+                scanned_bucket_count += 1
+                try:
+                    bucket_tags = future.result()
+                except ClientError as e:
+                    bucket_tag_errors[bucket_name_and_region['name']] = e.response['Error']['Code']
+                    continue
+                except Exception as exception:
+                    bucket_tag_errors[bucket_name_and_region['name']] = type(exception).__name__
+                    continue
                 # Check the tag key and value
-                if (tag['Key'] == tag_key) and (tag['Value'] in tag_values):
+                if any((tag['Key'] == tag_key) and (tag['Value'] in tag_values) for tag in bucket_tags):
                     bucket_names_and_regions_and_tags.append(bucket_name_and_region)
-        except ClientError as e:
-            # Filter the errors caused by no tags in buckets
-            if e.response['Error']['Code'] != 'NoSuchTagSet':
-                raise e
-    return bucket_names_and_regions_and_tags
+    bucket_names_and_regions_and_tags.sort(key=lambda bucket_name_and_region: bucket_name_and_region['name'])
+    if max_matches > 0:
+        bucket_names_and_regions_and_tags = bucket_names_and_regions_and_tags[:max_matches]
+    return bucket_names_and_regions_and_tags, scanned_bucket_count, len(bucket_names_and_regions), bucket_tag_errors
+
+
+# Get the text of the specified errors of the S3 buckets whose tags could not be retrieved,
+# with the bucket names grouped by error code
+def get_s3_bucket_tag_errors_text(bucket_tag_errors):
+    bucket_names_by_error_code = {}
+    for bucket_name, error_code in bucket_tag_errors.items():
+        bucket_names_by_error_code.setdefault(error_code, []).append(bucket_name)
+    return ('Skipped {} bucket(s) whose tags could not be retrieved :: {}. '
+            .format(len(bucket_tag_errors), '; '.join('Error ({}): {}'.format(error_code, sorted(bucket_names))
+                                                        for error_code, bucket_names in bucket_names_by_error_code.items())))
+
+
+# The max number of entries in the cached bucket name to bucket existence and region map
+S3_BUCKET_REGION_CACHE_MAX_ENTRIES = 10000
+
+
+# LRU cache of the existence and the region of the S3 buckets, keyed by the assumed IAM role of the client,
+# if any, and the bucket name, that is reused across invocations of a warm Lambda container
+S3_BUCKET_REGION_CACHE = OrderedDict()
+S3_BUCKET_REGION_CACHE_LOCK = threading.Lock()
+
 
+# Counts of the S3 bucket lookups answered from the cache (hit) or resolved with head_bucket (miss),
+# across invocations of a warm Lambda container
+S3_BUCKET_REGION_CACHE_COUNTS = {'hit': 0, 'miss': 0}
 
-# Check if the specified S3 bucket exists in the specified region
-def does_s3_bucket_exist_for_name(s3_client, aws_regions, bucket_name):
-    # Get all the bucket names
-    retrieved_bucket_names_and_regions = get_all_s3_bucket_names_for_regions(s3_client, aws_regions)
-    for retrieved_bucket_names_and_region in retrieved_bucket_names_and_regions:
-        if retrieved_bucket_names_and_region['name'] == bucket_name:
-            return True
-    return False
+
+# Get the TTL (in seconds) of the cached existing S3 buckets and their regions
+def get_s3_bucket_region_ttl():
+    return int(os.environ.get('S3_BUCKET_REGION_TTL_SECONDS', '3600'))
+
+
+# Get the TTL (in seconds) of the cached non-existing S3 buckets; kept short so that new buckets are found soon
+def get_s3_bucket_not_found_ttl():
+    return int(os.environ.get('S3_BUCKET_NOT_FOUND_TTL_SECONDS', '30'))
+
+
+# Cache the existence and the region of the specified S3 bucket, and evict the least recently used entries
+# beyond the max size
+def put_s3_bucket_region(s3_client, bucket_name, bucket_exists, bucket_region):
+    bucket_cache_key = (get_boto3_client_assume_role_arn(s3_client), bucket_name)
+    with S3_BUCKET_REGION_CACHE_LOCK:
+        S3_BUCKET_REGION_CACHE[bucket_cache_key] = {
+            'Exists': bucket_exists,
+            'Region': bucket_region,
+            'ResolvedTime': time.monotonic()
+        }
+        S3_BUCKET_REGION_CACHE.move_to_end(bucket_cache_key)
+        while len(S3_BUCKET_REGION_CACHE) > S3_BUCKET_REGION_CACHE_MAX_ENTRIES:
+            S3_BUCKET_REGION_CACHE.popitem(last=False)
+
+
+# Cache the specified listed S3 buckets as existing, along with their regions
+def put_s3_bucket_regions(s3_client, bucket_names_and_regions):
+    assume_role_arn = get_boto3_client_assume_role_arn(s3_client)
+    resolved_time = time.monotonic()
+    with S3_BUCKET_REGION_CACHE_LOCK:
+        for bucket_name_and_region in bucket_names_and_regions:
+            if len(bucket_name_and_region['region']) > 0:
+                bucket_cache_key = (assume_role_arn, bucket_name_and_region['name'])
+                S3_BUCKET_REGION_CACHE[bucket_cache_key] = {
+                    'Exists': True,
+                    'Region': bucket_name_and_region['region'],
+                    'ResolvedTime': resolved_time
+                }
+                S3_BUCKET_REGION_CACHE.move_to_end(bucket_cache_key)
+        while len(S3_BUCKET_REGION_CACHE) > S3_BUCKET_REGION_CACHE_MAX_ENTRIES:
+            S3_BUCKET_REGION_CACHE.popitem(last=False)
+
+
+# Resolve the existence and the region of the specified S3 bucket with a single head_bucket call; the region
+# is read from the "x-amz-bucket-region" header, which S3 also returns with the 301, 400 and 403 errors.
+# A bucket that exists but is not accessible to the client (403) is reported as existing and not accessible;
+# a bucket with an invalid name is reported as not existing.
+def resolve_s3_bucket_region(s3_client, bucket_name):
+    try:
+        head_bucket_response = s3_client.head_bucket(Bucket=bucket_name)
+        bucket_exists = True
+        bucket_accessible = True
+        bucket_region = head_bucket_response.get('BucketRegion', '')
+        if len(bucket_region) == 0:
+            bucket_region = head_bucket_response['ResponseMetadata']['HTTPHeaders'].get('x-amz-bucket-region', '')
+    except ClientError as exception:
+        error_code = exception.response['Error']['Code']
+        if error_code not in ('404', 'NoSuchBucket', '403', 'AccessDenied', 'Forbidden'):
+            raise exception
+        bucket_exists = error_code in ('403', 'AccessDenied', 'Forbidden')
+        bucket_accessible = False
+        bucket_region = exception.response.get('ResponseMetadata', {}).get('HTTPHeaders', {}).get('x-amz-bucket-region', '')
+    except ParamValidationError:
+        bucket_exists = False
+        bucket_accessible = False
+        bucket_region = ''
+    return bucket_exists, bucket_accessible, bucket_region
+
+
+# Get the existence, the accessibility and the region of the specified S3 bucket, from the cache if the cached
+# entry has not expired; the existing and the non-existing S3 buckets are cached with separate TTLs. A bucket
+# that exists but is not accessible is not cached, so that a change of its permissions is seen on the next call.
+def get_s3_bucket_region_info(s3_client, bucket_name):
+    bucket_cache_key = (get_boto3_client_assume_role_arn(s3_client), bucket_name)
+    with S3_BUCKET_REGION_CACHE_LOCK:
+        bucket_region_info = S3_BUCKET_REGION_CACHE.get(bucket_cache_key)
+        if bucket_region_info is not None:
+            bucket_region_ttl = get_s3_bucket_region_ttl() if bucket_region_info['Exists'] else get_s3_bucket_not_found_ttl()
+            if (time.monotonic() - bucket_region_info['ResolvedTime']) <= bucket_region_ttl:
+                S3_BUCKET_REGION_CACHE.move_to_end(bucket_cache_key)
+                S3_BUCKET_REGION_CACHE_COUNTS['hit'] += 1
+                return {'Exists': bucket_region_info['Exists'], 'Accessible': bucket_region_info['Exists'],
+                        'Region': bucket_region_info['Region']}
+        S3_BUCKET_REGION_CACHE_COUNTS['miss'] += 1
+    # Resolve outside the lock, so that different S3 buckets are resolved concurrently
+    bucket_exists, bucket_accessible, bucket_region = resolve_s3_bucket_region(s3_client, bucket_name)
+    if bucket_accessible or (not bucket_exists):
+        put_s3_bucket_region(s3_client, bucket_name, bucket_exists, bucket_region)
+    logging.info('Resolved S3 bucket "{}" :: exists: {}, accessible: {}, region: "{}". Cache hits: {}, misses: {}.'
+                 .format(bucket_name, bucket_exists, bucket_accessible, bucket_region,
+                         S3_BUCKET_REGION_CACHE_COUNTS['hit'], S3_BUCKET_REGION_CACHE_COUNTS['miss']))
+    return {'Exists': bucket_exists, 'Accessible': bucket_accessible, 'Region': bucket_region}
+
+
+# Get the cached Amazon S3 boto3 client for the region of the specified S3 bucket, in the AWS account of the
+# specified client, so that the per bucket API calls are not redirected from another region; the client
+# of the specified client's region is used if the region of the bucket is unknown
+def get_s3_client_for_bucket(s3_client, bucket_name):
+    bucket_region = get_s3_bucket_region_info(s3_client, bucket_name)['Region']
+    if len(bucket_region) == 0:
+        bucket_region = s3_client.meta.region_name
+    return get_boto3_client('s3', bucket_region, get_boto3_api_max_concurrency(), 'adaptive',
+                            get_boto3_client_assume_role_arn(s3_client))
+
+
+# Get the existence and the region of the specified S3 bucket; an error while resolving the bucket is
+# returned with the bucket, instead of being raised, so that it does not fail the other buckets. A bucket
+# that exists but is not accessible is returned with the "AccessDenied" error.
+def get_s3_bucket_region_info_or_error(s3_client, bucket_name):
+    try:
+        bucket_region_info = get_s3_bucket_region_info(s3_client, bucket_name)
+        bucket_region_info['Error'] = ('AccessDenied' if bucket_region_info['Exists'] and
+                                       (not bucket_region_info['Accessible']) else '')
+    except ClientError as exception:
+        bucket_region_info = {'Exists': False, 'Region': '',
+                              'Error': exception.response.get('Error', {}).get('Code', str(exception))}
+    except Exception as exception:
+        bucket_region_info = {'Exists': False, 'Region': '', 'Error': str(exception)}
+    return bucket_region_info
+
+
+# Get the specified S3 bucket names and their corresponding regions, for the buckets that exist;
+# the buckets are resolved concurrently on a bounded thread pool. Also, returns the names of the
+# specified buckets that do not exist, and the errors of the buckets that could not be resolved by name
+def get_s3_bucket_names_and_regions_for_names(s3_client, bucket_names):
+    bucket_names = list(OrderedDict.fromkeys(bucket_name.strip() for bucket_name in bucket_names
+                                             if len(bucket_name.strip()) > 0))
+    with ThreadPoolExecutor(max_workers=get_boto3_api_max_concurrency()) as executor:
+        # The results of map are in the order of the bucket names irrespective of the completion order
+        bucket_region_infos = list(executor.map(partial(get_s3_bucket_region_info_or_error, s3_client), bucket_names))
+    bucket_names_and_regions = [
+        {
+            'name': bucket_name,
+            'region': bucket_region_info['Region']
+        }
+        for bucket_name, bucket_region_info in zip(bucket_names, bucket_region_infos)
+        if bucket_region_info['Exists'] and (len(bucket_region_info['Error']) == 0)
+    ]
+    missing_bucket_names = [bucket_name for bucket_name, bucket_region_info in zip(bucket_names, bucket_region_infos)
+                            if (not bucket_region_info['Exists']) and (len(bucket_region_info['Error']) == 0)]
+    bucket_errors = {bucket_name: bucket_region_info['Error']
+                     for bucket_name, bucket_region_info in zip(bucket_names, bucket_region_infos)
+                     if len(bucket_region_info['Error']) > 0}
+    return bucket_names_and_regions, missing_bucket_names, bucket_errors
+
+
+# Get the versioning status of the specified S3 bucket
+def get_s3_bucket_versioning_posture(bucket_s3_client, bucket_name):
+    return bucket_s3_client.get_bucket_versioning(Bucket=bucket_name).get('Status', 'Disabled')
+
+
+# Get the replication status of the specified S3 bucket; enabled if any of its replication rules is enabled
+def get_s3_bucket_replication_posture(bucket_s3_client, bucket_name):
+    try:
+        replication_rules = bucket_s3_client.get_bucket_replication(Bucket=bucket_name)['ReplicationConfiguration']['Rules']
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ReplicationConfigurationNotFoundError':
+            raise e
+        return 'Disabled'
+    return 'Enabled' if any(rule['Status'] == 'Enabled' for rule in replication_rules) else 'Disabled'
+
+
+# Get the lifecycle status of the specified S3 bucket; enabled if any of its lifecycle rules is enabled
+def get_s3_bucket_lifecycle_posture(bucket_s3_client, bucket_name):
+    try:
+        lifecycle_rules = bucket_s3_client.get_bucket_lifecycle_configuration(Bucket=bucket_name)['Rules']
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'NoSuchLifecycleConfiguration':
+            raise e
+        return 'Disabled'
+    return 'Enabled' if any(rule['Status'] == 'Enabled' for rule in lifecycle_rules) else 'Disabled'
+
+
+# Get the Object Lock status of the specified S3 bucket, with the mode of its default retention, if any
+def get_s3_bucket_object_lock_posture(bucket_s3_client, bucket_name):
+    try:
+        object_lock_configuration = (bucket_s3_client.get_object_lock_configuration(Bucket=bucket_name)
+                                     ['ObjectLockConfiguration'])
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ObjectLockConfigurationNotFoundError':
+            raise e
+        return 'Disabled'
+    if object_lock_configuration.get('ObjectLockEnabled') != 'Enabled':
+        return 'Disabled'
+    default_retention = object_lock_configuration.get('Rule', {}).get('DefaultRetention', {})
+    return 'Enabled ({})'.format(default_retention['Mode']) if 'Mode' in default_retention else 'Enabled'
+
+
+# Get the server side encryption algorithm of the default encryption of the specified S3 bucket
+def get_s3_bucket_encryption_posture(bucket_s3_client, bucket_name):
+    try:
+        encryption_rules = (bucket_s3_client.get_bucket_encryption(Bucket=bucket_name)
+                            ['ServerSideEncryptionConfiguration']['Rules'])
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ServerSideEncryptionConfigurationNotFoundError':
+            raise e
+        return 'Disabled'
+    encryption_algorithms = [rule['ApplyServerSideEncryptionByDefault']['SSEAlgorithm'] for rule in encryption_rules
+                             if 'ApplyServerSideEncryptionByDefault' in rule]
+    return encryption_algorithms[0] if len(encryption_algorithms) > 0 else 'Disabled'
+
+
+# The data protection settings of a S3 bucket that are checked by the posture scan, and the functions that get them
+S3_BUCKET_DATA_PROTECTION_POSTURE_CHECKS = (
+    ('Versioning', get_s3_bucket_versioning_posture),
+    ('Replication', get_s3_bucket_replication_posture),
+    ('Lifecycle', get_s3_bucket_lifecycle_posture),
+    ('ObjectLock', get_s3_bucket_object_lock_posture),
+    ('Encryption', get_s3_bucket_encryption_posture)
+)
+
+
+# Get one data protection setting of the specified S3 bucket with the client of the bucket's region;
+# an error is returned as the setting's value, so that it does not fail the scan of the other buckets
+def get_s3_bucket_data_protection_setting(s3_client, bucket_name, posture_check_function):
+    try:
+        return posture_check_function(get_s3_client_for_bucket(s3_client, bucket_name), bucket_name)
+    except ClientError as e:
+        return 'Error ({})'.format(e.response['Error']['Code'])
+    except Exception as exception:
+        return 'Error ({})'.format(type(exception).__name__)
+
+
+# Get the data protection posture (versioning, replication, lifecycle, Object Lock and default encryption)
+# of the specified S3 buckets; all the settings of all the buckets are retrieved concurrently on a bounded
+# thread pool. Returns the per bucket postures, in the order of the specified buckets
+def get_s3_buckets_data_protection_posture(s3_client, bucket_names_and_regions):
+    bucket_postures = [
+        {
+            'name': bucket_name_and_region['name'],
+            'region': bucket_name_and_region['region']
+        }
+        for bucket_name_and_region in bucket_names_and_regions
+    ]
+    with ThreadPoolExecutor(max_workers=get_boto3_api_max_concurrency()) as executor:
+        futures = {
+            executor.submit(get_s3_bucket_data_protection_setting, s3_client, bucket_posture['name'],
+                            posture_check_function): (bucket_posture, posture_check_name)
+            for bucket_posture in bucket_postures
+            for posture_check_name, posture_check_function in S3_BUCKET_DATA_PROTECTION_POSTURE_CHECKS
+        }
+        for future in as_completed(futures):
+            bucket_posture, posture_check_name = futures[future]
+            bucket_posture[posture_check_name] = future.result()
+    return bucket_postures
+
+
+# Get the compact text of the data protection posture matrix of the specified S3 buckets, with a row per bucket
+def get_s3_buckets_data_protection_posture_text(bucket_postures):
+    posture_check_names = [posture_check_name for posture_check_name, _ in S3_BUCKET_DATA_PROTECTION_POSTURE_CHECKS]
+    bucket_posture_texts = ['"{}" ({}): {}'.format(bucket_posture['name'], bucket_posture['region'],
+                                                   ', '.join(bucket_posture[posture_check_name]
+                                                             for posture_check_name in posture_check_names))
+                            for bucket_posture in bucket_postures]
+    return ('Data protection posture per bucket as "name" (region): {} :: {}'
+            .format(', '.join(posture_check_names), '; '.join(bucket_posture_texts)))
+
+
+# The data protection settings of a S3 bucket, any of which protects the bucket when enabled
+S3_BUCKET_PROTECTING_POSTURE_CHECK_NAMES = ('Versioning', 'Replication', 'ObjectLock')
+
+
+# Get the aggregate counts of the values of each data protection setting, the names of the S3 buckets that
+# have none of versioning, replication and Object Lock enabled, and the errors of the protecting settings
+# by name of the S3 buckets that have none of them enabled, but failed to get one or more of them; the
+# protection of the latter buckets could not be determined, so they are not reported as unprotected
+def get_s3_buckets_data_protection_summary(bucket_postures):
+    setting_value_counts = OrderedDict((posture_check_name, {})
+                                       for posture_check_name, _ in S3_BUCKET_DATA_PROTECTION_POSTURE_CHECKS)
+    unprotected_bucket_names, undetermined_bucket_errors = [], {}
+    for bucket_posture in bucket_postures:
+        for posture_check_name, value_counts in setting_value_counts.items():
+            setting_value = bucket_posture[posture_check_name]
+            value_counts[setting_value] = value_counts.get(setting_value, 0) + 1
+        if any(bucket_posture[posture_check_name].startswith('Enabled')
+               for posture_check_name in S3_BUCKET_PROTECTING_POSTURE_CHECK_NAMES):
+            continue
+        bucket_errors = {posture_check_name: bucket_posture[posture_check_name]
+                         for posture_check_name in S3_BUCKET_PROTECTING_POSTURE_CHECK_NAMES
+                         if bucket_posture[posture_check_name].startswith('Error')}
+        if len(bucket_errors) > 0:
+            undetermined_bucket_errors[bucket_posture['name']] = bucket_errors
+        else:
+            unprotected_bucket_names.append(bucket_posture['name'])
+    return setting_value_counts, unprotected_bucket_names, undetermined_bucket_errors
+
+
+# Counts of the boto3 API JSONs that passed (hit) or failed (miss) the local validation,
+# across invocations of a warm Lambda container
+BOTO3_API_JSON_LOCAL_VALIDATION_COUNTS = {'hit': 0, 'miss': 0}
+
+
+# Find the values in the specified boto3 API parameter that are not in the enum of its shape
+def find_boto3_api_param_enum_errors(shape, param, param_name):
+    enum_errors = []
+    if (shape.type_name == 'structure') and isinstance(param, dict):
+        for member_name, member_param in param.items():
+            if member_name in shape.members:
+                member_param_name = '{}.{}'.format(param_name, member_name) if (len(param_name) > 0) else member_name
+                enum_errors.extend(find_boto3_api_param_enum_errors(shape.members[member_name], member_param,
+                                                                    member_param_name))
+    elif (shape.type_name == 'list') and isinstance(param, list):
+        for index, member_param in enumerate(param):
+            enum_errors.extend(find_boto3_api_param_enum_errors(shape.member, member_param,
+                                                                '{}[{}]'.format(param_name, index)))
+    elif (shape.type_name == 'map') and isinstance(param, dict):
+        for map_key, map_value in param.items():
+            enum_errors.extend(find_boto3_api_param_enum_errors(shape.value, map_value,
+                                                                '{}.{}'.format(param_name, map_key)))
+    elif (shape.type_name == 'string') and (len(shape.enum) > 0) and isinstance(param, str) and (param not in shape.enum):
+        enum_errors.append('Invalid value for parameter {}, value: {}, valid values: {}'
+                           .format(param_name, param, ', '.join(shape.enum)))
+    return enum_errors
+
+
+# Validate the boto3 API JSON locally against the service model of the specified boto3 client;
+# checks the required members, the unknown members, the types and the enums, and returns the list of errors
+def validate_boto3_api_json(boto3_client, boto3_api_name, boto3_api_json_text):
+    try:
+        boto3_api_request_json = json.loads(boto3_api_json_text)
+    except json.JSONDecodeError as exception:
+        return ['The boto3 API JSON is not valid JSON :: {}'.format(exception)]
+    if boto3_api_request_json is None:
+        boto3_api_request_json = {}
+    if not isinstance(boto3_api_request_json, dict):
+        return ['The boto3 API JSON is not a JSON object.']
+    operation_name = boto3_client.meta.method_to_api_mapping.get(boto3_api_name)
+    if operation_name is None:
+        return ['Unknown boto3 API "{}".'.format(boto3_api_name)]
+    input_shape = boto3_client.meta.service_model.operation_model(operation_name).input_shape
+    validation_errors = []
+    if input_shape is None:
+        if len(boto3_api_request_json) > 0:
+            validation_errors.append('The boto3 API "{}" does not take any parameters.'.format(boto3_api_name))
+        return validation_errors
+    validation_report = ParamValidator().validate(boto3_api_request_json, input_shape)
+    if validation_report.has_errors():
+        validation_errors.extend(validation_report.generate_report().splitlines())
+    validation_errors.extend(find_boto3_api_param_enum_errors(input_shape, boto3_api_request_json, ''))
+    return validation_errors
 
 
 # Process the prompt and the response by invoking the specified LLM
-def process_prompt(aws_account_id, aws_region, boto3_api_name, user_input, generated_boto3_json_str):
-    # Instantiate the Amazon Bedrock runtime boto3 client for the specific region
-    bedrock_rt_client = boto3.client('bedrock-runtime', region_name=aws_region, config=get_boto_config())
-    # Read the prompt templates and perform variable substitution
-    prompt_templates_dir = '.'
+def process_prompt(aws_account_id, aws_region, boto3_api_name, user_input, generated_boto3_json_str,
+                   validation_errors):
+    # Get the cached Amazon Bedrock runtime boto3 client for the specific region
+    bedrock_rt_client = get_boto3_client('bedrock-runtime', aws_region)
+    # Render the preloaded prompt templates with the variable values
     system_prompts = [
         {
-            "text": read_file(os.path.join(prompt_templates_dir, os.environ['SYSTEM_PROMPT_FILE_NAME']), 'r')
+            "text": render_prompt_template(PROMPT_TEMPLATES['SYSTEM_PROMPT_FILE_NAME'], {})
         }
     ]
-    user_prompt_content = read_file(os.path.join(prompt_templates_dir, os.environ['USER_PROMPT_FILE_NAME']), 'r')
-    user_prompt_content = user_prompt_content.replace('{aws_account_id}', aws_account_id)
-    user_prompt_content = user_prompt_content.replace('{aws_region}', aws_region)
-    user_prompt_content = user_prompt_content.replace('{boto3_api_name}', boto3_api_name)
-    user_prompt_content = user_prompt_content.replace('{user_input}', user_input)
-    user_prompt_content = user_prompt_content.replace('{generated_boto3_json}', generated_boto3_json_str)
+    placeholder_values = {
+        'aws_account_id': aws_account_id,
+        'aws_region': aws_region,
+        'boto3_api_name': boto3_api_name,
+        'user_input': user_input,
+        'generated_boto3_json': generated_boto3_json_str,
+        'validation_errors': '\n'.join(validation_errors)
+    }
+    user_prompt_content = render_prompt_template(PROMPT_TEMPLATES['USER_PROMPT_FILE_NAME'], placeholder_values)
     messages = [
         {
             "role": "user",
@@ -185,8 +1107,11 @@ def process_prompt(aws_account_id, aws_region, boto3_api_name, user_input, gener
             ]
         }
     ]
-    # Invoke the LLM, prepare and return the response
-    llm_response = invoke_llm(bedrock_rt_client, system_prompts, messages)
+    # Invoke the LLM or use its cached response, prepare and return the response
+    cache_key = get_llm_response_cache_key(('SYSTEM_PROMPT_FILE_NAME', 'USER_PROMPT_FILE_NAME'),
+                                           dict(placeholder_values,
+                                                generated_boto3_json=canonicalize_boto3_json(generated_boto3_json_str)))
+    llm_response = invoke_llm_with_cache(bedrock_rt_client, system_prompts, messages, cache_key, 'VALIDATED_BOTO3_JSON')
     change_log = substring_between(llm_response, '<CHANGELOG>', '</CHANGELOG>')
     logging.info('LLM validation and update complete. Change log :: {}'.format(change_log))
     updated_generated_json = substring_between(llm_response, '<VALIDATED_BOTO3_JSON>', '</VALIDATED_BOTO3_JSON>')
@@ -195,21 +1120,23 @@ def process_prompt(aws_account_id, aws_region, boto3_api_name, user_input, gener
 
 # Process the prompt for the boto3 API retry and the response by invoking the specified LLM
 def process_prompt_for_boto3_api_retry(aws_account_id, aws_region, boto3_api_name, boto3_json_str, boto3_error):
-    # Instantiate the Amazon Bedrock runtime boto3 client for the specific region
-    bedrock_rt_client = boto3.client('bedrock-runtime', region_name=aws_region, config=get_boto_config())
-    # Read the prompt templates and perform variable substitution
-    prompt_templates_dir = '.'
+    # Get the cached Amazon Bedrock runtime boto3 client for the specific region
+    bedrock_rt_client = get_boto3_client('bedrock-runtime', aws_region)
+    # Render the preloaded prompt templates with the variable values
     system_prompts = [
         {
-            "text": read_file(os.path.join(prompt_templates_dir, os.environ['SYSTEM_PROMPT_FOR_BOTO3_RETRY_FILE_NAME']), 'r')
+            "text": render_prompt_template(PROMPT_TEMPLATES['SYSTEM_PROMPT_FOR_BOTO3_RETRY_FILE_NAME'], {})
         }
     ]
-    user_prompt_content = read_file(os.path.join(prompt_templates_dir, os.environ['USER_PROMPT_FOR_BOTO3_RETRY_FILE_NAME']), 'r')
-    user_prompt_content = user_prompt_content.replace('{aws_account_id}', aws_account_id)
-    user_prompt_content = user_prompt_content.replace('{aws_region}', aws_region)
-    user_prompt_content = user_prompt_content.replace('{boto3_api_name}', boto3_api_name)
-    user_prompt_content = user_prompt_content.replace('{boto3_json}', boto3_json_str)
-    user_prompt_content = user_prompt_content.replace('{boto3_error}', boto3_error)
+    placeholder_values = {
+        'aws_account_id': aws_account_id,
+        'aws_region': aws_region,
+        'boto3_api_name': boto3_api_name,
+        'boto3_json': boto3_json_str,
+        'boto3_error': boto3_error
+    }
+    user_prompt_content = render_prompt_template(PROMPT_TEMPLATES['USER_PROMPT_FOR_BOTO3_RETRY_FILE_NAME'],
+                                                 placeholder_values)
     messages = [
         {
             "role": "user",
@@ -220,11 +1147,25 @@ def process_prompt_for_boto3_api_retry(aws_account_id, aws_region, boto3_api_nam
             ]
         }
     ]
-    # Invoke the LLM, prepare and return the response
-    llm_response = invoke_llm(bedrock_rt_client, system_prompts, messages)
+    # Invoke the LLM or use its cached response, prepare and return the response; unlike the validation,
+    # the fix is not cached here, but only once the boto3 API call retried with it succeeds
+    cache_key = get_llm_response_cache_key(('SYSTEM_PROMPT_FOR_BOTO3_RETRY_FILE_NAME', 'USER_PROMPT_FOR_BOTO3_RETRY_FILE_NAME'),
+                                           dict(placeholder_values, boto3_json=canonicalize_boto3_json(boto3_json_str)))
+    llm_response = get_cached_llm_response(cache_key)
+    token_usage = None
+    if llm_response is None:
+        llm_response, token_usage = invoke_llm(bedrock_rt_client, system_prompts, messages)
+    else:
+        logging.info('Using the cached LLM response.')
+    log_llm_response_cache_stats()
     fixed_boto3_json = substring_between(llm_response, '<FIXED_BOTO3_JSON>', '</FIXED_BOTO3_JSON>')
     logging.info('LLM fix to boto3 JSON completed based on the specified boto3 error.')
-    return fixed_boto3_json
+    llm_fix = {
+        'cache_key': cache_key,
+        'llm_response': llm_response,
+        'token_usage': token_usage
+    }
+    return fixed_boto3_json, llm_fix
 
 
 # Invoke the specified LLM through Amazon Bedrock's Converse API
@@ -257,8 +1198,8 @@ def invoke_llm(bedrock_rt_client, system_prompts, messages):
         logging.info('Prompt latency = {} second(s)'.format(int(metrics['latencyMs']) / 1000))
         logging.info('PROMPT: {}'.format(messages[0]['content'][0]))
         logging.info('RESPONSE: {}'.format(prompt_response))
-    # Return the LLM response text
-    return prompt_response
+    # Return the LLM response text and the token usage
+    return prompt_response, response['usage']
 
 
 # Invoke the specified boto3 API
@@ -281,85 +1222,147 @@ def invoke_boto3_api(s3_client, boto3_api_name, boto3_api_request_json):
         raise exception
 
 
-# Invoke boto3 APIs with LLM intervened retry
+# Get the response for the boto3 API errors that are handled as a response message;
+# returns None if the error is not handled
+def get_handled_boto3_api_error_response(boto3_api_name, boto3_api_request_json, exception):
+    if not isinstance(exception, ClientError):
+        return None
+    if (boto3_api_name == 'get_bucket_replication') and (exception.response['Error']['Code'] == 'ReplicationConfigurationNotFoundError'):
+        return {'handled_exception_message': 'No replication information found on S3 bucket named "{}".'.format(boto3_api_request_json['Bucket'])}
+    elif (boto3_api_name == 'get_bucket_lifecycle_configuration') and (exception.response['Error']['Code'] == 'NoSuchLifecycleConfiguration'):
+        return {'handled_exception_message': 'No lifecycle information found on S3 bucket named "{}".'.format(boto3_api_request_json['Bucket'])}
+    return None
+
+
+# Error codes of the boto3 API errors that a change to the request JSON can fix
+BOTO3_API_VALIDATION_ERROR_CODES = frozenset((
+    'InvalidArgument',
+    'InvalidInput',
+    'InvalidParameter',
+    'InvalidParameterCombination',
+    'InvalidParameterException',
+    'InvalidParameterValue',
+    'InvalidParameterValueException',
+    'InvalidRequest',
+    'InvalidRequestException',
+    'MalformedXML',
+    'MissingParameter',
+    'MissingParameterValueException',
+    'ValidationError',
+    'ValidationException'
+))
+
+
+# Error codes of the boto3 API errors that may succeed when retried as is
+BOTO3_API_TRANSIENT_ERROR_CODES = frozenset((
+    'InternalError',
+    'InternalFailure',
+    'InternalServerError',
+    'InternalServiceError',
+    'PriorRequestNotComplete',
+    'ProvisionedThroughputExceededException',
+    'RequestLimitExceeded',
+    'RequestThrottled',
+    'RequestThrottledException',
+    'RequestTimeout',
+    'RequestTimeoutException',
+    'ServiceUnavailable',
+    'ServiceUnavailableException',
+    'SlowDown',
+    'Throttling',
+    'ThrottlingException',
+    'TooManyRequestsException'
+))
+
+
+# Classify the boto3 API error as 'VALIDATION' (can be fixed by the LLM), 'TRANSIENT' (can be retried as is)
+# or 'TERMINAL' (cannot be fixed by retrying)
+def classify_boto3_api_error(exception):
+    if isinstance(exception, (ParamValidationError, TypeError)):
+        return 'VALIDATION'
+    if isinstance(exception, (EndpointConnectionError, ConnectTimeoutError, HTTPClientError)):
+        return 'TRANSIENT'
+    if isinstance(exception, ClientError):
+        error_code = exception.response.get('Error', {}).get('Code', '')
+        if (error_code in BOTO3_API_VALIDATION_ERROR_CODES) or error_code.endswith('.Malformed'):
+            return 'VALIDATION'
+        if ((error_code in BOTO3_API_TRANSIENT_ERROR_CODES)
+                or (exception.response.get('ResponseMetadata', {}).get('HTTPStatusCode', 0) >= 500)):
+            return 'TRANSIENT'
+    return 'TERMINAL'
+
+
+# The base and the max backoff (in seconds) of the retries after transient boto3 API errors
+BOTO3_API_RETRY_BASE_BACKOFF_SECONDS = 1
+BOTO3_API_RETRY_MAX_BACKOFF_SECONDS = 20
+
+
+# Get the jittered exponential backoff (in seconds) before the specified retry attempt
+def get_boto3_api_retry_backoff_seconds(retry_attempt):
+    return random.uniform(0, min(BOTO3_API_RETRY_MAX_BACKOFF_SECONDS,
+                                 BOTO3_API_RETRY_BASE_BACKOFF_SECONDS * (2 ** (retry_attempt - 1))))
+
+
+# Invoke boto3 APIs with a retry pipeline based on the error class; validation errors are fixed by the LLM
+# and retried, transient errors are retried after a jittered backoff and terminal errors are raised right away.
+# Each path is bounded by its own configurable attempt budget.
 def invoke_boto3_api_with_llm_intervened_retry(aws_account_id, aws_region, s3_client,
                                                boto3_api_name, boto3_api_request_json):
-    try:
+    llm_fix_attempts = 0
+    transient_retry_attempts = 0
+    # The LLM fix of the boto3 API JSON request that is being retried, if any
+    llm_fix = None
+    while True:
         try:
-            response = invoke_boto3_api(s3_client, boto3_api_name, boto3_api_request_json)
-        except ClientError as e:
-            if (boto3_api_name == 'get_bucket_replication') and (e.response['Error']['Code'] == 'ReplicationConfigurationNotFoundError'):
-                response = {'handled_exception_message': 'No replication information found on S3 bucket named "{}".'.format(boto3_api_request_json['Bucket'])}
-            elif (boto3_api_name == 'get_bucket_lifecycle_configuration') and (e.response['Error']['Code'] == 'NoSuchLifecycleConfiguration'):
-                response = {'handled_exception_message': 'No lifecycle information found on S3 bucket named "{}".'.format(boto3_api_request_json['Bucket'])}
-            else:
-                logging.info('Error occurred when invoking boto3 API "{}" :: {}'.format(boto3_api_name, e))
+            boto3_api_response = invoke_boto3_api(s3_client, boto3_api_name, boto3_api_request_json)
+            # Cache the LLM fix only now that the call retried with it has succeeded
+            put_cached_llm_fix(llm_fix)
+            return boto3_api_response
+        except Exception as exception:
+            handled_error_response = get_handled_boto3_api_error_response(boto3_api_name,
+                                                                          boto3_api_request_json,
+                                                                          exception)
+            if handled_error_response is not None:
+                # The call retried with the LLM fix, if any, was accepted by the boto3 API
+                put_cached_llm_fix(llm_fix)
+                return handled_error_response
+            boto3_api_error_class = classify_boto3_api_error(exception)
+            logging.info('{} error occurred when invoking boto3 API "{}" :: {}'
+                         .format(boto3_api_error_class, boto3_api_name, exception))
+            # The call retried with the LLM fix failed; evict the fix, if it was cached, so that it is not replayed
+            if (llm_fix is not None) and (boto3_api_error_class != 'TRANSIENT'):
+                evict_cached_llm_response(llm_fix['cache_key'])
+                llm_fix = None
+            if (boto3_api_error_class == 'VALIDATION') \
+                    and (llm_fix_attempts < int(os.environ.get('BOTO3_API_MAX_LLM_FIX_ATTEMPTS', '1'))):
+                llm_fix_attempts += 1
                 logging.info('Fixing the boto3 API JSON request using LLM...')
-                fixed_boto3_api_request_json = json.loads(process_prompt_for_boto3_api_retry(aws_account_id,
-                                                                                             aws_region,
-                                                                                             boto3_api_name,
-                                                                                             json.dumps(boto3_api_request_json),
-                                                                                             str(e)))
+                fixed_boto3_json, llm_fix = process_prompt_for_boto3_api_retry(aws_account_id,
+                                                                               aws_region,
+                                                                               boto3_api_name,
+                                                                               json.dumps(boto3_api_request_json),
+                                                                               str(exception))
+                boto3_api_request_json = json.loads(fixed_boto3_json)
                 logging.info('Completed fixing the boto3 API JSON request using LLM.')
                 logging.info('Retrying boto3 API "{}" after fixing the JSON request using LLM...'.format(boto3_api_name))
-                response = invoke_boto3_api(s3_client, boto3_api_name, fixed_boto3_api_request_json)
-                logging.info('Completed retrying boto3 API "{}" after fixing the JSON request using LLM.'.format(boto3_api_name))
-    except Exception as final_exception:
-        raise final_exception
-    return response
+            elif (boto3_api_error_class == 'TRANSIENT') \
+                    and (transient_retry_attempts < int(os.environ.get('BOTO3_API_MAX_TRANSIENT_RETRY_ATTEMPTS', '2'))):
+                transient_retry_attempts += 1
+                retry_backoff_seconds = get_boto3_api_retry_backoff_seconds(transient_retry_attempts)
+                logging.info('Retrying boto3 API "{}" in {:.2f} second(s)...'.format(boto3_api_name, retry_backoff_seconds))
+                time.sleep(retry_backoff_seconds)
+            else:
+                raise
 
 
-# Parse the input Lambda event received from Agents for Amazon Bedrock
-def parse_request_and_prepare_response(event):
+# Process the boto3 API request in the specified AWS account and AWS region, and return the response body
+# text list and the function response state; the IAM role is assumed for the other AWS accounts
+def process_boto3_api_request_for_region(aws_account_id, aws_region, boto3_api_name, boto3_api_json_text,
+                                         assume_role_arn=''):
     response_body_text_list = []
     function_response_state = ''
-    logging.info('Parsing request data...')
-    # Get the various objects from the input event
-    prompt_session_attributes = event["promptSessionAttributes"]
-    session_attributes = event["sessionAttributes"]
-    # Get the AWS account id from the session attributes, if it exists; if not, add to it
-    if 'AWSAccountId' in session_attributes:
-        aws_account_id = session_attributes['AWSAccountId']
-    else:
-        aws_account_id = (boto3.client('sts')).get_caller_identity().get('Account')
-        session_attributes['AWSAccountId'] = aws_account_id
-    # Append to the response body text
-    response_body_text = 'AWS Account Id "{}" will be used.'.format(aws_account_id)
-    response_body_text_list.append(response_body_text)
-    logging.info(response_body_text)
-    # Get the input parameters
-    aws_region, backup_plan_id, boto3_api_name, boto3_api_json_text = '', '', '', ''
-    input_text = event["inputText"]
-    # Loop through the input parameters
-    input_parameters = event["parameters"]
-    for input_parameter in input_parameters:
-        # Retrieve the value of the parameters
-        if input_parameter["name"] == "AWSRegion":
-            aws_region = input_parameter["value"]
-        elif input_parameter["name"] == "Boto3APIName":
-            boto3_api_name = input_parameter["value"].lower()
-            boto3_api_name = substring_after(boto3_api_name, 's3.client.')
-        elif input_parameter["name"] == "Boto3APIJSON":
-            boto3_api_json_text = input_parameter["value"]
-    logging.info('Completed parsing request data.')
-    # Set the default AWS region if not found in the input
-    if len(aws_region) == 0:
-        aws_region = os.environ['DEFAULT_AWS_REGION']
-    # Append to the response body text
-    response_body_text = 'AWS Region "{}" will be used.'.format(aws_region)
-    response_body_text_list.append(response_body_text)
-    logging.info(response_body_text)
-    # Instantiate the Amazon S3 boto3 client for the specific region
-    s3_client = boto3.client('s3', region_name=aws_region, config=get_boto_config())
-    # Except for custom APIs, validate the boto3 JSON for the specified user input by invoking a LLM
-    if boto3_api_name not in ('list_buckets_by_regions',
-                              'list_buckets_by_regions_and_tags',
-                              'get_bucket_replication',
-                              'get_bucket_versioning',
-                              'get_bucket_lifecycle_configuration'):
-        logging.info('Validating the boto3 API JSON...')
-        boto3_api_json_text = process_prompt(aws_account_id, aws_region, boto3_api_name, input_text, boto3_api_json_text)
-        logging.info('Completed validating the boto3 API JSON.')
+    # Get the cached Amazon S3 boto3 client for the specific region
+    s3_client = get_boto3_client('s3', aws_region, get_boto3_api_max_concurrency(), 'adaptive', assume_role_arn)
     # Determine the action type based on the existence of the relevant parameters
     if len(boto3_api_json_text) == 0:
         function_response_state = 'FAILURE'
@@ -382,15 +1385,21 @@ def parse_request_and_prepare_response(event):
                 retrieved_region_names = retrieved_region_names.split(',')
             else:
                 retrieved_region_names = []
+            # Get the optional bucket name prefix
+            retrieved_bucket_name_prefix = list_buckets_by_regions_json.get('BucketNamePrefix') or ''
             # Get all the S3 buckets across the specified regions
             logging.info('Getting the bucket names and their corresponding regions...')
-            retrieved_bucket_names_and_regions = get_all_s3_bucket_names_for_regions(s3_client, retrieved_region_names)
+            retrieved_bucket_names_and_regions = get_all_s3_bucket_names_for_regions(s3_client, retrieved_region_names,
+                                                                                     retrieved_bucket_name_prefix)
             logging.info('Completed getting the bucket names and their corresponding regions.')
             # Append to the response body text
+            max_results = int(os.environ['BOTO3_API_MAX_RESULTS'])
             response_body_text_list.append(
-                'Results restricted to a max of {} bucket(s). '.format(os.environ['BOTO3_API_MAX_RESULTS']))
+                'Returned {} of a total of {} bucket(s); results restricted to a max of {} bucket(s). '
+                .format(min(len(retrieved_bucket_names_and_regions), max_results), len(retrieved_bucket_names_and_regions),
+                        max_results))
             response_body_text_list.append('Bucket names and their corresponding regions :: {}'
-                                           .format(retrieved_bucket_names_and_regions))
+                                           .format(retrieved_bucket_names_and_regions[:max_results]))
         elif boto3_api_name == 'list_buckets_by_regions_and_tags':
             # Parse the JSON
             list_buckets_by_regions_and_tags_json = json.loads(boto3_api_json_text)
@@ -398,6 +1407,7 @@ def parse_request_and_prepare_response(event):
             retrieved_region_names = list_buckets_by_regions_and_tags_json['RegionNames']
             retrieved_tag_name = list_buckets_by_regions_and_tags_json['BucketTagName']
             retrieved_tag_values = list_buckets_by_regions_and_tags_json['BucketTagValues']
+            retrieved_bucket_name_prefix = list_buckets_by_regions_and_tags_json.get('BucketNamePrefix') or ''
             # Check the tag name and process accordingly
             if len(retrieved_tag_name) == 0:
                 function_response_state = 'REPROMPT'
@@ -425,16 +1435,23 @@ def parse_request_and_prepare_response(event):
                     # Get all the S3 buckets across the specified regions for the matching tag name and values
                     logging.info('Getting the bucket names and their corresponding regions for tag "{}" with values {}...'
                                  .format(retrieved_tag_name, retrieved_tag_values))
-                    retrieved_bucket_names_and_regions = get_all_s3_bucket_names_for_regions_and_tags(s3_client,
-                                                                                                      retrieved_region_names,
-                                                                                                      retrieved_tag_name,
-                                                                                                      retrieved_tag_values)
+                    max_results = int(os.environ['BOTO3_API_MAX_RESULTS'])
+                    retrieved_bucket_names_and_regions, scanned_bucket_count, total_bucket_count, bucket_tag_errors = \
+                        get_all_s3_bucket_names_for_regions_and_tags(s3_client, retrieved_region_names, retrieved_tag_name,
+                                                                     retrieved_tag_values, retrieved_bucket_name_prefix,
+                                                                     max_results)
                     logging.info('Completed getting the bucket names and their corresponding regions for tag with values.')
                     # Append to the response body text
                     response_body_text_list.append(
-                        'Results restricted to a max of {} bucket(s). '.format(os.environ['BOTO3_API_MAX_RESULTS']))
+                        'Returned {} matching bucket(s) after scanning the tags of {} of a total of {} bucket(s); '
+                        'results restricted to a max of {} bucket(s). '
+                        .format(len(retrieved_bucket_names_and_regions), scanned_bucket_count, total_bucket_count,
+                                max_results))
                     response_body_text_list.append('Bucket names and their corresponding regions for tag "{}" with values {} :: {}'
-                                                   .format(retrieved_tag_name, retrieved_tag_values, retrieved_bucket_names_and_regions))
+                                                   .format(retrieved_tag_name, retrieved_tag_values,
+                                                           retrieved_bucket_names_and_regions))
+                    if len(bucket_tag_errors) > 0:
+                        response_body_text_list.append(get_s3_bucket_tag_errors_text(bucket_tag_errors))
         elif boto3_api_name == 'get_bucket_replication':
             # Parse the JSON
             get_bucket_replication_json = json.loads(boto3_api_json_text)
@@ -442,16 +1459,17 @@ def parse_request_and_prepare_response(event):
             retrieved_bucket_name = get_bucket_replication_json['Bucket']
             # Check if the bucket was specified and process accordingly
             if len(retrieved_bucket_name) > 0:
-                response_body_text_list.append(
-                    'Bucket name search was restricted to a max of {} bucket(s). '.format(os.environ['BOTO3_API_MAX_RESULTS']))
-                # Check if the bucket exists and process accordingly
-                if does_s3_bucket_exist_for_name(s3_client, [], retrieved_bucket_name):
-                    # Get the bucket replication info
-                    logging.info('Getting replication info on S3 bucket "{}"...'.format(retrieved_bucket_name))
-                    try:
+                try:
+                    # Check if the bucket exists and is accessible, and process accordingly
+                    bucket_region_info = get_s3_bucket_region_info(s3_client, retrieved_bucket_name)
+                    if bucket_region_info['Exists'] and bucket_region_info['Accessible']:
+                        # Get the bucket replication info
+                        logging.info('Getting replication info on S3 bucket "{}"...'.format(retrieved_bucket_name))
+                        # Route the API call to the client of the bucket's region
+                        bucket_s3_client = get_s3_client_for_bucket(s3_client, retrieved_bucket_name)
                         get_bucket_replication_response = invoke_boto3_api_with_llm_intervened_retry(aws_account_id,
                                                                                                      aws_region,
-                                                                                                     s3_client,
+                                                                                                     bucket_s3_client,
                                                                                                      'get_bucket_replication',
                                                                                                      get_bucket_replication_json)
                         if 'handled_exception_message' in get_bucket_replication_response:
@@ -462,20 +1480,28 @@ def parse_request_and_prepare_response(event):
                             response_body_text_list.append(
                                 'Replication information on S3 bucket named "{}" :: "{}"'
                                 .format(retrieved_bucket_name, get_bucket_replication_response['ReplicationConfiguration']))
-                    except Exception as exception:
+                        logging.info('Completed getting replication info on S3 bucket.')
+                    elif bucket_region_info['Exists']:
                         function_response_state = 'FAILURE'
                         # Append to the response body text
-                        response_body_text = ('Error occurred while getting the replication information on S3 bucket "{}" :: "{}"'
-                                              .format(retrieved_bucket_name, exception))
+                        response_body_text = ('Access to the specified S3 bucket "{}" was denied. The bucket exists, but '
+                                              'is not accessible with the permissions of the Lambda function.'
+                                              .format(retrieved_bucket_name))
+                        logging.warning(response_body_text)
                         response_body_text_list.append(response_body_text)
-                        logging.error(response_body_text)
-                    logging.info('Completed getting replication info on S3 bucket.')
-                else:
-                    function_response_state = 'REPROMPT'
+                    else:
+                        function_response_state = 'REPROMPT'
+                        # Append to the response body text
+                        response_body_text = 'The specified S3 bucket "{}" does not exist.'.format(retrieved_bucket_name)
+                        logging.warning(response_body_text)
+                        response_body_text_list.append(response_body_text)
+                except Exception as exception:
+                    function_response_state = 'FAILURE'
                     # Append to the response body text
-                    response_body_text = 'The specified S3 bucket "{}" does not exist.'.format(retrieved_bucket_name)
-                    logging.warning(response_body_text)
+                    response_body_text = ('Error occurred while getting the replication information on S3 bucket "{}" :: "{}"'
+                                          .format(retrieved_bucket_name, exception))
                     response_body_text_list.append(response_body_text)
+                    logging.error(response_body_text)
             else:
                 function_response_state = 'REPROMPT'
                 # Append to the response body text
@@ -489,16 +1515,17 @@ def parse_request_and_prepare_response(event):
             retrieved_bucket_name = get_bucket_versioning_json['Bucket']
             # Check if the bucket was specified and process accordingly
             if len(retrieved_bucket_name) > 0:
-                response_body_text_list.append(
-                    'Bucket name search was restricted to a max of {} bucket(s). '.format(os.environ['BOTO3_API_MAX_RESULTS']))
-                # Check if the bucket exists and process accordingly
-                if does_s3_bucket_exist_for_name(s3_client, [], retrieved_bucket_name):
-                    # Get the bucket versioning info
-                    logging.info('Getting versioning info on S3 bucket "{}"...'.format(retrieved_bucket_name))
-                    try:
+                try:
+                    # Check if the bucket exists and is accessible, and process accordingly
+                    bucket_region_info = get_s3_bucket_region_info(s3_client, retrieved_bucket_name)
+                    if bucket_region_info['Exists'] and bucket_region_info['Accessible']:
+                        # Get the bucket versioning info
+                        logging.info('Getting versioning info on S3 bucket "{}"...'.format(retrieved_bucket_name))
+                        # Route the API call to the client of the bucket's region
+                        bucket_s3_client = get_s3_client_for_bucket(s3_client, retrieved_bucket_name)
                         get_bucket_versioning_response = invoke_boto3_api_with_llm_intervened_retry(aws_account_id,
                                                                                                     aws_region,
-                                                                                                    s3_client,
+                                                                                                    bucket_s3_client,
                                                                                                     'get_bucket_versioning',
                                                                                                     get_bucket_versioning_json)
                         if 'Status' in get_bucket_versioning_response:
@@ -508,20 +1535,28 @@ def parse_request_and_prepare_response(event):
                         else:
                             # Append to the response body text
                             response_body_text_list.append('Versioning not enabled on S3 bucket named "{}"'.format(retrieved_bucket_name))
-                    except Exception as exception:
+                        logging.info('Completed getting versioning info on S3 bucket.')
+                    elif bucket_region_info['Exists']:
                         function_response_state = 'FAILURE'
                         # Append to the response body text
-                        response_body_text = ('Error occurred while getting the versioning information on S3 bucket "{}" :: "{}"'
-                                              .format(retrieved_bucket_name, exception))
+                        response_body_text = ('Access to the specified S3 bucket "{}" was denied. The bucket exists, but '
+                                              'is not accessible with the permissions of the Lambda function.'
+                                              .format(retrieved_bucket_name))
+                        logging.warning(response_body_text)
                         response_body_text_list.append(response_body_text)
-                        logging.error(response_body_text)
-                    logging.info('Completed getting versioning info on S3 bucket.')
-                else:
-                    function_response_state = 'REPROMPT'
+                    else:
+                        function_response_state = 'REPROMPT'
+                        # Append to the response body text
+                        response_body_text = 'The specified S3 bucket "{}" does not exist.'.format(retrieved_bucket_name)
+                        logging.warning(response_body_text)
+                        response_body_text_list.append(response_body_text)
+                except Exception as exception:
+                    function_response_state = 'FAILURE'
                     # Append to the response body text
-                    response_body_text = 'The specified S3 bucket "{}" does not exist.'.format(retrieved_bucket_name)
-                    logging.warning(response_body_text)
+                    response_body_text = ('Error occurred while getting the versioning information on S3 bucket "{}" :: "{}"'
+                                          .format(retrieved_bucket_name, exception))
                     response_body_text_list.append(response_body_text)
+                    logging.error(response_body_text)
             else:
                 function_response_state = 'REPROMPT'
                 # Append to the response body text
@@ -535,16 +1570,17 @@ def parse_request_and_prepare_response(event):
             retrieved_bucket_name = get_bucket_lifecycle_configuration_json['Bucket']
             # Check if the bucket was specified and process accordingly
             if len(retrieved_bucket_name) > 0:
-                response_body_text_list.append(
-                    'Bucket name search was restricted to a max of {} bucket(s). '.format(os.environ['BOTO3_API_MAX_RESULTS']))
-                # Check if the bucket exists and process accordingly
-                if does_s3_bucket_exist_for_name(s3_client, [], retrieved_bucket_name):
-                    # Get the bucket lifecycle configuration info
-                    logging.info('Getting lifecycle configuration info on S3 bucket "{}"...'.format(retrieved_bucket_name))
-                    try:
+                try:
+                    # Check if the bucket exists and is accessible, and process accordingly
+                    bucket_region_info = get_s3_bucket_region_info(s3_client, retrieved_bucket_name)
+                    if bucket_region_info['Exists'] and bucket_region_info['Accessible']:
+                        # Get the bucket lifecycle configuration info
+                        logging.info('Getting lifecycle configuration info on S3 bucket "{}"...'.format(retrieved_bucket_name))
+                        # Route the API call to the client of the bucket's region
+                        bucket_s3_client = get_s3_client_for_bucket(s3_client, retrieved_bucket_name)
                         get_bucket_lifecycle_configuration_response = invoke_boto3_api_with_llm_intervened_retry(aws_account_id,
                                                                                                                  aws_region,
-                                                                                                                 s3_client,
+                                                                                                                 bucket_s3_client,
                                                                                                                  'get_bucket_lifecycle_configuration',
                                                                                                                  get_bucket_lifecycle_configuration_json)
                         if 'handled_exception_message' in get_bucket_lifecycle_configuration_response:
@@ -555,32 +1591,256 @@ def parse_request_and_prepare_response(event):
                             response_body_text_list.append(
                                 'Lifecycle configuration on S3 bucket named "{}" :: "{}"'
                                 .format(retrieved_bucket_name, get_bucket_lifecycle_configuration_response))
-                    except Exception as exception:
+                        logging.info('Completed getting lifecycle configuration info on S3 bucket.')
+                    elif bucket_region_info['Exists']:
                         function_response_state = 'FAILURE'
                         # Append to the response body text
-                        response_body_text = ('Error occurred while getting the lifecycle configuration information on S3 bucket "{}" :: "{}"'
-                                              .format(retrieved_bucket_name, exception))
+                        response_body_text = ('Access to the specified S3 bucket "{}" was denied. The bucket exists, but '
+                                              'is not accessible with the permissions of the Lambda function.'
+                                              .format(retrieved_bucket_name))
+                        logging.warning(response_body_text)
                         response_body_text_list.append(response_body_text)
-                        logging.error(response_body_text)
-                    logging.info('Completed getting lifecycle configuration info on S3 bucket.')
-                else:
-                    function_response_state = 'REPROMPT'
+                    else:
+                        function_response_state = 'REPROMPT'
+                        # Append to the response body text
+                        response_body_text = 'The specified S3 bucket "{}" does not exist.'.format(retrieved_bucket_name)
+                        logging.warning(response_body_text)
+                        response_body_text_list.append(response_body_text)
+                except Exception as exception:
+                    function_response_state = 'FAILURE'
                     # Append to the response body text
-                    response_body_text = 'The specified S3 bucket "{}" does not exist.'.format(retrieved_bucket_name)
-                    logging.warning(response_body_text)
+                    response_body_text = ('Error occurred while getting the lifecycle configuration information on S3 bucket "{}" :: "{}"'
+                                          .format(retrieved_bucket_name, exception))
                     response_body_text_list.append(response_body_text)
+                    logging.error(response_body_text)
             else:
                 function_response_state = 'REPROMPT'
                 # Append to the response body text
                 response_body_text = 'Bucket name is missing. It is required to get the bucket lifecycle configuration information.'
                 logging.warning(response_body_text)
                 response_body_text_list.append(response_body_text)
+        elif boto3_api_name == 'get_buckets_data_protection_posture':
+            # Parse the JSON
+            get_buckets_data_protection_posture_json = json.loads(boto3_api_json_text)
+            # Get the bucket selector; the bucket names, if specified, take precedence over
+            # the region names, the tag name and values, and the bucket name prefix
+            retrieved_bucket_names = get_buckets_data_protection_posture_json.get('BucketNames') or ''
+            retrieved_region_names = get_buckets_data_protection_posture_json.get('RegionNames') or ''
+            retrieved_tag_name = get_buckets_data_protection_posture_json.get('BucketTagName') or ''
+            retrieved_tag_values = get_buckets_data_protection_posture_json.get('BucketTagValues') or ''
+            retrieved_bucket_name_prefix = get_buckets_data_protection_posture_json.get('BucketNamePrefix') or ''
+            retrieved_region_names = retrieved_region_names.split(',') if len(retrieved_region_names) > 0 else []
+            max_results = int(os.environ['BOTO3_API_MAX_RESULTS'])
+            retrieved_bucket_names_and_regions = None
+            try:
+                # Select the buckets and process accordingly
+                logging.info('Getting the buckets for the data protection posture scan...')
+                if len(retrieved_bucket_names) > 0:
+                    retrieved_bucket_names_and_regions, missing_bucket_names, bucket_errors = \
+                        get_s3_bucket_names_and_regions_for_names(s3_client, retrieved_bucket_names.split(','))
+                    if len(missing_bucket_names) > 0:
+                        # Append to the response body text
+                        response_body_text = 'The specified S3 bucket(s) {} do not exist.'.format(missing_bucket_names)
+                        logging.warning(response_body_text)
+                        response_body_text_list.append(response_body_text)
+                    if len(bucket_errors) > 0:
+                        # Append to the response body text
+                        response_body_text = 'Error occurred while checking the specified S3 bucket(s) :: {}'.format(bucket_errors)
+                        logging.error(response_body_text)
+                        response_body_text_list.append(response_body_text)
+                    if len(retrieved_bucket_names_and_regions) == 0:
+                        function_response_state = 'FAILURE' if len(missing_bucket_names) == 0 else 'REPROMPT'
+                        retrieved_bucket_names_and_regions = None
+                elif len(retrieved_tag_name) > 0:
+                    # Check the tag values and process accordingly
+                    if len(retrieved_tag_values) == 0:
+                        function_response_state = 'REPROMPT'
+                        # Append to the response body text
+                        response_body_text = ('One or more S3 bucket tag values have not been specified. '
+                                              'It is required to get the S3 buckets.')
+                        logging.warning(response_body_text)
+                        response_body_text_list.append(response_body_text)
+                    else:
+                        retrieved_bucket_names_and_regions, scanned_bucket_count, total_bucket_count, bucket_tag_errors = \
+                            get_all_s3_bucket_names_for_regions_and_tags(s3_client, retrieved_region_names, retrieved_tag_name,
+                                                                         retrieved_tag_values.split(','),
+                                                                         retrieved_bucket_name_prefix, max_results)
+                        # Append to the response body text
+                        response_body_text_list.append(
+                            'Selected {} bucket(s) for tag "{}" after scanning the tags of {} of a total of {} bucket(s). '
+                            .format(len(retrieved_bucket_names_and_regions), retrieved_tag_name, scanned_bucket_count,
+                                    total_bucket_count))
+                        if len(bucket_tag_errors) > 0:
+                            response_body_text_list.append(get_s3_bucket_tag_errors_text(bucket_tag_errors))
+                else:
+                    retrieved_bucket_names_and_regions = get_all_s3_bucket_names_for_regions(s3_client, retrieved_region_names,
+                                                                                             retrieved_bucket_name_prefix)
+                logging.info('Completed getting the buckets for the data protection posture scan.')
+                if retrieved_bucket_names_and_regions is not None:
+                    # Get the data protection posture of the selected buckets
+                    logging.info('Getting the data protection posture of {} bucket(s)...'
+                                 .format(min(len(retrieved_bucket_names_and_regions), max_results)))
+                    retrieved_bucket_postures = get_s3_buckets_data_protection_posture(
+                        s3_client, retrieved_bucket_names_and_regions[:max_results])
+                    setting_value_counts, unprotected_bucket_names, undetermined_bucket_errors = \
+                        get_s3_buckets_data_protection_summary(retrieved_bucket_postures)
+                    logging.info('Completed getting the data protection posture of the buckets.')
+                    # Append to the response body text
+                    response_body_text_list.append(
+                        'Scanned the data protection posture of {} of a total of {} bucket(s); '
+                        'results restricted to a max of {} bucket(s). '
+                        .format(len(retrieved_bucket_postures), len(retrieved_bucket_names_and_regions), max_results))
+                    response_body_text_list.append(get_s3_buckets_data_protection_posture_text(retrieved_bucket_postures))
+                    response_body_text_list.append('Bucket count per data protection setting value :: {}'
+                                                   .format(dict(setting_value_counts)))
+                    response_body_text_list.append('Buckets with none of versioning, replication and Object Lock enabled '
+                                                   '({} of {} bucket(s)) :: {}'
+                                                   .format(len(unprotected_bucket_names), len(retrieved_bucket_postures),
+                                                           unprotected_bucket_names))
+                    if len(undetermined_bucket_errors) > 0:
+                        response_body_text_list.append('Buckets whose protection could not be determined, with the errors '
+                                                       'of their versioning, replication and Object Lock checks '
+                                                       '({} of {} bucket(s)) :: {}'
+                                                       .format(len(undetermined_bucket_errors), len(retrieved_bucket_postures),
+                                                               undetermined_bucket_errors))
+            except Exception as exception:
+                function_response_state = 'FAILURE'
+                # Append to the response body text
+                response_body_text = ('Error occurred while getting the data protection posture of the S3 buckets :: "{}"'
+                                      .format(exception))
+                response_body_text_list.append(response_body_text)
+                logging.error(response_body_text)
         else:
             function_response_state = 'FAILURE'
             # Append to the response body text
             response_body_text = 'API "{}" is not supported. No API invocation was performed.'.format(boto3_api_name)
             logging.warning(response_body_text)
             response_body_text_list.append(response_body_text)
+    return response_body_text_list, function_response_state
+
+
+# Parse the input Lambda event received from Agents for Amazon Bedrock
+def parse_request_and_prepare_response(event, context):
+    response_body_text_list = []
+    function_response_state = ''
+    logging.info('Parsing request data...')
+    # Get the various objects from the input event
+    prompt_session_attributes = event["promptSessionAttributes"]
+    session_attributes = event["sessionAttributes"]
+    # Get the AWS account id from the session attributes, if it exists; if not, add to it
+    if 'AWSAccountId' in session_attributes:
+        aws_account_id = session_attributes['AWSAccountId']
+    else:
+        aws_account_id = get_aws_account_id(context)
+        session_attributes['AWSAccountId'] = aws_account_id
+    # Append to the response body text
+    response_body_text = 'AWS Account Id "{}" will be used.'.format(aws_account_id)
+    response_body_text_list.append(response_body_text)
+    logging.info(response_body_text)
+    # Get the input parameters
+    aws_region, backup_plan_id, boto3_api_name, boto3_api_json_text = '', '', '', ''
+    aws_account_ids_text = ''
+    input_text = event["inputText"]
+    # Loop through the input parameters
+    input_parameters = event["parameters"]
+    for input_parameter in input_parameters:
+        # Retrieve the value of the parameters
+        if input_parameter["name"] == "AWSRegion":
+            aws_region = input_parameter["value"]
+        elif input_parameter["name"] == "AWSAccountIds":
+            aws_account_ids_text = input_parameter["value"]
+        elif input_parameter["name"] == "Boto3APIName":
+            boto3_api_name = input_parameter["value"].lower()
+            boto3_api_name = substring_after(boto3_api_name, 's3.client.')
+        elif input_parameter["name"] == "Boto3APIJSON":
+            boto3_api_json_text = input_parameter["value"]
+    logging.info('Completed parsing request data.')
+    # Set the default AWS region if not found in the input
+    if len(aws_region) == 0:
+        aws_region = os.environ['DEFAULT_AWS_REGION']
+    # Append to the response body text
+    response_body_text = 'AWS Region "{}" will be used.'.format(aws_region)
+    response_body_text_list.append(response_body_text)
+    logging.info(response_body_text)
+    # Get the target AWS accounts, which are the AWS account of this Lambda function unless other AWS accounts
+    # are specified
+    aws_account_ids = get_aws_account_ids(aws_account_ids_text, aws_account_id)
+    if aws_account_ids != [aws_account_id]:
+        # Append to the response body text
+        response_body_text = 'AWS Account Ids {} will be used.'.format(', '.join('"{}"'.format(target_aws_account_id)
+                                                                           for target_aws_account_id in aws_account_ids))
+        response_body_text_list.append(response_body_text)
+        logging.info(response_body_text)
+    # Get the cached Amazon S3 boto3 client for the specific region
+    s3_client = get_boto3_client('s3', aws_region, get_boto3_api_max_concurrency(), 'adaptive')
+    # Except for custom APIs, validate the boto3 JSON for the specified user input locally
+    # and, only if it is not valid, fix it by invoking a LLM
+    if boto3_api_name not in ('list_buckets_by_regions',
+                              'list_buckets_by_regions_and_tags',
+                              'get_bucket_replication',
+                              'get_bucket_versioning',
+                              'get_bucket_lifecycle_configuration',
+                              'get_buckets_data_protection_posture'):
+        logging.info('Validating the boto3 API JSON...')
+        validation_errors = validate_boto3_api_json(s3_client, boto3_api_name, boto3_api_json_text)
+        if len(validation_errors) == 0:
+            BOTO3_API_JSON_LOCAL_VALIDATION_COUNTS['hit'] += 1
+            logging.info('The boto3 API JSON is valid as per the local validation.')
+        else:
+            BOTO3_API_JSON_LOCAL_VALIDATION_COUNTS['miss'] += 1
+            logging.info('The boto3 API JSON failed the local validation :: {}'.format(validation_errors))
+            boto3_api_json_text = process_prompt(aws_account_id, aws_region, boto3_api_name, input_text,
+                                                 boto3_api_json_text, validation_errors)
+        logging.info('Completed validating the boto3 API JSON. Local validation hits: {}, misses: {}.'
+                     .format(BOTO3_API_JSON_LOCAL_VALIDATION_COUNTS['hit'], BOTO3_API_JSON_LOCAL_VALIDATION_COUNTS['miss']))
+    # Get the AWS account targets in the AWS region, ordered by AWS account
+    cross_account_role_name = get_cross_account_role_name()
+    targets = [
+        {
+            'AWSAccountId': target_aws_account_id,
+            'AWSRegion': aws_region,
+            'AssumeRoleArn': get_assume_role_arn(target_aws_account_id, aws_account_id, cross_account_role_name)
+        }
+        for target_aws_account_id in aws_account_ids
+    ]
+    invalid_aws_account_ids = [target_aws_account_id for target_aws_account_id in aws_account_ids
+                               if AWS_ACCOUNT_ID_PATTERN.match(target_aws_account_id) is None]
+    # Process the boto3 API request for the target; the read only APIs can also be processed concurrently
+    # across multiple targets
+    if len(invalid_aws_account_ids) > 0:
+        function_response_state = 'REPROMPT'
+        # Append to the response body text
+        response_body_text = ('AWS Account Ids {} are not valid 12 digit AWS account ids. No API invocation was performed.'
+                              .format(invalid_aws_account_ids))
+        logging.warning(response_body_text)
+        response_body_text_list.append(response_body_text)
+    elif (aws_account_ids != [aws_account_id]) and (len(cross_account_role_name) == 0):
+        function_response_state = 'FAILURE'
+        # Append to the response body text
+        response_body_text = ('Cross account requests are not enabled, as the IAM role name to assume in the other '
+                              'AWS accounts is not configured. No API invocation was performed.')
+        logging.warning(response_body_text)
+        response_body_text_list.append(response_body_text)
+    elif len(targets) == 1:
+        target_text_list, function_response_state = process_boto3_api_request_for_region(targets[0]['AWSAccountId'],
+                                                                                           targets[0]['AWSRegion'],
+                                                                                           boto3_api_name,
+                                                                                           boto3_api_json_text,
+                                                                                           targets[0]['AssumeRoleArn'])
+        response_body_text_list.extend(target_text_list)
+    elif boto3_api_name.startswith(READ_ONLY_BOTO3_API_NAME_PREFIXES):
+        target_text_list, function_response_state = process_boto3_api_request_for_targets(targets,
+                                                                                            boto3_api_name,
+                                                                                            boto3_api_json_text)
+        response_body_text_list.extend(target_text_list)
+    else:
+        function_response_state = 'REPROMPT'
+        # Append to the response body text
+        response_body_text = ('API "{}" is not read only and can be run in only one AWS account and AWS Region. '
+                              'Please specify a single AWS account and AWS Region. No API invocation was performed.'
+                              .format(boto3_api_name))
+        logging.warning(response_body_text)
+        response_body_text_list.append(response_body_text)
     # Create the response message
     logging.info('Creating the response message...')
     # Concatenate the messages
@@ -619,7 +1879,7 @@ def lambda_handler(event,context):
     logging.info('Request event :: {}'.format(event))
     logging.info('Request context :: {}'.format(context))
     # Parse the request data and prepare response
-    return_data = parse_request_and_prepare_response(event)
+    return_data = parse_request_and_prepare_response(event, context)
     logging.info('Response :: {}'.format(return_data))
     logging.info('Completed executing the handler() function.')
     return return_data
\ No newline at end of file
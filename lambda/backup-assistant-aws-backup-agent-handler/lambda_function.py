@@ -3,10 +3,21 @@ Copyright 2025 Amazon.com, Inc. or its affiliates.  All Rights Reserved.
 SPDX-License-Identifier: MIT-0
 """
 import boto3
+import hashlib
 import json
 import logging
 import os
+import random
+import re
+import threading
+import time
+import weakref
 from botocore.config import Config
+from botocore.exceptions import ClientError, ConnectTimeoutError, EndpointConnectionError, HTTPClientError, ParamValidationError
+from botocore.validate import ParamValidator
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import partial
 
 
 # Set the logger
@@ -69,60 +80,692 @@ def read_file(file_full_path, file_read_type):
     return file_content
 
 
+# Pattern of the placeholders (for example, {aws_region}) in the prompt templates
+PROMPT_TEMPLATE_PLACEHOLDER_PATTERN = re.compile(r'\{(\w+)\}')
+
+
+# Compile the prompt template text into its literal parts and placeholder names;
+# the odd indexed items of the parts list are the placeholder names
+def compile_prompt_template(template_text):
+    template_parts = PROMPT_TEMPLATE_PLACEHOLDER_PATTERN.split(template_text)
+    placeholder_names = frozenset(template_parts[1::2])
+    return template_parts, placeholder_names
+
+
+# Render the compiled prompt template by substituting all the placeholders in a single pass
+def render_prompt_template(compiled_prompt_template, placeholder_values):
+    template_parts, placeholder_names = compiled_prompt_template
+    # Validate that the placeholder values match the placeholders in the template
+    if placeholder_names != placeholder_values.keys():
+        raise ValueError('Prompt template placeholders {} do not match the specified values {}.'
+                         .format(sorted(placeholder_names), sorted(placeholder_values.keys())))
+    rendered_parts = template_parts.copy()
+    for idx in range(1, len(rendered_parts), 2):
+        rendered_parts[idx] = placeholder_values[rendered_parts[idx]]
+    return ''.join(rendered_parts)
+
+
+# Read and compile all the prompt templates; done once per Lambda container
+def load_prompt_templates():
+    prompt_templates_dir = os.path.dirname(os.path.abspath(__file__))
+    prompt_templates = {}
+    for prompt_file_name_env_var in ('SYSTEM_PROMPT_FILE_NAME',
+                                     'USER_PROMPT_FILE_NAME',
+                                     'SYSTEM_PROMPT_FOR_BOTO3_RETRY_FILE_NAME',
+                                     'USER_PROMPT_FOR_BOTO3_RETRY_FILE_NAME'):
+        prompt_file_full_path = os.path.join(prompt_templates_dir, os.environ[prompt_file_name_env_var])
+        prompt_templates[prompt_file_name_env_var] = compile_prompt_template(read_file(prompt_file_full_path, 'r'))
+    return prompt_templates
+
+
+# Load the prompt templates
+PROMPT_TEMPLATES = load_prompt_templates()
+
+
+# The hashes of the prompt templates; used to key the cached LLM responses
+PROMPT_TEMPLATE_HASHES = {
+    prompt_template_name: hashlib.sha256(json.dumps(prompt_template[0]).encode('utf-8')).hexdigest()
+    for prompt_template_name, prompt_template in PROMPT_TEMPLATES.items()
+}
+
+
+# In-memory LRU cache of the LLM responses, that is reused across invocations of a warm Lambda container;
+# the optional on-disk tier (e.g. under /tmp) is enabled by specifying its directory
+LLM_RESPONSE_CACHE = OrderedDict()
+LLM_RESPONSE_CACHE_LOCK = threading.Lock()
+LLM_RESPONSE_CACHE_STATS = {
+    'memory_hits': 0,
+    'disk_hits': 0,
+    'misses': 0,
+    'saved_input_tokens': 0,
+    'saved_output_tokens': 0
+}
+
+
+# Canonicalize the boto3 API JSON text so that formatting and key order do not change the cache key
+def canonicalize_boto3_json(boto3_json_str):
+    try:
+        return json.dumps(json.loads(boto3_json_str), sort_keys=True, separators=(',', ':'))
+    except json.JSONDecodeError:
+        return boto3_json_str.strip()
+
+
+# Get the cache key of the LLM response for the specified prompt templates and placeholder values
+def get_llm_response_cache_key(prompt_template_names, placeholder_values):
+    cache_key_json = json.dumps({
+        'model_id': os.environ['LLM_MODEL_OR_INFERENCE_PROFILE_ID'],
+        'prompt_template_hashes': [PROMPT_TEMPLATE_HASHES[name] for name in prompt_template_names],
+        'placeholder_values': placeholder_values
+    }, sort_keys=True)
+    return hashlib.sha256(cache_key_json.encode('utf-8')).hexdigest()
+
+
+# Get the TTL (in seconds) of the cached LLM responses, in both the in-memory and the on-disk tiers
+def get_llm_response_cache_ttl():
+    return int(os.environ.get('LLM_RESPONSE_CACHE_TTL_SECONDS', '86400'))
+
+
+# Check if the specified LLM response cache entry has expired; entries without a cached time have expired
+def is_llm_response_cache_entry_expired(cache_entry):
+    return (time.time() - cache_entry.get('cached_time', 0)) > get_llm_response_cache_ttl()
+
+
+# Get the path of the on-disk LLM response cache file for the specified key;
+# returns an empty string if the on-disk tier is not enabled
+def get_llm_response_cache_file_path(cache_key):
+    cache_dir = os.environ.get('LLM_RESPONSE_CACHE_DIR', '')
+    if len(cache_dir) == 0:
+        return ''
+    return os.path.join(cache_dir, '{}.json'.format(cache_key))
+
+
+# Add the cache entry to the in-memory tier and evict the least recently used entries beyond the max size.
+# Must be called with the cache lock held.
+def add_llm_response_cache_entry(cache_key, cache_entry):
+    LLM_RESPONSE_CACHE[cache_key] = cache_entry
+    LLM_RESPONSE_CACHE.move_to_end(cache_key)
+    while len(LLM_RESPONSE_CACHE) > int(os.environ.get('LLM_RESPONSE_CACHE_MAX_ENTRIES', '256')):
+        LLM_RESPONSE_CACHE.popitem(last=False)
+
+
+# Remove the cached LLM response for the specified key from the in-memory tier and the on-disk tier.
+# Must be called with the cache lock held.
+def remove_llm_response_cache_entry(cache_key):
+    LLM_RESPONSE_CACHE.pop(cache_key, None)
+    cache_file_path = get_llm_response_cache_file_path(cache_key)
+    if len(cache_file_path) > 0:
+        try:
+            os.remove(cache_file_path)
+        except FileNotFoundError:
+            pass
+        except OSError as exception:
+            logging.warning('Could not remove the LLM response cache file "{}" :: {}'.format(cache_file_path, exception))
+
+
+# Evict the cached LLM response for the specified key, so that it is not replayed
+def evict_cached_llm_response(cache_key):
+    with LLM_RESPONSE_CACHE_LOCK:
+        remove_llm_response_cache_entry(cache_key)
+
+
+# Get the cached LLM response for the specified key from the in-memory tier, then the on-disk tier;
+# returns None if the response is not cached or has expired
+def get_cached_llm_response(cache_key):
+    with LLM_RESPONSE_CACHE_LOCK:
+        cache_entry = LLM_RESPONSE_CACHE.get(cache_key)
+        if (cache_entry is not None) and is_llm_response_cache_entry_expired(cache_entry):
+            remove_llm_response_cache_entry(cache_key)
+            cache_entry = None
+        if cache_entry is not None:
+            LLM_RESPONSE_CACHE.move_to_end(cache_key)
+            LLM_RESPONSE_CACHE_STATS['memory_hits'] += 1
+        else:
+            cache_file_path = get_llm_response_cache_file_path(cache_key)
+            if (len(cache_file_path) > 0) and os.path.isfile(cache_file_path):
+                try:
+                    cache_entry = json.loads(read_file(cache_file_path, 'r'))
+                    if is_llm_response_cache_entry_expired(cache_entry):
+                        remove_llm_response_cache_entry(cache_key)
+                        cache_entry = None
+                    else:
+                        add_llm_response_cache_entry(cache_key, cache_entry)
+                        LLM_RESPONSE_CACHE_STATS['disk_hits'] += 1
+                except (OSError, ValueError) as exception:
+                    logging.warning('Could not read the LLM response cache file "{}" :: {}'.format(cache_file_path, exception))
+                    cache_entry = None
+        if cache_entry is None:
+            LLM_RESPONSE_CACHE_STATS['misses'] += 1
+            return None
+        LLM_RESPONSE_CACHE_STATS['saved_input_tokens'] += cache_entry['input_tokens']
+        LLM_RESPONSE_CACHE_STATS['saved_output_tokens'] += cache_entry['output_tokens']
+        return cache_entry['llm_response']
+
+
+# Cache the LLM response for the specified key in the in-memory tier and, if enabled, the on-disk tier
+def put_cached_llm_response(cache_key, llm_response, token_usage):
+    cache_entry = {
+        'llm_response': llm_response,
+        'input_tokens': token_usage['inputTokens'],
+        'output_tokens': token_usage['outputTokens'],
+        'cached_time': time.time()
+    }
+    with LLM_RESPONSE_CACHE_LOCK:
+        add_llm_response_cache_entry(cache_key, cache_entry)
+    cache_file_path = get_llm_response_cache_file_path(cache_key)
+    if len(cache_file_path) > 0:
+        try:
+            os.makedirs(os.path.dirname(cache_file_path), exist_ok=True)
+            # Write to a temporary file and rename it so that a partially written file is never read
+            temp_cache_file_path = '{}.{}.tmp'.format(cache_file_path, threading.get_ident())
+            with open(temp_cache_file_path, 'w') as temp_cache_file:
+                json.dump(cache_entry, temp_cache_file)
+            os.replace(temp_cache_file_path, cache_file_path)
+        except OSError as exception:
+            logging.warning('Could not write the LLM response cache file "{}" :: {}'.format(cache_file_path, exception))
+
+
+# Log the LLM response cache hit rate and the saved tokens
+def log_llm_response_cache_stats():
+    with LLM_RESPONSE_CACHE_LOCK:
+        cache_stats = dict(LLM_RESPONSE_CACHE_STATS)
+    lookup_count = cache_stats['memory_hits'] + cache_stats['disk_hits'] + cache_stats['misses']
+    hit_rate = ((cache_stats['memory_hits'] + cache_stats['disk_hits']) / lookup_count) if lookup_count > 0 else 0
+    logging.info('LLM response cache :: memory hits: {}, disk hits: {}, misses: {}, hit rate: {:.1%}, '
+                 'saved input tokens: {}, saved output tokens: {}.'
+                 .format(cache_stats['memory_hits'], cache_stats['disk_hits'], cache_stats['misses'], hit_rate,
+                         cache_stats['saved_input_tokens'], cache_stats['saved_output_tokens']))
+
+
+# Invoke the specified LLM unless its response for the specified cache key is cached; the response is
+# cached only if it contains the specified tag, so that malformed responses are not replayed
+def invoke_llm_with_cache(bedrock_rt_client, system_prompts, messages, cache_key, response_tag):
+    llm_response = get_cached_llm_response(cache_key)
+    if llm_response is None:
+        llm_response, token_usage = invoke_llm(bedrock_rt_client, system_prompts, messages)
+        if '<{}>'.format(response_tag) in llm_response:
+            put_cached_llm_response(cache_key, llm_response, token_usage)
+    else:
+        logging.info('Using the cached LLM response.')
+    log_llm_response_cache_stats()
+    return llm_response
+
+
+# Cache the specified LLM fix of a boto3 API JSON request, unless there is no fix or it was answered from the cache
+def put_cached_llm_fix(llm_fix):
+    if (llm_fix is not None) and (llm_fix['token_usage'] is not None):
+        put_cached_llm_response(llm_fix['cache_key'], llm_fix['llm_response'], llm_fix['token_usage'])
+
+
 # Get the config for all boto3 clients to be used by this Lambda function
-def get_boto_config():
+def get_boto_config(max_pool_connections=10, retry_mode='standard'):
     return Config(
         connect_timeout = (60 * 3),
         read_timeout = (60 * 3),
         retries = {
             'max_attempts': 10,
-            'mode': 'standard'
-        }
+            'mode': retry_mode
+        },
+        max_pool_connections = max_pool_connections
     )
 
 
+# Cache of the boto3 clients, keyed by service name, region, client config and the assumed IAM role, if any,
+# that is reused across invocations of a warm Lambda container
+BOTO3_CLIENT_CACHE = {}
+BOTO3_CLIENT_CACHE_LOCK = threading.Lock()
+
+
+# The assumed IAM role ARNs of the cached cross account boto3 clients; used to scope the per region caches
+# by AWS account, and to create the other boto3 clients of the same AWS account
+BOTO3_CLIENT_ASSUME_ROLE_ARNS = weakref.WeakKeyDictionary()
+
+
+# Get the boto3 client for the specified service, region, connection pool size and retry mode, optionally
+# with the temporary credentials of the specified IAM role in another AWS account;
+# the client is created on first use and cached for the subsequent invocations
+def get_boto3_client(service_name, aws_region, max_pool_connections=10, retry_mode='standard', assume_role_arn=''):
+    client_cache_key = (service_name, aws_region, max_pool_connections, retry_mode, assume_role_arn)
+    # Resolve the temporary credentials first, as refreshing them evicts the cached clients of the IAM role
+    assumed_role_credentials = get_assumed_role_credentials(assume_role_arn) if len(assume_role_arn) > 0 else None
+    boto3_client = BOTO3_CLIENT_CACHE.get(client_cache_key)
+    if boto3_client is None:
+        # boto3 client creation is not thread safe; so, serialize it
+        with BOTO3_CLIENT_CACHE_LOCK:
+            boto3_client = BOTO3_CLIENT_CACHE.get(client_cache_key)
+            if boto3_client is None:
+                if assumed_role_credentials is None:
+                    logging.info('Creating boto3 client for service "{}" in region "{}"...'.format(service_name, aws_region))
+                    boto3_client = boto3.client(service_name, region_name=aws_region,
+                                                config=get_boto_config(max_pool_connections, retry_mode))
+                else:
+                    logging.info('Creating boto3 client for service "{}" in region "{}" with IAM role "{}"...'
+                                 .format(service_name, aws_region, assume_role_arn))
+                    boto3_client = boto3.client(service_name, region_name=aws_region,
+                                                config=get_boto_config(max_pool_connections, retry_mode),
+                                                aws_access_key_id=assumed_role_credentials['AccessKeyId'],
+                                                aws_secret_access_key=assumed_role_credentials['SecretAccessKey'],
+                                                aws_session_token=assumed_role_credentials['SessionToken'])
+                    BOTO3_CLIENT_ASSUME_ROLE_ARNS[boto3_client] = assume_role_arn
+                BOTO3_CLIENT_CACHE[client_cache_key] = boto3_client
+    return boto3_client
+
+
+# Get the assumed IAM role ARN of the specified boto3 client; empty for the AWS account of this Lambda function
+def get_boto3_client_assume_role_arn(boto3_client):
+    return BOTO3_CLIENT_ASSUME_ROLE_ARNS.get(boto3_client, '')
+
+
+# Get the scope of the per region caches for the specified boto3 client, which is its assumed IAM role ARN
+# and region, so that the caches of different AWS accounts are kept apart
+def get_boto3_client_cache_scope(boto3_client):
+    return get_boto3_client_assume_role_arn(boto3_client), boto3_client.meta.region_name
+
+
+# Clear the boto3 client cache; used by tests to start from a cold container state
+def reset_boto3_client_cache():
+    with BOTO3_CLIENT_CACHE_LOCK:
+        BOTO3_CLIENT_CACHE.clear()
+
+
+# Get the max number of boto3 API calls that can be made concurrently
+def get_boto3_api_max_concurrency():
+    return int(os.environ.get('BOTO3_API_MAX_CONCURRENCY', '10'))
+
+
+# Get the IAM role name to assume in the other AWS accounts; empty if cross account requests are not enabled
+def get_cross_account_role_name():
+    return os.environ.get('CROSS_ACCOUNT_ROLE_NAME', '')
+
+
+# Get the duration of the sessions of the assumed IAM roles
+def get_assumed_role_session_duration():
+    return int(os.environ.get('ASSUMED_ROLE_SESSION_DURATION_SECONDS', '3600'))
+
+
+# Get the number of seconds before their expiry that the temporary credentials of an assumed IAM role are refreshed
+def get_assumed_role_credentials_refresh_margin():
+    return int(os.environ.get('ASSUMED_ROLE_CREDENTIALS_REFRESH_MARGIN_SECONDS', '300'))
+
+
+# Cache of the temporary credentials of the assumed IAM roles, keyed by IAM role ARN, that is reused across
+# invocations of a warm Lambda container until shortly before the credentials expire; the IAM roles
+# are assumed under a lock per IAM role ARN, so that different AWS accounts are assumed concurrently
+ASSUMED_ROLE_CREDENTIALS_CACHE = {}
+ASSUMED_ROLE_CREDENTIALS_LOCKS = {}
+ASSUMED_ROLE_CREDENTIALS_LOCKS_LOCK = threading.Lock()
+
+
+# Get the temporary credentials of the specified IAM role, assuming it if not cached or about to expire
+def get_assumed_role_credentials(assume_role_arn):
+    with ASSUMED_ROLE_CREDENTIALS_LOCKS_LOCK:
+        assumed_role_credentials_lock = ASSUMED_ROLE_CREDENTIALS_LOCKS.setdefault(assume_role_arn, threading.Lock())
+    with assumed_role_credentials_lock:
+        assumed_role_credentials = ASSUMED_ROLE_CREDENTIALS_CACHE.get(assume_role_arn)
+        if ((assumed_role_credentials is None) or
+                (assumed_role_credentials['Expiration'].timestamp() - time.time() < get_assumed_role_credentials_refresh_margin())):
+            if assumed_role_credentials is not None:
+                # Evict the cached clients that use the expiring credentials
+                with BOTO3_CLIENT_CACHE_LOCK:
+                    for client_cache_key in [key for key in BOTO3_CLIENT_CACHE if key[4] == assume_role_arn]:
+                        del BOTO3_CLIENT_CACHE[client_cache_key]
+            logging.info('Assuming IAM role "{}"...'.format(assume_role_arn))
+            sts_client = get_boto3_client('sts', os.environ.get('AWS_REGION'))
+            assume_role_response = sts_client.assume_role(RoleArn=assume_role_arn,
+                                                          RoleSessionName='backup-assistant',
+                                                          DurationSeconds=get_assumed_role_session_duration())
+            assumed_role_credentials = assume_role_response['Credentials']
+            ASSUMED_ROLE_CREDENTIALS_CACHE[assume_role_arn] = assumed_role_credentials
+            logging.info('Assumed IAM role "{}" with credentials expiring at {}.'
+                         .format(assume_role_arn, assumed_role_credentials['Expiration']))
+        return assumed_role_credentials
+
+
+# The AWS account id of this Lambda function; resolved once per Lambda container
+AWS_ACCOUNT_ID = ''
+
+
+# Get the AWS account id; it is read from the ARN of the invoked Lambda function, since the
+# execution role always belongs to the account of the function. If the ARN is not available
+# (for example, when invoked outside of AWS Lambda with assumed role credentials),
+# it is resolved through the STS caller identity. The result is cached in both cases.
+def get_aws_account_id(context):
+    global AWS_ACCOUNT_ID
+    if len(AWS_ACCOUNT_ID) == 0:
+        invoked_function_arn_parts = str(getattr(context, 'invoked_function_arn', '')).split(':')
+        if (len(invoked_function_arn_parts) > 4) and (len(invoked_function_arn_parts[4]) > 0):
+            AWS_ACCOUNT_ID = invoked_function_arn_parts[4]
+        else:
+            AWS_ACCOUNT_ID = get_boto3_client('sts', os.environ.get('AWS_REGION')).get_caller_identity().get('Account')
+        logging.info('Resolved AWS account id "{}".'.format(AWS_ACCOUNT_ID))
+    return AWS_ACCOUNT_ID
+
+
+# Pattern of an AWS account id
+AWS_ACCOUNT_ID_PATTERN = re.compile(r'^\d{12}$')
+
+
+# Get the AWS account ids for the specified comma separated AWS account ids text; defaults to the specified
+# AWS account id
+def get_aws_account_ids(aws_account_ids_text, default_aws_account_id):
+    aws_account_ids = []
+    for aws_account_id in aws_account_ids_text.split(','):
+        aws_account_id = aws_account_id.strip()
+        if (len(aws_account_id) > 0) and (aws_account_id not in aws_account_ids):
+            aws_account_ids.append(aws_account_id)
+    if len(aws_account_ids) == 0:
+        aws_account_ids.append(default_aws_account_id)
+    return aws_account_ids
+
+
+# Get the ARN of the IAM role to assume in the specified AWS account; empty for the AWS account of this
+# Lambda function, which uses the execution role of this Lambda function
+def get_assume_role_arn(aws_account_id, lambda_aws_account_id, role_name):
+    if aws_account_id == lambda_aws_account_id:
+        return ''
+    lambda_aws_region = os.environ.get('AWS_REGION', os.environ['DEFAULT_AWS_REGION'])
+    if lambda_aws_region.startswith('cn-'):
+        aws_partition = 'aws-cn'
+    elif lambda_aws_region.startswith('us-gov-'):
+        aws_partition = 'aws-us-gov'
+    else:
+        aws_partition = 'aws'
+    return 'arn:{}:iam::{}:role/{}'.format(aws_partition, aws_account_id, role_name)
+
+
+# The name prefixes of the read only boto3 APIs, which can be run across multiple AWS regions
+READ_ONLY_BOTO3_API_NAME_PREFIXES = ('describe_', 'find_', 'get_', 'list_')
+
+
+# The AWS regions enabled for the AWS account; resolved once per Lambda container
+ENABLED_AWS_REGIONS = []
+ENABLED_AWS_REGIONS_LOCK = threading.Lock()
+
+
+# Get the AWS regions enabled for the AWS account
+def get_enabled_aws_regions():
+    global ENABLED_AWS_REGIONS
+    with ENABLED_AWS_REGIONS_LOCK:
+        if len(ENABLED_AWS_REGIONS) == 0:
+            ec2_client = get_boto3_client('ec2', os.environ['DEFAULT_AWS_REGION'])
+            describe_regions_response = ec2_client.describe_regions(
+                Filters=[{'Name': 'opt-in-status', 'Values': ['opt-in-not-required', 'opted-in']}]
+            )
+            ENABLED_AWS_REGIONS = sorted(region['RegionName'] for region in describe_regions_response['Regions'])
+            logging.info('Resolved the enabled AWS regions {}.'.format(ENABLED_AWS_REGIONS))
+        return list(ENABLED_AWS_REGIONS)
+
+
+# Get the AWS regions for the specified AWS region text, which is a single AWS region, a comma separated
+# list of AWS regions, or "all" for all the enabled AWS regions
+def get_aws_regions(aws_region_text):
+    aws_regions = []
+    for aws_region in aws_region_text.split(','):
+        aws_region = aws_region.strip().lower()
+        if aws_region in ('all', '*'):
+            return get_enabled_aws_regions()
+        if (len(aws_region) > 0) and (aws_region not in aws_regions):
+            aws_regions.append(aws_region)
+    if len(aws_regions) == 0:
+        aws_regions.append(os.environ['DEFAULT_AWS_REGION'])
+    return aws_regions
+
+
+# Get the max number of AWS account and AWS region targets that a boto3 API request can be run in concurrently
+def get_fan_out_max_concurrency():
+    return int(os.environ.get('FAN_OUT_MAX_CONCURRENCY', '8'))
+
+
+# Get the number of seconds to wait for a boto3 API request across targets, before returning partial results
+def get_fan_out_timeout():
+    return float(os.environ.get('FAN_OUT_TIMEOUT_SECONDS', '120'))
+
+
+# Thread pool to run a boto3 API request across AWS account and AWS region targets;
+# shared by the invocations of a warm Lambda container. A target that timed out keeps its worker until its
+# boto3 API calls complete, which are bounded by the botocore connect and read timeouts and retries, so that
+# the workers still held by the timed out targets are not available to the next invocation until then.
+FAN_OUT_EXECUTOR = None
+FAN_OUT_EXECUTOR_LOCK = threading.Lock()
+
+
+# Get the shared thread pool to run a boto3 API request across targets
+def get_fan_out_executor():
+    global FAN_OUT_EXECUTOR
+    with FAN_OUT_EXECUTOR_LOCK:
+        if FAN_OUT_EXECUTOR is None:
+            FAN_OUT_EXECUTOR = ThreadPoolExecutor(max_workers=get_fan_out_max_concurrency(),
+                                                  thread_name_prefix='fan-out')
+        return FAN_OUT_EXECUTOR
+
+
+# Process the boto3 API request for the specified AWS account and AWS region target, and measure its latency
+def process_boto3_api_request_for_target_with_latency(target, boto3_api_name, boto3_api_json_text):
+    start_time = time.monotonic()
+    response_body_text_list, function_response_state = process_boto3_api_request_for_region(target['AWSAccountId'],
+                                                                                             target['AWSRegion'],
+                                                                                             boto3_api_name,
+                                                                                             boto3_api_json_text,
+                                                                                             target['AssumeRoleArn'])
+    return response_body_text_list, function_response_state, time.monotonic() - start_time
+
+
+# Get the text of the per target latency stats
+def get_fan_out_latency_text(target_latencies, target_count):
+    if len(target_latencies) == 0:
+        return 'Latency :: none of the {} targets completed.'.format(target_count)
+    latencies = sorted(target_latencies.values())
+    slowest_target_label = max(target_latencies, key=target_latencies.get)
+    return ('Latency :: {} of {} targets completed; min {:.2f}s, median {:.2f}s, max {:.2f}s ("{}").'
+            .format(len(latencies), target_count, latencies[0], latencies[len(latencies) // 2],
+                    latencies[-1], slowest_target_label))
+
+
+# Process the boto3 API request concurrently across the specified AWS account and AWS region targets on the
+# shared thread pool, and aggregate the results by AWS account; the targets that do not complete within
+# the timeout are reported as timed out, and the results of the other targets are still returned.
+# The timed out targets that are still queued are cancelled, but the running ones cannot be interrupted,
+# and complete in the background on the shared thread pool.
+def process_boto3_api_request_for_targets(targets, boto3_api_name, boto3_api_json_text):
+    response_body_text_list, target_states, target_latencies = [], [], {}
+    executor = get_fan_out_executor()
+    futures = [executor.submit(process_boto3_api_request_for_target_with_latency, target, boto3_api_name,
+                               boto3_api_json_text)
+               for target in targets]
+    fan_out_timeout = get_fan_out_timeout()
+    done_futures, not_done_futures = wait(futures, timeout=fan_out_timeout)
+    multiple_aws_accounts = len(set(target['AWSAccountId'] for target in targets)) > 1
+    # Share the response size limit among the targets, after the AWS account headers, so that every target
+    # and the latency stats fit within the truncated response message
+    aws_account_header_length = sum(len('AWS Account Id "{}" :: '.format(aws_account_id))
+                                    for aws_account_id in set(target['AWSAccountId'] for target in targets)
+                                    ) if multiple_aws_accounts else 0
+    max_target_text_length = max(0, (20000 - aws_account_header_length) // len(targets) - 1)
+    previous_aws_account_id = ''
+    # The targets are ordered by AWS account, and then by AWS region
+    for target, future in zip(targets, futures):
+        if multiple_aws_accounts:
+            target_label = '{}/{}'.format(target['AWSAccountId'], target['AWSRegion'])
+            if target['AWSAccountId'] != previous_aws_account_id:
+                response_body_text_list.append('AWS Account Id "{}" ::'.format(target['AWSAccountId']))
+                previous_aws_account_id = target['AWSAccountId']
+        else:
+            target_label = target['AWSRegion']
+        if future in not_done_futures:
+            # Do not start the targets still queued; the running ones complete in the background
+            future.cancel()
+            target_state = 'FAILURE'
+            target_text = 'Timed out after {:.0f} seconds.'.format(fan_out_timeout)
+        elif future.exception() is not None:
+            target_state = 'FAILURE'
+            target_text = 'Failed with the error :: {}'.format(future.exception())
+        else:
+            target_text_list, target_state, target_latencies[target_label] = future.result()
+            target_text = ' '.join(target_text_list)
+        if target_label in target_latencies:
+            target_text = '[AWSRegion "{}", {:.2f}s] {}'.format(target['AWSRegion'], target_latencies[target_label],
+                                                                target_text)
+        else:
+            target_text = '[AWSRegion "{}"] {}'.format(target['AWSRegion'], target_text)
+        if target_state == 'FAILURE':
+            logging.warning('Target "{}" :: {}'.format(target_label, target_text))
+        response_body_text_list.append(target_text[:max_target_text_length])
+        target_states.append(target_state)
+    # Append the per target latency stats
+    response_body_text = get_fan_out_latency_text(target_latencies, len(targets))
+    response_body_text_list.append(response_body_text)
+    logging.info(response_body_text)
+    # The request fails only if it failed for every target
+    if all(target_state == 'REPROMPT' for target_state in target_states):
+        function_response_state = 'REPROMPT'
+    elif all(len(target_state) > 0 for target_state in target_states):
+        function_response_state = 'FAILURE'
+    else:
+        function_response_state = ''
+    return response_body_text_list, function_response_state
+
+
+# The max page size supported by the AWS Backup list APIs
+BOTO3_API_PAGE_SIZE = 1000
+
+
+# Iterate lazily through the items of a paginated AWS Backup list API by following the NextToken;
+# the next page is only fetched after all the items of the current page have been consumed,
+# so that a lookup can stop as soon as it finds the item it is looking for
+def iterate_paginated_items(list_api_function, items_key, list_api_request_json):
+    page_request_json = dict(list_api_request_json)
+    page_request_json['MaxResults'] = BOTO3_API_PAGE_SIZE
+    while True:
+        list_api_response = list_api_function(**page_request_json)
+        for item in list_api_response.get(items_key, []):
+            yield item
+        next_token = list_api_response.get('NextToken', '')
+        if len(next_token) == 0:
+            break
+        page_request_json['NextToken'] = next_token
+
+
+# List the items across the pages of the specified AWS Backup list API by invoking it with LLM intervened retry;
+# up to the max results items are returned, and the listing stops at the first item beyond them,
+# so that no further pages are fetched. The total item count is None if there are more items than the max results
+def list_all_items_with_llm_intervened_retry(aws_account_id, aws_region, bkp_client,
+                                             boto3_api_name, items_key, boto3_api_request_json):
+    max_results = int(os.environ['BOTO3_API_MAX_RESULTS'])
+    returned_items = []
+    for item in iterate_paginated_items(
+            lambda **page_request_json: invoke_boto3_api_with_llm_intervened_retry(aws_account_id,
+                                                                                   aws_region,
+                                                                                   bkp_client,
+                                                                                   boto3_api_name,
+                                                                                   page_request_json),
+            items_key, boto3_api_request_json):
+        if len(returned_items) >= max_results:
+            return returned_items, None
+        returned_items.append(item)
+    return returned_items, len(returned_items)
+
+
+# Get the response body text that describes the returned and the total item counts;
+# a total item count of None means that there are more items than the max results
+def get_item_count_text(returned_item_count, total_item_count):
+    if total_item_count is None:
+        return ('Returned {} item(s); there are more than {} item(s) in total, '
+                'and the listing was stopped at the max of {} item(s). '
+                .format(returned_item_count, returned_item_count, os.environ['BOTO3_API_MAX_RESULTS']))
+    return ('Returned {} of a total of {} item(s); results restricted to a max of {} item(s). '
+            .format(returned_item_count, total_item_count, os.environ['BOTO3_API_MAX_RESULTS']))
+
+
+# Cache of the backup vault inventory, keyed by AWS account and region, and indexed by backup vault name and ARN,
+# that is reused across invocations of a warm Lambda container
+BACKUP_VAULT_INDEX_CACHE = {}
+BACKUP_VAULT_INDEX_CACHE_LOCK = threading.Lock()
+
+
+# Get the TTL (in seconds) of the cached backup vault inventory
+def get_backup_vault_index_ttl():
+    return int(os.environ.get('BACKUP_VAULT_INDEX_TTL_SECONDS', '60'))
+
+
+# Get the backup vault inventory for the region of the specified client, indexed by name and ARN;
+# the inventory is listed once and reused until its TTL expires or it is invalidated
+def get_backup_vault_index(bkp_client, refresh=False):
+    aws_region = bkp_client.meta.region_name
+    cache_scope = get_boto3_client_cache_scope(bkp_client)
+    with BACKUP_VAULT_INDEX_CACHE_LOCK:
+        backup_vault_index = BACKUP_VAULT_INDEX_CACHE.get(cache_scope)
+        if (refresh or (backup_vault_index is None)
+                or ((time.monotonic() - backup_vault_index['ListedTime']) > get_backup_vault_index_ttl())):
+            logging.info('Listing backup vaults in region "{}" to index them...'.format(aws_region))
+            backup_vaults = list(iterate_paginated_items(bkp_client.list_backup_vaults, 'BackupVaultList', {}))
+            backup_vault_index = {
+                'ListedTime': time.monotonic(),
+                'ByName': {backup_vault['BackupVaultName']: backup_vault for backup_vault in backup_vaults},
+                'ByArn': {backup_vault['BackupVaultArn']: backup_vault for backup_vault in backup_vaults}
+            }
+            BACKUP_VAULT_INDEX_CACHE[cache_scope] = backup_vault_index
+        return backup_vault_index
+
+
+# Add the specified backup vault details to the backup vault inventory of the specified client's region,
+# if the inventory is cached
+def add_backup_vault_to_index(bkp_client, backup_vault):
+    with BACKUP_VAULT_INDEX_CACHE_LOCK:
+        backup_vault_index = BACKUP_VAULT_INDEX_CACHE.get(get_boto3_client_cache_scope(bkp_client))
+        if backup_vault_index is not None:
+            backup_vault_index['ByName'][backup_vault['BackupVaultName']] = backup_vault
+            backup_vault_index['ByArn'][backup_vault['BackupVaultArn']] = backup_vault
+
+
+# Invalidate the cached backup vault inventory for the region of the specified client
+def invalidate_backup_vault_index(bkp_client):
+    with BACKUP_VAULT_INDEX_CACHE_LOCK:
+        BACKUP_VAULT_INDEX_CACHE.pop(get_boto3_client_cache_scope(bkp_client), None)
+
+
 # Check if the backup vault for the specified name exists;
 # # If it exists, also return the backup vault ARN
 def does_backup_vault_exist_for_name(bkp_client, backup_vault_name):
-    backup_vaults = (bkp_client.list_backup_vaults(MaxResults=int(os.environ['BOTO3_API_MAX_RESULTS'])))['BackupVaultList']
-    for backup_vault in backup_vaults:
-        if backup_vault['BackupVaultName'] == backup_vault_name:
-            return True, backup_vault['BackupVaultArn']
+    backup_vault = get_backup_vault_index(bkp_client)['ByName'].get(backup_vault_name)
+    if backup_vault is not None:
+        return True, backup_vault['BackupVaultArn']
     return False, ''
 
 
 # Get the backup vault details for the specified name
-def get_backup_vault_for_name(bkp_client, backup_vault_name):
-    backup_vaults = (bkp_client.list_backup_vaults(MaxResults=int(os.environ['BOTO3_API_MAX_RESULTS'])))['BackupVaultList']
-    for backup_vault in backup_vaults:
-        if backup_vault['BackupVaultName'] == backup_vault_name:
-            return True, backup_vault
-    return False, None
+def get_backup_vault_for_name(bkp_client, backup_vault_name, refresh=False):
+    backup_vault = get_backup_vault_index(bkp_client, refresh)['ByName'].get(backup_vault_name)
+    return (backup_vault is not None), backup_vault
 
 
 # Get the backup vault details for the specified ARN
-def get_backup_vault_for_arn(bkp_client, backup_vault_arn):
-    backup_vaults = (bkp_client.list_backup_vaults(MaxResults=int(os.environ['BOTO3_API_MAX_RESULTS'])))['BackupVaultList']
-    for backup_vault in backup_vaults:
-        if backup_vault['BackupVaultArn'] == backup_vault_arn:
-            return True, backup_vault
-    return False, None
+def get_backup_vault_for_arn(bkp_client, backup_vault_arn, refresh=False):
+    backup_vault = get_backup_vault_index(bkp_client, refresh)['ByArn'].get(backup_vault_arn)
+    return (backup_vault is not None), backup_vault
 
 
-# List the backup vault details for the specified tag and values
-def list_backup_vaults_for_tags(bkp_client, tag_key, tag_values):
-    retrieved_backup_vaults = []
+# Get the tags of the resource for the specified ARN
+def get_tags_for_resource_arn(bkp_client, resource_arn):
+    return (bkp_client.list_tags(ResourceArn=resource_arn, MaxResults=int(os.environ['BOTO3_API_MAX_RESULTS'])))['Tags']
+
+
+# List the resources that have the specified tag with one of the values;
+# The tags of the resources are retrieved concurrently on a bounded thread pool
+# and the matching resources are returned in the same order as the specified resources
+def list_resources_for_tags(bkp_client, resources, resource_arn_key, tag_key, tag_values):
     # Strip each item in the tag values list
     tag_values = [tag_value.strip() for tag_value in tag_values]
-    backup_vaults = (bkp_client.list_backup_vaults(MaxResults=int(os.environ['BOTO3_API_MAX_RESULTS'])))['BackupVaultList']
-    for backup_vault in backup_vaults:
-        backup_vault_arn = backup_vault['BackupVaultArn']
-        retrieved_tags = (bkp_client.list_tags(ResourceArn=backup_vault_arn, MaxResults=int(os.environ['BOTO3_API_MAX_RESULTS'])))['Tags']
-        retrieved_tag_keys = retrieved_tags.keys()
-        for retrieved_tag_key in retrieved_tag_keys:
-            if (retrieved_tag_key == tag_key) and (retrieved_tags[retrieved_tag_key] in tag_values):
-                retrieved_backup_vaults.append(backup_vault)
-    return retrieved_backup_vaults
+    resource_arns = [resource[resource_arn_key] for resource in resources]
+    with ThreadPoolExecutor(max_workers=get_boto3_api_max_concurrency()) as executor:
+        # The results of map are in the order of the resource ARNs irrespective of the completion order
+        retrieved_tags_list = list(executor.map(partial(get_tags_for_resource_arn, bkp_client), resource_arns))
+    return [resource for resource, retrieved_tags in zip(resources, retrieved_tags_list)
+            if (tag_key in retrieved_tags) and (retrieved_tags[tag_key] in tag_values)]
+
+
+# List the backup vault details for the specified tag and values
+def list_backup_vaults_for_tags(bkp_client, tag_key, tag_values):
+    backup_vaults = list(iterate_paginated_items(bkp_client.list_backup_vaults, 'BackupVaultList', {}))
+    return list_resources_for_tags(bkp_client, backup_vaults, 'BackupVaultArn', tag_key, tag_values)
 
 
 # Check and create backup vault
@@ -143,72 +786,175 @@ def check_and_create_backup_vault(bkp_client, backup_vault_name, response_body_t
             logging.info('Creating backup vault named "{}"...')
             create_backup_vault_response = bkp_client.create_backup_vault(BackupVaultName=backup_vault_name)
             logging.info('Created backup vault named "{}".')
+            # Add the backup vault to the cached inventory so that the other rules of the same
+            # backup plan do not list the backup vaults again
+            describe_backup_vault_response = bkp_client.describe_backup_vault(BackupVaultName=backup_vault_name)
+            describe_backup_vault_response.pop('ResponseMetadata', None)
+            add_backup_vault_to_index(bkp_client, describe_backup_vault_response)
             response_body_text = ('Backup vault named "{}" created. Its ARN is "{}".'.format(backup_vault_name,
                                                                                              create_backup_vault_response['BackupVaultArn']))
             response_body_text_list.append(response_body_text)
             logging.info(response_body_text)
 
 
+# Cache of the backup plan names and ids, keyed by AWS account and region, along with the backup selection names and ids
+# of each backup plan, that is reused across invocations of a warm Lambda container
+BACKUP_PLAN_INDEX_CACHE = {}
+BACKUP_PLAN_INDEX_CACHE_LOCK = threading.Lock()
+
+
+# Get the TTL (in seconds) of the cached backup plan and backup selection names and ids
+def get_backup_plan_index_ttl():
+    return int(os.environ.get('BACKUP_PLAN_INDEX_TTL_SECONDS', '60'))
+
+
+# Check if the specified backup plan or backup selection index is missing or has expired
+def is_backup_plan_index_expired(index_entry):
+    return (index_entry is None) or ((time.monotonic() - index_entry['ListedTime']) > get_backup_plan_index_ttl())
+
+
+# Get the backup plan names and ids for the region of the specified client; the backup plans are
+# listed lazily and reused until the TTL expires. Must be called with the index lock held.
+def get_backup_plan_index(bkp_client):
+    aws_region = bkp_client.meta.region_name
+    cache_scope = get_boto3_client_cache_scope(bkp_client)
+    backup_plan_index = BACKUP_PLAN_INDEX_CACHE.get(cache_scope)
+    if is_backup_plan_index_expired(backup_plan_index):
+        logging.info('Listing backup plans in region "{}" to index them...'.format(aws_region))
+        backup_plans = list(iterate_paginated_items(bkp_client.list_backup_plans, 'BackupPlansList',
+                                                    {'IncludeDeleted': False}))
+        backup_plan_index = {
+            'ListedTime': time.monotonic(),
+            'ByName': {backup_plan['BackupPlanName']: backup_plan['BackupPlanId'] for backup_plan in backup_plans},
+            'ById': {backup_plan['BackupPlanId']: backup_plan['BackupPlanName'] for backup_plan in backup_plans},
+            'Selections': {}
+        }
+        BACKUP_PLAN_INDEX_CACHE[cache_scope] = backup_plan_index
+    return backup_plan_index
+
+
+# Get the backup selection names and ids of the specified backup plan; the backup selections are
+# listed lazily and reused until the TTL expires. Must be called with the index lock held.
+def get_backup_selection_index(bkp_client, backup_plan_id):
+    backup_selection_indexes = get_backup_plan_index(bkp_client)['Selections']
+    backup_selection_index = backup_selection_indexes.get(backup_plan_id)
+    if is_backup_plan_index_expired(backup_selection_index):
+        logging.info('Listing backup selections of backup plan id "{}" to index them...'.format(backup_plan_id))
+        backup_selections = list(iterate_paginated_items(bkp_client.list_backup_selections, 'BackupSelectionsList',
+                                                         {'BackupPlanId': backup_plan_id}))
+        backup_selection_index = {
+            'ListedTime': time.monotonic(),
+            'ByName': {backup_selection['SelectionName']: backup_selection['SelectionId']
+                       for backup_selection in backup_selections},
+            'ById': {backup_selection['SelectionId']: backup_selection['SelectionName']
+                     for backup_selection in backup_selections}
+        }
+        backup_selection_indexes[backup_plan_id] = backup_selection_index
+    return backup_selection_index
+
+
+# Add or update the specified backup plan in the cached index, if the index is cached
+def add_backup_plan_to_index(bkp_client, backup_plan_id, backup_plan_name):
+    with BACKUP_PLAN_INDEX_CACHE_LOCK:
+        backup_plan_index = BACKUP_PLAN_INDEX_CACHE.get(get_boto3_client_cache_scope(bkp_client))
+        if backup_plan_index is not None:
+            previous_backup_plan_name = backup_plan_index['ById'].get(backup_plan_id)
+            if previous_backup_plan_name is not None:
+                backup_plan_index['ByName'].pop(previous_backup_plan_name, None)
+            backup_plan_index['ByName'][backup_plan_name] = backup_plan_id
+            backup_plan_index['ById'][backup_plan_id] = backup_plan_name
+
+
+# Remove the specified backup plan and its backup selections from the cached index
+def remove_backup_plan_from_index(bkp_client, backup_plan_id):
+    with BACKUP_PLAN_INDEX_CACHE_LOCK:
+        backup_plan_index = BACKUP_PLAN_INDEX_CACHE.get(get_boto3_client_cache_scope(bkp_client))
+        if backup_plan_index is not None:
+            backup_plan_name = backup_plan_index['ById'].pop(backup_plan_id, None)
+            if backup_plan_name is not None:
+                backup_plan_index['ByName'].pop(backup_plan_name, None)
+            backup_plan_index['Selections'].pop(backup_plan_id, None)
+
+
+# Add the specified backup selection to the cached index, if the backup plan's selections are cached
+def add_backup_selection_to_index(bkp_client, backup_plan_id, backup_selection_id, backup_selection_name):
+    with BACKUP_PLAN_INDEX_CACHE_LOCK:
+        backup_plan_index = BACKUP_PLAN_INDEX_CACHE.get(get_boto3_client_cache_scope(bkp_client))
+        if backup_plan_index is not None:
+            backup_selection_index = backup_plan_index['Selections'].get(backup_plan_id)
+            if backup_selection_index is not None:
+                backup_selection_index['ByName'][backup_selection_name] = backup_selection_id
+                backup_selection_index['ById'][backup_selection_id] = backup_selection_name
+
+
+# Remove the specified backup selection from the cached index
+def remove_backup_selection_from_index(bkp_client, backup_plan_id, backup_selection_id):
+    with BACKUP_PLAN_INDEX_CACHE_LOCK:
+        backup_plan_index = BACKUP_PLAN_INDEX_CACHE.get(get_boto3_client_cache_scope(bkp_client))
+        if backup_plan_index is not None:
+            backup_selection_index = backup_plan_index['Selections'].get(backup_plan_id)
+            if backup_selection_index is not None:
+                backup_selection_name = backup_selection_index['ById'].pop(backup_selection_id, None)
+                if backup_selection_name is not None:
+                    backup_selection_index['ByName'].pop(backup_selection_name, None)
+
+
+# Invalidate the cached backup plan and backup selection index for the region of the specified client
+def invalidate_backup_plan_index(bkp_client):
+    with BACKUP_PLAN_INDEX_CACHE_LOCK:
+        BACKUP_PLAN_INDEX_CACHE.pop(get_boto3_client_cache_scope(bkp_client), None)
+
+
 # Check if the backup plan for the specified id exists;
 # If it exists, also return the backup plan name
 def does_backup_plan_exist_for_id(bkp_client, backup_plan_id):
-    backup_plans = (bkp_client.list_backup_plans(IncludeDeleted=False))['BackupPlansList']
-    for backup_plan in backup_plans:
-        if backup_plan['BackupPlanId'] == backup_plan_id:
-            return True, backup_plan['BackupPlanName']
+    with BACKUP_PLAN_INDEX_CACHE_LOCK:
+        backup_plan_name = get_backup_plan_index(bkp_client)['ById'].get(backup_plan_id)
+    if backup_plan_name is not None:
+        return True, backup_plan_name
     return False, ''
 
 
 # Check if the backup plan for the specified name exists;
 # If it exists, also return the backup plan id
 def does_backup_plan_exist_for_name(bkp_client, backup_plan_name):
-    backup_plans = (bkp_client.list_backup_plans(IncludeDeleted=False))['BackupPlansList']
-    for backup_plan in backup_plans:
-        if backup_plan['BackupPlanName'] == backup_plan_name:
-            return True, backup_plan['BackupPlanId']
+    with BACKUP_PLAN_INDEX_CACHE_LOCK:
+        backup_plan_id = get_backup_plan_index(bkp_client)['ByName'].get(backup_plan_name)
+    if backup_plan_id is not None:
+        return True, backup_plan_id
     return False, ''
 
 
 # Check if the specified backup selection for the id exists;
 # If it exists, also return the backup selection name
 def does_backup_selection_exist_for_id(bkp_client, backup_plan_id, backup_selection_id):
-    backup_selections = (bkp_client.list_backup_selections(BackupPlanId=backup_plan_id))['BackupSelectionsList']
-    for backup_selection in backup_selections:
-        if backup_selection['SelectionId'] == backup_selection_id:
-            return True, backup_selection['SelectionName']
+    with BACKUP_PLAN_INDEX_CACHE_LOCK:
+        backup_selection_name = get_backup_selection_index(bkp_client, backup_plan_id)['ById'].get(backup_selection_id)
+    if backup_selection_name is not None:
+        return True, backup_selection_name
     return False, ''
 
 
 # List the backup plan details for the specified tag and values
 def list_backup_plans_for_tags(bkp_client, tag_key, tag_values):
-    retrieved_backup_plans = []
-    # Strip each item in the tag values list
-    tag_values = [tag_value.strip() for tag_value in tag_values]
-    backup_plans = (bkp_client.list_backup_plans(MaxResults=int(os.environ['BOTO3_API_MAX_RESULTS'])))['BackupPlansList']
-    for backup_plan in backup_plans:
-        backup_plan_arn = backup_plan['BackupPlanArn']
-        retrieved_tags = (bkp_client.list_tags(ResourceArn=backup_plan_arn, MaxResults=int(os.environ['BOTO3_API_MAX_RESULTS'])))['Tags']
-        retrieved_tag_keys = retrieved_tags.keys()
-        for retrieved_tag_key in retrieved_tag_keys:
-            if (retrieved_tag_key == tag_key) and (retrieved_tags[retrieved_tag_key] in tag_values):
-                retrieved_backup_plans.append(backup_plan)
-    return retrieved_backup_plans
+    backup_plans = list(iterate_paginated_items(bkp_client.list_backup_plans, 'BackupPlansList', {}))
+    return list_resources_for_tags(bkp_client, backup_plans, 'BackupPlanArn', tag_key, tag_values)
 
 
 # Check if the specified backup selection for the name exists;
 # If it exists, also return the backup selection id
 def does_backup_selection_exist_for_name(bkp_client, backup_plan_id, backup_selection_name):
-    backup_selections = (bkp_client.list_backup_selections(BackupPlanId=backup_plan_id))['BackupSelectionsList']
-    for backup_selection in backup_selections:
-        if backup_selection['SelectionName'] == backup_selection_name:
-            return True, backup_selection['SelectionId']
+    with BACKUP_PLAN_INDEX_CACHE_LOCK:
+        backup_selection_id = get_backup_selection_index(bkp_client, backup_plan_id)['ByName'].get(backup_selection_name)
+    if backup_selection_id is not None:
+        return True, backup_selection_id
     return False, ''
 
 
 # Check if the legal hold for the specified id exists;
 # # If it exists, also return the legal hold ARN
 def does_legal_hold_exist_for_id(bkp_client, legal_hold_id):
-    legal_holds = (bkp_client.list_legal_holds())['LegalHolds']
+    legal_holds = iterate_paginated_items(bkp_client.list_legal_holds, 'LegalHolds', {})
     for legal_hold in legal_holds:
         if legal_hold['LegalHoldId'] == legal_hold_id:
             return True, legal_hold['LegalHoldArn']
@@ -218,7 +964,7 @@ def does_legal_hold_exist_for_id(bkp_client, legal_hold_id):
 # Check if the legal hold for the specified ARN exists;
 # # If it exists, also return the legal hold id
 def does_legal_hold_exist_for_arn(bkp_client, legal_hold_arn):
-    legal_holds = (bkp_client.list_legal_holds())['LegalHolds']
+    legal_holds = iterate_paginated_items(bkp_client.list_legal_holds, 'LegalHolds', {})
     for legal_hold in legal_holds:
         if legal_hold['LegalHoldArn'] == legal_hold_arn:
             return True, legal_hold['LegalHoldId']
@@ -227,37 +973,85 @@ def does_legal_hold_exist_for_arn(bkp_client, legal_hold_arn):
 
 # List the legal hold details for the specified tag and values
 def list_legal_holds_for_tags(bkp_client, tag_key, tag_values):
-    retrieved_legal_holds = []
-    # Strip each item in the tag values list
-    tag_values = [tag_value.strip() for tag_value in tag_values]
-    legal_holds = (bkp_client.list_legal_holds(MaxResults=int(os.environ['BOTO3_API_MAX_RESULTS'])))['LegalHolds']
-    for legal_hold in legal_holds:
-        legal_hold_arn = legal_hold['LegalHoldArn']
-        retrieved_tags = (bkp_client.list_tags(ResourceArn=legal_hold_arn, MaxResults=int(os.environ['BOTO3_API_MAX_RESULTS'])))['Tags']
-        retrieved_tag_keys = retrieved_tags.keys()
-        for retrieved_tag_key in retrieved_tag_keys:
-            if (retrieved_tag_key == tag_key) and (retrieved_tags[retrieved_tag_key] in tag_values):
-                retrieved_legal_holds.append(legal_hold)
-    return retrieved_legal_holds
+    legal_holds = list(iterate_paginated_items(bkp_client.list_legal_holds, 'LegalHolds', {}))
+    return list_resources_for_tags(bkp_client, legal_holds, 'LegalHoldArn', tag_key, tag_values)
+
+
+# Counts of the boto3 API JSONs that passed (hit) or failed (miss) the local validation,
+# across invocations of a warm Lambda container
+BOTO3_API_JSON_LOCAL_VALIDATION_COUNTS = {'hit': 0, 'miss': 0}
+
+
+# Find the values in the specified boto3 API parameter that are not in the enum of its shape
+def find_boto3_api_param_enum_errors(shape, param, param_name):
+    enum_errors = []
+    if (shape.type_name == 'structure') and isinstance(param, dict):
+        for member_name, member_param in param.items():
+            if member_name in shape.members:
+                member_param_name = '{}.{}'.format(param_name, member_name) if (len(param_name) > 0) else member_name
+                enum_errors.extend(find_boto3_api_param_enum_errors(shape.members[member_name], member_param,
+                                                                    member_param_name))
+    elif (shape.type_name == 'list') and isinstance(param, list):
+        for index, member_param in enumerate(param):
+            enum_errors.extend(find_boto3_api_param_enum_errors(shape.member, member_param,
+                                                                '{}[{}]'.format(param_name, index)))
+    elif (shape.type_name == 'map') and isinstance(param, dict):
+        for map_key, map_value in param.items():
+            enum_errors.extend(find_boto3_api_param_enum_errors(shape.value, map_value,
+                                                                '{}.{}'.format(param_name, map_key)))
+    elif (shape.type_name == 'string') and (len(shape.enum) > 0) and isinstance(param, str) and (param not in shape.enum):
+        enum_errors.append('Invalid value for parameter {}, value: {}, valid values: {}'
+                           .format(param_name, param, ', '.join(shape.enum)))
+    return enum_errors
+
+
+# Validate the boto3 API JSON locally against the service model of the specified boto3 client;
+# checks the required members, the unknown members, the types and the enums, and returns the list of errors
+def validate_boto3_api_json(boto3_client, boto3_api_name, boto3_api_json_text):
+    try:
+        boto3_api_request_json = json.loads(boto3_api_json_text)
+    except json.JSONDecodeError as exception:
+        return ['The boto3 API JSON is not valid JSON :: {}'.format(exception)]
+    if boto3_api_request_json is None:
+        boto3_api_request_json = {}
+    if not isinstance(boto3_api_request_json, dict):
+        return ['The boto3 API JSON is not a JSON object.']
+    operation_name = boto3_client.meta.method_to_api_mapping.get(boto3_api_name)
+    if operation_name is None:
+        return ['Unknown boto3 API "{}".'.format(boto3_api_name)]
+    input_shape = boto3_client.meta.service_model.operation_model(operation_name).input_shape
+    validation_errors = []
+    if input_shape is None:
+        if len(boto3_api_request_json) > 0:
+            validation_errors.append('The boto3 API "{}" does not take any parameters.'.format(boto3_api_name))
+        return validation_errors
+    validation_report = ParamValidator().validate(boto3_api_request_json, input_shape)
+    if validation_report.has_errors():
+        validation_errors.extend(validation_report.generate_report().splitlines())
+    validation_errors.extend(find_boto3_api_param_enum_errors(input_shape, boto3_api_request_json, ''))
+    return validation_errors
 
 
 # Process the prompt and the response by invoking the specified LLM
-def process_prompt(aws_account_id, aws_region, boto3_api_name, user_input, generated_boto3_json_str):
-    # Instantiate the Amazon Bedrock runtime boto3 client for the specific region
-    bedrock_rt_client = boto3.client('bedrock-runtime', region_name=aws_region, config=get_boto_config())
-    # Read the prompt templates and perform variable substitution
-    prompt_templates_dir = '.'
+def process_prompt(aws_account_id, aws_region, boto3_api_name, user_input, generated_boto3_json_str,
+                   validation_errors):
+    # Get the cached Amazon Bedrock runtime boto3 client for the specific region
+    bedrock_rt_client = get_boto3_client('bedrock-runtime', aws_region)
+    # Render the preloaded prompt templates with the variable values
     system_prompts = [
         {
-            "text": read_file(os.path.join(prompt_templates_dir, os.environ['SYSTEM_PROMPT_FILE_NAME']), 'r')
+            "text": render_prompt_template(PROMPT_TEMPLATES['SYSTEM_PROMPT_FILE_NAME'], {})
         }
     ]
-    user_prompt_content = read_file(os.path.join(prompt_templates_dir, os.environ['USER_PROMPT_FILE_NAME']), 'r')
-    user_prompt_content = user_prompt_content.replace('{aws_account_id}', aws_account_id)
-    user_prompt_content = user_prompt_content.replace('{aws_region}', aws_region)
-    user_prompt_content = user_prompt_content.replace('{boto3_api_name}', boto3_api_name)
-    user_prompt_content = user_prompt_content.replace('{user_input}', user_input)
-    user_prompt_content = user_prompt_content.replace('{generated_boto3_json}', generated_boto3_json_str)
+    placeholder_values = {
+        'aws_account_id': aws_account_id,
+        'aws_region': aws_region,
+        'boto3_api_name': boto3_api_name,
+        'user_input': user_input,
+        'generated_boto3_json': generated_boto3_json_str,
+        'validation_errors': '\n'.join(validation_errors)
+    }
+    user_prompt_content = render_prompt_template(PROMPT_TEMPLATES['USER_PROMPT_FILE_NAME'], placeholder_values)
     messages = [
         {
             "role": "user",
@@ -268,8 +1062,11 @@ def process_prompt(aws_account_id, aws_region, boto3_api_name, user_input, gener
             ]
         }
     ]
-    # Invoke the LLM, prepare and return the response
-    llm_response = invoke_llm(bedrock_rt_client, system_prompts, messages)
+    # Invoke the LLM or use its cached response, prepare and return the response
+    cache_key = get_llm_response_cache_key(('SYSTEM_PROMPT_FILE_NAME', 'USER_PROMPT_FILE_NAME'),
+                                           dict(placeholder_values,
+                                                generated_boto3_json=canonicalize_boto3_json(generated_boto3_json_str)))
+    llm_response = invoke_llm_with_cache(bedrock_rt_client, system_prompts, messages, cache_key, 'VALIDATED_BOTO3_JSON')
     change_log = substring_between(llm_response, '<CHANGELOG>', '</CHANGELOG>')
     logging.info('LLM validation and update complete. Change log :: {}'.format(change_log))
     updated_generated_json = substring_between(llm_response, '<VALIDATED_BOTO3_JSON>', '</VALIDATED_BOTO3_JSON>')
@@ -278,21 +1075,23 @@ def process_prompt(aws_account_id, aws_region, boto3_api_name, user_input, gener
 
 # Process the prompt for the boto3 API retry and the response by invoking the specified LLM
 def process_prompt_for_boto3_api_retry(aws_account_id, aws_region, boto3_api_name, boto3_json_str, boto3_error):
-    # Instantiate the Amazon Bedrock runtime boto3 client for the specific region
-    bedrock_rt_client = boto3.client('bedrock-runtime', region_name=aws_region, config=get_boto_config())
-    # Read the prompt templates and perform variable substitution
-    prompt_templates_dir = '.'
+    # Get the cached Amazon Bedrock runtime boto3 client for the specific region
+    bedrock_rt_client = get_boto3_client('bedrock-runtime', aws_region)
+    # Render the preloaded prompt templates with the variable values
     system_prompts = [
         {
-            "text": read_file(os.path.join(prompt_templates_dir, os.environ['SYSTEM_PROMPT_FOR_BOTO3_RETRY_FILE_NAME']), 'r')
+            "text": render_prompt_template(PROMPT_TEMPLATES['SYSTEM_PROMPT_FOR_BOTO3_RETRY_FILE_NAME'], {})
         }
     ]
-    user_prompt_content = read_file(os.path.join(prompt_templates_dir, os.environ['USER_PROMPT_FOR_BOTO3_RETRY_FILE_NAME']), 'r')
-    user_prompt_content = user_prompt_content.replace('{aws_account_id}', aws_account_id)
-    user_prompt_content = user_prompt_content.replace('{aws_region}', aws_region)
-    user_prompt_content = user_prompt_content.replace('{boto3_api_name}', boto3_api_name)
-    user_prompt_content = user_prompt_content.replace('{boto3_json}', boto3_json_str)
-    user_prompt_content = user_prompt_content.replace('{boto3_error}', boto3_error)
+    placeholder_values = {
+        'aws_account_id': aws_account_id,
+        'aws_region': aws_region,
+        'boto3_api_name': boto3_api_name,
+        'boto3_json': boto3_json_str,
+        'boto3_error': boto3_error
+    }
+    user_prompt_content = render_prompt_template(PROMPT_TEMPLATES['USER_PROMPT_FOR_BOTO3_RETRY_FILE_NAME'],
+                                                 placeholder_values)
     messages = [
         {
             "role": "user",
@@ -303,11 +1102,25 @@ def process_prompt_for_boto3_api_retry(aws_account_id, aws_region, boto3_api_nam
             ]
         }
     ]
-    # Invoke the LLM, prepare and return the response
-    llm_response = invoke_llm(bedrock_rt_client, system_prompts, messages)
+    # Invoke the LLM or use its cached response, prepare and return the response; unlike the validation,
+    # the fix is not cached here, but only once the boto3 API call retried with it succeeds
+    cache_key = get_llm_response_cache_key(('SYSTEM_PROMPT_FOR_BOTO3_RETRY_FILE_NAME', 'USER_PROMPT_FOR_BOTO3_RETRY_FILE_NAME'),
+                                           dict(placeholder_values, boto3_json=canonicalize_boto3_json(boto3_json_str)))
+    llm_response = get_cached_llm_response(cache_key)
+    token_usage = None
+    if llm_response is None:
+        llm_response, token_usage = invoke_llm(bedrock_rt_client, system_prompts, messages)
+    else:
+        logging.info('Using the cached LLM response.')
+    log_llm_response_cache_stats()
     fixed_boto3_json = substring_between(llm_response, '<FIXED_BOTO3_JSON>', '</FIXED_BOTO3_JSON>')
     logging.info('LLM fix to boto3 JSON completed based on the specified boto3 error.')
-    return fixed_boto3_json
+    llm_fix = {
+        'cache_key': cache_key,
+        'llm_response': llm_response,
+        'token_usage': token_usage
+    }
+    return fixed_boto3_json, llm_fix
 
 
 # Invoke the specified LLM through Amazon Bedrock's Converse API
@@ -340,8 +1153,8 @@ def invoke_llm(bedrock_rt_client, system_prompts, messages):
         logging.info('Prompt latency = {} second(s)'.format(int(metrics['latencyMs']) / 1000))
         logging.info('PROMPT: {}'.format(messages[0]['content'][0]))
         logging.info('RESPONSE: {}'.format(prompt_response))
-    # Return the LLM response text
-    return prompt_response
+    # Return the LLM response text and the token usage
+    return prompt_response, response['usage']
 
 
 # Invoke the specified boto3 API
@@ -398,89 +1211,130 @@ def invoke_boto3_api(bkp_client, boto3_api_name, boto3_api_request_json):
         raise exception
 
 
-# Invoke boto3 APIs with LLM intervened retry
+# Error codes of the boto3 API errors that a change to the request JSON can fix
+BOTO3_API_VALIDATION_ERROR_CODES = frozenset((
+    'InvalidArgument',
+    'InvalidInput',
+    'InvalidParameter',
+    'InvalidParameterCombination',
+    'InvalidParameterException',
+    'InvalidParameterValue',
+    'InvalidParameterValueException',
+    'InvalidRequest',
+    'InvalidRequestException',
+    'MalformedXML',
+    'MissingParameter',
+    'MissingParameterValueException',
+    'ValidationError',
+    'ValidationException'
+))
+
+
+# Error codes of the boto3 API errors that may succeed when retried as is
+BOTO3_API_TRANSIENT_ERROR_CODES = frozenset((
+    'InternalError',
+    'InternalFailure',
+    'InternalServerError',
+    'InternalServiceError',
+    'PriorRequestNotComplete',
+    'ProvisionedThroughputExceededException',
+    'RequestLimitExceeded',
+    'RequestThrottled',
+    'RequestThrottledException',
+    'RequestTimeout',
+    'RequestTimeoutException',
+    'ServiceUnavailable',
+    'ServiceUnavailableException',
+    'SlowDown',
+    'Throttling',
+    'ThrottlingException',
+    'TooManyRequestsException'
+))
+
+
+# Classify the boto3 API error as 'VALIDATION' (can be fixed by the LLM), 'TRANSIENT' (can be retried as is)
+# or 'TERMINAL' (cannot be fixed by retrying)
+def classify_boto3_api_error(exception):
+    if isinstance(exception, (ParamValidationError, TypeError)):
+        return 'VALIDATION'
+    if isinstance(exception, (EndpointConnectionError, ConnectTimeoutError, HTTPClientError)):
+        return 'TRANSIENT'
+    if isinstance(exception, ClientError):
+        error_code = exception.response.get('Error', {}).get('Code', '')
+        if (error_code in BOTO3_API_VALIDATION_ERROR_CODES) or error_code.endswith('.Malformed'):
+            return 'VALIDATION'
+        if ((error_code in BOTO3_API_TRANSIENT_ERROR_CODES)
+                or (exception.response.get('ResponseMetadata', {}).get('HTTPStatusCode', 0) >= 500)):
+            return 'TRANSIENT'
+    return 'TERMINAL'
+
+
+# The base and the max backoff (in seconds) of the retries after transient boto3 API errors
+BOTO3_API_RETRY_BASE_BACKOFF_SECONDS = 1
+BOTO3_API_RETRY_MAX_BACKOFF_SECONDS = 20
+
+
+# Get the jittered exponential backoff (in seconds) before the specified retry attempt
+def get_boto3_api_retry_backoff_seconds(retry_attempt):
+    return random.uniform(0, min(BOTO3_API_RETRY_MAX_BACKOFF_SECONDS,
+                                 BOTO3_API_RETRY_BASE_BACKOFF_SECONDS * (2 ** (retry_attempt - 1))))
+
+
+# Invoke boto3 APIs with a retry pipeline based on the error class; validation errors are fixed by the LLM
+# and retried, transient errors are retried after a jittered backoff and terminal errors are raised right away.
+# Each path is bounded by its own configurable attempt budget.
 def invoke_boto3_api_with_llm_intervened_retry(aws_account_id, aws_region, bkp_client,
                                                boto3_api_name, boto3_api_request_json):
-    try:
+    llm_fix_attempts = 0
+    transient_retry_attempts = 0
+    # The LLM fix of the boto3 API JSON request that is being retried, if any
+    llm_fix = None
+    while True:
         try:
-            response = invoke_boto3_api(bkp_client, boto3_api_name, boto3_api_request_json)
+            boto3_api_response = invoke_boto3_api(bkp_client, boto3_api_name, boto3_api_request_json)
+            # Cache the LLM fix only now that the call retried with it has succeeded
+            put_cached_llm_fix(llm_fix)
+            return boto3_api_response
         except Exception as exception:
-            logging.info('Error occurred when invoking boto3 API "{}" :: {}'.format(boto3_api_name, exception))
-            logging.info('Fixing the boto3 API JSON request using LLM...')
-            fixed_boto3_api_request_json = json.loads(process_prompt_for_boto3_api_retry(aws_account_id,
-                                                                                         aws_region,
-                                                                                         boto3_api_name,
-                                                                                         json.dumps(boto3_api_request_json),
-                                                                                         str(exception)))
-            logging.info('Completed fixing the boto3 API JSON request using LLM.')
-            logging.info('Retrying boto3 API "{}" after fixing the JSON request using LLM...'.format(boto3_api_name))
-            response = invoke_boto3_api(bkp_client, boto3_api_name, fixed_boto3_api_request_json)
-            logging.info('Completed retrying boto3 API "{}" after fixing the JSON request using LLM.'.format(boto3_api_name))
-    except Exception as final_exception:
-        raise final_exception
-    return response
+            boto3_api_error_class = classify_boto3_api_error(exception)
+            logging.info('{} error occurred when invoking boto3 API "{}" :: {}'
+                         .format(boto3_api_error_class, boto3_api_name, exception))
+            # The call retried with the LLM fix failed; evict the fix, if it was cached, so that it is not replayed
+            if (llm_fix is not None) and (boto3_api_error_class != 'TRANSIENT'):
+                evict_cached_llm_response(llm_fix['cache_key'])
+                llm_fix = None
+            if (boto3_api_error_class == 'VALIDATION') \
+                    and (llm_fix_attempts < int(os.environ.get('BOTO3_API_MAX_LLM_FIX_ATTEMPTS', '1'))):
+                llm_fix_attempts += 1
+                logging.info('Fixing the boto3 API JSON request using LLM...')
+                fixed_boto3_json, llm_fix = process_prompt_for_boto3_api_retry(aws_account_id,
+                                                                               aws_region,
+                                                                               boto3_api_name,
+                                                                               json.dumps(boto3_api_request_json),
+                                                                               str(exception))
+                boto3_api_request_json = json.loads(fixed_boto3_json)
+                logging.info('Completed fixing the boto3 API JSON request using LLM.')
+                logging.info('Retrying boto3 API "{}" after fixing the JSON request using LLM...'.format(boto3_api_name))
+            elif (boto3_api_error_class == 'TRANSIENT') \
+                    and (transient_retry_attempts < int(os.environ.get('BOTO3_API_MAX_TRANSIENT_RETRY_ATTEMPTS', '2'))):
+                transient_retry_attempts += 1
+                retry_backoff_seconds = get_boto3_api_retry_backoff_seconds(transient_retry_attempts)
+                logging.info('Retrying boto3 API "{}" in {:.2f} second(s)...'.format(boto3_api_name, retry_backoff_seconds))
+                time.sleep(retry_backoff_seconds)
+            else:
+                raise
 
 
-# Parse the input Lambda event received from Agents for Amazon Bedrock
-def parse_request_and_prepare_response(event):
+# Process the boto3 API request in the specified AWS account and AWS region, and return the response body
+# text list and the function response state; the IAM role is assumed for the other AWS accounts
+def process_boto3_api_request_for_region(aws_account_id, aws_region, boto3_api_name, boto3_api_json_text,
+                                         assume_role_arn=''):
     response_body_text_list = []
     function_response_state = ''
-    logging.info('Parsing request data...')
-    # Get the various objects from the input event
-    prompt_session_attributes = event["promptSessionAttributes"]
-    session_attributes = event["sessionAttributes"]
-    # Get the AWS account id from the session attributes, if it exists; if not, add to it
-    if 'AWSAccountId' in session_attributes:
-        aws_account_id = session_attributes['AWSAccountId']
-    else:
-        aws_account_id = (boto3.client('sts')).get_caller_identity().get('Account')
-        session_attributes['AWSAccountId'] = aws_account_id
-    # Append to the response body text
-    response_body_text = 'AWS Account Id "{}" will be used.'.format(aws_account_id)
-    response_body_text_list.append(response_body_text)
-    logging.info(response_body_text)
-    # Get the input parameters
-    aws_region, boto3_api_name, boto3_api_json_text = '', '', ''
-    input_text = event["inputText"]
-    # Loop through the input parameters
-    input_parameters = event["parameters"]
-    for input_parameter in input_parameters:
-        # Retrieve the value of the parameters
-        if input_parameter["name"] == "AWSRegion":
-            aws_region = input_parameter["value"]
-        elif input_parameter["name"] == "Boto3APIName":
-            boto3_api_name = input_parameter["value"].lower()
-            boto3_api_name = substring_after(boto3_api_name, 'backup.client.')
-        elif input_parameter["name"] == "Boto3APIJSON":
-            boto3_api_json_text = input_parameter["value"]
-    logging.info('Completed parsing request data.')
-    # Set the default AWS region if not found in the input
-    if len(aws_region) == 0:
-        aws_region = os.environ['DEFAULT_AWS_REGION']
-    # Append to the response body text
-    response_body_text = 'AWS Region "{}" will be used.'.format(aws_region)
-    response_body_text_list.append(response_body_text)
-    logging.info(response_body_text)
-    # Instantiate the AWS Backup boto3 client for the specific region
-    bkp_client = boto3.client('backup', region_name=aws_region, config=get_boto_config())
-    # Except for custom APIs, validate the boto3 JSON for the specified user input by invoking a LLM
-    if boto3_api_name not in ('list_backup_selections_using_backup_plan_name',
-                              'list_backup_vaults_for_tags',
-                              'list_backup_plans_for_tags',
-                              'get_backup_vault_using_name',
-                              'get_backup_vault_using_arn',
-                              'get_backup_plan_using_name',
-                              'get_backup_selection_using_name',
-                              'delete_backup_vault_using_name',
-                              'delete_backup_vault_using_arn',
-                              'delete_backup_plan_using_name',
-                              'delete_backup_selection_using_name',
-                              'list_legal_holds_for_tags',
-                              'get_legal_hold_using_arn',
-                              'cancel_legal_hold_using_arn'):
-        logging.info('Validating the boto3 API JSON...')
-        boto3_api_json_text = process_prompt(aws_account_id, aws_region, boto3_api_name, input_text, boto3_api_json_text)
-        logging.info('Completed validating the boto3 API JSON.')
+    # Get the cached AWS Backup boto3 client for the specific region
+    # The connection pool is sized to match the concurrent boto3 API calls, and the adaptive retry mode
+    # rate limits the client side on throttling errors
+    bkp_client = get_boto3_client('backup', aws_region, get_boto3_api_max_concurrency(), 'adaptive', assume_role_arn)
     # Determine the action type based on the existence of the relevant parameters
     if len(boto3_api_json_text) == 0:
         function_response_state = 'FAILURE'
@@ -526,6 +1380,8 @@ def parse_request_and_prepare_response(event):
                                                                                                   'create_logically_air_gapped_backup_vault',
                                                                                                   create_backup_vault_json)
                         logging.info('Completed creating the logically air gapped backup vault.')
+                    # Invalidate the cached backup vault inventory
+                    invalidate_backup_vault_index(bkp_client)
                     # Get the backup vault ARN
                     retrieved_backup_vault_arn = create_backup_vault_response['BackupVaultArn']
                     # Append to the response body text
@@ -549,6 +1405,8 @@ def parse_request_and_prepare_response(event):
         elif boto3_api_name == 'create_backup_plan':
             # Parse the JSON
             create_backup_plan_json = json.loads(boto3_api_json_text)
+            # Invalidate the cached backup plan index, so that the existence checks below are not stale
+            invalidate_backup_plan_index(bkp_client)
             # Get the backup plan name
             backup_plan_name = create_backup_plan_json['BackupPlan']['BackupPlanName']
             # Check if the backup plan exists
@@ -579,6 +1437,8 @@ def parse_request_and_prepare_response(event):
                     logging.info('Completed creating the backup plan.')
                     # Get the backup plan id
                     retrieved_backup_plan_id = create_backup_plan_response['BackupPlanId']
+                    # Add the backup plan to the cached index
+                    add_backup_plan_to_index(bkp_client, retrieved_backup_plan_id, backup_plan_name)
                     # Append to the response body text
                     response_body_text_list.append('Backup plan with name "{}" and id "{}" has been created.'
                                                    .format(backup_plan_name, retrieved_backup_plan_id))
@@ -589,9 +1449,13 @@ def parse_request_and_prepare_response(event):
                                           .format(backup_plan_name, exception))
                     response_body_text_list.append(response_body_text)
                     logging.error(response_body_text)
+                    # The outcome of the failed call is not known; invalidate the cached backup plan index
+                    invalidate_backup_plan_index(bkp_client)
         elif boto3_api_name == 'update_backup_plan':
             # Parse the JSON
             update_backup_plan_json = json.loads(boto3_api_json_text)
+            # Invalidate the cached backup plan index, so that the existence checks below are not stale
+            invalidate_backup_plan_index(bkp_client)
             # Get the backup plan name
             backup_plan_name = update_backup_plan_json['BackupPlan']['BackupPlanName']
             # Check if the backup plan exists
@@ -616,6 +1480,8 @@ def parse_request_and_prepare_response(event):
                     logging.info('Completed updating the backup plan.')
                     # Get the backup plan id
                     retrieved_backup_plan_id = update_backup_plan_response['BackupPlanId']
+                    # Update the backup plan in the cached index
+                    add_backup_plan_to_index(bkp_client, retrieved_backup_plan_id, backup_plan_name)
                     # Append to the response body text
                     response_body_text_list.append('Backup plan with name "{}" and id "{}" has been updated.'
                                                    .format(backup_plan_name, retrieved_backup_plan_id))
@@ -626,6 +1492,8 @@ def parse_request_and_prepare_response(event):
                                           .format(backup_plan_name, exception))
                     response_body_text_list.append(response_body_text)
                     logging.error(response_body_text)
+                    # The outcome of the failed call is not known; invalidate the cached backup plan index
+                    invalidate_backup_plan_index(bkp_client)
             else:
                 function_response_state = 'REPROMPT'
                 # Append to the response body text
@@ -636,6 +1504,8 @@ def parse_request_and_prepare_response(event):
         elif boto3_api_name == 'create_backup_selection':
             # Parse the JSON
             create_backup_selection_json = json.loads(boto3_api_json_text)
+            # Invalidate the cached backup plan index, so that the existence checks below are not stale
+            invalidate_backup_plan_index(bkp_client)
             # Check the backup plan id and process accordingly
             if 'BackupPlanId' in create_backup_selection_json:
                 # Get the backup selection name and plan id
@@ -663,6 +1533,9 @@ def parse_request_and_prepare_response(event):
                         logging.info('Completed creating the backup selection.')
                         # Get the backup selection id
                         retrieved_backup_selection_id = create_backup_selection_response['SelectionId']
+                        # Add the backup selection to the cached index
+                        add_backup_selection_to_index(bkp_client, retrieved_backup_plan_id,
+                                                      retrieved_backup_selection_id, backup_selection_name)
                         # Append to the response body text
                         response_body_text_list.append('Backup selection with name "{}" and id "{}" has been created for backup plan id "{}".'
                                                        .format(backup_selection_name, retrieved_backup_selection_id, retrieved_backup_plan_id))
@@ -673,6 +1546,8 @@ def parse_request_and_prepare_response(event):
                                               .format(backup_selection_name, retrieved_backup_plan_id, exception))
                         response_body_text_list.append(response_body_text)
                         logging.error(response_body_text)
+                        # The outcome of the failed call is not known; invalidate the cached backup plan index
+                        invalidate_backup_plan_index(bkp_client)
             else:
                 function_response_state = 'REPROMPT'
                 # Append to the response body text
@@ -684,21 +1559,18 @@ def parse_request_and_prepare_response(event):
             list_backup_vaults_json = json.loads(boto3_api_json_text)
             if list_backup_vaults_json is None:
                 list_backup_vaults_json = {}
-            # Specify the max results restriction
-            response_body_text_list.append(
-                'Results restricted to a max of {} items(s). '.format(os.environ['BOTO3_API_MAX_RESULTS']))
-            # Set the max records
-            list_backup_vaults_json['MaxResults'] = int(os.environ['BOTO3_API_MAX_RESULTS'])
             # List the backup vaults by invoking the API
             logging.info('Listing backup vaults...')
-            list_backup_vaults_response = invoke_boto3_api_with_llm_intervened_retry(aws_account_id,
-                                                                                     aws_region,
-                                                                                     bkp_client,
-                                                                                     'list_backup_vaults',
-                                                                                     list_backup_vaults_json)
+            list_backup_vaults_response, total_item_count = list_all_items_with_llm_intervened_retry(aws_account_id,
+                                                                                                     aws_region,
+                                                                                                     bkp_client,
+                                                                                                     'list_backup_vaults',
+                                                                                                     'BackupVaultList',
+                                                                                                     list_backup_vaults_json)
             logging.info('Completed listing backup vaults.')
+            response_body_text_list.append(get_item_count_text(len(list_backup_vaults_response), total_item_count))
             # Append to the response body text
-            response_body_text_list.append('List of backup vaults :: "{}"'.format(list_backup_vaults_response['BackupVaultList']))
+            response_body_text_list.append('List of backup vaults :: "{}"'.format(list_backup_vaults_response))
         elif boto3_api_name == 'list_backup_vaults_for_tags':
             # Parse the JSON
             list_backup_vaults_for_tags_json = json.loads(boto3_api_json_text)
@@ -714,9 +1586,10 @@ def parse_request_and_prepare_response(event):
                                                                                    retrieved_tag_name,
                                                                                    retrieved_tag_values)
                 logging.info('Getting back vaults for tag with values.')
+                total_item_count = len(list_backup_vaults_for_tags_response)
+                list_backup_vaults_for_tags_response = list_backup_vaults_for_tags_response[:int(os.environ['BOTO3_API_MAX_RESULTS'])]
+                response_body_text_list.append(get_item_count_text(len(list_backup_vaults_for_tags_response), total_item_count))
                 # Append to the response body text
-                response_body_text_list.append(
-                    'Results restricted to a max of {} item(s). '.format(os.environ['BOTO3_API_MAX_RESULTS']))
                 response_body_text_list.append(
                     'Details of backup vaults associated with tag "{}" and with values {} :: {}'.format(retrieved_tag_name,
                                                                                                         retrieved_tag_values,
@@ -733,43 +1606,39 @@ def parse_request_and_prepare_response(event):
             list_protected_resources_json = json.loads(boto3_api_json_text)
             if list_protected_resources_json is None:
                 list_protected_resources_json = {}
-            # Set the max records
-            list_protected_resources_json['MaxResults'] = int(os.environ['BOTO3_API_MAX_RESULTS'])
-            response_body_text_list.append(
-                'Results restricted to a max of {} items(s). '.format(os.environ['BOTO3_API_MAX_RESULTS']))
             # List the protected resources by invoking the API
             logging.info('Listing protected resources...')
-            list_protected_resources_response = invoke_boto3_api_with_llm_intervened_retry(aws_account_id,
-                                                                                           aws_region,
-                                                                                           bkp_client,
-                                                                                           'list_protected_resources',
-                                                                                           list_protected_resources_json)
+            list_protected_resources_response, total_item_count = list_all_items_with_llm_intervened_retry(aws_account_id,
+                                                                                                           aws_region,
+                                                                                                           bkp_client,
+                                                                                                           'list_protected_resources',
+                                                                                                           'Results',
+                                                                                                           list_protected_resources_json)
             logging.info('Completed listing protected resources.')
+            response_body_text_list.append(get_item_count_text(len(list_protected_resources_response), total_item_count))
             # Append to the response body text
-            response_body_text_list.append('List of protected resources :: "{}"'.format(list_protected_resources_response['Results']))
+            response_body_text_list.append('List of protected resources :: "{}"'.format(list_protected_resources_response))
         elif boto3_api_name == 'list_protected_resources_by_backup_vault':
             # Parse the JSON
             list_protected_resources_by_backup_vault_json = json.loads(boto3_api_json_text)
             if list_protected_resources_by_backup_vault_json is None:
                 list_protected_resources_by_backup_vault_json = {}
-            # Set the max records
-            list_protected_resources_by_backup_vault_json['MaxResults'] = int(os.environ['BOTO3_API_MAX_RESULTS'])
-            response_body_text_list.append(
-                'Results restricted to a max of {} items(s). '.format(os.environ['BOTO3_API_MAX_RESULTS']))
             # Check the backup vault name and process accordingly
             if 'BackupVaultName' in list_protected_resources_by_backup_vault_json:
                 retrieved_backup_vault_name = list_protected_resources_by_backup_vault_json['BackupVaultName']
                 # List the protected resources by backup vault by invoking the API
                 logging.info('Listing protected resources by backup vault...')
-                list_protected_resources_by_backup_vault_response = invoke_boto3_api_with_llm_intervened_retry(aws_account_id,
-                                                                                               aws_region,
-                                                                                               bkp_client,
-                                                                                               'list_protected_resources_by_backup_vault',
-                                                                                               list_protected_resources_by_backup_vault_json)
+                list_protected_resources_by_backup_vault_response, total_item_count = list_all_items_with_llm_intervened_retry(aws_account_id,
+                                                                                                                               aws_region,
+                                                                                                                               bkp_client,
+                                                                                                                               'list_protected_resources_by_backup_vault',
+                                                                                                                               'Results',
+                                                                                                                               list_protected_resources_by_backup_vault_json)
                 logging.info('Completed listing protected resources by backup vault.')
+                response_body_text_list.append(get_item_count_text(len(list_protected_resources_by_backup_vault_response), total_item_count))
                 # Append to the response body text
                 response_body_text_list.append('List of protected resources for backup vault named "{}" :: "{}"'.format(retrieved_backup_vault_name,
-                                                                                                                        list_protected_resources_by_backup_vault_response['Results']))
+                                                                                                                        list_protected_resources_by_backup_vault_response))
             else:
                 function_response_state = 'REPROMPT'
                 # Append to the response body text
@@ -782,40 +1651,36 @@ def parse_request_and_prepare_response(event):
             list_backup_jobs_json = json.loads(boto3_api_json_text)
             if list_backup_jobs_json is None:
                 list_backup_jobs_json = {}
-            # Set the max records
-            list_backup_jobs_json['MaxResults'] = int(os.environ['BOTO3_API_MAX_RESULTS'])
-            response_body_text_list.append(
-                'Results restricted to a max of {} items(s). '.format(os.environ['BOTO3_API_MAX_RESULTS']))
             # List the backup jobs by invoking the API
             logging.info('Listing backup jobs...')
-            list_backup_jobs_response = invoke_boto3_api_with_llm_intervened_retry(aws_account_id,
-                                                                                   aws_region,
-                                                                                   bkp_client,
-                                                                                   'list_backup_jobs',
-                                                                                   list_backup_jobs_json)
+            list_backup_jobs_response, total_item_count = list_all_items_with_llm_intervened_retry(aws_account_id,
+                                                                                                   aws_region,
+                                                                                                   bkp_client,
+                                                                                                   'list_backup_jobs',
+                                                                                                   'BackupJobs',
+                                                                                                   list_backup_jobs_json)
             logging.info('Completed listing backup jobs.')
+            response_body_text_list.append(get_item_count_text(len(list_backup_jobs_response), total_item_count))
             # Append to the response body text
             response_body_text_list.append(
-                'List of backup jobs :: "{}"'.format(list_backup_jobs_response['BackupJobs']))
+                'List of backup jobs :: "{}"'.format(list_backup_jobs_response))
         elif boto3_api_name == 'list_backup_plans':
             # Parse the JSON
             list_backup_plans_json = json.loads(boto3_api_json_text)
             if list_backup_plans_json is None:
                 list_backup_plans_json = {}
-            # Set the max records
-            list_backup_plans_json['MaxResults'] = int(os.environ['BOTO3_API_MAX_RESULTS'])
-            response_body_text_list.append(
-                'Results restricted to a max of {} items(s). '.format(os.environ['BOTO3_API_MAX_RESULTS']))
             # List the backup plans by invoking the API
             logging.info('Listing backup plans...')
-            list_backup_plans_response = invoke_boto3_api_with_llm_intervened_retry(aws_account_id,
-                                                                                    aws_region,
-                                                                                    bkp_client,
-                                                                                    'list_backup_plans',
-                                                                                    list_backup_plans_json)
+            list_backup_plans_response, total_item_count = list_all_items_with_llm_intervened_retry(aws_account_id,
+                                                                                                    aws_region,
+                                                                                                    bkp_client,
+                                                                                                    'list_backup_plans',
+                                                                                                    'BackupPlansList',
+                                                                                                    list_backup_plans_json)
             logging.info('Completed listing backup plans.')
+            response_body_text_list.append(get_item_count_text(len(list_backup_plans_response), total_item_count))
             # Append to the response body text
-            response_body_text_list.append('List of backup plans :: "{}"'.format(list_backup_plans_response['BackupPlansList']))
+            response_body_text_list.append('List of backup plans :: "{}"'.format(list_backup_plans_response))
         elif boto3_api_name == 'list_backup_plans_for_tags':
             # Parse the JSON
             list_backup_plans_for_tags_json = json.loads(boto3_api_json_text)
@@ -831,9 +1696,10 @@ def parse_request_and_prepare_response(event):
                                                                                  retrieved_tag_name,
                                                                                  retrieved_tag_values)
                 logging.info('Getting backup plans for tag with values.')
+                total_item_count = len(list_backup_plans_for_tags_response)
+                list_backup_plans_for_tags_response = list_backup_plans_for_tags_response[:int(os.environ['BOTO3_API_MAX_RESULTS'])]
+                response_body_text_list.append(get_item_count_text(len(list_backup_plans_for_tags_response), total_item_count))
                 # Append to the response body text
-                response_body_text_list.append(
-                    'Results restricted to a max of {} item(s). '.format(os.environ['BOTO3_API_MAX_RESULTS']))
                 response_body_text_list.append(
                     'Details of backup plans associated with tag "{}" and with values {} :: {}'.format(retrieved_tag_name,
                                                                                                         retrieved_tag_values,
@@ -859,24 +1725,22 @@ def parse_request_and_prepare_response(event):
                 list_backup_selections_json = json.loads('{"BackupPlanId": "' + retrieved_backup_plan_id + '"}')
             # Check the backup plan id and process accordingly
             if 'BackupPlanId' in list_backup_selections_json:
-                # Set the max records
-                list_backup_selections_json['MaxResults'] = int(os.environ['BOTO3_API_MAX_RESULTS'])
-                response_body_text_list.append(
-                    'Results restricted to a max of {} items(s). '.format(os.environ['BOTO3_API_MAX_RESULTS']))
                 # Get the backup plan id
                 retrieved_backup_plan_id = list_backup_selections_json['BackupPlanId']
                 # List the backup selections by invoking the API
                 logging.info('Listing backup selections...')
-                list_backup_selections_response = invoke_boto3_api_with_llm_intervened_retry(aws_account_id,
-                                                                                             aws_region,
-                                                                                             bkp_client,
-                                                                                             'list_backup_selections',
-                                                                                             list_backup_selections_json)
+                list_backup_selections_response, total_item_count = list_all_items_with_llm_intervened_retry(aws_account_id,
+                                                                                                             aws_region,
+                                                                                                             bkp_client,
+                                                                                                             'list_backup_selections',
+                                                                                                             'BackupSelectionsList',
+                                                                                                             list_backup_selections_json)
                 logging.info('Completed listing backup selections.')
+                response_body_text_list.append(get_item_count_text(len(list_backup_selections_response), total_item_count))
                 # Append to the response body text
                 response_body_text_list.append(
                     'List of backup selections for backup id "{}" :: "{}"'
-                    .format(retrieved_backup_plan_id, list_backup_selections_response['BackupSelectionsList']))
+                    .format(retrieved_backup_plan_id, list_backup_selections_response))
             else:
                 function_response_state = 'REPROMPT'
                 # Append to the response body text
@@ -890,9 +1754,6 @@ def parse_request_and_prepare_response(event):
             retrieved_backup_vault_arn = get_backup_vault_json['BackupVaultArn']
             # Check the value that the user provided and process accordingly
             if len(retrieved_backup_vault_name) > 0:
-                # Specify the max results restriction
-                response_body_text_list.append(
-                    'Results restricted to a max of {} items(s). '.format(os.environ['BOTO3_API_MAX_RESULTS']))
                 logging.info('Getting backup vault details...')
                 backup_vault_exists, retrieved_backup_vault_details = get_backup_vault_for_name(bkp_client,
                                                                                                retrieved_backup_vault_name)
@@ -908,9 +1769,6 @@ def parse_request_and_prepare_response(event):
                     logging.warning(response_body_text)
                     response_body_text_list.append(response_body_text)
             elif len(retrieved_backup_vault_arn) > 0:
-                # Specify the max results restriction
-                response_body_text_list.append(
-                    'Results restricted to a max of {} items(s). '.format(os.environ['BOTO3_API_MAX_RESULTS']))
                 logging.info('Getting backup vault details...')
                 backup_vault_exists, retrieved_backup_vault_details = get_backup_vault_for_arn(bkp_client,
                                                                                               retrieved_backup_vault_arn)
@@ -1048,8 +1906,10 @@ def parse_request_and_prepare_response(event):
             # Check the value that the user provided and process accordingly
             if len(retrieved_backup_vault_name) > 0:
                 logging.info('Getting backup vault details...')
+                # Refresh the cached inventory as the number of recovery points may have changed
                 backup_vault_exists, retrieved_backup_vault_details = get_backup_vault_for_name(bkp_client,
-                                                                                               retrieved_backup_vault_name)
+                                                                                               retrieved_backup_vault_name,
+                                                                                               True)
                 logging.info('Completed getting backup vault details.')
                 if backup_vault_exists:
                     # Check if the backup vault is empty and delete accordingly
@@ -1060,6 +1920,8 @@ def parse_request_and_prepare_response(event):
                         logging.info('Deleting backup vault...')
                         bkp_client.delete_backup_vault(BackupVaultName=retrieved_backup_vault_name)
                         logging.info('Completed deleting backup vault.')
+                        # Invalidate the cached backup vault inventory
+                        invalidate_backup_vault_index(bkp_client)
                         response_body_text_list.append('Backup vault with name "{}" has been deleted.'
                                                        .format(retrieved_backup_vault_name))
                 else:
@@ -1071,8 +1933,10 @@ def parse_request_and_prepare_response(event):
                     response_body_text_list.append(response_body_text)
             elif len(retrieved_backup_vault_arn) > 0:
                 logging.info('Getting backup vault details...')
+                # Refresh the cached inventory as the number of recovery points may have changed
                 backup_vault_exists, retrieved_backup_vault_details = get_backup_vault_for_arn(bkp_client,
-                                                                                              retrieved_backup_vault_arn)
+                                                                                              retrieved_backup_vault_arn,
+                                                                                              True)
                 logging.info('Completed getting backup vault details.')
                 if backup_vault_exists:
                     # Check if the backup vault is empty and delete accordingly
@@ -1083,6 +1947,8 @@ def parse_request_and_prepare_response(event):
                         logging.info('Deleting backup vault...')
                         bkp_client.delete_backup_vault(BackupVaultName=retrieved_backup_vault_details['BackupVaultName'])
                         logging.info('Completed deleting backup vault.')
+                        # Invalidate the cached backup vault inventory
+                        invalidate_backup_vault_index(bkp_client)
                         response_body_text_list.append('Backup vault with ARN "{}" has been deleted.'
                                                        .format(retrieved_backup_vault_arn))
                 else:
@@ -1102,6 +1968,8 @@ def parse_request_and_prepare_response(event):
         elif boto3_api_name in ['delete_backup_plan', 'delete_backup_plan_using_name']:
             # Parse the JSON
             delete_backup_plan_json = json.loads(boto3_api_json_text)
+            # Invalidate the cached backup plan index, so that the existence checks below are not stale
+            invalidate_backup_plan_index(bkp_client)
             # Check if the user provided the name instead of the id of the backup plan
             if boto3_api_name == 'delete_backup_plan_using_name':
                 retrieved_backup_plan_name = delete_backup_plan_json['BackupPlanName']
@@ -1121,8 +1989,9 @@ def parse_request_and_prepare_response(event):
                 # Process accordingly
                 if backup_plan_exists:
                     # Get the list of all the backup selections for this backup plan
-                    backup_selections = (bkp_client.list_backup_selections(BackupPlanId=retrieved_backup_plan_id))[
-                        'BackupSelectionsList']
+                    backup_selections = list(iterate_paginated_items(bkp_client.list_backup_selections,
+                                                                     'BackupSelectionsList',
+                                                                     {'BackupPlanId': retrieved_backup_plan_id}))
                     # Loop the backup selections
                     for backup_selection in backup_selections:
                         # Delete the backup selection
@@ -1143,6 +2012,8 @@ def parse_request_and_prepare_response(event):
                                                                                              'delete_backup_plan',
                                                                                              delete_backup_plan_json)
                     logging.info('Completed deleting backup plan.')
+                    # Remove the backup plan and its backup selections from the cached index
+                    remove_backup_plan_from_index(bkp_client, retrieved_backup_plan_id)
                     # Append to the response body text
                     response_body_text_list.append('Backup plan with name "{}" and id "{}" has been deleted on "{}".'
                                                    .format(retrieved_backup_plan_name,
@@ -1164,6 +2035,8 @@ def parse_request_and_prepare_response(event):
         elif boto3_api_name in ['delete_backup_selection', 'delete_backup_selection_using_name']:
             # Parse the JSON
             delete_backup_selection_json = json.loads(boto3_api_json_text)
+            # Invalidate the cached backup plan index, so that the existence checks below are not stale
+            invalidate_backup_plan_index(bkp_client)
             # Check if the user provided the name of the backup plan instead of the id and process accordingly
             if 'BackupPlanName' in delete_backup_selection_json:
                 retrieved_backup_plan_name = delete_backup_selection_json['BackupPlanName']
@@ -1218,6 +2091,9 @@ def parse_request_and_prepare_response(event):
                                                                    'delete_backup_selection',
                                                                    delete_backup_selection_json)
                         logging.info('Completed deleting backup selection.')
+                        # Remove the backup selection from the cached index
+                        remove_backup_selection_from_index(bkp_client, retrieved_backup_plan_id,
+                                                           retrieved_backup_selection_id)
                         # Append to the response body text
                         response_body_text_list.append(
                             'Backup selection with id "{}" in backup plan with id "{}" has been deleted.'
@@ -1263,20 +2139,18 @@ def parse_request_and_prepare_response(event):
             list_legal_holds_json = json.loads(boto3_api_json_text)
             if list_legal_holds_json is None:
                 list_legal_holds_json = {}
-            # Set the max records
-            list_legal_holds_json['MaxResults'] = int(os.environ['BOTO3_API_MAX_RESULTS'])
-            response_body_text_list.append(
-                'Results restricted to a max of {} items(s). '.format(os.environ['BOTO3_API_MAX_RESULTS']))
             # List the legal holds by invoking the API
             logging.info('Listing legal holds...')
-            list_legal_holds_response = invoke_boto3_api_with_llm_intervened_retry(aws_account_id,
-                                                                                   aws_region,
-                                                                                   bkp_client,
-                                                                                   'list_legal_holds',
-                                                                                   list_legal_holds_json)
+            list_legal_holds_response, total_item_count = list_all_items_with_llm_intervened_retry(aws_account_id,
+                                                                                                   aws_region,
+                                                                                                   bkp_client,
+                                                                                                   'list_legal_holds',
+                                                                                                   'LegalHolds',
+                                                                                                   list_legal_holds_json)
             logging.info('Completed listing legal holds.')
+            response_body_text_list.append(get_item_count_text(len(list_legal_holds_response), total_item_count))
             # Append to the response body text
-            response_body_text_list.append('List of legal holds :: "{}"'.format(list_legal_holds_response['LegalHolds']))
+            response_body_text_list.append('List of legal holds :: "{}"'.format(list_legal_holds_response))
         elif boto3_api_name == 'list_legal_holds_for_tags':
             # Parse the JSON
             list_legal_holds_for_tags_json = json.loads(boto3_api_json_text)
@@ -1292,9 +2166,10 @@ def parse_request_and_prepare_response(event):
                                                                                retrieved_tag_name,
                                                                                retrieved_tag_values)
                 logging.info('Getting legal holds for tag with values.')
+                total_item_count = len(list_legal_holds_for_tags_response)
+                list_legal_holds_for_tags_response = list_legal_holds_for_tags_response[:int(os.environ['BOTO3_API_MAX_RESULTS'])]
+                response_body_text_list.append(get_item_count_text(len(list_legal_holds_for_tags_response), total_item_count))
                 # Append to the response body text
-                response_body_text_list.append(
-                    'Results restricted to a max of {} item(s). '.format(os.environ['BOTO3_API_MAX_RESULTS']))
                 response_body_text_list.append(
                     'Details of legal holds associated with tag "{}" and with values {} :: {}'.format(retrieved_tag_name,
                                                                                                         retrieved_tag_values,
@@ -1375,10 +2250,6 @@ def parse_request_and_prepare_response(event):
             list_recovery_points_by_backup_vault_json = json.loads(boto3_api_json_text)
             # Check the backup vault name and process accordingly
             if 'BackupVaultName' in list_recovery_points_by_backup_vault_json:
-                # Set the max records
-                list_recovery_points_by_backup_vault_json['MaxResults'] = int(os.environ['BOTO3_API_MAX_RESULTS'])
-                response_body_text_list.append(
-                    'Results restricted to a max of {} items(s). '.format(os.environ['BOTO3_API_MAX_RESULTS']))
                 # Get the backup vault name
                 retrieved_backup_vault_name = list_recovery_points_by_backup_vault_json['BackupVaultName']
                 # Check if the backup vault exists
@@ -1387,16 +2258,18 @@ def parse_request_and_prepare_response(event):
                 if backup_vault_exists:
                     # List the backup selections by invoking the API
                     logging.info('Listing recovery points by backup vault...')
-                    list_recovery_points_by_backup_vault_response = invoke_boto3_api_with_llm_intervened_retry(aws_account_id,
-                                                                                                               aws_region,
-                                                                                                               bkp_client,
-                                                                                                               'list_recovery_points_by_backup_vault',
-                                                                                                               list_recovery_points_by_backup_vault_json)
+                    list_recovery_points_by_backup_vault_response, total_item_count = list_all_items_with_llm_intervened_retry(aws_account_id,
+                                                                                                                               aws_region,
+                                                                                                                               bkp_client,
+                                                                                                                               'list_recovery_points_by_backup_vault',
+                                                                                                                               'RecoveryPoints',
+                                                                                                                               list_recovery_points_by_backup_vault_json)
                     logging.info('Completed listing recovery points by backup vault.')
+                    response_body_text_list.append(get_item_count_text(len(list_recovery_points_by_backup_vault_response), total_item_count))
                     # Append to the response body text
                     response_body_text_list.append(
                         'List of recovery points for backup vault "{}" :: "{}"'
-                        .format(retrieved_backup_vault_name, list_recovery_points_by_backup_vault_response['RecoveryPoints']))
+                        .format(retrieved_backup_vault_name, list_recovery_points_by_backup_vault_response))
                 else:
                     function_response_state = 'REPROMPT'
                     # Append to the response body text
@@ -1414,10 +2287,6 @@ def parse_request_and_prepare_response(event):
             list_recovery_points_by_legal_hold_json = json.loads(boto3_api_json_text)
             # Check the legal hold id and process accordingly
             if 'LegalHoldId' in list_recovery_points_by_legal_hold_json:
-                # Set the max records
-                list_recovery_points_by_legal_hold_json['MaxResults'] = int(os.environ['BOTO3_API_MAX_RESULTS'])
-                response_body_text_list.append(
-                    'Results restricted to a max of {} items(s). '.format(os.environ['BOTO3_API_MAX_RESULTS']))
                 # Get the legal hold id
                 retrieved_legal_hold_id = list_recovery_points_by_legal_hold_json['LegalHoldId']
                 # Check if the legal hold exists
@@ -1426,16 +2295,18 @@ def parse_request_and_prepare_response(event):
                 if legal_hold_exists:
                     # List the recovery points by legal hold by invoking the API
                     logging.info('Listing recovery points by legal hold...')
-                    list_recovery_points_by_legal_hold_response = invoke_boto3_api_with_llm_intervened_retry(aws_account_id,
-                                                                                                               aws_region,
-                                                                                                               bkp_client,
-                                                                                                               'list_recovery_points_by_legal_hold',
-                                                                                                               list_recovery_points_by_legal_hold_json)
+                    list_recovery_points_by_legal_hold_response, total_item_count = list_all_items_with_llm_intervened_retry(aws_account_id,
+                                                                                                                             aws_region,
+                                                                                                                             bkp_client,
+                                                                                                                             'list_recovery_points_by_legal_hold',
+                                                                                                                             'RecoveryPoints',
+                                                                                                                             list_recovery_points_by_legal_hold_json)
                     logging.info('Completed listing recovery points by legal hold.')
+                    response_body_text_list.append(get_item_count_text(len(list_recovery_points_by_legal_hold_response), total_item_count))
                     # Append to the response body text
                     response_body_text_list.append(
                         'List of recovery points for legal hold id "{}" :: "{}"'
-                        .format(retrieved_legal_hold_id, list_recovery_points_by_legal_hold_response['RecoveryPoints']))
+                        .format(retrieved_legal_hold_id, list_recovery_points_by_legal_hold_response))
                 else:
                     function_response_state = 'REPROMPT'
                     # Append to the response body text
@@ -1453,24 +2324,22 @@ def parse_request_and_prepare_response(event):
             list_recovery_points_by_resource_json = json.loads(boto3_api_json_text)
             # Check the resource ARN and process accordingly
             if 'ResourceArn' in list_recovery_points_by_resource_json:
-                # Set the max records
-                list_recovery_points_by_resource_json['MaxResults'] = int(os.environ['BOTO3_API_MAX_RESULTS'])
-                response_body_text_list.append(
-                    'Results restricted to a max of {} items(s). '.format(os.environ['BOTO3_API_MAX_RESULTS']))
                 # Get the resource ARN
                 retrieved_resource_arn = list_recovery_points_by_resource_json['ResourceArn']
                 # List the recovery points by resource by invoking the API
                 logging.info('Listing recovery points by resource...')
-                list_recovery_points_by_resource_response = invoke_boto3_api_with_llm_intervened_retry(aws_account_id,
-                                                                                                       aws_region,
-                                                                                                       bkp_client,
-                                                                                                       'list_recovery_points_by_resource',
-                                                                                                       list_recovery_points_by_resource_json)
+                list_recovery_points_by_resource_response, total_item_count = list_all_items_with_llm_intervened_retry(aws_account_id,
+                                                                                                                       aws_region,
+                                                                                                                       bkp_client,
+                                                                                                                       'list_recovery_points_by_resource',
+                                                                                                                       'RecoveryPoints',
+                                                                                                                       list_recovery_points_by_resource_json)
                 logging.info('Completed listing recovery points by resource.')
+                response_body_text_list.append(get_item_count_text(len(list_recovery_points_by_resource_response), total_item_count))
                 # Append to the response body text
                 response_body_text_list.append(
                     'List of recovery points for resource ARN "{}" :: "{}"'
-                    .format(retrieved_resource_arn, list_recovery_points_by_resource_response['RecoveryPoints']))
+                    .format(retrieved_resource_arn, list_recovery_points_by_resource_response))
             else:
                 function_response_state = 'REPROMPT'
                 # Append to the response body text
@@ -1483,6 +2352,151 @@ def parse_request_and_prepare_response(event):
             response_body_text = 'API "{}" is not supported. No API invocation was performed.'.format(boto3_api_name)
             logging.warning(response_body_text)
             response_body_text_list.append(response_body_text)
+    return response_body_text_list, function_response_state
+
+
+# Parse the input Lambda event received from Agents for Amazon Bedrock
+def parse_request_and_prepare_response(event, context):
+    response_body_text_list = []
+    function_response_state = ''
+    logging.info('Parsing request data...')
+    # Get the various objects from the input event
+    prompt_session_attributes = event["promptSessionAttributes"]
+    session_attributes = event["sessionAttributes"]
+    # Get the AWS account id from the session attributes, if it exists; if not, add to it
+    if 'AWSAccountId' in session_attributes:
+        aws_account_id = session_attributes['AWSAccountId']
+    else:
+        aws_account_id = get_aws_account_id(context)
+        session_attributes['AWSAccountId'] = aws_account_id
+    # Append to the response body text
+    response_body_text = 'AWS Account Id "{}" will be used.'.format(aws_account_id)
+    response_body_text_list.append(response_body_text)
+    logging.info(response_body_text)
+    # Get the input parameters
+    aws_region, boto3_api_name, boto3_api_json_text = '', '', ''
+    aws_account_ids_text = ''
+    input_text = event["inputText"]
+    # Loop through the input parameters
+    input_parameters = event["parameters"]
+    for input_parameter in input_parameters:
+        # Retrieve the value of the parameters
+        if input_parameter["name"] == "AWSRegion":
+            aws_region = input_parameter["value"]
+        elif input_parameter["name"] == "AWSAccountIds":
+            aws_account_ids_text = input_parameter["value"]
+        elif input_parameter["name"] == "Boto3APIName":
+            boto3_api_name = input_parameter["value"].lower()
+            boto3_api_name = substring_after(boto3_api_name, 'backup.client.')
+        elif input_parameter["name"] == "Boto3APIJSON":
+            boto3_api_json_text = input_parameter["value"]
+    logging.info('Completed parsing request data.')
+    # Set the default AWS region if not found in the input
+    if len(aws_region) == 0:
+        aws_region = os.environ['DEFAULT_AWS_REGION']
+    # Get the AWS regions, as the AWS region may be a comma separated list of AWS regions or "all"
+    aws_regions = get_aws_regions(aws_region)
+    # Append to the response body text
+    if len(aws_regions) == 1:
+        aws_region = aws_regions[0]
+        response_body_text = 'AWS Region "{}" will be used.'.format(aws_region)
+    else:
+        # The boto3 API JSON is validated in the default AWS region
+        aws_region = os.environ['DEFAULT_AWS_REGION']
+        response_body_text = 'AWS Regions {} will be used.'.format(', '.join('"{}"'.format(aws_region_name)
+                                                                       for aws_region_name in aws_regions))
+    response_body_text_list.append(response_body_text)
+    logging.info(response_body_text)
+    # Get the target AWS accounts, which are the AWS account of this Lambda function unless other AWS accounts
+    # are specified
+    aws_account_ids = get_aws_account_ids(aws_account_ids_text, aws_account_id)
+    if aws_account_ids != [aws_account_id]:
+        # Append to the response body text
+        response_body_text = 'AWS Account Ids {} will be used.'.format(', '.join('"{}"'.format(target_aws_account_id)
+                                                                           for target_aws_account_id in aws_account_ids))
+        response_body_text_list.append(response_body_text)
+        logging.info(response_body_text)
+    # Get the cached AWS Backup boto3 client for the specific region
+    # The connection pool is sized to match the concurrent boto3 API calls, and the adaptive retry mode
+    # rate limits the client side on throttling errors
+    bkp_client = get_boto3_client('backup', aws_region, get_boto3_api_max_concurrency(), 'adaptive')
+    # Except for custom APIs, validate the boto3 JSON for the specified user input locally
+    # and, only if it is not valid, fix it by invoking a LLM
+    if boto3_api_name not in ('list_backup_selections_using_backup_plan_name',
+                              'list_backup_vaults_for_tags',
+                              'list_backup_plans_for_tags',
+                              'get_backup_vault_using_name',
+                              'get_backup_vault_using_arn',
+                              'get_backup_plan_using_name',
+                              'get_backup_selection_using_name',
+                              'delete_backup_vault_using_name',
+                              'delete_backup_vault_using_arn',
+                              'delete_backup_plan_using_name',
+                              'delete_backup_selection_using_name',
+                              'list_legal_holds_for_tags',
+                              'get_legal_hold_using_arn',
+                              'cancel_legal_hold_using_arn'):
+        logging.info('Validating the boto3 API JSON...')
+        validation_errors = validate_boto3_api_json(bkp_client, boto3_api_name, boto3_api_json_text)
+        if len(validation_errors) == 0:
+            BOTO3_API_JSON_LOCAL_VALIDATION_COUNTS['hit'] += 1
+            logging.info('The boto3 API JSON is valid as per the local validation.')
+        else:
+            BOTO3_API_JSON_LOCAL_VALIDATION_COUNTS['miss'] += 1
+            logging.info('The boto3 API JSON failed the local validation :: {}'.format(validation_errors))
+            boto3_api_json_text = process_prompt(aws_account_id, aws_region, boto3_api_name, input_text,
+                                                 boto3_api_json_text, validation_errors)
+        logging.info('Completed validating the boto3 API JSON. Local validation hits: {}, misses: {}.'
+                     .format(BOTO3_API_JSON_LOCAL_VALIDATION_COUNTS['hit'], BOTO3_API_JSON_LOCAL_VALIDATION_COUNTS['miss']))
+    # Get the AWS account and AWS region targets, ordered by AWS account
+    cross_account_role_name = get_cross_account_role_name()
+    targets = [
+        {
+            'AWSAccountId': target_aws_account_id,
+            'AWSRegion': target_aws_region,
+            'AssumeRoleArn': get_assume_role_arn(target_aws_account_id, aws_account_id, cross_account_role_name)
+        }
+        for target_aws_account_id in aws_account_ids
+        for target_aws_region in aws_regions
+    ]
+    invalid_aws_account_ids = [target_aws_account_id for target_aws_account_id in aws_account_ids
+                               if AWS_ACCOUNT_ID_PATTERN.match(target_aws_account_id) is None]
+    # Process the boto3 API request for the target; the read only APIs can also be processed concurrently
+    # across multiple targets
+    if len(invalid_aws_account_ids) > 0:
+        function_response_state = 'REPROMPT'
+        # Append to the response body text
+        response_body_text = ('AWS Account Ids {} are not valid 12 digit AWS account ids. No API invocation was performed.'
+                              .format(invalid_aws_account_ids))
+        logging.warning(response_body_text)
+        response_body_text_list.append(response_body_text)
+    elif (aws_account_ids != [aws_account_id]) and (len(cross_account_role_name) == 0):
+        function_response_state = 'FAILURE'
+        # Append to the response body text
+        response_body_text = ('Cross account requests are not enabled, as the IAM role name to assume in the other '
+                              'AWS accounts is not configured. No API invocation was performed.')
+        logging.warning(response_body_text)
+        response_body_text_list.append(response_body_text)
+    elif len(targets) == 1:
+        target_text_list, function_response_state = process_boto3_api_request_for_region(targets[0]['AWSAccountId'],
+                                                                                           targets[0]['AWSRegion'],
+                                                                                           boto3_api_name,
+                                                                                           boto3_api_json_text,
+                                                                                           targets[0]['AssumeRoleArn'])
+        response_body_text_list.extend(target_text_list)
+    elif boto3_api_name.startswith(READ_ONLY_BOTO3_API_NAME_PREFIXES):
+        target_text_list, function_response_state = process_boto3_api_request_for_targets(targets,
+                                                                                            boto3_api_name,
+                                                                                            boto3_api_json_text)
+        response_body_text_list.extend(target_text_list)
+    else:
+        function_response_state = 'REPROMPT'
+        # Append to the response body text
+        response_body_text = ('API "{}" is not read only and can be run in only one AWS account and AWS Region. '
+                              'Please specify a single AWS account and AWS Region. No API invocation was performed.'
+                              .format(boto3_api_name))
+        logging.warning(response_body_text)
+        response_body_text_list.append(response_body_text)
     # Create the response message
     logging.info('Creating the response message...')
     # Concatenate the messages
@@ -1521,7 +2535,7 @@ def lambda_handler(event,context):
     logging.info('Request event :: {}'.format(event))
     logging.info('Request context :: {}'.format(context))
     # Parse the request data and prepare response
-    return_data = parse_request_and_prepare_response(event)
+    return_data = parse_request_and_prepare_response(event, context)
     logging.info('Response :: {}'.format(return_data))
     logging.info('Completed executing the handler() function.')
     return return_data
\ No newline at end of file